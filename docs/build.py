@@ -30,6 +30,27 @@ by clicking any of the example links below.
 
     If an endpoint does not describe a permissions level, then it does
     not impose any permissions restrictions.
+
+## Pagination and streaming
+
+Some endpoints that list entities, like the stops in a system, can return many results.
+The results of these endpoints can be paginated by passing a `limit` URL parameter,
+which is the maximum number of results in the response.
+If there are more results, the response has a `Link` header
+containing the URL of the next page:
+```
+Link: <https://demo.transiter.io/systems/us-ny-subway/stops?limit=100&after=IjEwMSI=>; rel="next"
+```
+The `after` URL parameter is an opaque cursor
+that identifies where the next page starts.
+Results are not skipped or repeated if entities are added or removed between requests.
+
+Alternatively, all of the results can be streamed
+by sending the request with the header `Accept: application/x-ndjson`.
+The response is then in the [newline delimited JSON](http://ndjson.org) format,
+with one result on each line,
+and results are sent as soon as they are read from the database.
+Streamed responses are not paginated.
 """
 
 
@@ -2,7 +2,7 @@ import time
 
 import pytest
 
-from transiter.db import dbconnection
+from transiter.db import dbconnection, systemcache
 
 # noinspection PyUnresolvedReferences
 from .data import *
@@ -28,6 +28,8 @@ def test_db():
 
 @pytest.fixture
 def db_session(test_db):
+    # Each test's data is rolled back, so IDs cached in previous tests are invalid.
+    systemcache.clear()
     with dbconnection.inline_unit_of_work() as session:
         yield session
         session.rollback()
@@ -1,3 +1,8 @@
+import datetime
+
+import pytest
+
+from transiter.db import models
 from transiter.import_ import fastscheduleoperations
 
 
@@ -26,3 +31,71 @@ def test_split_3():
     actual = list(fastscheduleoperations.split(container, 3))
 
     assert expected == actual
+
+
+@pytest.mark.parametrize("use_copy", [True, False])
+def test_bulk_insert(
+    db_session, monkeypatch, add_model, system_1, route_1_1, stop_1_1, use_copy
+):
+    if not use_copy:
+        monkeypatch.setattr(
+            fastscheduleoperations, "_supports_copy", lambda *args: False
+        )
+    service = add_model(
+        models.ScheduledService(id="service", system=system_1, source=route_1_1.source)
+    )
+    WheelchairAccessible = models.ScheduledTrip.WheelchairAccessible
+    BoardingPolicy = models.ScheduledTripStopTime.BoardingPolicy
+
+    fastscheduleoperations.bulk_insert(
+        models.ScheduledTrip,
+        [
+            {
+                "id": 'trip "1", with quotes',
+                "route_pk": route_1_1.pk,
+                "service_pk": service.pk,
+                "direction_id": None,
+                "headsign": "",
+                "wheelchair_accessible": WheelchairAccessible.ACCESSIBLE,
+                "bikes_allowed": models.ScheduledTrip.BikesAllowed.UNKNOWN,
+            }
+        ],
+    )
+    trip = db_session.query(models.ScheduledTrip).one()
+    fastscheduleoperations.bulk_insert(
+        models.ScheduledTripStopTime,
+        [
+            {
+                "trip_pk": trip.pk,
+                "stop_pk": stop_1_1.pk,
+                "arrival_time": datetime.time(10, 11, 12),
+                "departure_time": None,
+                "stop_sequence": 3,
+                "headsign": "Line 1\nLine 2",
+                "pickup_type": BoardingPolicy.ALLOWED,
+                "drop_off_type": BoardingPolicy.NOT_ALLOWED,
+                "continuous_pickup": BoardingPolicy.ALLOWED,
+                "continuous_drop_off": BoardingPolicy.ALLOWED,
+                "shape_distance_traveled": 1.5,
+                "exact_times": True,
+            }
+        ],
+    )
+
+    assert 'trip "1", with quotes' == trip.id
+    assert trip.direction_id is None
+    assert "" == trip.headsign
+    assert WheelchairAccessible.ACCESSIBLE == (trip.wheelchair_accessible)
+    stop_time = db_session.query(models.ScheduledTripStopTime).one()
+    assert datetime.time(10, 11, 12) == stop_time.arrival_time
+    assert stop_time.departure_time is None
+    assert "Line 1\nLine 2" == stop_time.headsign
+    assert BoardingPolicy.NOT_ALLOWED == (stop_time.drop_off_type)
+    assert 1.5 == stop_time.shape_distance_traveled
+    assert stop_time.exact_times is True
+
+
+def test_bulk_insert__no_mappings(db_session):
+    fastscheduleoperations.bulk_insert(models.ScheduledTrip, [])
+
+    assert [] == db_session.query(models.ScheduledTrip).all()
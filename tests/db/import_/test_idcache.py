@@ -0,0 +1,109 @@
+from transiter import parse
+from transiter.db import models
+from transiter.import_ import idcache, importdriver
+from tests.db.import_.test_import import ParserForTesting
+
+
+def test_get_id_to_pk_map(system_1, stop_1_1, stop_1_2):
+    expected = {stop_1_1.id: stop_1_1.pk, stop_1_2.id: stop_1_2.pk}
+
+    actual = idcache.get_id_to_pk_map(models.Stop, system_1)
+
+    assert expected == actual
+
+
+def test_get_id_to_pk_map__specify_ids(system_1, stop_1_1, stop_1_2):
+    expected = {stop_1_1.id: stop_1_1.pk, "unknown_id": None}
+
+    actual = idcache.get_id_to_pk_map(
+        models.Stop, system_1, [stop_1_1.id, "unknown_id"]
+    )
+
+    assert expected == actual
+
+
+def test_get_id_to_pk_map__cached(add_model, system_1, stop_1_1, feed_1_1_update_1):
+    idcache.get_id_to_pk_map(models.Stop, system_1)
+    add_model(
+        models.Stop(
+            id="new_id",
+            system=system_1,
+            type=models.Stop.Type.STATION,
+            source=feed_1_1_update_1,
+        )
+    )
+
+    actual = idcache.get_id_to_pk_map(models.Stop, system_1)
+
+    assert {stop_1_1.id: stop_1_1.pk} == actual
+
+
+def test_get_id_to_pk_map__new_generation(
+    db_session, add_model, system_1, stop_1_1, feed_1_1_update_1
+):
+    idcache.get_id_to_pk_map(models.Stop, system_1)
+    new_stop = add_model(
+        models.Stop(
+            id="new_id",
+            system=system_1,
+            type=models.Stop.Type.STATION,
+            source=feed_1_1_update_1,
+        )
+    )
+    system_1.cache_generation += 1
+    db_session.flush()
+
+    actual = idcache.get_id_to_pk_map(models.Stop, system_1)
+
+    assert {stop_1_1.id: stop_1_1.pk, new_stop.id: new_stop.pk} == actual
+
+
+def test_invalidate(db_session, add_model, system_1, stop_1_1, feed_1_1_update_1):
+    idcache.get_id_to_pk_map(models.Stop, system_1)
+    new_stop = add_model(
+        models.Stop(
+            id="new_id",
+            system=system_1,
+            type=models.Stop.Type.STATION,
+            source=feed_1_1_update_1,
+        )
+    )
+
+    idcache.invalidate(models.Stop, system_1)
+
+    assert 1 == system_1.cache_generation
+    assert {stop_1_1.id: stop_1_1.pk, new_stop.id: new_stop.pk} == (
+        idcache.get_id_to_pk_map(models.Stop, system_1)
+    )
+
+
+def test_invalidate__uncached_entity(system_1):
+    idcache.invalidate(models.Vehicle, system_1)
+
+    assert 0 == system_1.cache_generation
+
+
+def test_import_invalidates(add_model, system_1, stop_1_1):
+    feed = add_model(models.Feed(system=system_1, id="feed", auto_update_enabled=False))
+    feed_update = add_model(models.FeedUpdate(feed=feed))
+    idcache.get_id_to_pk_map(models.Stop, system_1)
+
+    importdriver.run_import(
+        feed_update.pk,
+        ParserForTesting(
+            [
+                parse.Stop(
+                    id="new_id",
+                    name="",
+                    latitude=0,
+                    longitude=0,
+                    type=parse.Stop.Type.STATION,
+                )
+            ]
+        ),
+    )
+
+    assert 1 == system_1.cache_generation
+    assert {stop_1_1.id, "new_id"} == set(
+        idcache.get_id_to_pk_map(models.Stop, system_1).keys()
+    )
@@ -1,13 +1,22 @@
 import dataclasses
 import datetime
+import io
 import itertools
+import json
+import pickle
+import threading
+import time
+import zipfile
 
 import pytest
 import pytz
 
-from transiter import parse
-from transiter.db import models
+from transiter import config, parse
+from transiter.db import dbconnection, models, systemcache
+from transiter.db.queries import feedqueries, systemqueries
 from transiter.import_ import importdriver
+from transiter.services import departureboardmanager
+from transiter.parse import transiter_gtfs_rt_pb2
 from tests.db.data import route_data
 
 
@@ -181,11 +190,11 @@ def test_simple_create_update_delete(
         current_update.pk, ParserForTesting(current)
     )
 
-    def fields_to_compare(entity):
+    def fields_to_compare(entity, source_pk):
         if entity_type is models.Route:
-            return entity.id, entity.description, entity.source_pk
+            return entity.id, entity.description, source_pk
         if entity_type is models.Stop:
-            return entity.id, entity.name, entity.source_pk
+            return entity.id, entity.name, source_pk
         if entity_type is models.Alert:
             return entity.id, entity.cause, entity.effect
         if entity_type is models.Agency:
@@ -194,8 +203,11 @@ def test_simple_create_update_delete(
             return entity.id, entity.label, entity.current_status
         raise NotImplementedError
 
-    assert set(map(fields_to_compare, current)) == set(
-        map(fields_to_compare, db_session.query(entity_type).all())
+    assert set(
+        fields_to_compare(entity, current_update.pk) for entity in current
+    ) == set(
+        fields_to_compare(entity, entity.source_pk)
+        for entity in db_session.query(entity_type).all()
     )
     verify_stats(actual_counts, expected_counts)
 
@@ -303,6 +315,56 @@ def test_route__agency_linking(db_session, current_update):
     assert persisted_route.agency is not None
 
 
+class SyncerForTesting:
+    def __init__(self, name, reads_parser_during_sync=False):
+        self.name = name
+        self.loaded = threading.Event()
+        self._reads_parser_during_sync = reads_parser_during_sync
+
+    def load_entities(self, parser_object):
+        self.loaded.set()
+        return [self.name]
+
+    def reads_parser_during_sync(self):
+        return self._reads_parser_during_sync
+
+
+def test_load_entities_ahead():
+    syncer_1 = SyncerForTesting("1")
+    syncer_2 = SyncerForTesting("2", reads_parser_during_sync=True)
+    syncer_3 = SyncerForTesting("3")
+
+    results = []
+    for syncer_, entities in importdriver._load_entities_ahead(
+        [syncer_1, syncer_2, syncer_3], ParserForTesting([])
+    ):
+        if syncer_ is syncer_1:
+            # The next syncer's entities are loaded while this syncer runs.
+            assert syncer_2.loaded.wait(timeout=10)
+        if syncer_ is syncer_2:
+            assert not syncer_3.loaded.is_set()
+        results.append((syncer_.name, entities))
+
+    assert [("1", ["1"]), ("2", ["2"]), ("3", ["3"])] == results
+
+
+def test_entity_batch(db_session, current_update):
+    agency = parse.Agency(id="agency", name="My Agency", timezone="", url="")
+    route = parse.Route(id="route", type=parse.Route.Type.RAIL, agency_id="agency")
+    trip = parse.Trip(id="trip", route_id="route", direction_id=True)
+    batch = pickle.loads(
+        pickle.dumps(
+            importdriver.load_entity_batch(ParserForTesting([route, agency, trip]))
+        )
+    )
+
+    stats = importdriver.run_import(current_update.pk, batch)
+
+    assert 3 == stats.num_added()
+    assert ["trip"] == [trip.id for trip in db_session.query(models.Trip).all()]
+    assert db_session.query(models.Route).all()[0].agency is not None
+
+
 @pytest.mark.parametrize(
     "previous,current,expected_counts",
     [
@@ -349,11 +411,14 @@ def test_direction_rules(
         current_update.pk, ParserForTesting(current)
     )
 
-    def fields_to_compare(entity):
-        return entity.stop_pk, entity.track, entity.source_pk
+    def fields_to_compare(entity, source_pk):
+        return entity.stop_pk, entity.track, source_pk
 
-    assert set(map(fields_to_compare, expected_entities)) == set(
-        map(fields_to_compare, db_session.query(models.DirectionRule).all())
+    assert set(
+        fields_to_compare(entity, current_update.pk) for entity in expected_entities
+    ) == set(
+        fields_to_compare(entity, entity.source_pk)
+        for entity in db_session.query(models.DirectionRule).all()
     )
     verify_stats(actual_counts, expected_counts)
 
@@ -408,6 +473,174 @@ def test_schedule(db_session, stop_1_1, route_1_1, previous_update, current_upda
     importdriver.run_import(current_update.pk, ParserForTesting([]))
 
 
+def test_schedule__incremental_sync(
+    db_session, stop_1_1, stop_1_2, route_1_1, previous_update, current_update
+):
+    def build_service(trip_id_to_stop_ids):
+        service = parse.ScheduledService.create_empty("service")
+        for trip_id, stop_ids in trip_id_to_stop_ids.items():
+            service.trips.append(
+                parse.ScheduledTrip(
+                    id=trip_id,
+                    route_id=route_1_1.id,
+                    direction_id=True,
+                    stop_times=[
+                        parse.ScheduledTripStopTime(
+                            stop_id=stop_id,
+                            stop_sequence=stop_sequence,
+                            arrival_time=datetime.time(10, stop_sequence),
+                            departure_time=datetime.time(10, stop_sequence),
+                        )
+                        for stop_sequence, stop_id in enumerate(stop_ids)
+                    ],
+                )
+            )
+        return service
+
+    def get_trip_id_to_pk_and_stop_pks():
+        return {
+            trip.id: (trip.pk, [stop_time.stop_pk for stop_time in trip.stop_times])
+            for trip in db_session.query(models.ScheduledTrip).all()
+        }
+
+    importdriver.run_import(
+        previous_update.pk,
+        ParserForTesting(
+            [
+                build_service(
+                    {
+                        "unchanged": [stop_1_1.id, stop_1_2.id],
+                        "changed": [stop_1_1.id, stop_1_2.id],
+                        "deleted": [stop_1_1.id],
+                    }
+                )
+            ]
+        ),
+    )
+    old_trip_id_to_pk_and_stop_pks = get_trip_id_to_pk_and_stop_pks()
+    unchanged_stop_time_pks = [
+        stop_time.pk
+        for stop_time in db_session.query(models.ScheduledTripStopTime).filter(
+            models.ScheduledTripStopTime.trip_pk
+            == old_trip_id_to_pk_and_stop_pks["unchanged"][0]
+        )
+    ]
+
+    importdriver.run_import(
+        current_update.pk,
+        ParserForTesting(
+            [
+                build_service(
+                    {
+                        "unchanged": [stop_1_1.id, stop_1_2.id],
+                        "changed": [stop_1_2.id, stop_1_1.id],
+                        "added": [stop_1_2.id],
+                    }
+                )
+            ]
+        ),
+    )
+    db_session.expire_all()
+    new_trip_id_to_pk_and_stop_pks = get_trip_id_to_pk_and_stop_pks()
+
+    assert {"unchanged", "changed", "added"} == set(new_trip_id_to_pk_and_stop_pks)
+    assert (
+        old_trip_id_to_pk_and_stop_pks["unchanged"]
+        == new_trip_id_to_pk_and_stop_pks["unchanged"]
+    )
+    assert unchanged_stop_time_pks == [
+        stop_time.pk
+        for stop_time in db_session.query(models.ScheduledTripStopTime).filter(
+            models.ScheduledTripStopTime.trip_pk
+            == old_trip_id_to_pk_and_stop_pks["unchanged"][0]
+        )
+    ]
+    assert (
+        old_trip_id_to_pk_and_stop_pks["changed"][0],
+        [stop_1_2.pk, stop_1_1.pk],
+    ) == new_trip_id_to_pk_and_stop_pks["changed"]
+    assert [stop_1_2.pk] == new_trip_id_to_pk_and_stop_pks["added"][1]
+
+
+def test_schedule__streamed_from_gtfs_static(
+    db_session, stop_1_1, stop_1_2, route_1_1, current_update
+):
+    buff = io.BytesIO()
+    with zipfile.ZipFile(buff, mode="w") as zip_file:
+        zip_file.writestr(
+            "calendar_dates.txt", "service_id,date,exception_type\nS,20200101,1"
+        )
+        zip_file.writestr(
+            "trips.txt",
+            "route_id,service_id,trip_id,direction_id\n{},S,T1,1\n{},S,T2,0".format(
+                route_1_1.id, route_1_1.id
+            ),
+        )
+        zip_file.writestr(
+            "stop_times.txt",
+            "\n".join(
+                [
+                    "trip_id,stop_id,stop_sequence,arrival_time,departure_time",
+                    "T1,{},1,10:00:00,10:00:00".format(stop_1_1.id),
+                    "T1,{},2,10:05:00,10:05:00".format(stop_1_2.id),
+                    "T2,{},1,11:00:00,11:00:00".format(stop_1_2.id),
+                    "T2,unknown_stop,2,11:05:00,11:05:00",
+                    "T3,{},1,12:00:00,12:00:00".format(stop_1_1.id),
+                ]
+            ),
+        )
+    parser = parse.GtfsStaticParser()
+    parser.load_content(buff.getvalue())
+
+    actual_counts = importdriver.run_import(current_update.pk, parser)
+
+    trip_id_to_stop_pks = {
+        trip.id: [stop_time.stop_pk for stop_time in trip.stop_times]
+        for trip in db_session.query(models.ScheduledTrip).all()
+    }
+    assert {
+        "T1": [stop_1_1.pk, stop_1_2.pk],
+        "T2": [stop_1_2.pk],
+    } == trip_id_to_stop_pks
+    verify_stats(actual_counts, (1, 0, 0))
+
+
+@pytest.mark.parametrize("previous_route_type", ["1", "2"])
+def test_routes__skipped_when_source_files_unchanged(
+    db_session, add_model, feed, current_update, previous_route_type
+):
+    def build_parser(route_type):
+        buff = io.BytesIO()
+        with zipfile.ZipFile(buff, mode="w") as zip_file:
+            zip_file.writestr(
+                "routes.txt", "route_id,route_type\nR,{}".format(route_type)
+            )
+        parser = parse.GtfsStaticParser()
+        parser.load_content(buff.getvalue())
+        return parser
+
+    add_model(
+        models.FeedUpdate(
+            feed=feed,
+            status=models.FeedUpdate.Status.SUCCESS,
+            result=models.FeedUpdate.Result.UPDATED,
+            completed_at=datetime.datetime(2020, 1, 1),
+            content_file_hashes=json.dumps(
+                build_parser(previous_route_type).get_file_hashes()
+            ),
+        )
+    )
+
+    actual_counts = importdriver.run_import(current_update.pk, build_parser("1"))
+
+    if previous_route_type == "1":
+        assert [] == db_session.query(models.Route).all()
+        verify_stats(actual_counts, (0, 0, 0))
+    else:
+        assert ["R"] == [route.id for route in db_session.query(models.Route).all()]
+        verify_stats(actual_counts, (1, 0, 0))
+
+
 def test_direction_rules__skip_unknown_stop(
     db_session, system_1, current_update,
 ):
@@ -502,6 +735,278 @@ def test_trip__invalid_stops_in_stop_times(
     assert 1 == len(all_trips[0].stop_times)
 
 
+def test_trip__built_directly_from_gtfs_realtime(
+    db_session, system_1, route_1_1, stop_1_1, stop_1_2, current_update
+):
+    gtfs = transiter_gtfs_rt_pb2
+    feed_message = gtfs.FeedMessage(
+        header=gtfs.FeedHeader(gtfs_realtime_version="2.0"),
+        entity=[
+            gtfs.FeedEntity(
+                id="1",
+                trip_update=gtfs.TripUpdate(
+                    trip=gtfs.TripDescriptor(
+                        trip_id="trip", route_id=route_1_1.id, direction_id=1
+                    ),
+                    stop_time_update=[
+                        gtfs.TripUpdate.StopTimeUpdate(
+                            stop_id=stop_1_1.id,
+                            arrival=gtfs.TripUpdate.StopTimeEvent(time=1000100),
+                        ),
+                        gtfs.TripUpdate.StopTimeUpdate(stop_id="unknown_stop"),
+                        gtfs.TripUpdate.StopTimeUpdate(
+                            stop_id=stop_1_2.id, stop_sequence=5
+                        ),
+                    ],
+                ),
+            )
+        ],
+    )
+    parser = parse.GtfsRealtimeParser()
+    parser.load_content(feed_message.SerializeToString())
+
+    actual_counts = importdriver.run_import(current_update.pk, parser)
+
+    [trip] = db_session.query(models.Trip).all()
+    assert ("trip", route_1_1.pk, True) == (trip.id, trip.route_pk, trip.direction_id)
+    assert [
+        (stop_1_1.pk, 1, datetime.datetime.fromtimestamp(1000100, tz=pytz.UTC)),
+        (stop_1_2.pk, 5, None),
+    ] == [
+        (stop_time.stop_pk, stop_time.stop_sequence, stop_time.arrival_time)
+        for stop_time in trip.stop_times
+    ]
+    verify_stats(actual_counts, (1, 0, 0))
+
+
+def test_trip__unchanged_stop_times_not_written(
+    db_session, add_model, feed, system_1, route_1_1, stop_1_1, stop_1_2
+):
+    def build_trip(second_arrival_time):
+        return parse.Trip(
+            id="trip",
+            route_id=route_1_1.id,
+            direction_id=True,
+            stop_times=[
+                parse.TripStopTime(
+                    stop_id=stop_1_1.id,
+                    stop_sequence=1,
+                    arrival_time=datetime.datetime(2020, 1, 1, 10, tzinfo=pytz.UTC),
+                ),
+                parse.TripStopTime(
+                    stop_id=stop_1_2.id,
+                    stop_sequence=2,
+                    arrival_time=second_arrival_time,
+                ),
+            ],
+        )
+
+    def run_import(trip):
+        feed_update = add_model(models.FeedUpdate(feed=feed))
+        return importdriver.run_import(feed_update.pk, ParserForTesting([trip]))
+
+    time_1 = datetime.datetime(2020, 1, 1, 11, tzinfo=pytz.UTC)
+    time_2 = datetime.datetime(2020, 1, 1, 12, tzinfo=pytz.UTC)
+    run_import(build_trip(time_1))
+    stop_time_pks = [
+        stop_time.pk for stop_time in db_session.query(models.TripStopTime).all()
+    ]
+
+    stats = run_import(build_trip(time_1))
+
+    assert 1 == stats.num_unchanged()
+    verify_stats(stats, (0, 0, 0))
+    assert stats.entity_type_to_num_in_db() == {"TRIP": 1}
+
+    stats = run_import(build_trip(time_2))
+
+    verify_stats(stats, (0, 1, 0))
+    assert [(stop_time_pks[0], 1), (stop_time_pks[1], 2)] == [
+        (stop_time.pk, stop_time.stop_sequence)
+        for stop_time in db_session.query(models.TripStopTime)
+        .order_by(models.TripStopTime.stop_sequence)
+        .all()
+    ]
+    assert time_2 == (
+        db_session.query(models.TripStopTime)
+        .filter(models.TripStopTime.stop_sequence == 2)
+        .one()
+        .arrival_time
+    )
+
+
+def test_trip__departure_boards(
+    db_session, add_model, monkeypatch, feed, route_1_1, stop_1_1, stop_1_2, stop_1_3
+):
+    monkeypatch.setattr(config, "MATERIALIZE_DEPARTURE_BOARDS", True)
+    stops = [stop_1_1, stop_1_2, stop_1_3]
+
+    def build_trip(*stops_and_sequences):
+        return parse.Trip(
+            id="trip",
+            route_id=route_1_1.id,
+            direction_id=True,
+            stop_times=[
+                parse.TripStopTime(
+                    stop_id=stop.id,
+                    stop_sequence=stop_sequence,
+                    arrival_time=datetime.datetime(
+                        2020, 1, 1, 10, stop_sequence, tzinfo=pytz.UTC
+                    ),
+                )
+                for stop, stop_sequence in stops_and_sequences
+            ],
+        )
+
+    def run_import(*entities):
+        feed_update = add_model(models.FeedUpdate(feed=feed))
+        importdriver.run_import(feed_update.pk, ParserForTesting(list(entities)))
+
+    def get_boards():
+        return {
+            stop_pk: json.loads(board.content)
+            for stop_pk, board in (
+                (board.stop_pk, board)
+                for board in db_session.query(models.DepartureBoard).all()
+            )
+        }
+
+    def get_num_stop_times(boards):
+        return [len(boards[stop.pk]["stop_times"]) for stop in stops]
+
+    run_import(build_trip((stop_1_1, 1), (stop_1_2, 2)))
+    boards = get_boards()
+
+    assert {stop_1_1.pk, stop_1_2.pk} == set(boards.keys())
+    assert (
+        departureboardmanager.build_departure_boards([stop_1_1.pk, stop_1_2.pk])
+        == boards
+    )
+
+    run_import(build_trip((stop_1_2, 2), (stop_1_3, 3)))
+    boards = get_boards()
+
+    assert [0, 1, 1] == get_num_stop_times(boards)
+    assert (
+        departureboardmanager.build_departure_boards([stop.pk for stop in stops])
+        == boards
+    )
+
+    route = parse.Route(id=route_1_1.id, type=parse.Route.Type.RAIL, color="ABCDEF")
+    run_import(route, build_trip((stop_1_2, 2), (stop_1_3, 3)))
+    boards = get_boards()
+
+    assert {stop.pk for stop in stops}.issubset(boards.keys())
+    assert "ABCDEF" == boards[stop_1_3.pk]["stop_times"][0]["trip"]["route_color"]
+
+    run_import(parse.Trip(id="trip_2", route_id=route_1_1.id, direction_id=True))
+    boards = get_boards()
+
+    assert [0, 0, 0] == get_num_stop_times(boards)
+
+
+@pytest.fixture
+def committed_system(test_db):
+    with dbconnection.inline_unit_of_work() as session:
+        system = models.System(
+            id="committed_system",
+            name="Committed system",
+            status=models.System.SystemStatus.ACTIVE,
+        )
+        feed_id_to_update = {}
+        for feed_id in ["static", "feed_1", "feed_2"]:
+            feed = models.Feed(system=system, id=feed_id, auto_update_enabled=False)
+            feed_id_to_update[feed_id] = models.FeedUpdate(feed=feed)
+            session.add(feed_id_to_update[feed_id])
+        static_update = feed_id_to_update["static"]
+        session.add(models.Route(system=system, id="route", source=static_update))
+        session.add(
+            models.Stop(
+                system=system,
+                id="stop",
+                type=models.Stop.Type.STATION,
+                source=static_update,
+            )
+        )
+    systemcache.clear()
+    yield "committed_system"
+    systemcache.clear()
+    with dbconnection.inline_unit_of_work():
+        systemqueries.delete_by_id("committed_system")
+
+
+def test_trip__departure_boards__concurrent_updates(monkeypatch, committed_system):
+    monkeypatch.setattr(config, "MATERIALIZE_DEPARTURE_BOARDS", True)
+    first_imported = threading.Event()
+    second_rebuilding = threading.Event()
+    rebuild_departure_boards = departureboardmanager.rebuild_departure_boards
+
+    def rebuild_departure_boards_and_signal(system_pk, stop_pks):
+        if threading.current_thread() is second_update:
+            second_rebuilding.set()
+        rebuild_departure_boards(system_pk, stop_pks)
+
+    monkeypatch.setattr(
+        departureboardmanager,
+        "rebuild_departure_boards",
+        rebuild_departure_boards_and_signal,
+    )
+
+    def run_import(feed_id, trip_id, before_commit=None):
+        with dbconnection.inline_unit_of_work():
+            feed_update = feedqueries.get_in_system_by_id(
+                committed_system, feed_id
+            ).updates[0]
+            importdriver.run_import(
+                feed_update.pk,
+                ParserForTesting(
+                    [
+                        parse.Trip(
+                            id=trip_id,
+                            route_id="route",
+                            direction_id=True,
+                            stop_times=[
+                                parse.TripStopTime(
+                                    stop_id="stop",
+                                    stop_sequence=1,
+                                    arrival_time=TIME_1,
+                                )
+                            ],
+                        )
+                    ]
+                ),
+            )
+            if before_commit is not None:
+                before_commit()
+
+    def commit_first_after_second_starts_rebuilding():
+        first_imported.set()
+        assert second_rebuilding.wait(timeout=10)
+        # Without serialization the second update would build its board from its
+        # own snapshot now, and write it after this update commits.
+        time.sleep(0.5)
+
+    first_update = threading.Thread(
+        target=run_import,
+        args=("feed_1", "trip_1", commit_first_after_second_starts_rebuilding),
+    )
+    second_update = threading.Thread(target=run_import, args=("feed_2", "trip_2"))
+    first_update.start()
+    assert first_imported.wait(timeout=10)
+    second_update.start()
+    first_update.join(timeout=20)
+    second_update.join(timeout=20)
+
+    with dbconnection.inline_unit_of_work() as session:
+        board = session.query(models.DepartureBoard).one()
+        trip_ids = {
+            stop_time["trip"]["id"]
+            for stop_time in json.loads(board.content)["stop_times"]
+        }
+
+    assert {"trip_1", "trip_2"} == trip_ids
+
+
 TIME_1 = datetime.datetime.fromtimestamp(1000100, tz=pytz.timezone("UTC"))
 TIME_2 = datetime.datetime.fromtimestamp(1000200, tz=pytz.timezone("UTC"))
 TIME_3 = datetime.datetime.fromtimestamp(1000300, tz=pytz.timezone("UTC"))
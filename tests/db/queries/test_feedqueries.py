@@ -1,6 +1,10 @@
 import datetime
 
-from transiter.db import models
+import pytest
+from alembic import command
+
+from transiter import config
+from transiter.db import dbconnection, models
 from transiter.db.queries import feedqueries
 
 
@@ -64,6 +68,16 @@ def test_get_update_by_pk__unknown_pk(feed_1_1_update_1):
 
 def test_get_last_successful_update(
     feed_1_1, feed_1_1_update_1, feed_1_1_update_2, feed_1_1_update_3
+):
+    assert feed_1_1_update_2 == feedqueries.get_last_successful_update(feed_1_1.pk)
+
+
+def test_get_last_successful_update__no_update(feed_1_1):
+    assert None is feedqueries.get_last_successful_update(feed_1_1.pk)
+
+
+def test_get_last_successful_update_hash(
+    feed_1_1, feed_1_1_update_1, feed_1_1_update_2, feed_1_1_update_3
 ):
     assert (
         feed_1_1_update_2.content_hash
@@ -71,10 +85,35 @@ def test_get_last_successful_update(
     )
 
 
-def test_get_last_successful_update__no_update(feed_1_1):
+def test_get_last_successful_update_hash__no_update(feed_1_1):
     assert None is feedqueries.get_last_successful_update_hash(feed_1_1.pk)
 
 
+def test_get_last_updated_content_file_hashes(add_model, feed_1_1):
+    for i, (result, content_file_hashes) in enumerate(
+        [
+            (models.FeedUpdate.Result.UPDATED, "first"),
+            (models.FeedUpdate.Result.UPDATED, "second"),
+            (models.FeedUpdate.Result.NOT_NEEDED, None),
+        ]
+    ):
+        add_model(
+            models.FeedUpdate(
+                feed=feed_1_1,
+                status=models.FeedUpdate.Status.SUCCESS,
+                result=result,
+                completed_at=datetime.datetime(2011, 1, 1, i, 0, 0),
+                content_file_hashes=content_file_hashes,
+            )
+        )
+
+    assert "second" == feedqueries.get_last_updated_content_file_hashes(feed_1_1.pk)
+
+
+def test_get_last_updated_content_file_hashes__no_update(feed_1_1):
+    assert None is feedqueries.get_last_updated_content_file_hashes(feed_1_1.pk)
+
+
 def test_list_updates_in_feed(
     feed_1_1, feed_1_1_update_1, feed_1_1_update_2, feed_1_1_update_3
 ):
@@ -85,6 +124,22 @@ def test_list_updates_in_feed(
     ] == feedqueries.list_updates_in_feed(feed_1_1.pk)
 
 
+def test_list_updates_in_feed__paginated(
+    feed_1_1, feed_1_1_update_1, feed_1_1_update_2, feed_1_1_update_3
+):
+    assert [feed_1_1_update_2] == feedqueries.list_updates_in_feed(
+        feed_1_1.pk, before_pk=feed_1_1_update_3.pk, limit=1
+    )
+
+
+def test_list_updates_in_feed__streamed(
+    feed_1_1, feed_1_1_update_1, feed_1_1_update_2, feed_1_1_update_3
+):
+    assert [[feed_1_1_update_3, feed_1_1_update_2], [feed_1_1_update_1]] == list(
+        feedqueries.list_updates_in_feed(feed_1_1.pk, limit=None, chunk_size=2)
+    )
+
+
 def test_list_updates_in_feed__no_updates(feed_1_1):
     assert [] == feedqueries.list_updates_in_feed(feed_1_1.pk)
 
@@ -133,3 +188,61 @@ def test__delete_in_system_by_id__unknown_feed(db_session, system_1, feed_1_1):
 
     assert response is False
     assert [feed_1_1] == db_session.query(models.Feed).all()
+
+
+@pytest.fixture
+def partitioned_feed_update_table(test_db, monkeypatch):
+    alembic_config = dbconnection._get_alembic_config()
+    monkeypatch.setattr(config, "DB_PARTITION_FEED_UPDATES", True)
+    command.downgrade(alembic_config, "4a6c1e9d3b28")
+    command.upgrade(alembic_config, "head")
+    yield
+    command.downgrade(alembic_config, "4a6c1e9d3b28")
+    monkeypatch.setattr(config, "DB_PARTITION_FEED_UPDATES", False)
+    command.upgrade(alembic_config, "head")
+
+
+def test_feed_update_partitions(
+    partitioned_feed_update_table,
+    db_session,
+    add_model,
+    feed_1_1,
+    feed_1_1_update_1,
+    route_1_1,
+):
+    today = datetime.datetime.utcnow().date()
+    future_day = today + datetime.timedelta(days=10)
+    old_day = today - datetime.timedelta(days=2)
+    future_update = add_model(
+        models.FeedUpdate(
+            feed=feed_1_1,
+            scheduled_at=datetime.datetime.combine(future_day, datetime.time(12)),
+        )
+    )
+    old_update = add_model(
+        models.FeedUpdate(
+            feed=feed_1_1,
+            scheduled_at=datetime.datetime.combine(old_day, datetime.time(12)),
+        )
+    )
+    route_1_1.source = old_update
+    add_model(
+        models.FeedUpdate(
+            feed=feed_1_1,
+            scheduled_at=datetime.datetime.combine(old_day, datetime.time(13)),
+        )
+    )
+
+    assert feedqueries.is_feed_update_partitioned()
+    assert today in feedqueries.list_feed_update_partition_days()
+
+    feedqueries.create_feed_update_partition(future_day)
+    feedqueries.drop_feed_update_partition(old_day)
+    db_session.expire_all()
+
+    days = feedqueries.list_feed_update_partition_days()
+    assert future_day in days
+    assert old_day not in days
+    assert {feed_1_1_update_1.pk, future_update.pk, old_update.pk} == {
+        feed_update.pk for feed_update in feedqueries.list_updates_in_feed(feed_1_1.pk)
+    }
@@ -39,8 +39,6 @@ def test_get_id_to_pk_map_by_feed_pk__no_matches(
 def test_delete_stale_entities(
     db_session, add_model, system_1, feed_1_1, route_1_1, route_1_2, route_1_3
 ):
-    # This breaks the test and hence the method:
-    # add_model(models.Trip(route=route_1_1))
     update_1 = add_model(models.FeedUpdate(feed=feed_1_1))
     update_2 = add_model(models.FeedUpdate(feed=feed_1_1))
     route_1_1.source = update_1
@@ -48,11 +46,48 @@ def test_delete_stale_entities(
     route_1_3.source = update_2
     db_session.flush()
 
-    genericqueries.delete_stale_entities(models.Route, update_2)
+    num_deleted = genericqueries.delete_stale_entities(models.Route, update_2)
 
+    assert 1 == num_deleted
     assert [route_1_2, route_1_3] == routequeries.list_in_system(system_1.id)
 
 
+def test_delete_stale_entities__dependents(
+    db_session, add_model, system_1, feed_1_1, route_1_1, stop_1_1
+):
+    update_1 = add_model(models.FeedUpdate(feed=feed_1_1))
+    update_2 = add_model(models.FeedUpdate(feed=feed_1_1))
+    stale_trip = add_model(models.Trip(id="trip_1", route=route_1_1, source=update_1))
+    trip = add_model(models.Trip(id="trip_2", route=route_1_1, source=update_2))
+    for trip_ in (stale_trip, trip):
+        add_model(models.TripStopTime(trip=trip_, stop=stop_1_1, stop_sequence=1))
+    vehicle = add_model(
+        models.Vehicle(id="vehicle", system=system_1, trip=stale_trip, source=update_2)
+    )
+    alert = add_model(
+        models.Alert(
+            id="alert",
+            system=system_1,
+            source=update_2,
+            routes=[route_1_1],
+            trips=[stale_trip],
+        )
+    )
+    add_model(models.AlertMessage(alert=alert, header="header", description=""))
+    vehicle_pk = vehicle.pk
+    db_session.expunge_all()
+
+    num_deleted = genericqueries.delete_stale_entities(models.Trip, update_2)
+
+    assert 1 == num_deleted
+    assert ["trip_2"] == [trip.id for trip in db_session.query(models.Trip).all()]
+    assert 1 == db_session.query(models.TripStopTime).count()
+    assert None is db_session.query(models.Vehicle).get(vehicle_pk).trip_pk
+    assert 0 == db_session.query(models.Alert).count()
+    assert 0 == db_session.query(models.AlertMessage).count()
+    assert 0 == db_session.query(models.alert.alert_route).count()
+
+
 def test_list_stale_entities(
     db_session, add_model, feed_1_1, route_1_1, route_1_2, route_1_3
 ):
@@ -123,6 +123,22 @@ def test_get_trip_id_to_pk_map_by_feed_pk__no_trips(feed_1_1, scheduled_service_
     assert expected == actual
 
 
+def test_get_trip_id_to_fingerprint_map_by_feed_pk(
+    db_session, feed_1_1, scheduled_trip_1_1
+):
+    scheduled_trip_1_1.fingerprint = "fingerprint"
+    db_session.flush()
+    expected = {
+        scheduled_trip_1_1.id: schedulequeries.TripFingerprintData(
+            pk=scheduled_trip_1_1.pk, fingerprint="fingerprint"
+        )
+    }
+
+    actual = schedulequeries.get_trip_id_to_fingerprint_map_by_feed_pk(feed_1_1.pk)
+
+    assert expected == actual
+
+
 def test_list_trips_by_system_pk_and_trip_ids(system_1, scheduled_trip_1_1):
     assert [scheduled_trip_1_1] == schedulequeries.list_trips_by_system_pk_and_trip_ids(
         system_1.pk, [scheduled_trip_1_1.id, "unknown_id"]
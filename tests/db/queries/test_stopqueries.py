@@ -70,6 +70,30 @@ def test_list_all_in_system(system_1, stop_1_1, stop_1_2, stop_2_1):
     assert [stop_1_1, stop_1_2] == stopqueries.list_all_in_system(system_1.id)
 
 
+def test_list_all_in_system__paginated(system_1, stop_1_1, stop_1_2, stop_1_3):
+    assert [stop_1_2] == stopqueries.list_all_in_system(
+        system_1.id, after_id=stop_1_1.id, limit=1
+    )
+
+
+def test_list_all_in_system__streamed(system_1, stop_1_1, stop_1_2, stop_1_3, stop_2_1):
+    assert [[stop_1_1, stop_1_2], [stop_1_3]] == list(
+        stopqueries.list_all_in_system(system_1.id, chunk_size=2)
+    )
+
+
+def test_list_all_transfers_in_system__paginated(system_1, transfers):
+    assert [transfers[1]] == stopqueries.list_all_transfers_in_system(
+        system_1.id, after_pk=transfers[0].pk, limit=1
+    )
+
+
+def test_list_all_transfers_in_system__streamed(system_1, transfers):
+    assert [transfers[:2], transfers[2:]] == list(
+        stopqueries.list_all_transfers_in_system(system_1.id, chunk_size=2)
+    )
+
+
 def test_list_all_in_system__no_stops(system_1, stop_2_1):
     assert [] == stopqueries.list_all_in_system(system_1.id)
 
@@ -350,17 +374,15 @@ def test_list_direction_rules(
     )
 
 
-@pytest.mark.parametrize("lat", [-4, 0, 4])
-@pytest.mark.parametrize("lon", [-4, 0, 4])
-def test_list_all_in_geographical_bounds(
-    system_1, add_model, lat, lon, stop_1_1, feed_1_1_update_1
+def test_list_stop_coordinates_in_system(
+    system_1, add_model, stop_1_1, stop_2_1, feed_1_1_update_1
 ):
     stop_1 = add_model(
         models.Stop(
             id="id_1",
             type=models.Stop.Type.STATION,
-            latitude=0,
-            longitude=0,
+            latitude=1.5,
+            longitude=-2.5,
             system=system_1,
             source=feed_1_1_update_1,
         )
@@ -368,16 +390,42 @@ def test_list_all_in_geographical_bounds(
     stop_2 = add_model(
         models.Stop(
             id="id_2",
-            type=models.Stop.Type.STATION,
-            latitude=lat,
-            longitude=lon,
+            type=models.Stop.Type.PLATFORM,
+            latitude=3,
+            longitude=4,
+            parent_stop=stop_1,
             system=system_1,
             source=feed_1_1_update_1,
         )
     )
-    if lat == 0 and lon == 0:
-        stop_2.parent_stop = stop_1_1
 
-    all_stops = stopqueries.list_all_in_geographical_bounds(-1, 1, -1, 1, system_1.id)
+    actual = stopqueries.list_stop_coordinates_in_system(system_1.pk)
+
+    assert [
+        stopqueries.StopCoordinates(stop_1.pk, 1.5, -2.5, None),
+        stopqueries.StopCoordinates(stop_2.pk, 3, 4, stop_1.pk),
+    ] == sorted(actual)
+
+
+def test_list_by_pks(stop_1_1, stop_1_2, stop_2_1):
+    actual = stopqueries.list_by_pks([stop_1_1.pk, stop_2_1.pk])
+
+    assert [stop_1_1, stop_2_1] == sorted(actual, key=lambda stop: stop.pk)
+
+
+def test_list_by_pks__no_pks(stop_1_1):
+    assert [] == stopqueries.list_by_pks([])
+
+
+def test_save_departure_boards(db_session, stop_1_1, stop_1_2, stop_1_3):
+    time_1 = datetime.datetime(2020, 1, 1, 10, tzinfo=datetime.timezone.utc)
+    time_2 = datetime.datetime(2020, 1, 1, 11, tzinfo=datetime.timezone.utc)
+    stopqueries.save_departure_boards({stop_1_1.pk: "1", stop_1_2.pk: "2"}, time_1)
+    stopqueries.save_departure_boards({stop_1_2.pk: "3", stop_1_3.pk: "4"}, time_2)
+
+    actual = stopqueries.get_stop_pk_to_departure_board_content_map(
+        [stop_1_1.pk, stop_1_2.pk]
+    )
 
-    assert [stop_1] == all_stops
+    assert {stop_1_1.pk: "1", stop_1_2.pk: "3"} == actual
+    assert time_2 == db_session.query(models.DepartureBoard).get(stop_1_2.pk).built_at
@@ -83,3 +83,18 @@ def test_get_update_by_pk__unknown(add_model, system_1):
     )
 
     assert None is systemqueries.get_update_by_pk(-100)
+
+
+def test_increment_update_generation(db_session, system_1, system_2):
+    system_1_generation = systemqueries.get_update_generation(system_1.id)
+
+    systemqueries.increment_update_generation(system_1.pk)
+
+    assert (system_1.pk, system_1_generation[1] + 1) == tuple(
+        systemqueries.get_update_generation(system_1.id)
+    )
+    assert (system_2.pk, 0) == tuple(systemqueries.get_update_generation(system_2.id))
+
+
+def test_get_update_generation__system_does_not_exist(db_session):
+    assert systemqueries.get_update_generation("does_not_exist") is None
@@ -21,6 +21,19 @@ def test_list_all_in_route(route_1_1, trip_1, trip_2, trip_3):
     )
 
 
+def test_list_all_in_route__paginated(route_1_1, trip_1, trip_2, trip_3):
+    assert [trip_2] == tripqueries.list_all_in_route_by_pk(
+        route_1_1.pk, after_id=trip_1.id, limit=1
+    )
+
+
+def test_list_all_in_route__streamed(route_1_1, trip_1, trip_2, trip_3):
+    chunks = list(tripqueries.list_all_in_route_by_pk(route_1_1.pk, chunk_size=2))
+
+    assert [[trip_1, trip_2], [trip_3]] == chunks
+    assert len(trip_3.stop_times) > 0
+
+
 def test_list_all_in_route__no_trips(route_1_1, route_1_2):
     assert [] == tripqueries.list_all_in_route_by_pk(route_1_2.pk)
 
@@ -57,6 +70,26 @@ def test_get_trip_pk_to_last_stop_map(route_1_1, stop_1_4, trip_1, trip_2, trip_
     assert expected == actual
 
 
+def test_get_trip_pk_to_stop_time_data_list(
+    stop_1_1, stop_1_2, stop_1_3, stop_1_4, trip_1, trip_2
+):
+    actual = tripqueries.get_trip_pk_to_stop_time_data_list([trip_1.pk])
+
+    assert [trip_1.pk] == list(actual.keys())
+    assert [
+        (stop_time.pk, stop_time.stop_sequence, stop_time.stop_pk, minute)
+        for minute, stop_time in enumerate(trip_1.stop_times)
+    ] == [
+        (
+            stop_time_data.pk,
+            stop_time_data.stop_sequence,
+            stop_time_data.stop_pk,
+            stop_time_data.arrival_time.minute,
+        )
+        for stop_time_data in actual[trip_1.pk]
+    ]
+
+
 def test_get_trip_pk_to_path_map(
     route_1_1, stop_1_1, stop_1_2, stop_1_3, stop_1_4, trip_1, trip_2, trip_3
 ):
@@ -88,3 +121,38 @@ def test_list_by_system_and_trip_ids(
     )
 
     assert [trip_1, trip_2] == actual
+
+
+def test_list_stop_pks_in_stale_trips(
+    add_model,
+    stop_1_1,
+    stop_1_2,
+    stop_1_4,
+    trip_2,
+    trip_3,
+    feed_1_1_update_1,
+    feed_1_1_update_2,
+):
+    trip_3.source = feed_1_1_update_2
+    add_model(trip_3)
+
+    actual = tripqueries.list_stop_pks_in_stale_trips(feed_1_1_update_2)
+
+    assert {stop_1_1.pk, stop_1_2.pk, stop_1_4.pk} == actual
+
+
+def test_get_trip_pk_to_vehicle_id_map(
+    add_model, system_1, trip_1, trip_2, trip_3, feed_1_1_update_1
+):
+    add_model(
+        models.Vehicle(
+            id="vehicle", system=system_1, trip=trip_1, source=feed_1_1_update_1
+        )
+    )
+    add_model(models.Vehicle(system=system_1, trip=trip_2, source=feed_1_1_update_1))
+
+    actual = tripqueries.get_trip_pk_to_vehicle_id_map(
+        [trip_1.pk, trip_2.pk, trip_3.pk]
+    )
+
+    assert {trip_1.pk: "vehicle", trip_2.pk: None} == actual
@@ -1,5 +1,12 @@
+import threading
+from unittest import mock
+
+import prometheus_client as prometheus
 import pytest
+import sqlalchemy
+from sqlalchemy import orm, sql
 
+from transiter import config
 from transiter.db import dbconnection
 
 
@@ -34,3 +41,141 @@ def test_nested_unit_of_work_error():
 
 def test_get_current_database_revision(db_session):
     assert dbconnection.get_current_database_revision() is not None
+
+
+@pytest.mark.parametrize(
+    "role,pool_size_setting,expected_pool_size",
+    [
+        [dbconnection.WEBSERVICE, None, 10],
+        [dbconnection.EXECUTOR, None, 2],
+        [dbconnection.EXECUTOR, "7", 7],
+    ],
+)
+def test_get_engine_profile(monkeypatch, role, pool_size_setting, expected_pool_size):
+    monkeypatch.setattr(config, "DB_POOL_SIZE", pool_size_setting)
+
+    profile = dbconnection.get_engine_profile(role)
+
+    assert expected_pool_size == profile.pool_size
+
+
+def test_set_role__unknown_role():
+    with pytest.raises(ValueError):
+        dbconnection.set_role("unknown")
+
+
+@pytest.mark.parametrize("transaction_pooling", [True, False])
+def test_create_engine__statement_timeout(test_db, monkeypatch, transaction_pooling):
+    monkeypatch.setattr(config, "DB_STATEMENT_TIMEOUT", "1234")
+    monkeypatch.setattr(config, "DB_TRANSACTION_POOLING", transaction_pooling)
+    engine = dbconnection.create_engine()
+
+    with orm.Session(engine, future=True) as session:
+        statement_timeout = session.execute(sql.text("SHOW statement_timeout")).scalar()
+
+    engine.dispose()
+    assert "1234ms" == statement_timeout
+
+
+def test_create_engine__metrics(test_db):
+    engine = dbconnection.create_engine(dbconnection.SCHEDULER)
+
+    with engine.connect():
+        checked_out = prometheus.REGISTRY.get_sample_value(
+            dbconnection.PROMETHEUS_DB_POOL_CONNECTIONS,
+            {
+                "role": dbconnection.SCHEDULER,
+                "database": dbconnection.PRIMARY,
+                "state": "checked_out",
+            },
+        )
+    num_checkouts = prometheus.REGISTRY.get_sample_value(
+        dbconnection.PROMETHEUS_DB_POOL_CHECKOUT_WAIT + "_count",
+        {"role": dbconnection.SCHEDULER, "database": dbconnection.PRIMARY},
+    )
+
+    engine.dispose()
+    assert 1 == checked_out
+    assert num_checkouts >= 1
+
+
+@pytest.mark.parametrize(
+    "read_only,replica_port,max_staleness,expect_replica",
+    [
+        [True, None, "10", True],
+        [False, None, "10", False],
+        [True, None, "-1", False],
+        [True, "1", "10", False],
+    ],
+)
+def test_read_only_unit_of_work(
+    test_db, monkeypatch, read_only, replica_port, max_staleness, expect_replica
+):
+    monkeypatch.setattr(config, "DB_REPLICA_HOST", config.DB_HOST)
+    monkeypatch.setattr(config, "DB_REPLICA_PORT", replica_port)
+    monkeypatch.setattr(config, "DB_REPLICA_MAX_STALENESS", max_staleness)
+    dbconnection.ensure_db_connection()
+    replica_engine = dbconnection.create_engine(database=dbconnection.REPLICA)
+    monkeypatch.setattr(dbconnection, "replica_engine", replica_engine)
+    monkeypatch.setattr(dbconnection, "_replica_status", dbconnection._ReplicaStatus())
+
+    with dbconnection.inline_unit_of_work(read_only=read_only) as session:
+        bind = session.get_bind()
+
+    replica_engine.dispose()
+    if expect_replica:
+        assert replica_engine is bind
+    else:
+        assert dbconnection.engine is bind
+
+
+def test_read_only_unit_of_work__decorator(test_db):
+    @dbconnection.unit_of_work(read_only=True)
+    def uow(a, b):
+        dbconnection.get_session()
+        return a + b
+
+    assert 3 == uow(1, 2)
+
+
+def test_create_engine__replica_connect_timeout(monkeypatch):
+    monkeypatch.setattr(config, "DB_REPLICA_HOST", config.DB_HOST)
+    create_engine = mock.MagicMock()
+    monkeypatch.setattr(sqlalchemy, "create_engine", create_engine)
+
+    dbconnection.create_engine(database=dbconnection.REPLICA)
+    dbconnection.create_engine(database=dbconnection.PRIMARY)
+
+    replica_kwargs, primary_kwargs = [call[1] for call in create_engine.call_args_list]
+    assert (
+        dbconnection.REPLICA_CONNECT_TIMEOUT
+        == replica_kwargs["connect_args"]["connect_timeout"]
+    )
+    assert "connect_timeout" not in primary_kwargs["connect_args"]
+
+
+def test_replica_status__check_in_progress(monkeypatch):
+    check_started = threading.Event()
+    finish_check = threading.Event()
+
+    def check(replica_engine):
+        check_started.set()
+        finish_check.wait(timeout=60)
+        return True
+
+    replica_status = dbconnection._ReplicaStatus()
+    monkeypatch.setattr(replica_status, "_check", check)
+    thread_results = []
+    thread = threading.Thread(
+        target=lambda: thread_results.append(replica_status.is_usable(None))
+    )
+    thread.start()
+    check_started.wait(timeout=60)
+
+    result_during_check = replica_status.is_usable(None)
+    finish_check.set()
+    thread.join(timeout=60)
+
+    assert result_during_check is False
+    assert [True] == thread_results
+    assert replica_status.is_usable(None) is True
@@ -0,0 +1,71 @@
+from transiter import parse
+from transiter.db import models
+from transiter.import_ import importdriver
+from transiter.services import spatialindex
+from tests.db.import_.test_import import ParserForTesting
+
+
+def add_stop(add_model, system, feed_update, id_, latitude, longitude):
+    return add_model(
+        models.Stop(
+            id=id_,
+            type=models.Stop.Type.STATION,
+            latitude=latitude,
+            longitude=longitude,
+            system=system,
+            source=feed_update,
+        )
+    )
+
+
+def search(system):
+    return [stop.pk for _, stop in spatialindex.get_index(system).search(0, 0, 100000)]
+
+
+def test_get_index(add_model, system_1, stop_2_1, feed_1_1_update_1):
+    stop_1 = add_stop(add_model, system_1, feed_1_1_update_1, "1", 0.1, 0.1)
+    stop_2 = add_stop(add_model, system_1, feed_1_1_update_1, "2", 0.2, 0.2)
+    add_stop(add_model, system_1, feed_1_1_update_1, "3", 5, 5)
+
+    assert [stop_1.pk, stop_2.pk] == search(system_1)
+
+
+def test_get_index__cached(add_model, system_1, feed_1_1_update_1):
+    stop_1 = add_stop(add_model, system_1, feed_1_1_update_1, "1", 0.1, 0.1)
+    spatialindex.get_index(system_1)
+    add_stop(add_model, system_1, feed_1_1_update_1, "2", 0.2, 0.2)
+
+    assert [stop_1.pk] == search(system_1)
+
+
+def test_import_invalidates(add_model, system_1):
+    feed = add_model(models.Feed(system=system_1, id="feed", auto_update_enabled=False))
+    feed_update = add_model(models.FeedUpdate(feed=feed))
+    spatialindex.get_index(system_1)
+
+    importdriver.run_import(
+        feed_update.pk,
+        ParserForTesting(
+            [
+                parse.Stop(
+                    id="new_id",
+                    name="",
+                    latitude=0.1,
+                    longitude=0.1,
+                    type=parse.Stop.Type.STATION,
+                )
+            ]
+        ),
+    )
+
+    assert 1 == system_1.cache_generation
+    assert 1 == len(search(system_1))
+
+
+def test_import_without_stop_changes_does_not_invalidate(add_model, system_1):
+    feed = add_model(models.Feed(system=system_1, id="feed", auto_update_enabled=False))
+    feed_update = add_model(models.FeedUpdate(feed=feed))
+
+    importdriver.run_import(feed_update.pk, ParserForTesting([]))
+
+    assert 0 == system_1.cache_generation
@@ -0,0 +1,43 @@
+from unittest import mock
+
+from transiter.db import systemcache
+
+
+def test_get__cached(system_1):
+    build = mock.MagicMock(side_effect=[1, 2])
+
+    systemcache.get(system_1, "key", build)
+
+    assert 1 == systemcache.get(system_1, "key", build)
+    assert 1 == build.call_count
+
+
+def test_get__keys_are_independent(system_1):
+    systemcache.get(system_1, "key_1", lambda: 1)
+
+    assert 2 == systemcache.get(system_1, "key_2", lambda: 2)
+
+
+def test_get__new_generation(db_session, system_1):
+    systemcache.get(system_1, "key", lambda: 1)
+    system_1.cache_generation += 1
+    db_session.flush()
+
+    assert 2 == systemcache.get(system_1, "key", lambda: 2)
+
+
+def test_invalidate(system_1):
+    systemcache.get(system_1, "key", lambda: 1)
+
+    systemcache.invalidate(system_1)
+    systemcache.invalidate(system_1)
+
+    assert 1 == system_1.cache_generation
+    assert 2 == systemcache.get(system_1, "key", lambda: 2)
+
+
+def test_invalidate__not_cached_in_same_session(system_1):
+    systemcache.invalidate(system_1)
+    systemcache.get(system_1, "key", lambda: 1)
+
+    assert 2 == systemcache.get(system_1, "key", lambda: 2)
@@ -0,0 +1,75 @@
+"""
+Benchmark for the memory use and construction cost of the parser output types.
+
+Each of the slotted parser types is compared with an equivalent ordinary dataclass
+with a per-instance __dict__. Run with:
+
+    python -m tests.performance.parsetypes
+"""
+import dataclasses
+import datetime
+import timeit
+import tracemalloc
+
+from transiter import parse
+
+NUM_OBJECTS = 100000
+
+TYPE_TO_KWARGS = {
+    parse.ScheduledTripStopTime: dict(
+        stop_id="stop",
+        arrival_time=datetime.time(10, 0, 0),
+        departure_time=datetime.time(10, 1, 0),
+        stop_sequence=5,
+    ),
+    parse.TripStopTime: dict(
+        stop_id="stop",
+        stop_sequence=5,
+        arrival_time=datetime.datetime(2020, 1, 1, 10, 0, 0),
+        track="1",
+    ),
+    parse.Trip: dict(id="trip", route_id="route", direction_id=True),
+    parse.Vehicle: dict(id="vehicle", trip_id="trip", latitude=1.0, longitude=2.0),
+    parse.Alert: dict(id="alert"),
+}
+
+
+def unslotted_copy(type_):
+    return dataclasses.make_dataclass(
+        type_.__name__,
+        [(field.name, field.type, field) for field in dataclasses.fields(type_)],
+    )
+
+
+def bytes_per_object(type_, kwargs):
+    tracemalloc.start()
+    objects = [type_(**kwargs) for _ in range(NUM_OBJECTS)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / NUM_OBJECTS
+
+
+def construction_time_ns(type_, kwargs):
+    seconds = min(timeit.repeat(lambda: type_(**kwargs), number=NUM_OBJECTS, repeat=5))
+    return seconds * 10 ** 9 / NUM_OBJECTS
+
+
+def main():
+    row = "{:<22} {:>14} {:>14} {:>14} {:>14}"
+    print(row.format("Type", "bytes/object", "(unslotted)", "ns/object", "(unslotted)"))
+    for type_, kwargs in TYPE_TO_KWARGS.items():
+        unslotted_type = unslotted_copy(type_)
+        print(
+            row.format(
+                type_.__name__,
+                "{:.0f}".format(bytes_per_object(type_, kwargs)),
+                "{:.0f}".format(bytes_per_object(unslotted_type, kwargs)),
+                "{:.0f}".format(construction_time_ns(type_, kwargs)),
+                "{:.0f}".format(construction_time_ns(unslotted_type, kwargs)),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -39,7 +39,7 @@ def inline_unit_of_work(monkeypatch, block_db_access):
     session = mock.MagicMock()
 
     @contextlib.contextmanager
-    def inline_unit_of_work():
+    def inline_unit_of_work(read_only=False):
         nonlocal session_started
         session_started = True
         yield session
@@ -58,7 +58,7 @@ def inline_unit_of_work(monkeypatch, block_db_access):
 @pytest.fixture
 def no_op_unit_of_work(monkeypatch):
     @contextlib.contextmanager
-    def no_op_context_manager():
+    def no_op_context_manager(read_only=False):
         yield ""
 
     monkeypatch.setattr(dbconnection, "inline_unit_of_work", no_op_context_manager)
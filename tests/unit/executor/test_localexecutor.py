@@ -0,0 +1,104 @@
+import operator
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from transiter import config
+from transiter.db import dbconnection
+from transiter.executor import celeryapp, localexecutor, processpool
+
+
+@pytest.fixture
+def local_executor(monkeypatch):
+    monkeypatch.setattr(config, "EXECUTOR", celeryapp.LOCAL)
+    monkeypatch.setattr(config, "LOCAL_EXECUTOR_NUM_WORKERS", "1")
+    yield
+    localexecutor.shutdown()
+
+
+def test_submit(local_executor):
+    future = celeryapp.submit(operator.add, 1, 2)
+
+    assert 3 == future.result(timeout=60)
+
+
+def test_submit__exception(local_executor):
+    future = celeryapp.submit(operator.truediv, 1, 0)
+
+    with pytest.raises(ZeroDivisionError):
+        future.result(timeout=60)
+
+
+def test_submit__expires(local_executor):
+    future = celeryapp.submit(operator.add, 1, 2, expires=60)
+
+    assert 3 == future.result(timeout=60)
+
+
+def test_submit__expired(local_executor):
+    expired = threading.Event()
+
+    future = celeryapp.submit(
+        operator.truediv, 1, 0, expires=-1, on_expired=expired.set
+    )
+
+    assert isinstance(future.result(timeout=60), localexecutor.Expired)
+    assert expired.wait(timeout=60)
+
+
+def test_run_task__expired():
+    task = mock.MagicMock()
+
+    result = localexecutor._run_task(task, (1, 2), deadline=time.time() - 1)
+
+    assert isinstance(result, localexecutor.Expired)
+    task.assert_not_called()
+
+
+def test_run_task__not_expired():
+    task = mock.MagicMock()
+
+    result = localexecutor._run_task(task, (1, 2), deadline=time.time() + 60)
+
+    assert task.return_value == result
+    task.assert_called_once_with(1, 2)
+
+
+def test_submit__broken_pool(local_executor, monkeypatch):
+    broken_pool = mock.MagicMock()
+    broken_pool.submit.side_effect = processpool.BrokenProcessPool
+    monkeypatch.setattr(localexecutor._pool, "_pool", broken_pool)
+
+    future = localexecutor.submit(operator.add, 1, 2)
+
+    assert 3 == future.result(timeout=60)
+    broken_pool.shutdown.assert_called_once_with(wait=False)
+
+
+def test_submit__celery(monkeypatch):
+    monkeypatch.setattr(config, "EXECUTOR", celeryapp.CELERY)
+    task = mock.MagicMock()
+
+    celeryapp.submit(task, 1, 2, expires=30)
+
+    task.apply_async.assert_called_once_with(args=(1, 2), expires=30)
+
+
+@pytest.mark.parametrize(
+    "parse_pool_num_workers,expected_argv",
+    [
+        ["0", ["celeryapp", "worker", "-l", "info"]],
+        ["2", ["celeryapp", "worker", "-l", "info", "--pool", "threads"]],
+    ],
+)
+def test_run(monkeypatch, parse_pool_num_workers, expected_argv):
+    monkeypatch.setattr(config, "PARSE_POOL_NUM_WORKERS", parse_pool_num_workers)
+    monkeypatch.setattr(dbconnection, "set_role", mock.MagicMock())
+    app = mock.MagicMock()
+    monkeypatch.setattr(celeryapp, "app", app)
+
+    celeryapp.run("info")
+
+    app.start.assert_called_once_with(argv=expected_argv)
@@ -0,0 +1,33 @@
+import multiprocessing
+import operator
+
+import pytest
+
+from transiter.executor import processpool
+
+
+def use_pool(queue):
+    pool = processpool.ProcessPool("Test", lambda: 1)
+    try:
+        queue.put(("result", pool.submit(operator.add, 1, 2).result(timeout=60)))
+    except processpool.DaemonicProcessError as e:
+        queue.put(("error", str(e)))
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("daemon", [True, False])
+def test_submit__from_child_process(daemon):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=use_pool, args=(queue,), daemon=daemon)
+    process.start()
+
+    outcome, value = queue.get(timeout=60)
+    process.join(timeout=60)
+
+    if daemon:
+        assert "error" == outcome
+        assert "cannot be started in the daemonic process" in value
+    else:
+        assert ("result", 3) == (outcome, value)
@@ -119,21 +119,21 @@ def test_permission_denied__admin_read_endpoints(
             feedservice,
             "list_updates_in_feed",
             ["system_id", "feed_id"],
-            {},
+            {"limit": None, "after": None},
         ),
         pytest.param(
             stopendpoints,
             stopservice,
             "list_all_in_system",
             ["system_id"],
-            {"alerts_detail": None},
+            {"alerts_detail": None, "limit": None, "after": None},
         ),
         pytest.param(
             tripendpoints,
             tripservice,
             "list_all_in_route",
             ["system_id", "route_id"],
-            {"alerts_detail": None},
+            {"alerts_detail": None, "limit": None, "after": None},
         ),
         pytest.param(
             tripendpoints,
@@ -199,7 +199,7 @@ def test_system_endpoints__list_all_transfers(monkeypatch):
         stopservice,
         "list_all_transfers_in_system",
         ["system_id"],
-        {"from_stop_ids": None, "to_stop_ids": None},
+        {"from_stop_ids": None, "to_stop_ids": None, "limit": None, "after": None},
     )
 
 
@@ -287,6 +287,7 @@ def test_geographic_search(monkeypatch, endpoint_function, endpoint_kwargs, syst
         longitude=20,
         distance=1000,
         return_service_maps=True,
+        limit=None,
     )
 
 
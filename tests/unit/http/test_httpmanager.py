@@ -2,14 +2,24 @@ import dataclasses
 import datetime
 import decimal
 import enum
+import json
+from unittest import mock
 
 import flask
 import pytest
 from werkzeug import datastructures
 
-from transiter import exceptions
-from transiter.http import httpmanager
-from transiter.services import views
+from transiter import config, exceptions
+from transiter.db import models
+from transiter.db.queries import systemqueries
+from transiter.http import flaskapp, httpmanager, responsecache
+from transiter.services import (
+    pagination,
+    stopservice,
+    systemservice,
+    transfersconfigservice,
+    views,
+)
 
 
 # NOTE: Most of the test coverage of the HTTP manager comes from the endpoint
@@ -196,3 +206,243 @@ def test_get_float_url_parameter(
         assert expected_result == httpmanager.get_float_url_parameter(
             key="key", default=default, required=required
         )
+
+
+@pytest.fixture
+def cacheable_endpoint(monkeypatch):
+    monkeypatch.setattr(
+        systemservice, "get_update_generation", lambda system_id: (1, generation[0])
+    )
+    monkeypatch.setattr(responsecache, "_backend_config", None)
+    generation = [1]
+    func = mock.MagicMock(return_value={"key": "value"})
+
+    def endpoint(system_id):
+        return func(system_id)
+
+    app = flask.Flask(__name__)
+    endpoint = httpmanager._cached_response(httpmanager._json_response(endpoint))
+    app.add_url_rule("/systems/<system_id>/entities", view_func=endpoint)
+    return app.test_client(), func, generation
+
+
+@pytest.mark.parametrize("backend", [None, "LOCAL"])
+def test_cached_response(monkeypatch, cacheable_endpoint, backend):
+    monkeypatch.setattr(config, "HTTP_CACHE_BACKEND", backend)
+    client, func, generation = cacheable_endpoint
+
+    response_1 = client.get("/systems/system_id/entities?a=b")
+    response_2 = client.get("/systems/system_id/entities?a=b")
+    generation[0] = 2
+    response_3 = client.get("/systems/system_id/entities?a=b")
+
+    assert 3 * [{"key": "value"}] == [
+        json.loads(response.data) for response in (response_1, response_2, response_3)
+    ]
+    assert response_1.headers["ETag"] == response_2.headers["ETag"]
+    assert (3 if backend is None else 2) == func.call_count
+
+
+def test_cached_response__not_modified(monkeypatch, cacheable_endpoint):
+    monkeypatch.setattr(config, "HTTP_CACHE_BACKEND", None)
+    client, func, __ = cacheable_endpoint
+    etag = client.get("/systems/system_id/entities").headers["ETag"]
+
+    response = client.get(
+        "/systems/system_id/entities", headers={"If-None-Match": etag}
+    )
+
+    assert httpmanager.HttpStatus.NOT_MODIFIED == response.status_code
+    assert b"" == response.data
+    assert etag == response.headers["ETag"]
+
+    func.return_value = {"key": "new_value"}
+    response = client.get(
+        "/systems/system_id/entities", headers={"If-None-Match": etag}
+    )
+
+    assert httpmanager.HttpStatus.OK == response.status_code
+
+
+def test_cached_response__transfers_config_write(monkeypatch, inline_unit_of_work):
+    monkeypatch.setattr(config, "HTTP_CACHE_BACKEND", "LOCAL")
+    monkeypatch.setattr(responsecache, "_backend", None)
+    monkeypatch.setattr(responsecache, "_backend_config", None)
+    generation = [1]
+    monkeypatch.setattr(
+        systemservice, "get_update_generation", lambda system_id: (1, generation[0])
+    )
+
+    def increment_update_generation(system_pk):
+        generation[0] += 1
+
+    monkeypatch.setattr(
+        systemqueries, "increment_update_generation", increment_update_generation
+    )
+    systems = [models.System(pk=1, id="1"), models.System(pk=2, id="2")]
+    monkeypatch.setattr(systemqueries, "list_all", lambda system_ids: systems)
+    monkeypatch.setattr(
+        transfersconfigservice, "_build_transfers", lambda systems, distance: []
+    )
+    list_all_transfers_in_system = mock.MagicMock(
+        return_value=pagination.Page([{"distance": 1}])
+    )
+    monkeypatch.setattr(
+        stopservice, "list_all_transfers_in_system", list_all_transfers_in_system
+    )
+    client = flaskapp.app.test_client()
+
+    response_1 = client.get("/systems/1/transfers")
+    list_all_transfers_in_system.return_value = pagination.Page([{"distance": 2}])
+    response_2 = client.get("/systems/1/transfers")
+    transfersconfigservice.create(["1", "2"], 2)
+    response_3 = client.get("/systems/1/transfers")
+
+    assert response_1.data == response_2.data
+    assert response_1.headers["ETag"] != response_3.headers["ETag"]
+    assert [{"distance": 2}] == json.loads(response_3.data)
+
+
+@pytest.fixture
+def linked_views_app():
+    @dataclasses.dataclass
+    class FakeLink(views.View):
+        id: str
+        system_id: str
+
+    @dataclasses.dataclass
+    class FakeView(views.View):
+        id: str
+        time: datetime.datetime
+        link: FakeLink
+        _hidden: str = None
+        missing: str = views.NULL
+
+    app = flask.Flask(__name__)
+
+    @httpmanager.link_target(FakeLink, ["system_id", "id"])
+    def endpoint(system_id, link_id):
+        pass
+
+    app.add_url_rule(
+        "/systems/<system_id>/links/<link_id>",
+        endpoint=httpmanager._view_to_target[FakeLink].target_str,
+        view_func=endpoint,
+    )
+    yield app, FakeView, FakeLink
+    del httpmanager._view_to_target[FakeLink]
+
+
+@pytest.mark.parametrize("custom_host", [None, "https://transiter.example.com"])
+@pytest.mark.parametrize("link_id", ["1", "A B", "a/b?c#d", "ünïcödé", "%20"])
+def test_json_serialization__fast_path(linked_views_app, custom_host, link_id):
+    app, FakeView, FakeLink = linked_views_app
+    dt = datetime.datetime.now()
+    view = FakeView(
+        id="2", time=dt, link=FakeLink(id=link_id, system_id="sys"), _hidden="3"
+    )
+    headers = {} if custom_host is None else {"X-Transiter-Host": custom_host}
+
+    with app.test_request_context(headers=headers):
+        expected = json.loads(
+            json.dumps([view, view], default=httpmanager._transiter_json_serializer)
+        )
+        actual = httpmanager._JsonCompatibleConverter().convert([view, view])
+
+    assert expected == actual
+    assert {"id": "2", "time": dt.timestamp(), "link": expected[0]["link"]} == actual[0]
+
+
+@pytest.mark.parametrize("encoder", ["STANDARD", "ORJSON"])
+@pytest.mark.parametrize("compact", [True, False])
+def test_convert_to_json_str(monkeypatch, encoder, compact):
+    if encoder == "ORJSON":
+        pytest.importorskip("orjson")
+    monkeypatch.setattr(config, "HTTP_JSON_ENCODER", encoder)
+    monkeypatch.setattr(config, "HTTP_COMPACT_JSON", compact)
+
+    class MyEnum(enum.Enum):
+        FIRST = 1
+
+    data = {"a": [MyEnum.FIRST, decimal.Decimal("0.54"), None, 1.5], 3: True}
+
+    json_str = httpmanager._convert_to_json_str(data)
+
+    assert {"a": ["FIRST", "0.54", None, 1.5], "3": True} == json.loads(json_str)
+    assert compact != (b"\n" in json_str if encoder == "ORJSON" else "\n" in json_str)
+
+
+def test_convert_to_json_str__unknown_encoder(monkeypatch):
+    monkeypatch.setattr(config, "HTTP_JSON_ENCODER", "UNKNOWN")
+
+    with pytest.raises(ValueError):
+        httpmanager._convert_to_json_str({})
+
+
+@pytest.fixture
+def list_endpoint():
+    def endpoint(system_id):
+        if httpmanager.is_ndjson_request():
+            return (item for item in ["a", "b"])
+        return pagination.Page(["a"], next_cursor="CURSOR")
+
+    app = flask.Flask(__name__)
+    app.add_url_rule(
+        "/systems/<system_id>/entities", view_func=httpmanager._json_response(endpoint)
+    )
+    return app.test_client()
+
+
+@pytest.mark.parametrize(
+    "headers,expected_url",
+    [
+        [{}, "http://localhost/systems/A/entities?limit=1&after=CURSOR"],
+        [
+            {"X-Transiter-Host": "https://transiter.example.com"},
+            "https://transiter.example.com/systems/A/entities?limit=1&after=CURSOR",
+        ],
+    ],
+)
+def test_json_response__page(list_endpoint, headers, expected_url):
+    response = list_endpoint.get(
+        "/systems/A/entities?limit=1&after=PREVIOUS", headers=headers
+    )
+
+    assert ["a"] == json.loads(response.data)
+    assert '<{}>; rel="next"'.format(expected_url) == response.headers["Link"]
+
+
+def test_json_response__ndjson(list_endpoint):
+    response = list_endpoint.get(
+        "/systems/A/entities", headers={"Accept": "application/x-ndjson"}
+    )
+
+    assert response.is_streamed
+    assert "application/x-ndjson" == response.content_type
+    assert b'"a"\n"b"\n' == response.data
+
+
+def test_json_response__ndjson_error():
+    def items():
+        raise exceptions.IdNotFoundError
+        yield
+
+    app = flask.Flask(__name__)
+    endpoint = httpmanager._json_response(lambda: items())
+
+    with app.test_request_context(headers={"Accept": "application/x-ndjson"}):
+        with pytest.raises(exceptions.IdNotFoundError):
+            endpoint()
+
+
+def test_cached_response__ndjson_not_cached(monkeypatch, cacheable_endpoint):
+    monkeypatch.setattr(config, "HTTP_CACHE_BACKEND", "LOCAL")
+    client, func, __ = cacheable_endpoint
+    func.return_value = (item for item in [])
+
+    response = client.get(
+        "/systems/system_id/entities", headers={"Accept": "application/x-ndjson"}
+    )
+
+    assert b"" == response.data
+    assert "ETag" not in response.headers
@@ -0,0 +1,79 @@
+import time
+from unittest import mock
+
+import pytest
+
+from transiter import config
+from transiter.http import responsecache
+
+
+@pytest.fixture
+def monotonic_time(monkeypatch):
+    monotonic_time = mock.MagicMock(return_value=100)
+    monkeypatch.setattr(time, "monotonic", monotonic_time)
+    return monotonic_time
+
+
+def test_local_backend__lru_eviction(monotonic_time):
+    backend = responsecache.LocalBackend(2)
+    backend.set("key_1", b"1", 10)
+    backend.set("key_2", b"2", 10)
+    backend.get("key_1")
+    backend.set("key_3", b"3", 10)
+
+    assert b"1" == backend.get("key_1")
+    assert backend.get("key_2") is None
+    assert b"3" == backend.get("key_3")
+
+
+def test_local_backend__expiry(monotonic_time):
+    backend = responsecache.LocalBackend(2)
+    backend.set("key", b"content", 10)
+
+    monotonic_time.return_value = 109
+    assert b"content" == backend.get("key")
+
+    monotonic_time.return_value = 110
+    assert backend.get("key") is None
+
+
+@pytest.mark.parametrize(
+    "backend,expected_type",
+    [
+        [None, type(None)],
+        ["local", responsecache.LocalBackend],
+        ["LOCAL", responsecache.LocalBackend],
+    ],
+)
+def test_get_backend(monkeypatch, backend, expected_type):
+    monkeypatch.setattr(config, "HTTP_CACHE_BACKEND", backend)
+
+    actual = responsecache.get_backend()
+
+    assert isinstance(actual, expected_type)
+    assert actual is responsecache.get_backend()
+
+
+def test_get_backend__unknown(monkeypatch):
+    monkeypatch.setattr(config, "HTTP_CACHE_BACKEND", "MEMCACHED")
+
+    with pytest.raises(ValueError):
+        responsecache.get_backend()
+
+
+def test_build_key():
+    def build_key(update_generation=(1, 2), args=(("a", "1"), ("b", "2"))):
+        return responsecache.build_key(
+            "system_id",
+            update_generation,
+            "/systems/system_id/stops",
+            args,
+            "http://localhost/",
+            None,
+        )
+
+    assert build_key() == build_key(args=(("b", "2"), ("a", "1")))
+    assert build_key() != build_key(update_generation=(1, 3))
+    assert build_key() != build_key(update_generation=(2, 2))
+    assert build_key() != build_key(args=(("a", "1"),))
+    assert build_key().startswith("transiter:http:system_id:")
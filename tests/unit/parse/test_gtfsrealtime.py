@@ -1,3 +1,4 @@
+import dataclasses
 import datetime
 import itertools
 
@@ -340,6 +341,37 @@ def test_parse_trips(input_trip, expected_trip, gtfs):
     assert [expected_trip] == actual_trips
 
 
+def test_build_trips():
+    gtfs = transiter_gtfs_rt_pb2
+    [[input_trip, expected_trip]] = build_test_parse_trip_params(gtfs)[-1:]
+    trip_message = gtfs.FeedMessage(
+        header=gtfs.FeedHeader(gtfs_realtime_version="2.0"),
+        entity=[gtfs.FeedEntity(id=TRIP_ID, trip_update=input_trip)],
+    )
+
+    @dataclasses.dataclass
+    class Trip(parse.Trip):
+        pk: int = None
+
+    @dataclasses.dataclass
+    class TripStopTime(parse.TripStopTime):
+        pk: int = None
+
+    parser = gtfsrealtime.GtfsRealtimeParser()
+    parser.load_content(trip_message.SerializeToString())
+    [actual_trip] = list(parser.build_trips(Trip, TripStopTime))
+
+    assert isinstance(actual_trip, Trip)
+    assert all(
+        isinstance(stop_time, TripStopTime) for stop_time in actual_trip.stop_times
+    )
+    actual_trip_dict = dataclasses.asdict(actual_trip)
+    del actual_trip_dict["pk"]
+    for stop_time_dict in actual_trip_dict["stop_times"]:
+        del stop_time_dict["pk"]
+    assert dataclasses.asdict(expected_trip) == actual_trip_dict
+
+
 def test_parse_trips__transiter_extension():
     gtfs = transiter_gtfs_rt_pb2
 
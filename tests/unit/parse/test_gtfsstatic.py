@@ -25,6 +25,16 @@ SERVICE_ID = "M"
 TRIP_ID = "Z"
 
 
+def _rows_to_columns(rows):
+    column_names = set(key for row in rows for key in row.keys())
+    return [
+        {
+            column_name: tuple(row.get(column_name) for row in rows)
+            for column_name in column_names
+        }
+    ]
+
+
 def test_parse_routes():
     gtfs_static_file = mock.Mock()
     gtfs_static_file.routes.return_value = [
@@ -323,22 +333,24 @@ def test_parse_services_with_trips(input_direction, output_direction):
         frequency_based=True,
     )
 
-    gtfs_static_file.stop_times.return_value = [
-        {
-            "trip_id": TRIP_ID,
-            "stop_id": STOP_ID,
-            "stop_sequence": "1",
-            "departure_time": "11:12:13",
-            "arrival_time": "11:12:13",
-        },
-        {
-            "trip_id": "Unknown trip ID",
-            "stop_id": STOP_ID_2,
-            "stop_sequence": "1",
-            "departure_time": "11:12:13",
-            "arrival_time": "11:12:13",
-        },
-    ]
+    gtfs_static_file.stop_times_columns.return_value = _rows_to_columns(
+        [
+            {
+                "trip_id": TRIP_ID,
+                "stop_id": STOP_ID,
+                "stop_sequence": "1",
+                "departure_time": "11:12:13",
+                "arrival_time": "11:12:13",
+            },
+            {
+                "trip_id": "Unknown trip ID",
+                "stop_id": STOP_ID_2,
+                "stop_sequence": "1",
+                "departure_time": "11:12:13",
+                "arrival_time": "11:12:13",
+            },
+        ]
+    )
     stop_time = parse.ScheduledTripStopTime(
         stop_sequence=1,
         stop_id=STOP_ID,
@@ -402,6 +414,132 @@ def test_parse_services_with_trips(input_direction, output_direction):
     assert [service] == actual_services
 
 
+def test_stream_scheduled_services(monkeypatch):
+    gtfs_static_file = mock.Mock()
+    gtfs_static_file.calendar.return_value = []
+    gtfs_static_file.calendar_dates.return_value = [
+        {"service_id": SERVICE_ID, "exception_type": "1", "date": "20190304"}
+    ]
+    gtfs_static_file.trips.return_value = [
+        {
+            "service_id": SERVICE_ID,
+            "trip_id": TRIP_ID,
+            "route_id": ROUTE_ID,
+            "direction_id": "1",
+        },
+    ]
+    gtfs_static_file.trip_frequencies.return_value = []
+    gtfs_static_file.stop_times_columns.return_value = _rows_to_columns(
+        [
+            {
+                "trip_id": TRIP_ID,
+                "stop_id": STOP_ID,
+                "stop_sequence": "1",
+                "departure_time": "11:12:13",
+                "arrival_time": "",
+            },
+            {
+                "trip_id": "Unknown trip ID",
+                "stop_id": STOP_ID_2,
+                "stop_sequence": "1",
+                "departure_time": "11:12:13",
+                "arrival_time": "11:12:13",
+            },
+        ]
+    )
+    monkeypatch.setattr(
+        gtfsstaticparser, "_GtfsStaticFile", lambda *args: gtfs_static_file
+    )
+    parser = gtfsstaticparser.GtfsStaticParser()
+    parser.load_content(b"")
+
+    services, stop_times = parser.stream_scheduled_services()
+
+    assert [
+        parse.ScheduledTrip(id=TRIP_ID, route_id=ROUTE_ID, direction_id=True)
+    ] == services[0].trips
+    gtfs_static_file.stop_times_columns.assert_not_called()
+    assert [
+        (
+            TRIP_ID,
+            parse.ScheduledTripStopTime(
+                stop_sequence=1,
+                stop_id=STOP_ID,
+                departure_time=datetime.time(hour=11, minute=12, second=13),
+                arrival_time=datetime.time(hour=11, minute=12, second=13),
+            ),
+        )
+    ] == [stop_time for columns in stop_times for stop_time in columns.to_stop_times()]
+
+
+def test_stop_times_stream__decode_columns():
+    gtfs_static_file = mock.Mock()
+    gtfs_static_file.stop_times_columns.return_value = _rows_to_columns(
+        [
+            {
+                "trip_id": TRIP_ID,
+                "stop_id": STOP_ID,
+                "stop_sequence": "1",
+                "departure_time": "25:00:00",
+                "arrival_time": "24:59:00",
+                "stop_headsign": "Headsign",
+                "pickup_type": "1",
+                "drop_off_type": "unknown",
+                "continuous_pickup": "0",
+                "continuous_drop_off": "",
+                "shape_dist_traveled": "2.5",
+                "timepoint": "1",
+            },
+            {
+                "trip_id": TRIP_ID,
+                "stop_id": STOP_ID_2,
+                "stop_sequence": "2",
+                "departure_time": "",
+                "arrival_time": "",
+            },
+            {
+                "trip_id": TRIP_ID,
+                "stop_id": STOP_ID_2,
+                "stop_sequence": "3",
+                "departure_time": "01:00:00",
+                "arrival_time": "",
+                "shape_dist_traveled": "",
+            },
+        ]
+    )
+
+    stream = gtfsstaticparser._StopTimesStream(gtfs_static_file, {TRIP_ID})
+    [columns] = list(stream)
+
+    assert [
+        (
+            TRIP_ID,
+            parse.ScheduledTripStopTime(
+                stop_id=STOP_ID,
+                stop_sequence=1,
+                departure_time=datetime.time(1, 0, 0),
+                arrival_time=datetime.time(0, 59, 0),
+                headsign="Headsign",
+                pickup_type=parse.BoardingPolicy.NOT_ALLOWED,
+                drop_off_type=parse.BoardingPolicy.ALLOWED,
+                continuous_pickup=parse.BoardingPolicy.ALLOWED,
+                continuous_drop_off=parse.BoardingPolicy.NOT_ALLOWED,
+                shape_distance_traveled=2.5,
+                exact_times=True,
+            ),
+        ),
+        (
+            TRIP_ID,
+            parse.ScheduledTripStopTime(
+                stop_id=STOP_ID_2,
+                stop_sequence=3,
+                departure_time=datetime.time(1, 0, 0),
+                arrival_time=datetime.time(1, 0, 0),
+            ),
+        ),
+    ] == list(columns.to_stop_times())
+
+
 @pytest.mark.parametrize("calendar_set", [True, False])
 @pytest.mark.parametrize(
     "exception_type,expected_added_dates,expected_removed_dates",
@@ -415,7 +553,7 @@ def test_parse_services__exception_days_handling(
 ):
     gtfs_static_file = mock.Mock()
     gtfs_static_file.trips.return_value = []
-    gtfs_static_file.stop_times.return_value = []
+    gtfs_static_file.stop_times_columns.return_value = []
     gtfs_static_file.trip_frequencies.return_value = []
 
     if calendar_set:
@@ -519,6 +657,33 @@ class TestReadZipFile(unittest.TestCase):
 
         self.assertEqual([], actual)
 
+    def test_read_columns(self):
+        """[GTFS Static Util] Read Zip archive column-wise"""
+        csv = """{},{}\n{},{}\n\n{}\n""".format(
+            self.HEADER_1,
+            self.HEADER_2,
+            self.VALUE_1_1,
+            self.VALUE_1_2,
+            self.VALUE_2_1,
+        )
+        binary_content = self._create_zip(
+            gtfsstaticparser._GtfsStaticFile._InternalFileName.STOP_TIMES.value, csv
+        )
+
+        actual = list(
+            gtfsstaticparser._GtfsStaticFile(binary_content).stop_times_columns()
+        )
+
+        self.assertEqual(
+            [
+                {
+                    self.HEADER_1: (self.VALUE_1_1, self.VALUE_2_1),
+                    self.HEADER_2: (self.VALUE_1_2, None),
+                }
+            ],
+            actual,
+        )
+
     @staticmethod
     def _create_zip(file_name, file_content):
         buff = io.BytesIO()
@@ -529,6 +694,72 @@ class TestReadZipFile(unittest.TestCase):
         return buff.read()
 
 
+def _create_gtfs_static_parser(
+    file_name_to_content, options=None, parser_class=gtfsstaticparser.GtfsStaticParser
+):
+    buff = io.BytesIO()
+    with zipfile.ZipFile(buff, mode="w") as zip_file:
+        for file_name, content in file_name_to_content.items():
+            zip_file.writestr(file_name, content)
+    parser = parser_class()
+    if options is not None:
+        parser.load_options(options)
+    parser.load_content(buff.getvalue())
+    return parser
+
+
+@pytest.mark.parametrize(
+    "current_files,options,expected_unchanged_types",
+    [
+        [
+            {"routes.txt": "a", "stops.txt": "b"},
+            None,
+            {
+                parse.Agency,
+                parse.Route,
+                parse.Stop,
+                parse.Transfer,
+                parse.ScheduledService,
+            },
+        ],
+        [
+            {"routes.txt": "c", "stops.txt": "b"},
+            None,
+            {parse.Agency, parse.Stop, parse.Transfer},
+        ],
+        [{"routes.txt": "a"}, None, {parse.Agency, parse.Route}],
+        [
+            {"routes.txt": "a", "stops.txt": "b"},
+            {"transfers": {"strategy": "group_stations"}},
+            {parse.Agency, parse.Route, parse.ScheduledService},
+        ],
+    ],
+)
+def test_get_unchanged_types(current_files, options, expected_unchanged_types):
+    previous_parser = _create_gtfs_static_parser({"routes.txt": "a", "stops.txt": "b"})
+    previous_file_hashes = previous_parser.get_file_hashes()
+
+    parser = _create_gtfs_static_parser(current_files, options)
+
+    assert expected_unchanged_types == parser.get_unchanged_types(previous_file_hashes)
+
+
+def test_get_unchanged_types__no_previous_hashes():
+    parser = _create_gtfs_static_parser({"routes.txt": "a"})
+
+    assert set() == parser.get_unchanged_types(None)
+
+
+def test_get_unchanged_types__overridden_getter():
+    class Parser(gtfsstaticparser.GtfsStaticParser):
+        def get_routes(self):
+            return []
+
+    parser = _create_gtfs_static_parser({"routes.txt": "a"}, parser_class=Parser)
+
+    assert parse.Route not in parser.get_unchanged_types(parser.get_file_hashes())
+
+
 @pytest.mark.parametrize(
     "input_blob,expected",
     [
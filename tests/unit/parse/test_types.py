@@ -0,0 +1,59 @@
+import dataclasses
+import pickle
+
+import pytest
+
+from transiter import parse
+
+
+@pytest.mark.parametrize(
+    "entity",
+    [
+        parse.ScheduledTripStopTime(
+            stop_id="1", arrival_time=None, departure_time=None, stop_sequence=1
+        ),
+        parse.Trip(id="1", stop_times=[parse.TripStopTime(stop_id="2")]),
+        parse.TripStopTime(stop_id="1"),
+        parse.Vehicle(id="1"),
+        parse.Alert(
+            id="1",
+            messages=[parse.AlertMessage(header="header", description="description")],
+        ),
+    ],
+)
+def test_slotted_types(entity):
+    assert not hasattr(entity, "__dict__")
+    assert entity == pickle.loads(pickle.dumps(entity))
+    assert entity == dataclasses.replace(entity)
+    assert entity == type(entity)(
+        **{
+            field.name: getattr(entity, field.name)
+            for field in dataclasses.fields(entity)
+        }
+    )
+
+
+def test_slotted_types__defaults():
+    trip_1 = parse.Trip(id="1")
+    trip_2 = parse.Trip(id="2")
+
+    trip_1.stop_times.append(parse.TripStopTime(stop_id="1"))
+
+    assert parse.Trip.ScheduleRelationship.UNKNOWN == trip_1.schedule_relationship
+    assert [] == trip_2.stop_times
+
+
+def test_slotted_types__subclass():
+    @dataclasses.dataclass
+    class Trip(parse.Trip):
+        pk: int = None
+
+    trip = Trip(id="1", pk=2)
+    trip.new_attribute = 3
+
+    assert isinstance(trip, parse.Trip)
+    assert {"id": "1", "pk": 2} == {
+        key: value
+        for key, value in dataclasses.asdict(trip).items()
+        if key in {"id", "pk"}
+    }
@@ -4,9 +4,14 @@ import random
 import time
 from unittest import mock
 
+import flask
+import prometheus_client as prometheus
 import pytest
 from sqlalchemy.exc import SQLAlchemyError
 
+from transiter import config
+from transiter.db import models
+from transiter.executor import celeryapp
 from transiter.scheduler import server
 from transiter.services import feedservice, views
 
@@ -90,6 +95,320 @@ def test_refresh_feed_auto_update_registry(
     assert len(new_feeds) == len(list(registry.all_tasks()))
 
 
+def test_refresh_batched_feed_auto_update_registry(monkeypatch, scheduler):
+    feed_3 = views.Feed(
+        id="3",
+        auto_update_period=5,
+        _system_id=SYSTEM_ID,
+        system=views.System(id=SYSTEM_ID, name="", status=None),
+    )
+    monkeypatch.setattr(feedservice, "list_all_auto_updating", lambda: [feed_1, feed_3])
+
+    registry = server.BatchedFeedAutoUpdateRegistry()
+    registry.refresh()
+
+    [task] = registry.all_tasks()
+    assert [FEED_ID, "3"] == task.feed_ids
+    existing_job = mock.MagicMock()
+    task._job = existing_job
+
+    monkeypatch.setattr(feedservice, "list_all_auto_updating", lambda: [feed_2])
+    registry.refresh()
+
+    [task] = registry.all_tasks()
+    assert [FEED_ID] == task.feed_ids
+    assert 10 == task.schedule.period
+    existing_job.remove.assert_called_once()
+
+
+def test_refresh_feed_auto_update_registry__adaptive(monkeypatch, scheduler):
+    adaptive_feed = views.Feed(
+        id=FEED_ID,
+        auto_update_period=10,
+        auto_update_min_period=5,
+        _system_id=SYSTEM_ID,
+        system=views.System(id=SYSTEM_ID, name="", status=None),
+    )
+    monkeypatch.setattr(feedservice, "list_all_auto_updating", lambda: [adaptive_feed])
+    registry = server.FeedAutoUpdateRegistry()
+    registry.refresh()
+    [task] = registry.all_tasks()
+    schedule = task.schedule
+
+    registry.refresh()
+
+    assert server.AdaptiveSchedule(10, 5, 10) == task.schedule
+    assert schedule is task.schedule
+    scheduler.add_job.assert_called_once()
+
+
+UPDATED = models.FeedUpdate.Result.UPDATED
+NOT_NEEDED = models.FeedUpdate.Result.NOT_NEEDED
+
+
+@pytest.mark.parametrize(
+    "results,expected_period",
+    [
+        [[UPDATED] * 10, 15],
+        [[UPDATED] * 8 + [NOT_NEEDED] * 2, 15],
+        [[UPDATED] * 5 + [NOT_NEEDED] * 5, 20],
+        [[NOT_NEEDED] * 10, 30],
+        [[NOT_NEEDED] * 10 + [UPDATED] * 10, 22.5],
+        [[UPDATED] * 9, 20],
+        [[models.FeedUpdate.Result.DOWNLOAD_ERROR] * 10, 20],
+    ],
+)
+def test_adaptive_schedule(results, expected_period):
+    schedule = server.AdaptiveSchedule(20, 10, 30)
+
+    for result in results:
+        schedule.report(result)
+
+    assert expected_period == schedule.period
+
+
+def test_adaptive_schedule__content_created_at():
+    schedule = server.AdaptiveSchedule(20, 1, 30)
+
+    for i in range(10):
+        schedule.report(UPDATED if i % 2 == 0 else NOT_NEEDED, 1000 + 12 * (i // 2))
+
+    assert 6 == schedule.period
+
+
+def test_adaptive_schedule__json():
+    schedule = server.AdaptiveSchedule(20, 10, 30)
+    for _ in range(10):
+        schedule.report(NOT_NEEDED)
+
+    expected = {
+        "type": "ADAPTIVE",
+        "parameters": {
+            "period": 30,
+            "initial_period": 20,
+            "min_period": 10,
+            "max_period": 30,
+        },
+    }
+
+    assert expected == schedule.json()
+
+
+def test_feed_auto_update_task__report(scheduler):
+    task = server.FeedAutoUpdateTask(SYSTEM_ID, FEED_ID)
+    task.schedule = server.AdaptiveSchedule(20, 10, 30)
+
+    for _ in range(10):
+        task.report(NOT_NEEDED)
+
+    scheduler.add_job.return_value.reschedule.assert_called_once_with(
+        trigger="interval", seconds=30
+    )
+
+
+@pytest.fixture
+def feed_update_tracker(monkeypatch):
+    tracker = server.FeedUpdateTracker(registry=prometheus.CollectorRegistry())
+    monkeypatch.setattr(server, "feed_update_tracker", tracker)
+    return tracker
+
+
+def test_feeds_auto_update_task(monkeypatch, scheduler, feed_update_tracker):
+    apply_async = mock.MagicMock()
+    monkeypatch.setattr(
+        server.FeedsAutoUpdateTask._create_feed_updates, "apply_async", apply_async
+    )
+    task = server.FeedsAutoUpdateTask(SYSTEM_ID, [FEED_ID, "3"])
+    task.schedule = server.PeriodicSchedule(10)
+
+    task.run()
+
+    apply_async.assert_called_once_with(
+        args=(None, SYSTEM_ID, [FEED_ID, "3"], mock.ANY), expires=10 * 10
+    )
+
+
+def test_feed_auto_update_task__expires(monkeypatch, scheduler, feed_update_tracker):
+    apply_async = mock.MagicMock()
+    monkeypatch.setattr(
+        server.FeedAutoUpdateTask._create_feed_update, "apply_async", apply_async
+    )
+    task = server.FeedAutoUpdateTask(SYSTEM_ID, FEED_ID)
+    task.schedule = server.PeriodicSchedule(2)
+
+    task.run()
+
+    apply_async.assert_called_once_with(
+        args=(None, SYSTEM_ID, FEED_ID, mock.ANY), expires=server.MIN_IN_FLIGHT_TIMEOUT,
+    )
+
+
+def trigger_id(apply_async):
+    return apply_async.call_args[1]["args"][-1]
+
+
+@pytest.mark.parametrize("callback_trigger_id", [None, "other_trigger_id"])
+def test_feed_auto_update_task__other_update_finishes(
+    monkeypatch, scheduler, feed_update_tracker, callback_trigger_id
+):
+    apply_async = mock.MagicMock()
+    monkeypatch.setattr(
+        server.FeedAutoUpdateTask._create_feed_update, "apply_async", apply_async
+    )
+    task = server.FeedAutoUpdateTask(SYSTEM_ID, FEED_ID)
+    task.schedule = server.PeriodicSchedule(10)
+    task.run()
+
+    feed_update_tracker.finish(SYSTEM_ID, FEED_ID, callback_trigger_id)
+    task.run()
+
+    assert 1 == apply_async.call_count
+    assert (
+        1 == feed_update_tracker._num_in_flight.labels(system_id=SYSTEM_ID)._value.get()
+    )
+
+
+def test_feeds_auto_update_task__skipped_feeds(
+    monkeypatch, scheduler, feed_update_tracker
+):
+    apply_async = mock.MagicMock()
+    monkeypatch.setattr(
+        server.FeedsAutoUpdateTask._create_feed_updates, "apply_async", apply_async
+    )
+    task = server.FeedsAutoUpdateTask(SYSTEM_ID, [FEED_ID, "3"])
+    task.schedule = server.PeriodicSchedule(10)
+    task.run()
+
+    with flask.Flask(__name__).test_request_context(
+        json={
+            "system_id": SYSTEM_ID,
+            "feed_ids": ["3"],
+            "trigger_id": trigger_id(apply_async),
+        }
+    ):
+        assert ("", 200) == server.app_feed_updates_skipped_callback()
+    feed_update_tracker.finish(SYSTEM_ID, FEED_ID, trigger_id(apply_async))
+    task.run()
+
+    assert 2 == apply_async.call_count
+
+
+def test_feed_auto_update_task__coalesced(monkeypatch, scheduler, feed_update_tracker):
+    apply_async = mock.MagicMock()
+    monkeypatch.setattr(
+        server.FeedAutoUpdateTask._create_feed_update, "apply_async", apply_async
+    )
+    task = server.FeedAutoUpdateTask(SYSTEM_ID, FEED_ID)
+    task.schedule = server.PeriodicSchedule(10)
+
+    task.run()
+    task.run()
+    task.run()
+
+    apply_async.assert_called_once()
+    assert (
+        2
+        == feed_update_tracker._num_skipped_triggers.labels(
+            system_id=SYSTEM_ID, feed_id=FEED_ID
+        )._value.get()
+    )
+    assert (
+        1 == feed_update_tracker._num_in_flight.labels(system_id=SYSTEM_ID)._value.get()
+    )
+    assert (
+        1 == feed_update_tracker._num_pending.labels(system_id=SYSTEM_ID)._value.get()
+    )
+
+    feed_update_tracker.finish(SYSTEM_ID, FEED_ID, trigger_id(apply_async))
+
+    assert 2 == apply_async.call_count
+    assert (
+        0 == feed_update_tracker._num_pending.labels(system_id=SYSTEM_ID)._value.get()
+    )
+
+    feed_update_tracker.finish(SYSTEM_ID, FEED_ID, trigger_id(apply_async))
+
+    assert 2 == apply_async.call_count
+    assert (
+        0 == feed_update_tracker._num_in_flight.labels(system_id=SYSTEM_ID)._value.get()
+    )
+
+
+def test_feed_auto_update_task__in_flight_timeout(
+    monkeypatch, scheduler, feed_update_tracker
+):
+    apply_async = mock.MagicMock()
+    monkeypatch.setattr(
+        server.FeedAutoUpdateTask._create_feed_update, "apply_async", apply_async
+    )
+    task = server.FeedAutoUpdateTask(SYSTEM_ID, FEED_ID)
+    task.schedule = server.PeriodicSchedule(10)
+    monkeypatch.setattr(time, "time", lambda: 1000)
+    task.run()
+
+    monkeypatch.setattr(time, "time", lambda: 1000 + 10 * 10 - 1)
+    task.run()
+
+    assert 1 == apply_async.call_count
+
+    monkeypatch.setattr(time, "time", lambda: 1000 + 10 * 10)
+    task.run()
+
+    assert 2 == apply_async.call_count
+
+
+def test_feed_auto_update_task__expired(monkeypatch, scheduler, feed_update_tracker):
+    apply_async = mock.MagicMock()
+    monkeypatch.setattr(
+        server.FeedAutoUpdateTask._create_feed_update, "apply_async", apply_async
+    )
+    task = server.FeedAutoUpdateTask(SYSTEM_ID, FEED_ID)
+    task.schedule = server.PeriodicSchedule(10)
+    monkeypatch.setattr(time, "time", lambda: 1000)
+    task.run()
+    task.run()
+
+    task._on_expired()
+
+    assert 1 == apply_async.call_count
+
+    monkeypatch.setattr(time, "time", lambda: 1000 + 10 * 10)
+    task._on_expired()
+
+    assert 2 == apply_async.call_count
+    assert (
+        1 == feed_update_tracker._num_in_flight.labels(system_id=SYSTEM_ID)._value.get()
+    )
+
+    task._on_expired()
+
+    assert (
+        1 == feed_update_tracker._num_in_flight.labels(system_id=SYSTEM_ID)._value.get()
+    )
+
+
+def test_feed_auto_update_task__local_executor(
+    monkeypatch, scheduler, feed_update_tracker
+):
+    submit = mock.MagicMock()
+    monkeypatch.setattr(celeryapp.localexecutor, "submit", submit)
+    monkeypatch.setattr(config, "EXECUTOR", celeryapp.LOCAL)
+    task = server.FeedAutoUpdateTask(SYSTEM_ID, FEED_ID)
+    task.schedule = server.PeriodicSchedule(10)
+
+    task.run()
+
+    submit.assert_called_once_with(
+        server.FeedAutoUpdateTask._create_feed_update,
+        None,
+        SYSTEM_ID,
+        FEED_ID,
+        mock.ANY,
+        expires=10 * 10,
+        on_expired=task._on_expired,
+    )
+
+
 class DummyRegistry(server.Registry):
     def __init__(self):
         self.refresh = mock.MagicMock()
@@ -196,6 +515,33 @@ def test_app_refresh_tasks(monkeypatch):
     metrics.refresh.assert_called_once()
 
 
+def test_app_feed_update_callback(monkeypatch):
+    metrics = mock.MagicMock()
+    metrics.report.return_value = None
+    metrics.get_system_id_and_feed_id.return_value = (SYSTEM_ID, FEED_ID)
+    monkeypatch.setattr(server, "metrics_populator", metrics)
+    tracker = mock.MagicMock()
+    monkeypatch.setattr(server, "feed_update_tracker", tracker)
+    registry = mock.MagicMock()
+    monkeypatch.setattr(server, "feed_auto_update_registry", registry)
+
+    with flask.Flask(__name__).test_request_context(
+        json={
+            "feed_pk": 3,
+            "result": "UPDATED",
+            "content_created_at": 1000.0,
+            "trigger_id": "trigger_id",
+        }
+    ):
+        assert ("", 200) == server.app_feed_update_callback()
+
+    metrics.get_system_id_and_feed_id.assert_called_once_with(3)
+    tracker.finish.assert_called_once_with(SYSTEM_ID, FEED_ID, "trigger_id")
+    registry.report.assert_called_once_with(
+        SYSTEM_ID, FEED_ID, models.FeedUpdate.Result.UPDATED, 1000.0
+    )
+
+
 def test_create_app(monkeypatch, scheduler):
     registry_1 = mock.MagicMock()
     monkeypatch.setattr(server, "feed_auto_update_registry", registry_1)
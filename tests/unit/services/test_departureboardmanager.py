@@ -0,0 +1,206 @@
+import datetime
+import json
+
+import pytest
+
+from transiter.db import models
+from transiter.db.queries import stopqueries, systemqueries, tripqueries
+from transiter.services import departureboardmanager, stopservice, views
+
+SYSTEM_ID = "1"
+SYSTEM_PK = 2
+STOP_ONE_PK = 3
+STOP_TWO_PK = 4
+TRIP_PK = 100
+TRIP_ID = "101"
+ROUTE_ID = "103"
+LAST_STOP_ID = "102"
+LAST_STOP_NAME = "102-NAME"
+VEHICLE_ID = "201"
+DIRECTION_NAME = "Uptown"
+TIME_1 = datetime.datetime(2020, 4, 4, 4, 10, 0, tzinfo=datetime.timezone.utc)
+TIME_2 = datetime.datetime(2020, 4, 4, 4, 15, 0, tzinfo=datetime.timezone.utc)
+TIME_3 = datetime.datetime(2020, 4, 4, 4, 20, 0, tzinfo=datetime.timezone.utc)
+
+
+@pytest.fixture
+def trip_stop_times():
+    system = models.System(id=SYSTEM_ID)
+    route = models.Route(system=system, id=ROUTE_ID, color="FFFFFF")
+    trip = models.Trip(
+        pk=TRIP_PK,
+        id=TRIP_ID,
+        route=route,
+        direction_id=True,
+        started_at=TIME_1,
+        current_stop_sequence=1,
+    )
+    return [
+        models.TripStopTime(
+            stop_pk=STOP_TWO_PK,
+            trip_pk=TRIP_PK,
+            trip=trip,
+            arrival_time=TIME_1,
+            departure_time=TIME_2,
+            departure_delay=30,
+            stop_sequence=1,
+        ),
+        models.TripStopTime(
+            stop_pk=STOP_ONE_PK,
+            trip_pk=TRIP_PK,
+            trip=trip,
+            arrival_time=TIME_3,
+            stop_sequence=2,
+            track="2",
+        ),
+    ]
+
+
+@pytest.fixture
+def last_stop():
+    system = models.System(id=SYSTEM_ID)
+    return models.Stop(system=system, id=LAST_STOP_ID, name=LAST_STOP_NAME)
+
+
+@pytest.fixture
+def stop_time_queries(monkeypatch, trip_stop_times, last_stop):
+    direction_rule = models.DirectionRule(
+        stop_pk=STOP_ONE_PK, priority=0, name=DIRECTION_NAME
+    )
+    monkeypatch.setattr(
+        stopqueries,
+        "list_direction_rules_for_stops",
+        lambda stop_pks: [
+            rule for rule in [direction_rule] if rule.stop_pk in stop_pks
+        ],
+    )
+    monkeypatch.setattr(
+        stopqueries,
+        "list_stop_time_updates_at_stops",
+        lambda stop_pks: [
+            trip_stop_time
+            for trip_stop_time in trip_stop_times
+            if trip_stop_time.stop_pk in stop_pks
+        ],
+    )
+    monkeypatch.setattr(
+        tripqueries, "get_trip_pk_to_last_stop_map", lambda *args: {TRIP_PK: last_stop},
+    )
+
+
+def test_build_departure_boards(stop_time_queries):
+    stop_pk_to_board = departureboardmanager.build_departure_boards(
+        [STOP_ONE_PK, STOP_TWO_PK, 5]
+    )
+
+    assert {STOP_ONE_PK, STOP_TWO_PK, 5} == set(stop_pk_to_board.keys())
+    assert [DIRECTION_NAME] == stop_pk_to_board[STOP_ONE_PK]["directions"]
+    assert [] == stop_pk_to_board[STOP_TWO_PK]["directions"]
+    assert 1 == len(stop_pk_to_board[STOP_ONE_PK]["stop_times"])
+    assert 1 == len(stop_pk_to_board[STOP_TWO_PK]["stop_times"])
+    assert {"directions": [], "stop_times": []} == stop_pk_to_board[5]
+
+
+def test_rebuild_departure_boards(monkeypatch, stop_time_queries):
+    locked = []
+    monkeypatch.setattr(systemqueries, "lock", locked.append)
+    saved = {}
+    monkeypatch.setattr(
+        stopqueries,
+        "save_departure_boards",
+        lambda stop_pk_to_content, built_at: saved.update(stop_pk_to_content),
+    )
+
+    departureboardmanager.rebuild_departure_boards(SYSTEM_PK, [STOP_ONE_PK])
+
+    assert [SYSTEM_PK] == locked
+    assert [STOP_ONE_PK] == list(saved.keys())
+    assert (
+        DIRECTION_NAME == json.loads(saved[STOP_ONE_PK])["stop_times"][0]["direction"]
+    )
+
+
+@pytest.mark.parametrize("vehicle_id", [None, VEHICLE_ID])
+@pytest.mark.parametrize(
+    "saved_stop_pks", [[], [STOP_ONE_PK], [STOP_ONE_PK, STOP_TWO_PK]]
+)
+def test_get_departure_board__same_as_live(
+    monkeypatch,
+    stop_time_queries,
+    trip_stop_times,
+    last_stop,
+    saved_stop_pks,
+    vehicle_id,
+):
+    stop_pk_to_board = departureboardmanager.build_departure_boards(
+        [STOP_ONE_PK, STOP_TWO_PK]
+    )
+    monkeypatch.setattr(
+        stopqueries,
+        "get_stop_pk_to_departure_board_content_map",
+        lambda *args: {
+            stop_pk: json.dumps(stop_pk_to_board[stop_pk]) for stop_pk in saved_stop_pks
+        },
+    )
+    monkeypatch.setattr(
+        tripqueries,
+        "get_trip_pk_to_vehicle_id_map",
+        lambda *args: {TRIP_PK: vehicle_id},
+    )
+    trip_stop_times[0].trip.vehicle = models.Vehicle(id=vehicle_id)
+
+    directions, stop_times = departureboardmanager.get_departure_board(
+        SYSTEM_ID, [STOP_ONE_PK, STOP_TWO_PK]
+    )
+
+    assert [DIRECTION_NAME] == directions
+    assert [
+        stopservice._build_trip_stop_time_response(
+            trip_stop_times[0], None, {TRIP_PK: last_stop}
+        ),
+        stopservice._build_trip_stop_time_response(
+            trip_stop_times[1], DIRECTION_NAME, {TRIP_PK: last_stop}
+        ),
+    ] == stop_times
+
+
+def test_get_departure_board__no_vehicle(monkeypatch, stop_time_queries):
+    monkeypatch.setattr(
+        stopqueries, "get_stop_pk_to_departure_board_content_map", lambda *args: {}
+    )
+    monkeypatch.setattr(tripqueries, "get_trip_pk_to_vehicle_id_map", lambda *args: {})
+
+    __, stop_times = departureboardmanager.get_departure_board(SYSTEM_ID, [STOP_ONE_PK])
+
+    assert 1 == len(stop_times)
+    assert stop_times[0].trip.vehicle is None
+    assert (
+        views.Stop(id=LAST_STOP_ID, name=LAST_STOP_NAME, _system_id=SYSTEM_ID)
+        == stop_times[0].trip.last_stop
+    )
+
+
+def test_direction_name_matcher__all_names():
+    matcher = departureboardmanager.DirectionNameMatcher(
+        [models.DirectionRule(stop_pk=1, name=DIRECTION_NAME)]
+    )
+
+    assert {DIRECTION_NAME} == matcher.all_names()
+
+
+@pytest.mark.parametrize(
+    "direction_rule,expected",
+    [
+        [models.DirectionRule(stop_pk=1, name=DIRECTION_NAME), DIRECTION_NAME],
+        [models.DirectionRule(stop_pk=2, name=DIRECTION_NAME), None],
+        [models.DirectionRule(stop_pk=1, name=DIRECTION_NAME, direction_id=True), None],
+        [models.DirectionRule(stop_pk=1, name=DIRECTION_NAME, track="track"), None],
+    ],
+)
+def test_direction_name_matcher__match(direction_rule, expected):
+    matcher = departureboardmanager.DirectionNameMatcher([direction_rule])
+    stop_time = models.TripStopTime(stop_pk=1, trip=models.Trip())
+
+    actual = matcher.match(stop_time)
+
+    assert expected == actual
@@ -0,0 +1,95 @@
+from unittest import mock
+
+import pytest
+import requests
+
+from transiter.services import downloader
+
+URL = "http://www.feed.com"
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = mock.MagicMock()
+    monkeypatch.setattr(downloader, "_get_session", lambda: session)
+    return session
+
+
+def _response(status_code, content=b"", headers=None):
+    response = mock.MagicMock()
+    response.status_code = status_code
+    response.content = content
+    response.headers = headers or {}
+    return response
+
+
+def test_download(session):
+    session.get.return_value = _response(
+        200, b"content", {"ETag": "etag", "Last-Modified": "date"}
+    )
+
+    result = downloader.download(
+        downloader.DownloadRequest(url=URL, headers={"key": "value"})
+    )
+
+    assert b"content" == result.content
+    assert "etag" == result.etag
+    assert "date" == result.last_modified
+    assert not result.not_modified
+    session.get.assert_called_once_with(
+        URL, timeout=downloader.DEFAULT_TIMEOUT, headers={"key": "value"}
+    )
+
+
+def test_download__conditional(session):
+    session.get.return_value = _response(304)
+
+    result = downloader.download(
+        downloader.DownloadRequest(
+            url=URL,
+            headers={"If-None-Match": "custom"},
+            timeout=5,
+            etag="etag",
+            last_modified="date",
+        )
+    )
+
+    assert result.not_modified
+    assert "etag" == result.etag
+    assert "date" == result.last_modified
+    session.get.assert_called_once_with(
+        URL,
+        timeout=5,
+        headers={"If-None-Match": "custom", "If-Modified-Since": "date"},
+    )
+
+
+def test_download__error(session):
+    response = _response(500)
+    response.raise_for_status.side_effect = requests.exceptions.HTTPError()
+    session.get.return_value = response
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        downloader.download(downloader.DownloadRequest(url=URL))
+
+
+def test_download_many(monkeypatch):
+    exception = requests.exceptions.ConnectionError()
+
+    def download(request):
+        if request.url == "error":
+            raise exception
+        return downloader.DownloadResult(content=request.url.encode())
+
+    monkeypatch.setattr(downloader, "download", download)
+
+    results = downloader.download_many(
+        [downloader.DownloadRequest(url=url) for url in ["a", "error", "b"]],
+        max_workers=2,
+    )
+
+    assert [
+        downloader.DownloadResult(content=b"a"),
+        exception,
+        downloader.DownloadResult(content=b"b"),
+    ] == results
@@ -6,7 +6,8 @@ import pytest
 from transiter import exceptions
 from transiter.db import models
 from transiter.db.queries import feedqueries, systemqueries
-from transiter.services import feedservice, views, updatemanager
+from transiter.scheduler import client
+from transiter.services import feedservice, pagination, views, updatemanager
 
 
 def test_list_all_auto_updating(
@@ -85,14 +86,34 @@ def test_create_feed_update(monkeypatch, feed_1_model):
     assert feed_update == actual
 
 
+def test_create_feed_update__trigger_id(monkeypatch, feed_1_model):
+    monkeypatch.setattr(updatemanager, "create_feed_update", lambda *args: 1)
+    execute_feed_update = mock.MagicMock()
+    monkeypatch.setattr(updatemanager, "execute_feed_update", execute_feed_update)
+
+    feedservice.create_and_execute_feed_update(
+        feed_1_model.system.id, feed_1_model.id, trigger_id="trigger_id"
+    )
+
+    execute_feed_update.assert_called_once_with(1, None, trigger_id="trigger_id")
+
+
 def test_create_feed_update__no_such_feed(monkeypatch, feed_1_model):
     monkeypatch.setattr(updatemanager, "create_feed_update", lambda *args: None)
+    feed_updates_skipped_callback = mock.MagicMock()
+    monkeypatch.setattr(
+        client, "feed_updates_skipped_callback", feed_updates_skipped_callback
+    )
 
     with pytest.raises(exceptions.IdNotFoundError):
         feedservice.create_and_execute_feed_update(
-            feed_1_model.system.id, feed_1_model.id
+            feed_1_model.system.id, feed_1_model.id, trigger_id="trigger_id"
         )
 
+    feed_updates_skipped_callback.assert_called_once_with(
+        feed_1_model.system.id, [feed_1_model.id], "trigger_id"
+    )
+
 
 def test_list_updates_in_feed(monkeypatch, feed_1_model):
     update_1 = models.FeedUpdate(feed=feed_1_model)
@@ -100,7 +121,9 @@ def test_list_updates_in_feed(monkeypatch, feed_1_model):
 
     monkeypatch.setattr(feedqueries, "get_in_system_by_id", lambda *args: feed_1_model)
     monkeypatch.setattr(
-        feedqueries, "list_updates_in_feed", lambda *args: [update_1, update_2]
+        feedqueries,
+        "list_updates_in_feed",
+        lambda *args, **kwargs: [update_1, update_2],
     )
 
     expected = [
@@ -110,7 +133,46 @@ def test_list_updates_in_feed(monkeypatch, feed_1_model):
 
     actual = feedservice.list_updates_in_feed(feed_1_model.system.id, feed_1_model.id)
 
-    assert expected == actual
+    assert pagination.Page(expected) == actual
+
+
+def test_list_updates_in_feed__paginated(monkeypatch, feed_1_model):
+    update_1 = models.FeedUpdate(pk=5, feed=feed_1_model)
+    update_2 = models.FeedUpdate(pk=4, feed=feed_1_model)
+    list_updates_in_feed = mock.MagicMock(return_value=[update_1, update_2])
+
+    monkeypatch.setattr(feedqueries, "get_in_system_by_id", lambda *args: feed_1_model)
+    monkeypatch.setattr(feedqueries, "list_updates_in_feed", list_updates_in_feed)
+
+    actual = feedservice.list_updates_in_feed(
+        feed_1_model.system.id,
+        feed_1_model.id,
+        limit=1,
+        after=pagination.encode_cursor(6),
+    )
+
+    assert [views.FeedUpdate.from_model(update_1)] == actual.items
+    assert 5 == pagination.decode_cursor(actual.next_cursor, int)
+    list_updates_in_feed.assert_called_once_with(feed_1_model.pk, before_pk=6, limit=2)
+
+
+def test_stream_updates_in_feed(monkeypatch, no_op_unit_of_work, feed_1_model):
+    update_1 = models.FeedUpdate(feed=feed_1_model)
+    update_2 = models.FeedUpdate(feed=feed_1_model)
+
+    monkeypatch.setattr(feedqueries, "get_in_system_by_id", lambda *args: feed_1_model)
+    monkeypatch.setattr(
+        feedqueries,
+        "list_updates_in_feed",
+        lambda *args, **kwargs: iter([[update_1], [update_2]]),
+    )
+
+    actual = feedservice.stream_updates_in_feed(feed_1_model.system.id, feed_1_model.id)
+
+    assert [
+        views.FeedUpdate.from_model(update_1),
+        views.FeedUpdate.from_model(update_2),
+    ] == list(actual)
 
 
 def test_list_updates_in_feed__no_such_feed(monkeypatch, feed_1_model):
@@ -136,6 +198,7 @@ def test_trip_feed_updates(monkeypatch, datetime_now, feed_pks):
     ) - datetime.timedelta(hours=30)
 
     dam_trip_feed_updates = mock.Mock()
+    monkeypatch.setattr(feedqueries, "is_feed_update_partitioned", lambda: False)
     monkeypatch.setattr(feedqueries, "list_all_feed_pks", lambda: feed_pks)
     monkeypatch.setattr(feedqueries, "trim_feed_updates", dam_trip_feed_updates)
 
@@ -147,3 +210,26 @@ def test_trip_feed_updates(monkeypatch, datetime_now, feed_pks):
         dam_trip_feed_updates.assert_has_calls(
             [mock.call(feed_pk, before_datetime) for feed_pk in feed_pks]
         )
+
+
+def test_trim_feed_updates__partitioned(monkeypatch, datetime_now):
+    today = datetime_now.date()
+    days = [today - datetime.timedelta(days=2), today - datetime.timedelta(days=1)]
+    create_partition = mock.Mock()
+    drop_partition = mock.Mock()
+    trim_default_partition = mock.Mock()
+    monkeypatch.setattr(feedqueries, "is_feed_update_partitioned", lambda: True)
+    monkeypatch.setattr(feedqueries, "list_feed_update_partition_days", lambda: days)
+    monkeypatch.setattr(feedqueries, "create_feed_update_partition", create_partition)
+    monkeypatch.setattr(feedqueries, "drop_feed_update_partition", drop_partition)
+    monkeypatch.setattr(
+        feedqueries, "trim_default_feed_update_partition", trim_default_partition
+    )
+
+    feedservice.trim_feed_updates()
+
+    create_partition.assert_has_calls(
+        [mock.call(today + datetime.timedelta(days=i)) for i in range(3)]
+    )
+    drop_partition.assert_called_once_with(days[0])
+    trim_default_partition.assert_called_once()
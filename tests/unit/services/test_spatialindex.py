@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from transiter.db.queries import stopqueries
+from transiter.services import geography, spatialindex
+
+
+def build_stops(center_lat, center_lon, spread, num_stops=200):
+    generator = random.Random(4)
+    return [
+        stopqueries.StopCoordinates(
+            pk=pk,
+            latitude=center_lat + generator.uniform(-spread, spread),
+            longitude=center_lon + generator.uniform(-spread, spread),
+            parent_stop_pk=None if pk % 3 else pk - 1,
+        )
+        for pk in range(num_stops)
+    ]
+
+
+def brute_force_search(stops, lat, lon, distance, stations_only=False):
+    result = []
+    for stop in stops:
+        if stations_only and stop.parent_stop_pk is not None:
+            continue
+        stop_distance = geography.distance(lat, lon, stop.latitude, stop.longitude)
+        if stop_distance <= distance:
+            result.append((stop_distance, stop))
+    return sorted(result, key=lambda distance_and_stop: distance_and_stop[0])
+
+
+@pytest.mark.parametrize("stations_only", [True, False])
+@pytest.mark.parametrize("distance", [10, 500, 3000, 50000, 10000000])
+@pytest.mark.parametrize(
+    "lat,lon,spread",
+    [
+        [40.7, -73.9, 0.1],
+        [-33.9, 151.2, 2],
+        [0, 0, 0.05],
+        [88.9, 10, 0.5],
+        [10, 179.95, 0.04],
+        [-10, -179.95, 0.04],
+    ],
+)
+def test_search(lat, lon, spread, distance, stations_only):
+    stops = build_stops(lat, lon, spread)
+    index = spatialindex.StopIndex(stops)
+
+    actual = index.search(lat, lon, distance, stations_only=stations_only)
+
+    assert brute_force_search(stops, lat, lon, distance, stations_only) == actual
+
+
+def test_search__limit():
+    stops = build_stops(40.7, -73.9, 0.1)
+    index = spatialindex.StopIndex(stops)
+
+    actual = index.search(40.7, -73.9, 5000, limit=3)
+
+    assert brute_force_search(stops, 40.7, -73.9, 5000)[:3] == actual
+
+
+def test_search__no_stops():
+    index = spatialindex.StopIndex([])
+
+    assert [] == index.search(40.7, -73.9, 5000)
@@ -1,13 +1,21 @@
+import dataclasses
 import datetime
 import time
 import unittest.mock as mock
 
 import pytest
 
-from transiter import exceptions
+from transiter import config, exceptions
 from transiter.db import models
 from transiter.db.queries import alertqueries, tripqueries, stopqueries, systemqueries
-from transiter.services import stopservice, views, geography
+from transiter.services import (
+    departureboardmanager,
+    geography,
+    pagination,
+    spatialindex,
+    stopservice,
+    views,
+)
 from transiter.services.servicemap import servicemapmanager
 
 SYSTEM_ID = "1"
@@ -66,7 +74,7 @@ def test_list_all_transfers_in_system(
 
     actual = stopservice.list_all_transfers_in_system(system_1_model.id)
 
-    assert expected == actual
+    assert pagination.Page(expected) == actual
 
 
 def test_list_all_transfers_in_system__system_not_found(monkeypatch):
@@ -87,10 +95,20 @@ def test_geographical_search(monkeypatch):
     stop_3 = models.Stop(
         pk=5, id="5", name="5", latitude=0.5, longitude=0.5, system=system
     )
+    stops = [stop_3, stop_2, stop_1]
+    monkeypatch.setattr(systemqueries, "get_by_id", lambda *args, **kwargs: system)
+    monkeypatch.setattr(
+        spatialindex,
+        "get_index",
+        lambda system_: spatialindex.StopIndex(
+            stopqueries.StopCoordinates(stop.pk, stop.latitude, stop.longitude, None)
+            for stop in stops
+        ),
+    )
     monkeypatch.setattr(
         stopqueries,
-        "list_all_in_geographical_bounds",
-        lambda *args, **kwargs: [stop_3, stop_2, stop_1],
+        "list_by_pks",
+        lambda stop_pks: [stop for stop in stops if stop.pk in set(stop_pks)],
     )
 
     actual_stops = stopservice.geographical_search(
@@ -159,45 +177,72 @@ def test_direction(time_dot_time):
     assert stop_time_filter.remove(stop_times[1], DIRECTION) is True
 
 
-def test_direction_name_matcher__all_names():
-    matcher = stopservice._DirectionNameMatcher(
-        [models.DirectionRule(stop_pk=1, name=DIRECTION_NAME)]
+def test_list_all_in_system(monkeypatch):
+    system = models.System(id=SYSTEM_ID)
+    stop_one = models.Stop(
+        pk=STOP_ONE_PK, id=STOP_ONE_ID, name=STOP_ONE_NAME, system=system
+    )
+    monkeypatch.setattr(systemqueries, "get_by_id", lambda *args, **kwargs: system)
+    monkeypatch.setattr(
+        stopqueries, "list_all_in_system", lambda *args, **kwargs: [stop_one]
     )
 
-    assert {DIRECTION_NAME} == matcher.all_names()
+    expected = [views.Stop(id=STOP_ONE_ID, name=STOP_ONE_NAME, _system_id=SYSTEM_ID)]
 
+    actual = stopservice.list_all_in_system(SYSTEM_ID)
 
-@pytest.mark.parametrize(
-    "direction_rule,expected",
-    [
-        [models.DirectionRule(stop_pk=1, name=DIRECTION_NAME), DIRECTION_NAME],
-        [models.DirectionRule(stop_pk=2, name=DIRECTION_NAME), None],
-        [models.DirectionRule(stop_pk=1, name=DIRECTION_NAME, direction_id=True), None],
-        [models.DirectionRule(stop_pk=1, name=DIRECTION_NAME, track="track"), None],
-    ],
-)
-def test_direction_name_matcher__match(direction_rule, expected):
-    matcher = stopservice._DirectionNameMatcher([direction_rule])
-    stop_time = models.TripStopTime(stop_pk=1, trip=models.Trip())
+    assert pagination.Page(expected) == actual
 
-    actual = matcher.match(stop_time)
 
-    assert expected == actual
+@pytest.mark.parametrize("num_stops,has_next_page", [[1, False], [2, False], [3, True]])
+def test_list_all_in_system__paginated(monkeypatch, num_stops, has_next_page):
+    system = models.System(id=SYSTEM_ID)
+    stops = [
+        models.Stop(pk=i, id=str(i), name=str(i), system=system)
+        for i in range(num_stops)
+    ]
+    list_all_in_system = mock.MagicMock(return_value=stops)
+    monkeypatch.setattr(systemqueries, "get_by_id", lambda *args, **kwargs: system)
+    monkeypatch.setattr(stopqueries, "list_all_in_system", list_all_in_system)
 
+    actual = stopservice.list_all_in_system(
+        SYSTEM_ID, limit=2, after=pagination.encode_cursor("A")
+    )
 
-def test_list_all_in_system(monkeypatch):
+    assert [stop.id for stop in stops[:2]] == [view.id for view in actual.items]
+    if has_next_page:
+        assert "1" == pagination.decode_cursor(actual.next_cursor, str)
+    else:
+        assert actual.next_cursor is None
+    list_all_in_system.assert_called_once_with(SYSTEM_ID, after_id="A", limit=3)
+
+
+@pytest.mark.parametrize("limit,after", [[0, None], [None, "bad"], [None, "MQ=="]])
+def test_list_all_in_system__invalid_pagination(limit, after):
+    with pytest.raises(exceptions.InvalidInput):
+        stopservice.list_all_in_system(SYSTEM_ID, limit=limit, after=after)
+
+
+def test_stream_all_in_system(monkeypatch, no_op_unit_of_work):
     system = models.System(id=SYSTEM_ID)
-    stop_one = models.Stop(
-        pk=STOP_ONE_PK, id=STOP_ONE_ID, name=STOP_ONE_NAME, system=system
-    )
+    stops = [models.Stop(pk=i, id=str(i), name=str(i), system=system) for i in range(3)]
     monkeypatch.setattr(systemqueries, "get_by_id", lambda *args, **kwargs: system)
-    monkeypatch.setattr(stopqueries, "list_all_in_system", lambda *args: [stop_one])
+    monkeypatch.setattr(
+        stopqueries,
+        "list_all_in_system",
+        lambda *args, **kwargs: iter([stops[:2], stops[2:]]),
+    )
 
-    expected = [views.Stop(id=STOP_ONE_ID, name=STOP_ONE_NAME, _system_id=SYSTEM_ID)]
+    actual = stopservice.stream_all_in_system(SYSTEM_ID)
 
-    actual = stopservice.list_all_in_system(SYSTEM_ID)
+    assert [stop.id for stop in stops] == [view.id for view in actual]
 
-    assert expected == actual
+
+def test_stream_all_in_system__system_not_found(monkeypatch, no_op_unit_of_work):
+    monkeypatch.setattr(systemqueries, "get_by_id", lambda *args, **kwargs: None)
+
+    with pytest.raises(exceptions.IdNotFoundError):
+        next(stopservice.stream_all_in_system(SYSTEM_ID))
 
 
 def test_list_all_in_system__system_not_found(monkeypatch):
@@ -215,7 +260,8 @@ def test_get_in_system_by_id__stop_not_found(monkeypatch):
         stopservice.get_in_system_by_id(SYSTEM_ID, STOP_ONE_ID),
 
 
-def test_get_in_system_by_id(monkeypatch):
+@pytest.mark.parametrize("materialize_departure_boards", [True, False])
+def test_get_in_system_by_id(monkeypatch, materialize_departure_boards):
     stop_one = models.Stop(
         pk=STOP_ONE_PK, id=STOP_ONE_ID, system=models.System(id=SYSTEM_ID),
     )
@@ -247,10 +293,14 @@ def test_get_in_system_by_id(monkeypatch):
     )
 
     monkeypatch.setattr(
-        stopservice._DirectionNameMatcher, "match", lambda *args: DIRECTION_NAME
+        departureboardmanager.DirectionNameMatcher,
+        "match",
+        lambda *args: DIRECTION_NAME,
     )
     monkeypatch.setattr(
-        stopservice._DirectionNameMatcher, "all_names", lambda *args: [DIRECTION_NAME]
+        departureboardmanager.DirectionNameMatcher,
+        "all_names",
+        lambda *args: [DIRECTION_NAME],
     )
     fake_stop_tree_response = views.Stop(
         id=STOP_TWO_ID,
@@ -268,6 +318,34 @@ def test_get_in_system_by_id(monkeypatch):
         "_build_trip_stop_time_response",
         lambda *args: fake_trip_stop_time_response,
     )
+    monkeypatch.setattr(
+        config, "MATERIALIZE_DEPARTURE_BOARDS", materialize_departure_boards
+    )
+    if materialize_departure_boards:
+        fake_trip_stop_time_response = views.TripStopTime(
+            arrival=views._TripStopTimeEvent(
+                time=stop_time_two.arrival_time, delay=None, uncertainty=None
+            ),
+            departure=views._TripStopTimeEvent(time=None, delay=None, uncertainty=None),
+            track=None,
+            future=True,
+            stop_sequence=2,
+            direction=DIRECTION_NAME,
+        )
+        old_trip_stop_time_response = dataclasses.replace(
+            fake_trip_stop_time_response,
+            arrival=views._TripStopTimeEvent(
+                time=stop_time_one.arrival_time, delay=None, uncertainty=None
+            ),
+        )
+        monkeypatch.setattr(
+            departureboardmanager,
+            "get_departure_board",
+            lambda *args: (
+                [DIRECTION_NAME],
+                [old_trip_stop_time_response, fake_trip_stop_time_response],
+            ),
+        )
     monkeypatch.setattr(
         alertqueries,
         "get_stop_pk_to_active_alerts",
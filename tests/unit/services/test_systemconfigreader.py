@@ -145,6 +145,51 @@ def test_yaml_parser_error():
         systemconfigreader.read(config)
 
 
+def test_auto_update_period_bounds():
+
+    config = f"""
+    {systemconfigreader.NAME}: "{SYSTEM_NAME}"
+
+    {systemconfigreader.FEEDS}:
+      {FEED_ID}:
+        http:
+          url: {URL}
+        parser:
+          built_in: GTFS_REALTIME
+        auto_update:
+          period: 15 seconds
+          min_period: 5 seconds
+          max_period: 1 minute
+    """
+
+    assert {"enabled": True, "period": 15, "min_period": 5, "max_period": 60} == (
+        systemconfigreader.read(config)[systemconfigreader.FEEDS][FEED_ID][
+            systemconfigreader.AUTO_UPDATE
+        ]
+    )
+
+
+def test_auto_update_period_bounds__min_greater_than_max():
+
+    config = f"""
+    {systemconfigreader.NAME}: "{SYSTEM_NAME}"
+
+    {systemconfigreader.FEEDS}:
+      {FEED_ID}:
+        http:
+          url: {URL}
+        parser:
+          built_in: GTFS_REALTIME
+        auto_update:
+          period: 15 seconds
+          min_period: 1 minute
+          max_period: 5 seconds
+    """
+
+    with pytest.raises(exceptions.InvalidSystemConfigFile):
+        systemconfigreader.read(config)
+
+
 def test_missing_settings():
 
     config = f"""
@@ -218,6 +218,7 @@ def test_install(
         lambda *args, **kwargs: (models.FeedUpdate(status=feed_update_status), None),
     )
     monkeypatch.setattr(updatemanager, "create_feed_update", mock.MagicMock())
+    monkeypatch.setattr(updatemanager, "download_feeds", lambda *args: {})
 
     systemservice.install(SYSTEM_ID, "adsf", {"key": "value"}, None)
 
@@ -446,7 +447,12 @@ def test_save_feed_configuration(monkeypatch, session_factory):
         FEED_ID_3: {
             "parser": {"custom": "a:b"},
             "http": {"url": "https://nytimes.com", "headers": {"key": "value"}},
-            "auto_update": {"period": 5, "enabled": True},
+            "auto_update": {
+                "period": 5,
+                "min_period": 2,
+                "max_period": 30,
+                "enabled": True,
+            },
             "required_for_install": False,
         },
     }
@@ -472,6 +478,8 @@ def test_save_feed_configuration(monkeypatch, session_factory):
         headers=json.dumps({"key": "value"}, indent=2),
         parser_options=None,
         auto_update_period=5,
+        auto_update_min_period=2,
+        auto_update_max_period=30,
         auto_update_enabled=True,
         required_for_install=False,
     )
@@ -1,9 +1,11 @@
+import collections
+
 import pytest
 
 from transiter import exceptions
 from transiter.db import models
 from transiter.db.queries import stopqueries, systemqueries, transfersconfigqueries
-from transiter.services import transfersconfigservice, views
+from transiter.services import spatialindex, transfersconfigservice, views
 
 SYSTEM_1_ID = "1"
 SYSTEM_2_ID = "2"
@@ -18,6 +20,14 @@ def list_all_in_system_factory(stops):
     return lambda system_id: [stop for stop in stops if stop.system.id == system_id]
 
 
+def get_index_factory(stops):
+    list_all_in_system = list_all_in_system_factory(stops)
+    return lambda system: spatialindex.StopIndex(
+        stopqueries.StopCoordinates(stop.pk, stop.latitude, stop.longitude, None)
+        for stop in list_all_in_system(system.id)
+    )
+
+
 # TODO: test that the transfers are returned ion sorted order
 
 
@@ -88,9 +98,12 @@ def list_all_in_system_factory(stops):
     ],
 )
 def test_build_transfers(monkeypatch, stops, distance, expected_tuples):
+    for pk, stop in enumerate(stops):
+        stop.pk = pk
     monkeypatch.setattr(
         stopqueries, "list_all_in_system", list_all_in_system_factory(stops),
     )
+    monkeypatch.setattr(spatialindex, "get_index", get_index_factory(stops))
 
     actual_pairs_list = [
         (transfer.from_stop.id, transfer.to_stop.id)
@@ -212,3 +225,67 @@ def test_get_by_id(
     )
 
     assert expected == transfersconfigservice.get_by_id(CONFIG_PK)
+
+
+@pytest.fixture
+def update_generations(monkeypatch):
+    system_pk_to_generation = collections.defaultdict(int)
+
+    def increment_update_generation(system_pk):
+        system_pk_to_generation[system_pk] += 1
+
+    monkeypatch.setattr(
+        systemqueries, "increment_update_generation", increment_update_generation
+    )
+    return system_pk_to_generation
+
+
+@pytest.fixture
+def two_systems(monkeypatch):
+    systems = [models.System(pk=1, id=SYSTEM_1_ID), models.System(pk=2, id=SYSTEM_2_ID)]
+    monkeypatch.setattr(
+        systemqueries,
+        "list_all",
+        lambda system_ids: [system for system in systems if system.id in system_ids],
+    )
+    monkeypatch.setattr(
+        transfersconfigservice, "_build_transfers", lambda systems, distance: []
+    )
+    return systems
+
+
+def test_create__invalidates_cached_responses(
+    inline_unit_of_work, update_generations, two_systems
+):
+    transfersconfigservice.create([SYSTEM_1_ID, SYSTEM_2_ID], DISTANCE)
+
+    assert {1: 1, 2: 1} == update_generations
+
+
+def test_update__invalidates_cached_responses(
+    monkeypatch, no_op_unit_of_work, update_generations, two_systems
+):
+    old_system = models.System(pk=3, id="3")
+    monkeypatch.setattr(
+        transfersconfigqueries,
+        "get",
+        lambda config_id: models.TransfersConfig(
+            distance=DISTANCE, systems=[old_system, two_systems[0]]
+        ),
+    )
+
+    transfersconfigservice.update(CONFIG_ID, [SYSTEM_1_ID, SYSTEM_2_ID], None)
+
+    assert {1: 2, 2: 1, 3: 1} == update_generations
+
+
+def test_delete__invalidates_cached_responses(
+    monkeypatch, inline_unit_of_work, update_generations, two_systems
+):
+    config = models.TransfersConfig(distance=DISTANCE, systems=two_systems)
+    monkeypatch.setattr(transfersconfigqueries, "get", lambda config_id: config)
+
+    transfersconfigservice.delete(CONFIG_ID)
+
+    assert {1: 1, 2: 1} == update_generations
+    inline_unit_of_work.delete.assert_called_once_with(config)
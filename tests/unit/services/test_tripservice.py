@@ -3,7 +3,7 @@ import pytest
 from transiter import exceptions
 from transiter.db import models
 from transiter.db.queries import alertqueries, tripqueries, routequeries
-from transiter.services import tripservice, views
+from transiter.services import pagination, tripservice, views
 
 
 def test_list_all_in_route__route_not_found(monkeypatch, route_1_model):
@@ -58,7 +58,7 @@ def test_list_all_in_route(
 
     actual = tripservice.list_all_in_route(route_1_model.system.id, route_1_model.id)
 
-    assert expected == actual
+    assert pagination.Page(expected) == actual
 
 
 def test_get_in_route_by_id__trip_not_found(monkeypatch, trip_1_model):
@@ -1,13 +1,19 @@
+import concurrent.futures
+import datetime
 import hashlib
+import multiprocessing
+import pickle
 from unittest import mock
 
 import pytest
 import requests
 
-from transiter import parse, import_
+from transiter import config, parse, import_
 from transiter.db import models
-from transiter.db.queries import feedqueries
-from transiter.services import updatemanager
+from transiter.db.queries import feedqueries, systemqueries
+from transiter.executor import processpool
+from transiter.scheduler import client
+from transiter.services import downloader, updatemanager
 from transiter.import_ import importdriver
 
 FEED_ID = "1"
@@ -148,16 +154,12 @@ def test_execute_feed_update(
     )
     feed_update = models.FeedUpdate(feed=feed)
 
-    response = mock.MagicMock()
-    if feed_content is None:
-        response.raise_for_status.side_effect = requests.exceptions.RequestException()
-    else:
-        response.content = feed_content
-
-    def get(*args, **kwargs):
-        return response
+    def download(request):
+        if feed_content is None:
+            raise requests.exceptions.RequestException()
+        return downloader.DownloadResult(content=feed_content)
 
-    monkeypatch.setattr(requests, "get", get)
+    monkeypatch.setattr(downloader, "download", download)
 
     def get_update_by_pk(feed_update_pk):
         return feed_update
@@ -170,6 +172,7 @@ def test_execute_feed_update(
         return m.hexdigest()
 
     monkeypatch.setattr(feedqueries, "get_update_by_pk", get_update_by_pk)
+    monkeypatch.setattr(feedqueries, "get_last_successful_update", lambda *args: None)
     monkeypatch.setattr(
         feedqueries, "get_last_successful_update_hash", get_last_successful_update
     )
@@ -198,11 +201,12 @@ def test_execute_feed_update__success_or_sync_error(
     )
     feed_update = models.FeedUpdate(feed=feed)
 
-    response = mock.MagicMock()
-    response.content = b"a"
-    monkeypatch.setattr(requests, "get", lambda *args, **kwargs: response)
+    monkeypatch.setattr(
+        downloader, "download", lambda *args: downloader.DownloadResult(content=b"a")
+    )
 
     monkeypatch.setattr(feedqueries, "get_update_by_pk", lambda *args: feed_update)
+    monkeypatch.setattr(feedqueries, "get_last_successful_update", lambda *args: None)
     monkeypatch.setattr(
         feedqueries, "get_last_successful_update_hash", lambda *args: None
     )
@@ -226,6 +230,276 @@ def test_execute_feed_update__success_or_sync_error(
     assert feed_update.result == expected_explanation
 
 
+def test_execute_feed_update__content_created_at(inline_unit_of_work, monkeypatch):
+    system = models.System(id=SYSTEM_ID)
+    feed = models.Feed(
+        id=FEED_ID, system=system, custom_parser="custom_parser", url=URL, headers="{}"
+    )
+    feed_update = models.FeedUpdate(feed=feed)
+    content_created_at = datetime.datetime(2020, 1, 2, 3, 4, 5)
+
+    monkeypatch.setattr(
+        downloader, "download", lambda *args: downloader.DownloadResult(content=b"a")
+    )
+    monkeypatch.setattr(feedqueries, "get_update_by_pk", lambda *args: feed_update)
+    monkeypatch.setattr(feedqueries, "get_last_successful_update", lambda *args: None)
+    monkeypatch.setattr(
+        feedqueries, "get_last_successful_update_hash", lambda *args: None
+    )
+
+    class Parser(parse.TransiterParser):
+        def load_content(self, content: bytes):
+            pass
+
+        def get_timestamp(self):
+            return content_created_at
+
+    monkeypatch.setattr(updatemanager, "_get_parser", lambda *args: Parser())
+    monkeypatch.setattr(import_, "run_import", lambda *args: importdriver.ImportStats())
+    feed_update_callback = mock.MagicMock()
+    monkeypatch.setattr(client, "feed_update_callback", feed_update_callback)
+
+    feed_update, _ = updatemanager.execute_feed_update(1, trigger_id="trigger_id")
+
+    assert content_created_at == feed_update.content_created_at
+    assert content_created_at == feed_update_callback.call_args[0][4]
+    assert "trigger_id" == feed_update_callback.call_args[1]["trigger_id"]
+
+
+@pytest.mark.parametrize("num_added,expect_increment", [[0, False], [1, True]])
+def test_execute_feed_update__update_generation(
+    inline_unit_of_work, monkeypatch, num_added, expect_increment
+):
+    system = models.System(id=SYSTEM_ID, pk=1)
+    feed = models.Feed(
+        id=FEED_ID,
+        system=system,
+        system_pk=1,
+        custom_parser="custom_parser",
+        url=URL,
+        headers="{}",
+    )
+    feed_update = models.FeedUpdate(feed=feed)
+
+    monkeypatch.setattr(
+        downloader, "download", lambda *args: downloader.DownloadResult(content=b"a")
+    )
+    monkeypatch.setattr(feedqueries, "get_update_by_pk", lambda *args: feed_update)
+    monkeypatch.setattr(feedqueries, "get_last_successful_update", lambda *args: None)
+
+    class Parser(parse.TransiterParser):
+        def load_content(self, content: bytes):
+            pass
+
+    monkeypatch.setattr(updatemanager, "_get_parser", lambda *args: Parser())
+    stats = importdriver.ImportStats()
+    stats.add_data("ROUTE", num_added, 0, 0)
+    monkeypatch.setattr(import_, "run_import", lambda *args: stats)
+    increment_update_generation = mock.MagicMock()
+    monkeypatch.setattr(
+        systemqueries, "increment_update_generation", increment_update_generation
+    )
+
+    updatemanager.execute_feed_update(1)
+
+    if expect_increment:
+        increment_update_generation.assert_called_once_with(1)
+    else:
+        increment_update_generation.assert_not_called()
+
+
+class InlinePool:
+    """
+    Pool that runs work immediately, sending the result through pickle like a process
+    pool does.
+    """
+
+    def __init__(self, exception=None):
+        self._exception = exception
+
+    def submit(self, func, *args):
+        future = concurrent.futures.Future()
+        if self._exception is not None:
+            future.set_exception(self._exception)
+        else:
+            future.set_result(pickle.loads(pickle.dumps(func(*args))))
+        return future
+
+
+AGENCY = parse.Agency(id="agency", name="Agency", url="", timezone="")
+
+
+@pytest.fixture
+def pipelined_feed_update(monkeypatch):
+    system = models.System(id=SYSTEM_ID)
+    feed = models.Feed(
+        id=FEED_ID, system=system, custom_parser="custom_parser", url=URL, headers="{}"
+    )
+    feed_update = models.FeedUpdate(feed=feed)
+
+    monkeypatch.setattr(
+        downloader, "download", lambda *args: downloader.DownloadResult(content=b"a")
+    )
+    monkeypatch.setattr(feedqueries, "get_update_by_pk", lambda *args: feed_update)
+    monkeypatch.setattr(feedqueries, "get_last_successful_update", lambda *args: None)
+    monkeypatch.setattr(
+        feedqueries, "get_last_successful_update_hash", lambda *args: None
+    )
+    monkeypatch.setattr(
+        updatemanager,
+        "_get_parser",
+        lambda *args: parse.parser.CallableBasedParser(lambda content: [AGENCY]),
+    )
+    monkeypatch.setattr(client, "feed_update_callback", mock.MagicMock())
+
+
+def test_execute_feed_updates_pipelined(
+    inline_unit_of_work, monkeypatch, pipelined_feed_update
+):
+    monkeypatch.setattr(updatemanager, "_parse_pool", InlinePool())
+    run_import = mock.MagicMock(return_value=importdriver.ImportStats())
+    monkeypatch.setattr(import_, "run_import", run_import)
+
+    updatemanager.execute_feed_updates_pipelined([FEED_UPDATE_PK])
+
+    [(_, batch), _] = run_import.call_args
+    assert isinstance(batch, import_.EntityBatch)
+    assert [AGENCY] == batch.type_to_entities[parse.Agency]
+    feed_update = inline_unit_of_work.merge.call_args[0][0]
+    assert models.FeedUpdate.Status.SUCCESS == feed_update.status
+    assert models.FeedUpdate.Result.UPDATED == feed_update.result
+
+
+def test_execute_feed_updates_pipelined__no_batch(
+    inline_unit_of_work, monkeypatch, pipelined_feed_update
+):
+    monkeypatch.setattr(updatemanager, "_parse_pool", InlinePool())
+    monkeypatch.setattr(import_, "can_load_entity_batch", lambda *args: False)
+    run_import = mock.MagicMock(return_value=importdriver.ImportStats())
+    monkeypatch.setattr(import_, "run_import", run_import)
+
+    updatemanager.execute_feed_updates_pipelined([FEED_UPDATE_PK])
+
+    [(_, parser_object), _] = run_import.call_args
+    assert [AGENCY] == parser_object.get_entities(parse.Agency)
+
+
+def test_execute_feed_updates_pipelined__worker_failure(monkeypatch):
+    monkeypatch.setattr(updatemanager, "_parse_pool", InlinePool(ValueError()))
+    execute_feed_update = mock.MagicMock()
+    monkeypatch.setattr(updatemanager, "execute_feed_update", execute_feed_update)
+
+    updatemanager.execute_feed_updates_pipelined([FEED_UPDATE_PK])
+
+    execute_feed_update.assert_called_once_with(FEED_UPDATE_PK, trigger_id=None)
+
+
+def test_execute_feed_update__not_modified(inline_unit_of_work, monkeypatch):
+    system = models.System(id=SYSTEM_ID)
+    feed = models.Feed(
+        id=FEED_ID, system=system, custom_parser="custom_parser", url=URL, headers="{}"
+    )
+    feed_update = models.FeedUpdate(feed=feed)
+    previous_update = models.FeedUpdate(
+        content_hash="hash", content_etag="etag", content_last_modified="date"
+    )
+
+    def download(request):
+        assert "etag" == request.etag
+        assert "date" == request.last_modified
+        return downloader.DownloadResult(content=None, etag="etag_2")
+
+    monkeypatch.setattr(downloader, "download", download)
+    monkeypatch.setattr(feedqueries, "get_update_by_pk", lambda *args: feed_update)
+    monkeypatch.setattr(
+        feedqueries, "get_last_successful_update", lambda *args: previous_update
+    )
+    monkeypatch.setattr(updatemanager, "_get_parser", lambda *args: None)
+    monkeypatch.setattr(import_, "run_import", None)
+
+    feed_update, _ = updatemanager.execute_feed_update(1)
+
+    assert feed_update.status == models.FeedUpdate.Status.SUCCESS
+    assert feed_update.result == models.FeedUpdate.Result.NOT_NEEDED
+    assert feed_update.content_hash == "hash"
+    assert feed_update.content_etag == "etag_2"
+
+
+def test_execute_feed_update__download_result_is_exception(
+    inline_unit_of_work, monkeypatch
+):
+    system = models.System(id=SYSTEM_ID)
+    feed = models.Feed(
+        id=FEED_ID, system=system, custom_parser="custom_parser", url=URL, headers="{}"
+    )
+    feed_update = models.FeedUpdate(feed=feed)
+    monkeypatch.setattr(feedqueries, "get_update_by_pk", lambda *args: feed_update)
+    monkeypatch.setattr(feedqueries, "get_last_successful_update", lambda *args: None)
+    monkeypatch.setattr(updatemanager, "_get_parser", lambda *args: None)
+
+    feed_update, exception = updatemanager.execute_feed_update(
+        1, download_result=requests.exceptions.ConnectionError()
+    )
+
+    assert feed_update.status == models.FeedUpdate.Status.FAILURE
+    assert feed_update.result == models.FeedUpdate.Result.DOWNLOAD_ERROR
+    assert isinstance(exception, requests.exceptions.ConnectionError)
+
+
+@pytest.mark.parametrize("trigger_id", [None, "trigger_id"])
+def test_create_and_execute_feed_updates(monkeypatch, trigger_id):
+    feed_id_to_feed_update_pk = {"feed_1": 1, "feed_2": None, "feed_3": 3}
+    download_result = downloader.DownloadResult(content=b"a")
+    execute_feed_update = mock.MagicMock()
+    monkeypatch.setattr(
+        updatemanager,
+        "create_feed_update",
+        lambda system_id, feed_id: feed_id_to_feed_update_pk[feed_id],
+    )
+    monkeypatch.setattr(
+        updatemanager,
+        "download_feeds",
+        lambda system_id, feed_ids: {"feed_1": download_result},
+    )
+    monkeypatch.setattr(updatemanager, "execute_feed_update", execute_feed_update)
+    feed_updates_skipped_callback = mock.MagicMock()
+    monkeypatch.setattr(
+        client, "feed_updates_skipped_callback", feed_updates_skipped_callback
+    )
+
+    actual = updatemanager.create_and_execute_feed_updates(
+        SYSTEM_ID, ["feed_1", "feed_2", "feed_3"], trigger_id=trigger_id
+    )
+
+    assert [1, 3] == actual
+    assert [
+        mock.call(1, download_result=download_result, trigger_id=trigger_id),
+        mock.call(3, download_result=None, trigger_id=trigger_id),
+    ] == execute_feed_update.call_args_list
+    if trigger_id is None:
+        feed_updates_skipped_callback.assert_not_called()
+    else:
+        feed_updates_skipped_callback.assert_called_once_with(
+            SYSTEM_ID, ["feed_2"], trigger_id
+        )
+
+
+def test_create_and_execute_feed_updates__parse_pool_in_daemonic_process(monkeypatch):
+    monkeypatch.setattr(config, "PARSE_POOL_NUM_WORKERS", "2")
+    monkeypatch.setattr(
+        multiprocessing,
+        "current_process",
+        lambda: mock.MagicMock(daemon=True, name="ForkPoolWorker-1"),
+    )
+    create_feed_update = mock.MagicMock()
+    monkeypatch.setattr(updatemanager, "create_feed_update", create_feed_update)
+
+    with pytest.raises(processpool.DaemonicProcessError):
+        updatemanager.create_and_execute_feed_updates(SYSTEM_ID, ["feed_1"])
+
+    create_feed_update.assert_not_called()
+
+
 def test_get_parser__built_in_parser__gtfs_static():
     parser = updatemanager._get_parser(models.Feed.BuiltInParser.GTFS_STATIC, None)
 
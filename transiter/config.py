@@ -17,9 +17,75 @@ DB_DATABASE = "transiter"
 DB_USERNAME = "transiter"
 DB_PASSWORD = "transiter"
 
+# Connection pool settings. If a setting is unset, the value in the engine profile of
+# the role the process is running (webservice, executor or scheduler) is used.
+DB_POOL_SIZE = None
+DB_MAX_OVERFLOW = None
+DB_POOL_TIMEOUT = None
+# Number of seconds after which a pooled connection is replaced; -1 to never replace.
+DB_POOL_RECYCLE = -1
+# If true, pooled connections are tested before being used.
+DB_POOL_PRE_PING = False
+# The maximum number of milliseconds a single SQL statement may run for; 0 for no limit.
+DB_STATEMENT_TIMEOUT = 0
+# If true, Transiter does not rely on any state that lives for longer than a single
+# transaction on a database connection. This is required when connecting to Postgres
+# through a connection pooler like PgBouncer running in transaction pooling mode.
+DB_TRANSACTION_POOLING = False
+
+# If set, read only requests to the HTTP API are served from a read replica of the
+# database at this host, as long as the replica's replication lag is no more than the
+# given number of seconds. Otherwise they are served from the primary database.
+DB_REPLICA_HOST = None
+DB_REPLICA_PORT = None
+DB_REPLICA_MAX_STALENESS = 10
+
+# If true when the database is initialized or upgraded, the feed update table is range
+# partitioned by day, and old feed updates are removed by dropping whole partitions.
+DB_PARTITION_FEED_UPDATES = False
+
+
+# The maximum number of feeds downloaded concurrently, and the maximum number of pooled
+# connections kept alive per host.
+DOWNLOAD_MAX_WORKERS = 8
+
+# The executor that runs feed updates and other asynchronous tasks. Either CELERY, in
+# which case tasks are sent through RabbitMQ to the Transiter executor, or LOCAL, in
+# which case tasks are run in a pool of worker processes in the submitting process.
+EXECUTOR = "CELERY"
+LOCAL_EXECUTOR_NUM_WORKERS = 4
+
+# If positive, feed updates executed in a batch are pipelined: the feeds are downloaded
+# and parsed in a pool of this many worker processes, while the parsed entities are
+# imported in the executing process. The Celery executor then runs its tasks in
+# threads, as tasks in the default prefork pool cannot start the pool.
+PARSE_POOL_NUM_WORKERS = 0
 
 SCHEDULER_HOST = "localhost"
 SCHEDULER_PORT = "5000"
+# If true, feeds in the same system with the same auto update period are updated
+# together in a single task, rather than in one task per feed.
+SCHEDULER_BATCH_FEED_UPDATES = False
+
+# If true, the upcoming trip stop times at each stop are materialized in a departure
+# board table when trips are imported, and the stop endpoint reads from this table.
+MATERIALIZE_DEPARTURE_BOARDS = False
+
+# The backend of the HTTP response cache. Either None, in which case responses are not
+# cached, LOCAL, in which case responses are cached in each web service process, or
+# REDIS, in which case responses are cached in the Redis server at the given URL.
+# Cached responses are invalidated when a feed update or a transfers config changes the
+# system's data, and in any case expire after the given number of seconds.
+HTTP_CACHE_BACKEND = None
+HTTP_CACHE_MAX_ENTRIES = 1000
+HTTP_CACHE_MAX_AGE = 60
+HTTP_CACHE_REDIS_URL = "redis://localhost:6379/0"
+
+# The library used to encode JSON responses. Either STANDARD, for Python's json module,
+# or ORJSON, which is faster but requires the orjson package. If HTTP_COMPACT_JSON is
+# true, responses are not indented.
+HTTP_JSON_ENCODER = "STANDARD"
+HTTP_COMPACT_JSON = False
 
 DOCUMENTATION_ENABLED = False
 DOCUMENTATION_ROOT = "../../docs/site"
@@ -0,0 +1,29 @@
+"""Add system update generation
+
+Revision ID: 0c4e6b8a2d17
+Revises: 5d2f8a4c7e91
+Create Date: 2026-10-18 23:26:12.918204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0c4e6b8a2d17"
+down_revision = "5d2f8a4c7e91"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "system",
+        sa.Column(
+            "update_generation", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+
+
+def downgrade():
+    op.drop_column("system", "update_generation")
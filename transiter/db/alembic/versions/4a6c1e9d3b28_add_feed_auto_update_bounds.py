@@ -0,0 +1,30 @@
+"""Add feed auto update period bounds
+
+Revision ID: 4a6c1e9d3b28
+Revises: 7d2f4b8e6a15
+Create Date: 2026-10-18 17:02:45.318270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "4a6c1e9d3b28"
+down_revision = "7d2f4b8e6a15"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "feed", sa.Column("auto_update_min_period", sa.Integer(), nullable=True)
+    )
+    op.add_column(
+        "feed", sa.Column("auto_update_max_period", sa.Integer(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("feed", "auto_update_max_period")
+    op.drop_column("feed", "auto_update_min_period")
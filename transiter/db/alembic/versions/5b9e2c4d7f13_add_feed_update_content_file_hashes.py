@@ -0,0 +1,26 @@
+"""Add feed update content file hashes
+
+Revision ID: 5b9e2c4d7f13
+Revises: a3c41e7d9b20
+Create Date: 2026-10-18 11:24:09.530112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5b9e2c4d7f13"
+down_revision = "a3c41e7d9b20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "feed_update", sa.Column("content_file_hashes", sa.String(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("feed_update", "content_file_hashes")
@@ -0,0 +1,31 @@
+"""Add departure board
+
+Revision ID: 5d2f8a4c7e91
+Revises: 9e1b7c3d5f20
+Create Date: 2026-10-18 22:41:53.207114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "5d2f8a4c7e91"
+down_revision = "9e1b7c3d5f20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "departure_board",
+        sa.Column("stop_pk", sa.Integer(), nullable=False),
+        sa.Column("content", sa.String(), nullable=False),
+        sa.Column("built_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["stop_pk"], ["stop.pk"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("stop_pk"),
+    )
+
+
+def downgrade():
+    op.drop_table("departure_board")
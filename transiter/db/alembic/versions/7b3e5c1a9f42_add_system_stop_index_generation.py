@@ -0,0 +1,29 @@
+"""Add system stop index generation
+
+Revision ID: 7b3e5c1a9f42
+Revises: 0c4e6b8a2d17
+Create Date: 2026-10-19 01:12:47.305519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7b3e5c1a9f42"
+down_revision = "0c4e6b8a2d17"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "system",
+        sa.Column(
+            "stop_index_generation", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+
+
+def downgrade():
+    op.drop_column("system", "stop_index_generation")
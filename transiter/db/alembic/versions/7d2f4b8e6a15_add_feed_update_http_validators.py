@@ -0,0 +1,28 @@
+"""Add feed update HTTP validators
+
+Revision ID: 7d2f4b8e6a15
+Revises: e3a7f90b1c64
+Create Date: 2026-10-18 16:20:11.903512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "7d2f4b8e6a15"
+down_revision = "e3a7f90b1c64"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("feed_update", sa.Column("content_etag", sa.String(), nullable=True))
+    op.add_column(
+        "feed_update", sa.Column("content_last_modified", sa.String(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("feed_update", "content_last_modified")
+    op.drop_column("feed_update", "content_etag")
@@ -0,0 +1,165 @@
+"""Optionally range partition the feed update table
+
+If the TRANSITER_DB_PARTITION_FEED_UPDATES setting is true when this migration is run,
+the feed update table is converted to a table that is range partitioned by day on
+the scheduled_at column. Otherwise this migration does nothing.
+
+Foreign keys cannot reference a partitioned table unless the partition key is part of
+the referenced key, so the foreign keys from the source_pk columns of the updatable
+entity tables are dropped. Transiter ensures feed updates that are still referenced
+are not removed when partitions are dropped.
+
+Revision ID: 9e1b7c3d5f20
+Revises: 4a6c1e9d3b28
+Create Date: 2026-10-18 21:14:06.540182
+
+"""
+import datetime
+
+from alembic import op
+
+from transiter import config
+
+# revision identifiers, used by Alembic.
+revision = "9e1b7c3d5f20"
+down_revision = "4a6c1e9d3b28"
+branch_labels = None
+depends_on = None
+
+SOURCE_TABLES = [
+    "agency",
+    "alert",
+    "direction_name_rule",
+    "route",
+    "scheduled_service",
+    "stop",
+    "transfer",
+    "trip",
+    "vehicle",
+]
+
+INDEXES = [
+    "feed_update_pkey",
+    "feed_update_feed_pk_feed_update_pk_idx",
+    "feed_update_status_result_completed_at_idx",
+    "feed_update_success_pk_completed_at_idx",
+]
+
+
+def upgrade():
+    if not config.DB_PARTITION_FEED_UPDATES:
+        return
+    _rename_table("feed_update", "feed_update_old")
+    for table in SOURCE_TABLES:
+        op.execute(
+            "ALTER TABLE {table} DROP CONSTRAINT {table}_source_pk_fkey".format(
+                table=table
+            )
+        )
+    op.execute(
+        """
+        UPDATE feed_update_old SET scheduled_at = COALESCE(completed_at, now())
+        WHERE scheduled_at IS NULL
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE feed_update (LIKE feed_update_old INCLUDING DEFAULTS)
+        PARTITION BY RANGE (scheduled_at)
+        """
+    )
+    op.execute("ALTER TABLE feed_update ADD PRIMARY KEY (pk, scheduled_at)")
+    _create_indexes_and_feed_foreign_key()
+    op.execute("CREATE TABLE feed_update_default PARTITION OF feed_update DEFAULT")
+    today = datetime.datetime.utcnow().date()
+    for days in range(-2, 3):
+        day = today + datetime.timedelta(days=days)
+        op.execute(
+            """
+            CREATE TABLE feed_update_p{name} PARTITION OF feed_update
+            FOR VALUES FROM ('{lower} 00:00:00+00') TO ('{upper} 00:00:00+00')
+            """.format(
+                name=day.strftime("%Y%m%d"),
+                lower=day.isoformat(),
+                upper=(day + datetime.timedelta(days=1)).isoformat(),
+            )
+        )
+    op.execute("INSERT INTO feed_update SELECT * FROM feed_update_old")
+    op.execute("ALTER SEQUENCE feed_update_pk_seq OWNED BY feed_update.pk")
+    op.execute("DROP TABLE feed_update_old")
+
+
+def downgrade():
+    is_partitioned = (
+        op.get_bind()
+        .exec_driver_sql(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_partitioned_table
+                WHERE partrelid = to_regclass('feed_update')
+            )
+            """
+        )
+        .scalar()
+    )
+    if not is_partitioned:
+        return
+    _rename_table("feed_update", "feed_update_partitioned")
+    op.execute(
+        "CREATE TABLE feed_update (LIKE feed_update_partitioned INCLUDING DEFAULTS)"
+    )
+    op.execute("ALTER TABLE feed_update ALTER COLUMN scheduled_at DROP NOT NULL")
+    op.execute("INSERT INTO feed_update SELECT * FROM feed_update_partitioned")
+    op.execute("ALTER SEQUENCE feed_update_pk_seq OWNED BY feed_update.pk")
+    op.execute("DROP TABLE feed_update_partitioned")
+    op.execute("ALTER TABLE feed_update ADD PRIMARY KEY (pk)")
+    _create_indexes_and_feed_foreign_key()
+    for table in SOURCE_TABLES:
+        op.execute(
+            """
+            ALTER TABLE {table} ADD CONSTRAINT {table}_source_pk_fkey
+            FOREIGN KEY (source_pk) REFERENCES feed_update(pk)
+            """.format(
+                table=table
+            )
+        )
+
+
+def _rename_table(old_name, new_name):
+    op.execute("ALTER TABLE {} RENAME TO {}".format(old_name, new_name))
+    for index in INDEXES:
+        op.execute(
+            "ALTER INDEX {} RENAME TO {}".format(
+                index, index.replace(old_name, new_name, 1)
+            )
+        )
+    op.execute(
+        "ALTER TABLE {} DROP CONSTRAINT feed_update_feed_pk_fkey".format(new_name)
+    )
+
+
+def _create_indexes_and_feed_foreign_key():
+    op.execute(
+        """
+        ALTER TABLE feed_update ADD CONSTRAINT feed_update_feed_pk_fkey
+        FOREIGN KEY (feed_pk) REFERENCES feed(pk)
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX feed_update_feed_pk_feed_update_pk_idx
+        ON feed_update (feed_pk, pk)
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX feed_update_status_result_completed_at_idx
+        ON feed_update (feed_pk, status, result, completed_at)
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX feed_update_success_pk_completed_at_idx
+        ON feed_update (feed_pk, completed_at) WHERE status = 'SUCCESS'
+        """
+    )
@@ -0,0 +1,31 @@
+"""Merge system cache generations
+
+Revision ID: 9e1d4b7c3a58
+Revises: 7b3e5c1a9f42
+Create Date: 2026-10-18 18:41:09.216734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "9e1d4b7c3a58"
+down_revision = "7b3e5c1a9f42"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column("system", "id_cache_generation", new_column_name="cache_generation")
+    op.drop_column("system", "stop_index_generation")
+
+
+def downgrade():
+    op.add_column(
+        "system",
+        sa.Column(
+            "stop_index_generation", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+    op.alter_column("system", "cache_generation", new_column_name="id_cache_generation")
@@ -0,0 +1,26 @@
+"""Add scheduled trip fingerprint
+
+Revision ID: a3c41e7d9b20
+Revises: f722a8952973
+Create Date: 2026-10-18 10:02:41.118230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a3c41e7d9b20"
+down_revision = "f722a8952973"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "scheduled_trip", sa.Column("fingerprint", sa.String(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("scheduled_trip", "fingerprint")
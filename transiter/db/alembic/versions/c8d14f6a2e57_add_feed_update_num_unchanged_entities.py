@@ -0,0 +1,26 @@
+"""Add feed update num unchanged entities
+
+Revision ID: c8d14f6a2e57
+Revises: 5b9e2c4d7f13
+Create Date: 2026-10-18 13:41:52.207145
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "c8d14f6a2e57"
+down_revision = "5b9e2c4d7f13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "feed_update", sa.Column("num_unchanged_entities", sa.Integer(), nullable=True)
+    )
+
+
+def downgrade():
+    op.drop_column("feed_update", "num_unchanged_entities")
@@ -0,0 +1,29 @@
+"""Add system ID cache generation
+
+Revision ID: e3a7f90b1c64
+Revises: c8d14f6a2e57
+Create Date: 2026-10-18 15:02:37.481920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "e3a7f90b1c64"
+down_revision = "c8d14f6a2e57"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "system",
+        sa.Column(
+            "id_cache_generation", sa.Integer(), nullable=False, server_default="0"
+        ),
+    )
+
+
+def downgrade():
+    op.drop_column("system", "id_cache_generation")
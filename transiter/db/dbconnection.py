@@ -1,13 +1,19 @@
 """
 This module is responsible for the database session and transaction scope.
 """
+import dataclasses
+import functools
 import logging
+import threading
+import time
 from contextlib import contextmanager
 
+import prometheus_client as prometheus
 import sqlalchemy.exc
 from alembic import command
 from alembic.config import Config
-from decorator import decorator
+from decorator import decorate
+from sqlalchemy import event, pool
 from sqlalchemy.engine.url import URL
 from sqlalchemy.orm import scoped_session, sessionmaker
 
@@ -16,30 +22,194 @@ from transiter.db import models
 
 logger = logging.getLogger(__name__)
 
+WEBSERVICE = "webservice"
+EXECUTOR = "executor"
+SCHEDULER = "scheduler"
+DEFAULT = "default"
 
-def create_engine():
+PRIMARY = "primary"
+REPLICA = "replica"
+
+# The number of seconds for which the result of checking the read replica's
+# replication lag is reused.
+REPLICA_CHECK_INTERVAL = 5
+# Connecting to the read replica, and checking its replication lag, time out quickly
+# so that an unreachable replica does not hold up read only units of work.
+REPLICA_CONNECT_TIMEOUT = 2
+REPLICA_CHECK_STATEMENT_TIMEOUT = 1000
+
+
+@dataclasses.dataclass
+class EngineProfile:
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float = 30
+
+
+# The webservice handles many short concurrent read requests. Executor processes
+# (Celery worker processes or local executor workers) run one task at a time, so they
+# need a connection for the task and one to spare. The scheduler only reads the feeds
+# to schedule and occasionally writes feed updates.
+_ROLE_TO_ENGINE_PROFILE = {
+    WEBSERVICE: EngineProfile(pool_size=10, max_overflow=10),
+    EXECUTOR: EngineProfile(pool_size=2, max_overflow=2),
+    SCHEDULER: EngineProfile(pool_size=2, max_overflow=3),
+    DEFAULT: EngineProfile(pool_size=5, max_overflow=10),
+}
+
+_role = DEFAULT
+
+# These are the names of the Prometheus metrics
+PROMETHEUS_DB_POOL_CHECKOUT_WAIT = "transiter_db_pool_checkout_wait_seconds"
+PROMETHEUS_DB_POOL_CONNECTIONS = "transiter_db_pool_connections"
+
+_checkout_wait = prometheus.Histogram(
+    PROMETHEUS_DB_POOL_CHECKOUT_WAIT,
+    "Number of seconds spent waiting to check out a database connection from the pool",
+    ["role", "database"],
+)
+_connections = prometheus.Gauge(
+    PROMETHEUS_DB_POOL_CONNECTIONS,
+    "Number of database connections in the pool in a given state",
+    ["role", "database", "state"],
+)
+
+
+def set_role(role):
+    """
+    Set the role of this process, which determines the engine profile used.
+
+    This must be called before the engine is created to have an effect.
+    """
+    global _role
+    if role not in _ROLE_TO_ENGINE_PROFILE:
+        raise ValueError("Unknown role '{}'".format(role))
+    if engine is not None and role != _role:
+        logger.warning(
+            "Setting the role to %s after the engine has been created with role %s",
+            role,
+            _role,
+        )
+    _role = role
+
+
+def get_engine_profile(role=None) -> EngineProfile:
+    """
+    Get the engine profile of a role with any overrides in the config applied.
+    """
+    profile = _ROLE_TO_ENGINE_PROFILE[role or _role]
+    return EngineProfile(
+        pool_size=_get_setting(config.DB_POOL_SIZE, profile.pool_size, int),
+        max_overflow=_get_setting(config.DB_MAX_OVERFLOW, profile.max_overflow, int),
+        pool_timeout=_get_setting(config.DB_POOL_TIMEOUT, profile.pool_timeout, float),
+    )
+
+
+def _get_setting(value, default, type_):
+    if value is None or value == "":
+        return default
+    return type_(value)
+
+
+class _InstrumentedQueuePool(pool.QueuePool):
+    """
+    Queue pool that exports metrics on its connections and on how long each checkout
+    takes, including waiting for a free connection or opening a new one.
+    """
+
+    role = DEFAULT
+    database = PRIMARY
+
+    def instrument(self, role, database):
+        self.role = role
+        self.database = database
+        labels = {"role": role, "database": database}
+        _connections.labels(state="checked_out", **labels).set_function(self.checkedout)
+        _connections.labels(state="idle", **labels).set_function(self.checkedin)
+        _connections.labels(state="overflow", **labels).set_function(
+            lambda: max(self.overflow(), 0)
+        )
+
+    def recreate(self):
+        new_pool = super().recreate()
+        new_pool.instrument(self.role, self.database)
+        return new_pool
+
+    def _do_get(self):
+        start_time = time.monotonic()
+        try:
+            return super()._do_get()
+        finally:
+            _checkout_wait.labels(role=self.role, database=self.database).observe(
+                time.monotonic() - start_time
+            )
+
+
+def create_engine(role=None, database=PRIMARY):
     """
     Create a SQL Alchemy engine using config.DatabaseConfig.
 
+    :param role: the role whose engine profile is used. Defaults to the role of this
+        process.
+    :param database: either PRIMARY or REPLICA, the database to connect to
     :return: the engine
     """
+    role = role or _role
+    profile = get_engine_profile(role)
+    if database == REPLICA:
+        host = config.DB_REPLICA_HOST
+        port = config.DB_REPLICA_PORT or config.DB_PORT
+    else:
+        host = config.DB_HOST
+        port = config.DB_PORT
     connection_url = URL.create(
         drivername=config.DB_DRIVER,
         username=config.DB_USERNAME,
         password=config.DB_PASSWORD,
-        host=config.DB_HOST,
-        port=config.DB_PORT,
+        host=host,
+        port=port,
         database=config.DB_DATABASE,
     )
-    return sqlalchemy.create_engine(
+    statement_timeout = int(config.DB_STATEMENT_TIMEOUT)
+    connect_args = {}
+    if database == REPLICA:
+        connect_args["connect_timeout"] = REPLICA_CONNECT_TIMEOUT
+    if statement_timeout > 0 and not config.DB_TRANSACTION_POOLING:
+        # Poolers like PgBouncer reject startup parameters, so in transaction pooling
+        # mode the timeout is instead set at the start of each transaction.
+        connect_args["options"] = "-c statement_timeout={}".format(statement_timeout)
+    new_engine = sqlalchemy.create_engine(
         connection_url,
         executemany_mode="values",
         executemany_values_page_size=1000,
         executemany_batch_page_size=200,
+        connect_args=connect_args,
+        poolclass=_InstrumentedQueuePool,
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+        pool_recycle=int(config.DB_POOL_RECYCLE),
+        pool_pre_ping=config.DB_POOL_PRE_PING,
     )
+    new_engine.pool.instrument(role, database)
+    if statement_timeout > 0 and config.DB_TRANSACTION_POOLING:
+        event.listen(
+            new_engine, "begin", _build_set_local_statement_timeout(statement_timeout)
+        )
+    return new_engine
+
+
+def _build_set_local_statement_timeout(statement_timeout):
+    def set_local_statement_timeout(connection):
+        connection.exec_driver_sql(
+            "SET LOCAL statement_timeout = {}".format(statement_timeout)
+        )
+
+    return set_local_statement_timeout
 
 
 engine = None
+replica_engine = None
 session_factory = None
 Session = None
 
@@ -48,14 +218,92 @@ def ensure_db_connection():
     """
     Ensure that the SQL Alchemy engine and session factory have been initialized.
     """
-    global engine, session_factory, Session
+    global engine, replica_engine, session_factory, Session
     if engine is not None:
         return
+    if config.DB_REPLICA_HOST:
+        replica_engine = create_engine(database=REPLICA)
     engine = create_engine()
     session_factory = sessionmaker(bind=engine, future=True)
     Session = scoped_session(session_factory)
 
 
+class _ReplicaStatus:
+    """
+    Tracks whether the read replica is reachable and sufficiently up to date.
+
+    The replication lag is checked at most once every REPLICA_CHECK_INTERVAL seconds.
+    The check runs in the thread of the first caller after the interval; other callers
+    use the last known status rather than waiting for the check to finish. Until the
+    first check completes, the replica is not used.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = None
+        self._checking = False
+        self._usable = False
+
+    def is_usable(self, replica_engine_) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self._checking or (
+                self._checked_at is not None
+                and now - self._checked_at < REPLICA_CHECK_INTERVAL
+            ):
+                return self._usable
+            self._checking = True
+        try:
+            usable = self._check(replica_engine_)
+        finally:
+            with self._lock:
+                self._checking = False
+                self._checked_at = time.monotonic()
+        with self._lock:
+            if usable != self._usable:
+                logger.warning(
+                    "Read only units of work are now routed to the %s",
+                    REPLICA if usable else PRIMARY,
+                )
+            self._usable = usable
+        return usable
+
+    def reset(self):
+        with self._lock:
+            self._checked_at = None
+            self._checking = False
+            self._usable = False
+
+    @staticmethod
+    def _check(replica_engine_) -> bool:
+        try:
+            with replica_engine_.connect() as connection, connection.begin():
+                connection.exec_driver_sql(
+                    "SET LOCAL statement_timeout = {}".format(
+                        REPLICA_CHECK_STATEMENT_TIMEOUT
+                    )
+                )
+                lag = connection.exec_driver_sql(_REPLICATION_LAG_QUERY).scalar()
+        except sqlalchemy.exc.SQLAlchemyError:
+            logger.exception("Failed to check the replication lag of the read replica")
+            return False
+        return lag is not None and lag <= float(config.DB_REPLICA_MAX_STALENESS)
+
+
+# The lag is zero if the database is not a replica, or if it has replayed everything
+# it has received from the primary; in the latter case the last replayed transaction
+# may be old simply because the primary has been idle.
+_REPLICATION_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END
+"""
+
+_replica_status = _ReplicaStatus()
+
+
 class OutsideUnitOfWorkError(Exception):
     pass
 
@@ -78,15 +326,27 @@ def get_session():
 
 
 @contextmanager
-def inline_unit_of_work():
+def inline_unit_of_work(read_only=False):
     """
     Context manager that handles beginning and ending a unit of work.
+
+    :param read_only: if true and a read replica is configured, the unit of work is
+        run against the replica, unless the replica is unreachable or its replication
+        lag exceeds the configured staleness tolerance. Read only units of work must
+        not write to the database.
     """
     global Session
     ensure_db_connection()
     if Session.registry.has():
         raise NestedUnitOfWorkError
-    session = Session()
+    if (
+        read_only
+        and replica_engine is not None
+        and _replica_status.is_usable(replica_engine)
+    ):
+        session = Session(bind=replica_engine)
+    else:
+        session = Session()
     try:
         yield session
         session.commit()
@@ -97,13 +357,21 @@ def inline_unit_of_work():
         Session.remove()
 
 
-@decorator
-def unit_of_work(func, *args, **kw):
+def unit_of_work(func=None, read_only=False):
     """
     Decorator that handles beginning and ending a unit of work.
+
+    The decorator can be used directly, or as unit_of_work(read_only=True) to run the
+    unit of work as a read only unit of work; see inline_unit_of_work.
     """
-    with inline_unit_of_work():
-        return func(*args, **kw)
+    if func is None:
+        return functools.partial(unit_of_work, read_only=read_only)
+
+    def caller(func_, *args, **kw):
+        with inline_unit_of_work(read_only=read_only):
+            return func_(*args, **kw)
+
+    return decorate(func, caller)
 
 
 def delete_all_tables():
@@ -3,6 +3,7 @@ from .alert import Alert, alert_route
 from .alertactiveperiod import AlertActivePeriod
 from .alertmessage import AlertMessage
 from .base import Base
+from .departureboard import DepartureBoard
 from .directionrule import DirectionRule
 from .feed import Feed
 from .feedupdate import FeedUpdate
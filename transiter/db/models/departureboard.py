@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey
+
+from .base import Base
+
+
+class DepartureBoard(Base):
+    __tablename__ = "departure_board"
+
+    stop_pk = Column(
+        Integer, ForeignKey("stop.pk", ondelete="CASCADE"), primary_key=True
+    )
+    content = Column(String, nullable=False)
+    built_at = Column(TIMESTAMP(timezone=True), nullable=False)
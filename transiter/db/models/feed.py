@@ -34,6 +34,8 @@ class Feed(Base):
     http_timeout = Column(Float)
     auto_update_enabled = Column(Boolean, nullable=False)
     auto_update_period = Column(Integer)
+    auto_update_min_period = Column(Integer)
+    auto_update_max_period = Column(Integer)
     required_for_install = Column(Boolean, nullable=False, default=False)
 
     system = relationship("System", back_populates="feeds")
@@ -52,6 +52,13 @@ class FeedUpdate(Base):
     result = Column(Enum(Result, native_enum=False))
     result_message = Column(String)  # TODO: rename stack trace?
     content_hash = Column(String)
+    # JSON map from file name to hash for feeds made up of multiple files. This is used
+    # to skip importing entities whose source files have not changed.
+    content_file_hashes = Column(String)
+    # HTTP validators returned with the content. These are sent in the next download so
+    # that unchanged content is not transferred again.
+    content_etag = Column(String)
+    content_last_modified = Column(String)
     content_length = Column(Integer)
     content_created_at = Column(TIMESTAMP(timezone=True))
     download_duration = Column(Float)
@@ -62,6 +69,7 @@ class FeedUpdate(Base):
     num_added_entities = Column(Integer)
     num_updated_entities = Column(Integer)
     num_deleted_entities = Column(Integer)
+    num_unchanged_entities = Column(Integer)
 
     feed = relationship("Feed", back_populates="updates")
 
@@ -30,6 +30,8 @@ class ScheduledTrip(Base):
         nullable=False,
         default=BikesAllowed.UNKNOWN,
     )
+    # Hash of the trip's data and stop times, used to diff successive schedule imports
+    fingerprint = Column(String)
 
     route = relationship("Route", back_populates="scheduled_trips", cascade="none")
     service = relationship("ScheduledService", back_populates="trips", cascade="none")
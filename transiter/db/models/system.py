@@ -23,6 +23,11 @@ class System(Base):
     status = Column(Enum(SystemStatus, native_enum=False), nullable=False)
     timezone = Column(String, nullable=True)
     auto_update_enabled = Column(Boolean, nullable=False, server_default="True")
+    # Incremented whenever data the system cache is derived from changes.
+    cache_generation = Column(Integer, nullable=False, server_default="0")
+    # Incremented whenever a feed update or a transfers config changes the system's
+    # data.
+    update_generation = Column(Integer, nullable=False, server_default="0")
 
     updates = relationship(
         "SystemUpdate", back_populates="system", cascade="all, delete-orphan",
@@ -1,4 +1,5 @@
-from typing import Optional
+import datetime
+from typing import List, Optional
 
 from sqlalchemy import sql, func
 from sqlalchemy.orm import joinedload
@@ -73,6 +74,23 @@ def get_update_by_pk(feed_update_pk) -> Optional[models.FeedUpdate]:
     )
 
 
+def get_last_successful_update(feed_pk) -> Optional[models.FeedUpdate]:
+    """
+    Get the last successful FeedUpdate for a Feed.
+
+    :param feed_pk: the feed's PK
+    :return: FeedUpdate, or None if it doesn't exist
+    """
+    session = dbconnection.get_session()
+    return (
+        session.query(models.FeedUpdate)
+        .filter(models.FeedUpdate.feed_pk == feed_pk)
+        .filter(models.FeedUpdate.status == models.FeedUpdate.Status.SUCCESS)
+        .order_by(models.FeedUpdate.completed_at.desc())
+        .first()
+    )
+
+
 def get_last_successful_update_hash(feed_pk) -> Optional[str]:
     """
     Get the last successful FeedUpdate content hash for a Feed.
@@ -94,20 +112,50 @@ def get_last_successful_update_hash(feed_pk) -> Optional[str]:
     return result[0]
 
 
-def list_updates_in_feed(feed_pk):
+def get_last_updated_content_file_hashes(feed_pk) -> Optional[str]:
+    """
+    Get the content file hashes of the last FeedUpdate for a Feed that updated the DB.
+
+    :param feed_pk: the feed's PK
+    :return: the hashes, or None if the FeedUpdate doesn't exist or has no hashes
+    """
+    session = dbconnection.get_session()
+    query = (
+        session.query(models.FeedUpdate.content_file_hashes)
+        .filter(models.FeedUpdate.feed_pk == feed_pk)
+        .filter(models.FeedUpdate.status == models.FeedUpdate.Status.SUCCESS)
+        .filter(models.FeedUpdate.result == models.FeedUpdate.Result.UPDATED)
+        .order_by(models.FeedUpdate.completed_at.desc())
+        .limit(1)
+    )
+    result = query.first()
+    if result is None:
+        return None
+    return result[0]
+
+
+def list_updates_in_feed(feed_pk, before_pk=None, limit=100, chunk_size=None):
     """
     List the most recent updates in a feed, ordered descending in time.
 
     :param feed_pk: the Feed's PK
+    :param before_pk: if provided, only return updates whose PK is less than this
+    :param limit: the maximum number of updates to return, or None for no limit
+    :param chunk_size: if provided, stream the updates and return an iterator over
+        lists of at most this many updates
     :return: list of FeedUpdates
     """
     session = dbconnection.get_session()
-    query = (
-        session.query(models.FeedUpdate)
-        .filter(models.FeedUpdate.feed_pk == feed_pk)
-        .order_by(models.FeedUpdate.pk.desc())
-        .limit(100)
+    query = session.query(models.FeedUpdate).filter(
+        models.FeedUpdate.feed_pk == feed_pk
     )
+    if before_pk is not None:
+        query = query.filter(models.FeedUpdate.pk < before_pk)
+    query = query.order_by(models.FeedUpdate.pk.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    if chunk_size is not None:
+        return genericqueries.stream_in_chunks(query, chunk_size)
     return query.all()
 
 
@@ -154,6 +202,11 @@ def delete_in_system_by_id(system_id, feed_id):
     return True
 
 
+# An upper bound on the time between when a feed update is scheduled and when it
+# completes, used to restrict queries on completion time to recently scheduled updates.
+MAX_FEED_UPDATE_DURATION = datetime.timedelta(hours=1)
+
+
 def list_aggregated_updates(feed_pks, start_time):
     session = dbconnection.get_session()
     query = (
@@ -173,6 +226,10 @@ def list_aggregated_updates(feed_pks, start_time):
         .filter(
             models.FeedUpdate.feed_pk.in_(feed_pks),
             models.FeedUpdate.completed_at > start_time,
+            # Unless an update takes longer than the maximum duration, this condition
+            # does not change the result. It allows Postgres to skip partitions of
+            # the feed update table that only contain older updates.
+            models.FeedUpdate.scheduled_at > start_time - MAX_FEED_UPDATE_DURATION,
             models.FeedUpdate.status.in_(
                 {models.FeedUpdate.Status.SUCCESS, models.FeedUpdate.Status.FAILURE}
             ),
@@ -184,3 +241,159 @@ def list_aggregated_updates(feed_pks, start_time):
             feed_pk_to_updates[row[0]] = []
         feed_pk_to_updates[row[0]].append(row[1:])
     return feed_pk_to_updates
+
+
+FEED_UPDATE_PARTITION_PREFIX = "feed_update_p"
+FEED_UPDATE_DEFAULT_PARTITION = "feed_update_default"
+
+
+def is_feed_update_partitioned() -> bool:
+    """
+    Return whether the feed update table is partitioned.
+    """
+    return (
+        dbconnection.get_session()
+        .execute(
+            sql.text(
+                """
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_partitioned_table
+                    WHERE partrelid = to_regclass('feed_update')
+                )
+                """
+            )
+        )
+        .scalar()
+    )
+
+
+def list_feed_update_partition_days() -> List[datetime.date]:
+    """
+    List the days covered by partitions of the feed update table.
+
+    Each partition contains the updates scheduled on a single day in UTC.
+    """
+    names = (
+        dbconnection.get_session()
+        .execute(
+            sql.text(
+                """
+                SELECT child.relname FROM pg_inherits
+                INNER JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = to_regclass('feed_update')
+                """
+            )
+        )
+        .scalars()
+    )
+    days = []
+    for name in names:
+        if not name.startswith(FEED_UPDATE_PARTITION_PREFIX):
+            continue
+        days.append(
+            datetime.datetime.strptime(
+                name[len(FEED_UPDATE_PARTITION_PREFIX) :], "%Y%m%d"
+            ).date()
+        )
+    return sorted(days)
+
+
+def create_feed_update_partition(day: datetime.date):
+    """
+    Create the partition of the feed update table for a day.
+
+    Updates for that day in the default partition are moved to the new partition.
+    """
+    session = dbconnection.get_session()
+    name = _get_feed_update_partition_name(day)
+    lower, upper = _get_feed_update_partition_bounds(day)
+    session.execute(
+        sql.text("CREATE TABLE {} (LIKE feed_update INCLUDING DEFAULTS)".format(name))
+    )
+    session.execute(
+        sql.text(
+            """
+            WITH moved AS (
+                DELETE FROM {default}
+                WHERE scheduled_at >= :lower AND scheduled_at < :upper
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """.format(
+                default=FEED_UPDATE_DEFAULT_PARTITION, name=name
+            )
+        ),
+        {"lower": lower, "upper": upper},
+    )
+    session.execute(
+        sql.text(
+            """
+            ALTER TABLE feed_update ATTACH PARTITION {name}
+            FOR VALUES FROM ('{lower}') TO ('{upper}')
+            """.format(
+                name=name, lower=lower.isoformat(), upper=upper.isoformat()
+            )
+        )
+    )
+
+
+def drop_feed_update_partition(day: datetime.date):
+    """
+    Drop the partition of the feed update table for a day.
+
+    Updates in the partition that are the source of some entity are moved to the
+    default partition before it is dropped.
+    """
+    session = dbconnection.get_session()
+    name = _get_feed_update_partition_name(day)
+    session.execute(
+        sql.text("ALTER TABLE feed_update DETACH PARTITION {}".format(name))
+    )
+    session.execute(
+        sql.text(
+            """
+            INSERT INTO feed_update SELECT * FROM {name} AS feed_update
+            WHERE {is_source}
+            """.format(
+                name=name, is_source=_build_is_source_condition()
+            )
+        )
+    )
+    session.execute(sql.text("DROP TABLE {}".format(name)))
+
+
+def trim_default_feed_update_partition(before_datetime):
+    """
+    Delete all feed updates in the default partition of the feed update table that
+    completed before a cut-off point and are not the source of any entity.
+    """
+    dbconnection.get_session().execute(
+        sql.text(
+            """
+            DELETE FROM {default} AS feed_update
+            WHERE completed_at <= :before_datetime AND NOT ({is_source})
+            """.format(
+                default=FEED_UPDATE_DEFAULT_PARTITION,
+                is_source=_build_is_source_condition(),
+            )
+        ),
+        {"before_datetime": before_datetime},
+    )
+
+
+def _build_is_source_condition():
+    return " OR ".join(
+        "EXISTS (SELECT 1 FROM {} WHERE source_pk = feed_update.pk)".format(
+            UpdatableEntity.__tablename__
+        )
+        for UpdatableEntity in models.list_updatable_entities()
+    )
+
+
+def _get_feed_update_partition_name(day: datetime.date):
+    return FEED_UPDATE_PARTITION_PREFIX + day.strftime("%Y%m%d")
+
+
+def _get_feed_update_partition_bounds(day: datetime.date):
+    lower = datetime.datetime.combine(day, datetime.time(), datetime.timezone.utc)
+    return lower, lower + datetime.timedelta(days=1)
@@ -1,10 +1,12 @@
 """
 This module provides some abstract methods to remove code duplication in the DAMs.
 """
+import itertools
 import typing
 from typing import Dict, Iterable
 
-from sqlalchemy.orm import joinedload
+from sqlalchemy import inspect, sql
+from sqlalchemy.orm import interfaces, joinedload
 from sqlalchemy.sql import func
 
 from transiter.db import dbconnection, models
@@ -38,7 +40,15 @@ def get_by_id(DbEntity: models.Base, id_):
     return session.query(DbEntity).filter(DbEntity.id == id_).one_or_none()
 
 
-def list_in_system(DbEntity: models.Base, system_id, order_by_field=None, ids=None):
+def list_in_system(
+    DbEntity: models.Base,
+    system_id,
+    order_by_field=None,
+    ids=None,
+    after=None,
+    limit=None,
+    chunk_size=None,
+):
     """
     List all entities of a certain type that are in a given system. Note this method
     only works with entities that are direct children of the system.
@@ -47,6 +57,10 @@ def list_in_system(DbEntity: models.Base, system_id, order_by_field=None, ids=No
     :param system_id: the system's ID
     :param order_by_field: optional field to order the results by
     :param ids: ids to filter on
+    :param after: if provided, only return entities whose order by field is greater
+        than this value
+    :param limit: the maximum number of entities to return
+    :param chunk_size: if provided, the entities are streamed; see stream_in_chunks
     :return: list of entities of type DbEntity
     """
     if ids is not None and len(ids) == 0:
@@ -59,11 +73,35 @@ def list_in_system(DbEntity: models.Base, system_id, order_by_field=None, ids=No
     )
     if ids is not None:
         query = query.filter(DbEntity.id.in_(ids))
+    if after is not None:
+        query = query.filter(order_by_field > after)
     if order_by_field is not None:
         query = query.order_by(order_by_field)
+    if limit is not None:
+        query = query.limit(limit)
+    if chunk_size is not None:
+        return stream_in_chunks(query, chunk_size)
     return query.all()
 
 
+def stream_in_chunks(query, chunk_size) -> typing.Iterator[list]:
+    """
+    Execute a query using a server side cursor and return an iterator over lists of
+    at most chunk_size results.
+
+    Only chunk_size rows are fetched from the database at a time, so the results of
+    large queries do not need to fit in memory. Relationships of the results that are
+    loaded eagerly are loaded separately for each chunk. The iterator must be consumed
+    within the current unit of work.
+    """
+    results = iter(query.execution_options(stream_results=True).yield_per(chunk_size))
+    while True:
+        chunk = list(itertools.islice(results, chunk_size))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
 def get_in_system_by_id(DbEntity: models.Base, system_id, id_):
     """
     Get an entity of a certain type that is in a given system. Note this method
@@ -127,14 +165,89 @@ def get_id_to_pk_map_by_feed_pk(DbEntity: typing.Type[models.Base], feed_pk):
 # noinspection PyPep8Naming
 def delete_stale_entities(
     DbEntity: typing.Type[models.Base], feed_update: models.FeedUpdate
-):
+) -> int:
+    """
+    Delete stale entities using set-based SQL statements.
+
+    The cascades configured on the entity's relationships are replicated with bulk
+    statements, so the result is the same as deleting each entity using the ORM but
+    without loading the entities or their dependents.
+
+    :return: the number of stale entities deleted
+    """
     session = dbconnection.get_session()
-    (
-        session.query(DbEntity)
-        .filter(DbEntity.source_pk == models.FeedUpdate.pk)
-        .filter(models.FeedUpdate.feed_pk == feed_update.feed_pk)
-        .filter(models.FeedUpdate.pk != feed_update.pk)
-    ).delete(synchronize_session=False)
+    session.flush()
+    stale_pks = (
+        session.execute(
+            sql.select(DbEntity.pk)
+            .join(models.FeedUpdate, DbEntity.source_pk == models.FeedUpdate.pk)
+            .where(models.FeedUpdate.feed_pk == feed_update.feed_pk)
+            .where(models.FeedUpdate.pk != feed_update.pk)
+        )
+        .scalars()
+        .all()
+    )
+    _delete_with_dependents(DbEntity, stale_pks)
+    return len(stale_pks)
+
+
+# DbEntity is a class
+# noinspection PyPep8Naming
+def _delete_with_dependents(DbEntity: typing.Type[models.Base], pks):
+    """
+    Delete the entities with the given PKs along with their dependents.
+
+    For each relationship of the entity: related entities with a delete cascade are
+    deleted recursively, rows in many to many association tables are deleted, and
+    the foreign keys of other related entities are set to null.
+    """
+    if len(pks) == 0:
+        return
+    session = dbconnection.get_session()
+    for relationship in inspect(DbEntity).relationships:
+        if relationship.viewonly:
+            continue
+        [(__, remote_column)] = relationship.synchronize_pairs
+        RelatedEntity = relationship.mapper.class_
+        if relationship.direction is interfaces.MANYTOMANY:
+            [
+                (related_column, secondary_column)
+            ] = relationship.secondary_synchronize_pairs
+            related_pks = []
+            if relationship.cascade.delete:
+                related_pks = (
+                    session.execute(
+                        sql.select(secondary_column).where(remote_column.in_(pks))
+                    )
+                    .scalars()
+                    .all()
+                )
+            session.execute(
+                sql.delete(relationship.secondary).where(remote_column.in_(pks))
+            )
+            _delete_with_dependents(RelatedEntity, related_pks)
+        elif relationship.direction is interfaces.ONETOMANY:
+            if relationship.cascade.delete:
+                _delete_with_dependents(
+                    RelatedEntity,
+                    session.execute(
+                        sql.select(RelatedEntity.pk).where(remote_column.in_(pks))
+                    )
+                    .scalars()
+                    .all(),
+                )
+            else:
+                session.execute(
+                    sql.update(RelatedEntity)
+                    .where(remote_column.in_(pks))
+                    .values({remote_column: None})
+                    .execution_options(synchronize_session=False)
+                )
+    session.execute(
+        sql.delete(DbEntity)
+        .where(DbEntity.pk.in_(pks))
+        .execution_options(synchronize_session=False)
+    )
 
 
 # DbEntity is a class
@@ -120,6 +120,37 @@ def get_trip_id_to_pk_map_by_feed_pk(feed_pk):
     return id_to_pk
 
 
+class TripFingerprintData(typing.NamedTuple):
+    pk: int
+    fingerprint: typing.Optional[str]
+
+
+def get_trip_id_to_fingerprint_map_by_feed_pk(
+    feed_pk,
+) -> typing.Dict[str, TripFingerprintData]:
+    """
+    Get a map of trip ID to the trip's PK and fingerprint for all scheduled trips
+    whose service was most recently imported from a given feed.
+    """
+    query = (
+        dbconnection.get_session()
+        .query(
+            models.ScheduledTrip.id,
+            models.ScheduledTrip.pk,
+            models.ScheduledTrip.fingerprint,
+        )
+        .filter(
+            models.ScheduledService.pk == models.ScheduledTrip.service_pk,
+            models.ScheduledService.source_pk == models.FeedUpdate.pk,
+            models.FeedUpdate.feed_pk == feed_pk,
+        )
+    )
+    return {
+        id_: TripFingerprintData(pk=pk, fingerprint=fingerprint)
+        for (id_, pk, fingerprint) in query.all()
+    }
+
+
 def list_trips_by_system_pk_and_trip_ids(
     system_pk, trip_ids
 ) -> typing.List[models.ScheduledTrip]:
@@ -2,38 +2,99 @@ import collections
 import typing
 
 from sqlalchemy import sql
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import joinedload, selectinload, aliased
 
 from transiter.db import dbconnection, models
 from transiter.db.queries import genericqueries
 
 
-def list_all_in_geographical_bounds(
-    lower_lat, upper_lat, lower_lon, upper_lon, system_id,
-):
+class StopCoordinates(typing.NamedTuple):
+    pk: int
+    latitude: float
+    longitude: float
+    parent_stop_pk: typing.Optional[int]
+
+
+def list_stop_coordinates_in_system(system_pk) -> typing.List[StopCoordinates]:
+    """
+    List the coordinates of the stops in a system. Stops without coordinates are
+    not returned.
+    """
     query = (
+        dbconnection.get_session()
+        .query(
+            models.Stop.pk,
+            models.Stop.latitude,
+            models.Stop.longitude,
+            models.Stop.parent_stop_pk,
+        )
+        .filter(models.Stop.system_pk == system_pk)
+        .filter(models.Stop.latitude.isnot(None))
+        .filter(models.Stop.longitude.isnot(None))
+    )
+    return [
+        StopCoordinates(pk, float(latitude), float(longitude), parent_stop_pk)
+        for pk, latitude, longitude, parent_stop_pk in query.all()
+    ]
+
+
+def list_by_pks(stop_pks) -> typing.List[models.Stop]:
+    stop_pks = list(stop_pks)
+    if len(stop_pks) == 0:
+        return []
+    return (
         dbconnection.get_session()
         .query(models.Stop)
-        .filter(models.Stop.parent_stop_pk.is_(None))
-        .filter(models.Stop.latitude >= lower_lat)
-        .filter(models.Stop.latitude <= upper_lat)
-        .filter(models.Stop.longitude >= lower_lon)
-        .filter(models.Stop.longitude <= upper_lon)
+        .filter(models.Stop.pk.in_(stop_pks))
+        .options(joinedload(models.Stop.system))
+        .all()
     )
-    if system_id is not None:
-        query = query.join(models.System).filter(models.System.id == system_id)
-    return query.all()
 
 
-def list_all_in_system(system_id, stop_ids=None):
+def list_all_in_system(
+    system_id, stop_ids=None, after_id=None, limit=None, chunk_size=None
+):
+    """
+    List the stops in a system, ordered by ID.
+
+    :param system_id: the system's ID
+    :param stop_ids: optional IDs of the stops to return
+    :param after_id: if provided, only return stops whose ID is after this ID
+    :param limit: the maximum number of stops to return
+    :param chunk_size: if provided, stream the stops and return an iterator over
+        lists of at most this many stops
+    """
     return genericqueries.list_in_system(
-        models.Stop, system_id, order_by_field=models.Stop.id, ids=stop_ids
+        models.Stop,
+        system_id,
+        order_by_field=models.Stop.id,
+        ids=stop_ids,
+        after=after_id,
+        limit=limit,
+        chunk_size=chunk_size,
     )
 
 
 def list_all_transfers_in_system(
-    system_id, from_stop_ids=None, to_stop_ids=None
+    system_id,
+    from_stop_ids=None,
+    to_stop_ids=None,
+    after_pk=None,
+    limit=None,
+    chunk_size=None,
 ) -> typing.List[models.Transfer]:
+    """
+    List the transfers in a system, ordered by PK.
+
+    :param system_id: the system's ID
+    :param from_stop_ids: optional IDs of the stops the transfers start at
+    :param to_stop_ids: optional IDs of the stops the transfers end at
+    :param after_pk: if provided, only return transfers whose PK is greater than this
+    :param limit: the maximum number of transfers to return
+    :param chunk_size: if provided, stream the transfers and return an iterator over
+        lists of at most this many transfers
+    """
     query = (
         dbconnection.get_session()
         .query(models.Transfer)
@@ -51,6 +112,13 @@ def list_all_transfers_in_system(
         query = query.join(models.Stop, models.Transfer.to_stop).filter(
             models.Stop.id.in_(to_stop_ids)
         )
+    if after_pk is not None:
+        query = query.filter(models.Transfer.pk > after_pk)
+    query = query.order_by(models.Transfer.pk)
+    if limit is not None:
+        query = query.limit(limit)
+    if chunk_size is not None:
+        return genericqueries.stream_in_chunks(query, chunk_size)
     return list(query.all())
 
 
@@ -200,6 +268,42 @@ def list_stop_time_updates_at_stops(stop_pks, earliest_time=None, latest_time=No
     return query.all()
 
 
+def get_stop_pk_to_departure_board_content_map(stop_pks) -> typing.Dict[int, str]:
+    """
+    Get the map of stop PK to the content of the stop's departure board, for the stops
+    whose departure board has been built.
+    """
+    session = dbconnection.get_session()
+    query = session.query(
+        models.DepartureBoard.stop_pk, models.DepartureBoard.content
+    ).filter(models.DepartureBoard.stop_pk.in_(stop_pks))
+    return {stop_pk: content for stop_pk, content in query}
+
+
+def save_departure_boards(stop_pk_to_content: typing.Dict[int, str], built_at):
+    """
+    Insert or replace the departure boards of the given stops.
+
+    The caller must hold the system lock; see departureboardmanager.
+    """
+    if len(stop_pk_to_content) == 0:
+        return
+    statement = postgresql.insert(models.DepartureBoard).values(
+        [
+            {"stop_pk": stop_pk, "content": content, "built_at": built_at}
+            for stop_pk, content in stop_pk_to_content.items()
+        ]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[models.DepartureBoard.stop_pk],
+        set_={
+            "content": statement.excluded.content,
+            "built_at": statement.excluded.built_at,
+        },
+    )
+    dbconnection.get_session().execute(statement)
+
+
 def get_stop_pk_to_station_pk_map_in_system(system_id):
     """
     Get the map of stop PK to station PK for every stop in a system.
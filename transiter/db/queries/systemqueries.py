@@ -1,3 +1,4 @@
+import typing
 from typing import Optional
 
 from sqlalchemy import sql
@@ -82,5 +83,45 @@ def set_auto_update_enabled(system_id, auto_update_enabled) -> bool:
     return True
 
 
+def get_update_generation(system_id) -> Optional[typing.Tuple[int, int]]:
+    """
+    Get the PK and the update generation of a system.
+
+    Returns None if the system does not exist.
+    """
+    return (
+        dbconnection.get_session()
+        .query(models.System.pk, models.System.update_generation)
+        .filter(models.System.id == system_id)
+        .one_or_none()
+    )
+
+
+def increment_update_generation(system_pk):
+    """
+    Increment the update generation of a system, after a feed update or a transfers
+    config changed the system's data.
+    """
+    dbconnection.get_session().query(models.System).filter(
+        models.System.pk == system_pk
+    ).update(
+        {models.System.update_generation: models.System.update_generation + 1},
+        synchronize_session=False,
+    )
+
+
+def lock(system_pk):
+    """
+    Lock the row of a system until the end of the current transaction.
+
+    Feed updates that change the system's data also increment its update generation,
+    which takes the same lock, so taking it earlier does not add a lock ordering
+    between concurrent feed updates.
+    """
+    dbconnection.get_session().query(models.System.pk).filter(
+        models.System.pk == system_pk
+    ).with_for_update().one_or_none()
+
+
 def list_agencies_in_system(system_id, agency_ids=None):
     return genericqueries.list_in_system(models.Agency, system_id, ids=agency_ids)
@@ -1,3 +1,4 @@
+import datetime
 from typing import Optional, NamedTuple, Dict, List
 
 import sqlalchemy
@@ -5,6 +6,7 @@ import sqlalchemy.sql.expression as sql
 from sqlalchemy.orm import selectinload, joinedload
 
 from transiter.db import dbconnection, models
+from transiter.db.queries import genericqueries
 import typing
 
 
@@ -53,27 +55,37 @@ class StopTimeData(NamedTuple):
     pk: int
     stop_sequence: int
     stop_pk: int
+    arrival_time: Optional[datetime.datetime] = None
+    arrival_delay: Optional[int] = None
+    arrival_uncertainty: Optional[int] = None
+    departure_time: Optional[datetime.datetime] = None
+    departure_delay: Optional[int] = None
+    departure_uncertainty: Optional[int] = None
+    track: Optional[str] = None
 
 
 def get_trip_pk_to_stop_time_data_list(trip_pks) -> Dict[int, List[StopTimeData]]:
+    """
+    Get a map from trip PK to the data of the trip's stop times, ordered by stop
+    sequence.
+
+    The data includes the realtime values stored for each stop time so that callers
+    can determine which stop times have changed.
+    """
     session = dbconnection.get_session()
     query = (
         session.query(
             models.TripStopTime.trip_pk,
-            models.TripStopTime.pk,
-            models.TripStopTime.stop_sequence,
-            models.TripStopTime.stop_pk,
+            *(getattr(models.TripStopTime, field) for field in StopTimeData._fields),
         )
         .filter(models.TripStopTime.trip_pk.in_(trip_pks))
         .order_by(models.TripStopTime.trip_pk, models.TripStopTime.stop_sequence)
     )
     trip_pk_to_stop_time_data_list = {}
-    for (trip_pk, stop_time_pk, stop_sequence, stop_pk) in query.all():
+    for (trip_pk, *stop_time_data) in query.all():
         if trip_pk not in trip_pk_to_stop_time_data_list:
             trip_pk_to_stop_time_data_list[trip_pk] = []
-        trip_pk_to_stop_time_data_list[trip_pk].append(
-            StopTimeData(pk=stop_time_pk, stop_sequence=stop_sequence, stop_pk=stop_pk)
-        )
+        trip_pk_to_stop_time_data_list[trip_pk].append(StopTimeData(*stop_time_data))
     return trip_pk_to_stop_time_data_list
 
 
@@ -111,11 +123,15 @@ def get_trip_pk_to_stop_time_data(
     return result
 
 
-def list_all_in_route_by_pk(route_pk):
+def list_all_in_route_by_pk(route_pk, after_id=None, limit=None, chunk_size=None):
     """
-    List all of the Trips in a route.
+    List all of the Trips in a route, ordered by ID.
 
     :param route_pk: the route's PK
+    :param after_id: if provided, only return trips whose ID is after this ID
+    :param limit: the maximum number of trips to return
+    :param chunk_size: if provided, stream the trips and return an iterator over lists
+        of at most this many trips
     :return: list of Trips
     """
     session = dbconnection.get_session()
@@ -124,6 +140,13 @@ def list_all_in_route_by_pk(route_pk):
         .filter(models.Trip.route_pk == route_pk)
         .options(selectinload(models.Trip.stop_times))
     )
+    if after_id is not None:
+        query = query.filter(models.Trip.id > after_id)
+    query = query.order_by(models.Trip.id)
+    if limit is not None:
+        query = query.limit(limit)
+    if chunk_size is not None:
+        return genericqueries.stream_in_chunks(query, chunk_size)
     return query.all()
 
 
@@ -181,6 +204,34 @@ def get_trip_pk_to_last_stop_map(trip_pks):
     return trip_pk_to_last_stop
 
 
+def list_stop_pks_in_stale_trips(feed_update: models.FeedUpdate) -> typing.Set[int]:
+    """
+    List the PKs of stops that have stop times in trips that will be deleted as stale
+    at the end of the feed update.
+    """
+    session = dbconnection.get_session()
+    query = (
+        session.query(models.TripStopTime.stop_pk)
+        .join(models.Trip, models.TripStopTime.trip_pk == models.Trip.pk)
+        .join(models.FeedUpdate, models.Trip.source_pk == models.FeedUpdate.pk)
+        .filter(models.FeedUpdate.feed_pk == feed_update.feed_pk)
+        .filter(models.FeedUpdate.pk != feed_update.pk)
+        .distinct()
+    )
+    return {stop_pk for (stop_pk,) in query}
+
+
+def get_trip_pk_to_vehicle_id_map(trip_pks) -> typing.Dict[int, Optional[str]]:
+    """
+    Get the map of trip PK to the ID of the trip's vehicle, for trips with a vehicle.
+    """
+    session = dbconnection.get_session()
+    query = session.query(models.Vehicle.trip_pk, models.Vehicle.id).filter(
+        models.Vehicle.trip_pk.in_(trip_pks)
+    )
+    return {trip_pk: vehicle_id for trip_pk, vehicle_id in query}
+
+
 def get_trip_pk_to_path_map(route_pk):
     """
     Get a map of trip PK to the path of the trip for every trip in a route.
@@ -0,0 +1,69 @@
+"""
+The system cache holds values derived from the data in a transit system, like the ID
+cache's entity ID to PK maps and the spatial index of the stops, in the process that
+uses them.
+
+Each system row has a cache generation counter. Whenever an import changes data that a
+cached value is derived from the counter is incremented, and values cached under an
+earlier generation, in this process or in any other, are rebuilt on their next use.
+Within the transaction that incremented the counter the cache is bypassed entirely, so
+that values built from uncommitted data are never cached.
+"""
+import typing
+
+from transiter.db import dbconnection, models
+
+_SESSION_INFO_KEY = "system_cache_invalidated_system_pks"
+
+_system_pk_and_key_to_entry: typing.Dict[
+    typing.Tuple[int, typing.Hashable], typing.Tuple[int, typing.Any]
+] = {}
+
+
+def get(
+    system: models.System, key: typing.Hashable, build: typing.Callable[[], typing.Any]
+):
+    """
+    Get the cached value for a key in a system, building it if it is not cached or was
+    built under an earlier generation.
+
+    :param system: the system
+    :param key: identifies the value within the system
+    :param build: function that builds the value from the database
+    """
+    if _is_invalidated_in_session(system.pk):
+        return build()
+    cache_key = (system.pk, key)
+    entry = _system_pk_and_key_to_entry.get(cache_key)
+    if entry is None or entry[0] != system.cache_generation:
+        entry = (system.cache_generation, build())
+        _system_pk_and_key_to_entry[cache_key] = entry
+    return entry[1]
+
+
+def invalidate(system: models.System):
+    """
+    Invalidate every cached value for a system after data they are derived from has
+    changed.
+    """
+    session = dbconnection.get_session()
+    invalidated_system_pks = session.info.setdefault(_SESSION_INFO_KEY, set())
+    if system.pk in invalidated_system_pks:
+        return
+    invalidated_system_pks.add(system.pk)
+    session.query(models.System).filter(models.System.pk == system.pk).update(
+        {models.System.cache_generation: models.System.cache_generation + 1},
+        synchronize_session=False,
+    )
+    session.expire(system, ["cache_generation"])
+
+
+def clear():
+    """
+    Remove every value from the cache.
+    """
+    _system_pk_and_key_to_entry.clear()
+
+
+def _is_invalidated_in_session(system_pk):
+    return system_pk in dbconnection.get_session().info.get(_SESSION_INFO_KEY, ())
@@ -3,10 +3,34 @@ import os
 
 from celery import Celery, signals
 
+from transiter import config
+from transiter.db import dbconnection
+from transiter.executor import localexecutor
+
 host = os.environ.get("TRANSITER_RABBITMQ_HOST", "127.0.0.1")
 
 app = Celery("transiter", broker="amqp://{}".format(host))
 
+CELERY = "CELERY"
+LOCAL = "LOCAL"
+
+
+def submit(task, *args, expires=None, on_expired=None):
+    """
+    Submit a task for asynchronous execution using the configured executor.
+
+    :param task: the Celery task
+    :param args: the arguments to pass to the task
+    :param expires: if provided, the number of seconds after which the task is
+        discarded if it has not started running
+    :param on_expired: if provided, a function that is called if the task is
+        discarded. This is only supported by the local executor; Celery discards
+        expired tasks silently.
+    """
+    if config.EXECUTOR == LOCAL:
+        return localexecutor.submit(task, *args, expires=expires, on_expired=on_expired)
+    return task.apply_async(args=args, expires=expires)
+
 
 @signals.after_setup_logger.connect
 def on_after_setup_logger(**kwargs):
@@ -18,8 +42,15 @@ def on_after_setup_logger(**kwargs):
 
 
 def run(log_level="warning"):
+    dbconnection.set_role(dbconnection.EXECUTOR)
     app.autodiscover_tasks(
         packages=["transiter.services.systemservice", "transiter.scheduler.server"],
         related_name=None,
     )
-    app.start(argv=["celeryapp", "worker", "-l", log_level])
+    argv = ["celeryapp", "worker", "-l", log_level]
+    # Tasks in the default prefork pool run in daemonic processes, which cannot start
+    # the parse pool. In the threads pool tasks run in the main worker process, and
+    # the parse pool provides the parallelism for CPU bound work.
+    if int(config.PARSE_POOL_NUM_WORKERS) > 0:
+        argv.extend(["--pool", "threads"])
+    app.start(argv=argv)
@@ -0,0 +1,78 @@
+"""
+The local executor runs tasks in a pool of worker processes on the current machine,
+rather than sending them through RabbitMQ to Celery workers. It is intended for single
+node deployments, in which it removes the need to run RabbitMQ and the executor service.
+
+Tasks are the same Celery task objects that are used with the Celery executor. In the
+worker process the task object is called directly, which runs it synchronously.
+
+Like Celery tasks, tasks may be given an expiry. A task that has not started running by
+its deadline, for example because the pool is behind, is skipped rather than run late.
+"""
+import concurrent.futures
+import functools
+import logging
+import time
+
+from transiter import config
+from transiter.db import dbconnection
+from transiter.executor import processpool
+
+logger = logging.getLogger(__name__)
+
+
+def num_workers() -> int:
+    return int(config.LOCAL_EXECUTOR_NUM_WORKERS)
+
+
+_pool = processpool.ProcessPool(
+    "Local executor",
+    num_workers,
+    initializer=functools.partial(dbconnection.set_role, dbconnection.EXECUTOR),
+)
+
+
+class Expired:
+    """
+    The result of a task that expired before it started running.
+    """
+
+
+def submit(task, *args, expires=None, on_expired=None) -> concurrent.futures.Future:
+    """
+    Submit a task to be run in a worker process.
+
+    :param task: the task
+    :param args: the arguments to pass to the task
+    :param expires: if provided, the number of seconds after which the task is skipped
+        if it has not started running. The result of a skipped task is an instance of
+        Expired.
+    :param on_expired: if provided, a function that is called without arguments in
+        the current process if the task is skipped
+    """
+    deadline = time.time() + expires if expires is not None else None
+    future = _pool.submit(_run_task, task, args, deadline)
+    if on_expired is not None:
+        future.add_done_callback(functools.partial(_check_expired, on_expired))
+    return future
+
+
+def shutdown(wait=True):
+    """
+    Shutdown the pool of worker processes, if it has been started.
+    """
+    _pool.shutdown(wait=wait)
+
+
+def _run_task(task, args, deadline=None):
+    if deadline is not None and time.time() >= deadline:
+        logger.info("Skipping task %s; it expired before it started running", task)
+        return Expired()
+    return task(*args)
+
+
+def _check_expired(on_expired, future: concurrent.futures.Future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    if isinstance(future.result(), Expired):
+        on_expired()
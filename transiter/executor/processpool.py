@@ -0,0 +1,100 @@
+"""
+A pool of worker processes on the current machine.
+
+The worker processes are started with the spawn method, so they do not inherit database
+connections or threads from the process submitting work. Each worker is a fresh Python
+process that reads the Transiter config from the environment and connects to the
+database itself if needed.
+
+Daemonic processes cannot have child processes, so a pool cannot be started in one.
+In particular, a pool cannot be started in a task running in a Celery prefork worker.
+"""
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+import typing
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+
+class DaemonicProcessError(RuntimeError):
+    """
+    Exception raised when a pool is used in a daemonic process.
+    """
+
+
+class ProcessPool:
+    """
+    A lazily started process pool that replaces itself if it breaks.
+    """
+
+    def __init__(
+        self, name, num_workers: typing.Callable[[], int], initializer=None,
+    ):
+        self._name = name
+        self._num_workers = num_workers
+        self._initializer = initializer
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args) -> concurrent.futures.Future:
+        """
+        Submit a function to be run in a worker process.
+
+        The function and its arguments must be picklable.
+
+        :raises DaemonicProcessError: if the current process is daemonic
+        """
+        try:
+            future = self._get_pool().submit(func, *args)
+        except BrokenProcessPool:
+            # A worker process died unexpectedly, for example by being killed by the
+            # OS. The pool cannot be used after this so a new one is created.
+            logger.warning("%s pool is broken; starting a new pool", self._name)
+            self.shutdown(wait=False)
+            future = self._get_pool().submit(func, *args)
+        future.add_done_callback(self._log_exception)
+        return future
+
+    def check_can_start(self):
+        """
+        Raise DaemonicProcessError if the pool cannot be started in the current
+        process.
+        """
+        if multiprocessing.current_process().daemon:
+            raise DaemonicProcessError(
+                "The {} pool cannot be started in the daemonic process {}. If this "
+                "is a Celery worker, run it with the threads or solo pool.".format(
+                    self._name, multiprocessing.current_process().name
+                )
+            )
+
+    def shutdown(self, wait=True):
+        """
+        Shutdown the pool, if it has been started.
+        """
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    def _get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self.check_can_start()
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self._num_workers(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self._initializer,
+                )
+            return self._pool
+
+    def _log_exception(self, future: concurrent.futures.Future):
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception is not None:
+            logger.error("Work failed in the %s pool", self._name, exc_info=exception)
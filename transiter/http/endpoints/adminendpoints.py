@@ -4,10 +4,13 @@ Admin
 These endpoints are used for administering the Transiter instance.
 """
 import logging
-from flask import Blueprint
 
+import prometheus_client as prometheus
+from flask import Blueprint, Response
+
+from transiter import config
 from transiter.db import dbconnection
-from transiter.executor.celeryapp import app as celery_app
+from transiter.executor import celeryapp, localexecutor
 from transiter.http.httpmanager import http_endpoint, HttpMethod
 from transiter.http.permissions import requires_permissions, PermissionsLevel
 from transiter.scheduler import client
@@ -33,7 +36,12 @@ def health():
     else:
         scheduler_up = True
         scheduler_num_tasks = len(scheduler_response)
-    num_celery_workers = len(celery_app.control.ping(timeout=0.25))
+    if config.EXECUTOR == celeryapp.LOCAL:
+        # The local executor runs tasks in worker processes of the scheduler, so it
+        # is up if the scheduler is up.
+        num_celery_workers = localexecutor.num_workers() if scheduler_up else 0
+    else:
+        num_celery_workers = len(celeryapp.app.control.ping(timeout=0.25))
     celery_up = num_celery_workers > 0
     return {
         "up": celery_up and scheduler_up,
@@ -44,6 +52,20 @@ def health():
     }
 
 
+@http_endpoint(admin_endpoints, "metrics", returns_json_response=False)
+@requires_permissions(PermissionsLevel.ADMIN_READ)
+def webservice_metrics():
+    """
+    Webservice metrics
+
+    Provides metrics on the webservice process that handles the request, in Prometheus
+    format. These include the state of the process' database connection pool.
+    """
+    return Response(
+        prometheus.generate_latest(), content_type=prometheus.CONTENT_TYPE_LATEST
+    )
+
+
 @http_endpoint(admin_endpoints, "scheduler")
 @requires_permissions(PermissionsLevel.ADMIN_READ)
 def scheduler_ping():
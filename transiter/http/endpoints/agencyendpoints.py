@@ -15,7 +15,7 @@ from transiter.services import agencyservice, views
 agency_endpoints = flask.Blueprint(__name__, __name__)
 
 
-@http_endpoint(agency_endpoints, "")
+@http_endpoint(agency_endpoints, "", cacheable=True)
 @link_target(views.AgenciesInSystem, ["_system_id"])
 def list_all_in_system(system_id):
     """
@@ -27,7 +27,7 @@ def list_all_in_system(system_id):
     )
 
 
-@http_endpoint(agency_endpoints, "/<agency_id>")
+@http_endpoint(agency_endpoints, "/<agency_id>", cacheable=True)
 @link_target(views.Agency, ["_system_id", "id"])
 def get_in_system_by_id(system_id, agency_id):
     """
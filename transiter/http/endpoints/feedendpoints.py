@@ -13,6 +13,8 @@ from transiter.http.httpmanager import (
     HttpMethod,
     HttpStatus,
     is_sync_request,
+    is_ndjson_request,
+    get_pagination_url_parameters,
 )
 from transiter import exceptions
 from transiter.http.permissions import requires_permissions, PermissionsLevel
@@ -127,11 +129,17 @@ def list_updates_in_feed(system_id, feed_id):
     List updates for a feed
 
     List the most recent updates for a feed.
-    Up to one hundred updates will be listed.
+    Unless a different limit is given, up to one hundred updates will be listed.
+    The list can be paginated or streamed;
+    see [pagination and streaming](index.md#pagination-and-streaming).
 
     Return code         | Description
     --------------------|-------------
     `200 OK`            | Returned if the system and feed exist.
     `404 NOT FOUND`     | Returned if either the system or the feed does not exist.
     """
-    return feedservice.list_updates_in_feed(system_id, feed_id)
+    if is_ndjson_request():
+        return feedservice.stream_updates_in_feed(system_id, feed_id)
+    return feedservice.list_updates_in_feed(
+        system_id, feed_id, **get_pagination_url_parameters()
+    )
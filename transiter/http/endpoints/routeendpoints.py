@@ -15,7 +15,7 @@ from transiter.services import routeservice, views
 route_endpoints = flask.Blueprint(__name__, __name__)
 
 
-@http_endpoint(route_endpoints, "")
+@http_endpoint(route_endpoints, "", cacheable=True)
 @link_target(views.RoutesInSystem, ["_system_id"])
 def list_all_in_system(system_id):
     """
@@ -34,7 +34,7 @@ def list_all_in_system(system_id):
     )
 
 
-@http_endpoint(route_endpoints, "/<route_id>")
+@http_endpoint(route_endpoints, "/<route_id>", cacheable=True)
 @link_target(views.Route, ["_system_id", "id"])
 def get_in_system_by_id(system_id, route_id):
     """
@@ -14,28 +14,35 @@ from transiter.http.httpmanager import (
     get_enum_url_parameter,
     HttpMethod,
     get_float_url_parameter,
+    get_int_url_parameter,
+    get_pagination_url_parameters,
+    is_ndjson_request,
 )
 from transiter.services import stopservice, views
 
 stop_endpoints = flask.Blueprint(__name__, __name__)
 
 
-@http_endpoint(stop_endpoints, "/systems/<system_id>/stops")
+@http_endpoint(stop_endpoints, "/systems/<system_id>/stops", cacheable=True)
 @link_target(views.StopsInSystem, ["_system_id"])
 def list_all_in_system(system_id):
     """
     List stops in a system
 
     List all the stops in a transit system.
+    The list can be paginated or streamed;
+    see [pagination and streaming](index.md#pagination-and-streaming).
 
     Return code     | Description
     ----------------|-------------
     `200 OK`        | Returned if the system with this ID exists.
     `404 NOT FOUND` | Returned if no system with the provided ID is installed.
     """
+    alerts_detail = get_enum_url_parameter("alerts_detail", views.AlertsDetail)
+    if is_ndjson_request():
+        return stopservice.stream_all_in_system(system_id, alerts_detail=alerts_detail)
     return stopservice.list_all_in_system(
-        system_id,
-        alerts_detail=get_enum_url_parameter("alerts_detail", views.AlertsDetail),
+        system_id, alerts_detail=alerts_detail, **get_pagination_url_parameters()
     )
 
 
@@ -47,12 +54,14 @@ def geographical_search():
     Search for stops in all systems based on their proximity to a geographic root location.
     This endpoint can be used, for example, to list stops near a user given the user's location.
 
-    It takes three URL parameters:
+    It takes four URL parameters:
 
     - `latitude` - the latitude of the root location (required).
     - `longitude` - the longitude of the root location (required).
     - `distance` - the maximum distance, in meters, away from the root location that stops can be.
                 This is optional and defaults to 1000 meters (i.e., 1 kilometer). 1 mile is about 1609 meters.
+    - `limit` - the maximum number of stops to return, in which case the closest stops
+                are returned. This is optional.
 
     The result of this endpoint is a list of stops ordered by distance, starting with the stop
     closest to the root location.
@@ -68,12 +77,14 @@ def geographical_search_in_system(system_id):
     Search for stops in a system based on their proximity to a geographic root location.
     This endpoint can be used, for example, to list stops near a user given the user's location.
 
-    It takes three URL parameters:
+    It takes four URL parameters:
 
     - `latitude` - the latitude of the root location (required).
     - `longitude` - the longitude of the root location (required).
     - `distance` - the maximum distance, in meters, away from the root location that stops can be.
                 This is optional and defaults to 1000 meters (i.e., 1 kilometer). 1 mile is about 1609 meters.
+    - `limit` - the maximum number of stops to return, in which case the closest stops
+                are returned. This is optional.
 
     The result of this endpoint is a list of stops ordered by distance, starting with the stop
     closest to the root location.
@@ -88,10 +99,11 @@ def _geographical_search_helper(system_id):
         longitude=get_float_url_parameter("longitude", required=True),
         distance=get_float_url_parameter("distance", default=1000),
         return_service_maps=True,
+        limit=get_int_url_parameter("limit"),
     )
 
 
-@http_endpoint(stop_endpoints, "/systems/<system_id>/stops/<stop_id>")
+@http_endpoint(stop_endpoints, "/systems/<system_id>/stops/<stop_id>", cacheable=True)
 @link_target(views.Stop, ["_system_id", "id"])
 def get_in_system_by_id(system_id, stop_id):
     """
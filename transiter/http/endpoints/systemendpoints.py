@@ -47,13 +47,15 @@ def get_by_id(system_id):
     return systemservice.get_by_id(system_id)
 
 
-@http_endpoint(system_endpoints, "/<system_id>/transfers")
+@http_endpoint(system_endpoints, "/<system_id>/transfers", cacheable=True)
 @link_target(views.TransfersInSystem, ["_system_id"])
 def list_all_transfers_in_system(system_id):
     """
     List all transfers in a system
 
     List all transfers in a system.
+    The list can be paginated or streamed;
+    see [pagination and streaming](index.md#pagination-and-streaming).
 
     Return code | Description
     ------------|-------------
@@ -62,8 +64,15 @@ def list_all_transfers_in_system(system_id):
     """
     from_stop_ids = httpmanager.get_list_url_parameter("from_stop_id")
     to_stop_ids = httpmanager.get_list_url_parameter("to_stop_id")
+    if httpmanager.is_ndjson_request():
+        return stopservice.stream_all_transfers_in_system(
+            system_id, from_stop_ids=from_stop_ids, to_stop_ids=to_stop_ids
+        )
     return stopservice.list_all_transfers_in_system(
-        system_id, from_stop_ids=from_stop_ids, to_stop_ids=to_stop_ids
+        system_id,
+        from_stop_ids=from_stop_ids,
+        to_stop_ids=to_stop_ids,
+        **httpmanager.get_pagination_url_parameters(),
     )
 
 
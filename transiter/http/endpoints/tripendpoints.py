@@ -10,32 +10,42 @@ from transiter.http.httpmanager import (
     link_target,
     http_endpoint,
     get_enum_url_parameter,
+    get_pagination_url_parameters,
+    is_ndjson_request,
 )
 from transiter.services import tripservice, views
 
 trip_endpoints = flask.Blueprint(__name__, __name__)
 
 
-@http_endpoint(trip_endpoints, "")
+@http_endpoint(trip_endpoints, "", cacheable=True)
 def list_all_in_route(system_id, route_id):
     """
     List trips in a route
 
     List all the realtime trips in a particular route.
+    The list can be paginated or streamed;
+    see [pagination and streaming](index.md#pagination-and-streaming).
 
     Return code     | Description
     ----------------|-------------
     `200 OK`        | Returned if the system and route exist.
     `404 NOT FOUND` | Returned if either the system or the route does not exist.
     """
+    alerts_detail = get_enum_url_parameter("alerts_detail", views.AlertsDetail)
+    if is_ndjson_request():
+        return tripservice.stream_all_in_route(
+            system_id, route_id, alerts_detail=alerts_detail
+        )
     return tripservice.list_all_in_route(
         system_id,
         route_id,
-        alerts_detail=get_enum_url_parameter("alerts_detail", views.AlertsDetail),
+        alerts_detail=alerts_detail,
+        **get_pagination_url_parameters(),
     )
 
 
-@http_endpoint(trip_endpoints, "/<trip_id>")
+@http_endpoint(trip_endpoints, "/<trip_id>", cacheable=True)
 @link_target(views.Trip, ["_system_id", "_route_id", "id"])
 def get_in_route_by_id(system_id, route_id, trip_id):
     """
@@ -9,6 +9,7 @@ import pytz
 import werkzeug.exceptions as werkzeug_exceptions
 
 from transiter import config, exceptions, __metadata__
+from transiter.db import dbconnection
 from transiter.http import endpoints, httpviews
 from transiter.http.httpmanager import (
     http_endpoint,
@@ -18,6 +19,8 @@ from transiter.http.httpmanager import (
 from transiter.services import systemservice
 from transiter.scheduler import client
 
+dbconnection.set_role(dbconnection.WEBSERVICE)
+
 app = flask.Flask("transiter", static_folder=None)
 
 app.register_blueprint(endpoints.docs_endpoints, url_prefix="/docs")
@@ -5,7 +5,7 @@ those functions to HTTP responses. Its methods are designed to be invoked
 solely through decorators, thus completely separating business logic from
 HTTP logic.
 
-Specifically, the HTTP Manager currently does three things:
+Specifically, the HTTP Manager currently does four things:
 1. Uses the Flask library to correctly set up the HTTP request to Python
    function mappings.
 2. Implements all of the logic for mapping Transiter service layer responses
@@ -15,20 +15,30 @@ Specifically, the HTTP Manager currently does three things:
 3. Converts service layer Links to HTTP URLs. This is done with the assistance
    of the link_target decorator, which is used to identify which endpoints
    correspond to which Links.
+4. Gives ETags to the responses of cacheable endpoints and, if enabled, serves
+   them from the response cache.
 """
 import dataclasses
 import decimal
 import enum
+import hashlib
 import inspect
+import itertools
 import json
 import logging
+import typing
 from datetime import date, datetime
 
 import flask
+import werkzeug.datastructures
+import werkzeug.http
+import werkzeug.routing
+import werkzeug.urls
 from decorator import decorator
 
-from transiter import exceptions
-from transiter.services import views
+from transiter import config, exceptions
+from transiter.http import responsecache
+from transiter.services import pagination, systemservice, views
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +48,7 @@ class HttpStatus(enum.IntEnum):
     CREATED = 201
     ACCEPTED = 202
     NO_CONTENT = 204
+    NOT_MODIFIED = 304
     BAD_REQUEST = 400
     FORBIDDEN = 403
     NOT_FOUND = 404
@@ -73,6 +84,7 @@ def http_endpoint(
     flask_rule,
     method: HttpMethod = HttpMethod.GET,
     returns_json_response: bool = True,
+    cacheable: bool = False,
 ):
     """
     Decorator factory used to easily register a Transiter HTTP endpoint.
@@ -82,12 +94,17 @@ def http_endpoint(
     :param method: which HTTP method this endpoint uses
     :param returns_json_response: whether to format the response as JSON and apply
         appropriate HTTP headers
+    :param cacheable: whether the JSON response only depends on the request and on the
+        data in the system given by the system_id URL parameter. Responses of such
+        endpoints are given ETags and may be stored in the response cache.
     """
     decorators = [
         register_documented_endpoint(flask_rule, method.value),
         flask_entity.route(flask_rule + "/", methods=[method.value]),
         flask_entity.route(flask_rule, methods=[method.value]),
     ]
+    if cacheable:
+        decorators.append(_cached_response)
     if returns_json_response:
         decorators.append(_json_response)
 
@@ -134,6 +151,8 @@ def register_documented_endpoint(flask_rule, method):
 @decorator
 def _json_response(func, *args, **kwargs):
     response = func(*args, **kwargs)
+    if inspect.isgenerator(response):
+        return _ndjson_response(response)
     status = HttpStatus.OK
     if (
         isinstance(response, tuple)
@@ -141,13 +160,107 @@ def _json_response(func, *args, **kwargs):
         and isinstance(response[1], HttpStatus)
     ):
         response, status = response
+    headers = {}
+    if isinstance(response, pagination.Page):
+        if response.next_cursor is not None:
+            headers["Link"] = '<{}>; rel="next"'.format(
+                _build_next_page_url(response.next_cursor)
+            )
+        response = response.items
     return flask.Response(
         response=_convert_to_json_str(response),
         status=status,
+        headers=headers,
         content_type="application/json",
     )
 
 
+def _ndjson_response(items):
+    """
+    Build a streamed response in which each item is written on its own line, in the
+    newline delimited JSON format.
+    """
+    # The first item is retrieved before the response is built so that errors, like
+    # the requested entity not existing, result in a regular error response.
+    try:
+        first_items = [next(items)]
+    except StopIteration:
+        first_items = []
+    converter = _JsonCompatibleConverter()
+
+    def generate():
+        for item in itertools.chain(first_items, items):
+            line = _encode_json(converter.convert(item), compact=True)
+            yield line + (b"\n" if isinstance(line, bytes) else "\n")
+
+    return flask.Response(
+        response=flask.stream_with_context(generate()),
+        status=HttpStatus.OK,
+        content_type=NDJSON_CONTENT_TYPE,
+    )
+
+
+def _build_next_page_url(next_cursor):
+    args = werkzeug.datastructures.MultiDict(flask.request.args)
+    args["after"] = next_cursor
+    custom_host = flask.request.headers.get("X-Transiter-Host")
+    if custom_host is not None:
+        base_url = custom_host + flask.request.script_root + flask.request.path
+    else:
+        base_url = flask.request.base_url
+    return base_url + "?" + werkzeug.urls.url_encode(args)
+
+
+@decorator
+def _cached_response(func, *args, **kwargs):
+    """
+    Serve the response from the response cache, if possible, and give it an ETag.
+
+    The system's update generation is read before the response is built, so a
+    response is never cached under a generation older than the data it contains.
+    """
+    if is_ndjson_request():
+        return func(*args, **kwargs)
+    key = None
+    backend = responsecache.get_backend()
+    system_id = flask.request.view_args.get("system_id")
+    if backend is not None and system_id is not None:
+        update_generation = systemservice.get_update_generation(system_id)
+        if update_generation is not None:
+            key = responsecache.build_key(
+                system_id,
+                update_generation,
+                flask.request.path,
+                flask.request.args.items(multi=True),
+                flask.request.host_url,
+                flask.request.headers.get("X-Transiter-Host"),
+            )
+    content = backend.get(key) if key is not None else None
+    if content is not None:
+        response = flask.Response(
+            response=content, status=HttpStatus.OK, content_type="application/json",
+        )
+    else:
+        response = func(*args, **kwargs)
+        # The cache only stores response bodies, so paginated responses that link to
+        # the next page are not cached.
+        if (
+            key is not None
+            and response.status_code == HttpStatus.OK
+            and "Link" not in response.headers
+        ):
+            backend.set(key, response.get_data(), responsecache.get_max_age())
+    if response.status_code != HttpStatus.OK:
+        return response
+    etag = hashlib.sha256(response.get_data()).hexdigest()
+    if werkzeug.http.parse_etags(flask.request.headers.get("If-None-Match")).contains(
+        etag
+    ):
+        response = flask.Response(status=HttpStatus.NOT_MODIFIED)
+    response.set_etag(etag)
+    return response
+
+
 _link_type_to_target = {}
 
 
@@ -211,6 +324,48 @@ def is_sync_request():
     )
 
 
+JSON_CONTENT_TYPE = "application/json"
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def is_ndjson_request():
+    """
+    Whether the request asks for the response to be streamed as newline delimited
+    JSON, using the Accept header.
+    """
+    return (
+        flask.request.accept_mimetypes.best_match(
+            [JSON_CONTENT_TYPE, NDJSON_CONTENT_TYPE]
+        )
+        == NDJSON_CONTENT_TYPE
+    )
+
+
+def get_pagination_url_parameters():
+    """
+    Get the page size limit and the cursor of the previous page for a paginated list
+    endpoint, as keyword arguments for the service layer.
+    """
+    return {
+        "limit": get_int_url_parameter("limit"),
+        "after": flask.request.args.get("after"),
+    }
+
+
+def get_int_url_parameter(key, default=None, required=False):
+    raw_value = flask.request.args.get(key)
+    if raw_value is None:
+        if not required:
+            return default
+        raise exceptions.InvalidInput(f"The URL parameter '{key}' is required.")
+    try:
+        return int(raw_value)
+    except ValueError:
+        raise exceptions.InvalidInput(
+            f"Received non-integer value '{raw_value}' for URL parameter '{key}'."
+        )
+
+
 def get_float_url_parameter(key, default=None, required=False):
     raw_value = flask.request.args.get(key)
     if raw_value is None:
@@ -267,24 +422,172 @@ def convert_exception_to_error_response(exception):
         return flask.Response(response="", status=HttpStatus.INTERNAL_SERVER_ERROR)
 
 
+STANDARD = "STANDARD"
+ORJSON = "ORJSON"
+
+
 def _convert_to_json_str(data):
     """
     Convert a server layer response to a JSON string.
+
+    The response is first converted to JSON compatible objects, so that the encoder
+    never needs to call back into Python for individual objects. With the orjson
+    encoder the result is bytes rather than a string.
     """
-    return json.dumps(
-        data, indent=2, separators=(",", ": "), default=_transiter_json_serializer
+    return _encode_json(
+        _JsonCompatibleConverter().convert(data), compact=config.HTTP_COMPACT_JSON
     )
 
 
+def _encode_json(data, compact):
+    encoder = config.HTTP_JSON_ENCODER.upper()
+    if encoder == ORJSON:
+        import orjson
+
+        option = orjson.OPT_NON_STR_KEYS
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if encoder != STANDARD:
+        raise ValueError(
+            "Unknown JSON encoder '{}'; valid encoders are {} and {}.".format(
+                config.HTTP_JSON_ENCODER, STANDARD, ORJSON
+            )
+        )
+    if compact:
+        return json.dumps(data, separators=(",", ":"))
+    return json.dumps(data, indent=2, separators=(",", ": "))
+
+
+class _JsonCompatibleConverter:
+    """
+    Converts service layer responses to objects that can be encoded by any JSON
+    library, with the same result as encoding them with _transiter_json_serializer.
+
+    The public fields of each view type are only calculated once. The href of a view
+    is built from a template that is calculated once per view type and converter,
+    rather than calling Flask's url_for for each view. As templates depend on the
+    host of the current request, a converter should only be used for one response.
+    """
+
+    _view_type_to_field_names = {}
+
+    def __init__(self):
+        self._view_type_to_href_template = {}
+
+    def convert(self, obj):
+        if obj is None or type(obj) in _JSON_PRIMITIVE_TYPES:
+            return obj
+        if isinstance(obj, views.View):
+            return self._convert_view(obj)
+        if isinstance(obj, (list, tuple)):
+            return [self.convert(element) for element in obj]
+        if isinstance(obj, dict):
+            return {key: self.convert(value) for key, value in obj.items()}
+        # Subclasses of the primitive types, like integer enums, are encoded using
+        # the primitive type.
+        if isinstance(obj, (str, int, float)):
+            return obj
+        return _transiter_json_serializer(obj)
+
+    def _convert_view(self, view: views.View):
+        view_type = type(view)
+        field_names = self._view_type_to_field_names.get(view_type)
+        if field_names is None:
+            field_names = [
+                key for key in view_type.__dataclass_fields__.keys() if key[0] != "_"
+            ]
+            self._view_type_to_field_names[view_type] = field_names
+        result = {}
+        for field_name in field_names:
+            value = getattr(view, field_name)
+            if value is views.NULL:
+                continue
+            result[field_name] = self.convert(value)
+        if view_type in _view_to_target:
+            href = self._build_href(view)
+            if href is not None:
+                result["href"] = href
+        return result
+
+    def _build_href(self, view: views.View):
+        view_type = type(view)
+        if view_type not in self._view_type_to_href_template:
+            self._view_type_to_href_template[view_type] = _HrefTemplate.build(
+                _view_to_target[view_type]
+            )
+        template = self._view_type_to_href_template[view_type]
+        if template is None:
+            return _build_href(view)
+        return template.fill(view)
+
+
+_JSON_PRIMITIVE_TYPES = {str, int, float, bool}
+
+
+@dataclasses.dataclass
+class _HrefTemplate:
+    """
+    A template for the hrefs of a view type, built by resolving the view type's target
+    with placeholder parameters.
+    """
+
+    parts: typing.List[str]
+    view_params: typing.List[str]
+
+    _PLACEHOLDER = "TransiterHrefPlaceholder{}"
+
+    @classmethod
+    def build(cls, view_target: ViewTarget) -> typing.Optional["_HrefTemplate"]:
+        """
+        Build the template, or return None if the template cannot be built; for
+        example, if the target has parameters that are not strings.
+        """
+        view_params = list(view_target.target_param_to_view_param.values())
+        kwargs = {
+            target_param: cls._PLACEHOLDER.format(i)
+            for i, target_param in enumerate(
+                view_target.target_param_to_view_param.keys()
+            )
+        }
+        try:
+            href = _url_for(view_target, kwargs)
+        except (ValueError, werkzeug.routing.BuildError):
+            return None
+        parts = []
+        for i in range(len(view_params)):
+            placeholder = cls._PLACEHOLDER.format(i)
+            if href.count(placeholder) != 1:
+                return None
+            part, href = href.split(placeholder)
+            parts.append(part)
+        parts.append(href)
+        return cls(parts=parts, view_params=view_params)
+
+    def fill(self, view: views.View) -> str:
+        result = [self.parts[0]]
+        for view_param, part in zip(self.view_params, self.parts[1:]):
+            # This is the quoting that Werkzeug applies to string URL parameters.
+            result.append(
+                werkzeug.urls.url_quote(str(getattr(view, view_param)), safe="/:")
+            )
+            result.append(part)
+        return "".join(result)
+
+
 def _build_href(view: views.View):
     if type(view) not in _view_to_target:
         return None
     view_target = _view_to_target[type(view)]
-    custom_host = flask.request.headers.get("X-Transiter-Host")
     kwargs = {
         key: getattr(view, value)
         for key, value in view_target.target_param_to_view_param.items()
     }
+    return _url_for(view_target, kwargs)
+
+
+def _url_for(view_target: ViewTarget, kwargs):
+    custom_host = flask.request.headers.get("X-Transiter-Host")
     if custom_host is not None:
         return custom_host + flask.url_for(
             view_target.target_str, _external=False, **kwargs
@@ -0,0 +1,142 @@
+"""
+The response cache stores the JSON responses of HTTP endpoints that only depend on the
+data in a transit system.
+
+The data in a system only changes when a feed update or a transfers config commits, and
+each such change increments the system's update generation. Cache keys contain the
+generation, so responses cached before an update are never returned after it; they are
+left to expire or be evicted. Responses also expire after HTTP_CACHE_MAX_AGE seconds, as
+some responses, like the stop times at a stop, depend on the current time.
+
+Two backends are supported: LOCAL, an LRU cache in the web service process, and REDIS,
+which allows the cache to be shared between web service processes. The Redis backend
+requires the redis Python package.
+"""
+import collections
+import hashlib
+import json
+import threading
+import time
+import typing
+
+from transiter import config
+
+LOCAL = "LOCAL"
+REDIS = "REDIS"
+
+
+class Backend:
+    def get(self, key: str) -> typing.Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, content: bytes, max_age: float):
+        raise NotImplementedError
+
+
+class LocalBackend(Backend):
+    """
+    A thread safe in process cache that evicts the least recently used entries.
+    """
+
+    def __init__(self, max_entries):
+        self._max_entries = max_entries
+        self._key_to_entry = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._key_to_entry.get(key)
+            if entry is None:
+                return None
+            content, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._key_to_entry[key]
+                return None
+            self._key_to_entry.move_to_end(key)
+            return content
+
+    def set(self, key, content, max_age):
+        with self._lock:
+            self._key_to_entry[key] = (content, time.monotonic() + max_age)
+            self._key_to_entry.move_to_end(key)
+            while len(self._key_to_entry) > self._max_entries:
+                self._key_to_entry.popitem(last=False)
+
+
+class RedisBackend(Backend):
+    """
+    A cache stored in a Redis server, or any server compatible with Redis' GET and SET
+    commands.
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, content, max_age):
+        self._client.set(key, content, px=max(1, int(max_age * 1000)))
+
+
+_backend: typing.Optional[Backend] = None
+_backend_config = None
+
+
+def get_backend() -> typing.Optional[Backend]:
+    """
+    Get the backend configured using the HTTP_CACHE_BACKEND setting, or None if
+    responses are not cached.
+    """
+    global _backend, _backend_config
+    backend_config = (
+        config.HTTP_CACHE_BACKEND,
+        config.HTTP_CACHE_MAX_ENTRIES,
+        config.HTTP_CACHE_REDIS_URL,
+    )
+    if backend_config != _backend_config:
+        _backend = _build_backend(*backend_config)
+        _backend_config = backend_config
+    return _backend
+
+
+def _build_backend(backend, max_entries, redis_url) -> typing.Optional[Backend]:
+    if backend is None:
+        return None
+    if backend.upper() == LOCAL:
+        return LocalBackend(int(max_entries))
+    if backend.upper() == REDIS:
+        return RedisBackend(redis_url)
+    raise ValueError(
+        "Unknown HTTP cache backend '{}'; valid backends are {} and {}.".format(
+            backend, LOCAL, REDIS
+        )
+    )
+
+
+def get_max_age() -> float:
+    return float(config.HTTP_CACHE_MAX_AGE)
+
+
+def build_key(system_id, update_generation, path, args, host_url, custom_host) -> str:
+    """
+    Build the cache key of a request.
+
+    :param system_id: the ID of the system the response depends on
+    :param update_generation: the PK and update generation of the system; including
+        the PK ensures responses for a deleted system are not returned for a new
+        system with the same ID.
+    :param path: the path of the request
+    :param args: the URL parameters of the request, as (key, value) pairs
+    :param host_url: the host URL of the request, which appears in links
+    :param custom_host: the value of the X-Transiter-Host header, which also appears
+        in links
+    """
+    digest = hashlib.sha256(
+        json.dumps(
+            [list(update_generation), path, sorted(args), host_url, custom_host]
+        ).encode("utf-8")
+    ).hexdigest()
+    return "transiter:http:{}:{}".format(system_id, digest)
@@ -1 +1,6 @@
 from transiter.import_.importdriver import run_import as run_import
+from transiter.import_.importdriver import EntityBatch as EntityBatch
+from transiter.import_.importdriver import (
+    can_load_entity_batch as can_load_entity_batch,
+)
+from transiter.import_.importdriver import load_entity_batch as load_entity_batch
@@ -1,93 +1,289 @@
+import collections
 import dataclasses
+import datetime
+import enum
+import hashlib
+import io
 import itertools
 import typing
 
 from transiter import parse
 from transiter.db import dbconnection, models
 from transiter.db.queries import genericqueries, schedulequeries
+from transiter.import_ import idcache
 
 
-def sync_trips(feed_update, parsed_services: typing.List[parse.ScheduledService]):
-    num_entities_deleted = delete_trips_associated_to_feed(feed_update.feed.pk)
-    if len(parsed_services) == 0:
-        return num_entities_deleted > 0
+# NOTE: SQL Alchemy's bulk_insert_mappings can take up a huge amount of memory if
+# executed on a large collection of mappings. If executed on the NYC Subway's
+# collection of stop times, it uses up to 750mb of memory. Chunking solves this
+# and actually seems to make the process faster.
+STOP_TIME_CHUNK_SIZE = 5000
 
-    session = dbconnection.get_session()
 
+def sync_trips(
+    feed_update,
+    parsed_services: typing.List[parse.ScheduledService],
+    stop_time_columns: typing.Iterable[parse.gtfsstatic.StopTimeColumns] = None,
+):
+    """
+    Sync the trips in the parsed services, along with their stop times and
+    frequencies, to the database.
+
+    The sync is incremental. Each trip is fingerprinted using its data, its
+    frequencies and its stop times, and the fingerprint is compared with the
+    fingerprint stored when the trip was last imported from this feed. Only trips that
+    are new, that have changed or that have disappeared from the feed are written to.
+
+    :param feed_update: the current feed update
+    :param parsed_services: the parsed services
+    :param stop_time_columns: optional iterable of blocks of stop times stored
+        column-wise. If provided, stop times are read from here instead of from the
+        trips in the services. The iterable is traversed twice, each time in bounded
+        chunks, so it may be a lazy re-iterable stream over a very large stop times
+        table.
+    :return: whether any trip was added, updated or deleted
+    """
     service_id_to_pk = genericqueries.get_id_to_pk_map_by_feed_pk(
         models.ScheduledService, feed_update.feed.pk
     )
-    route_id_to_pk = genericqueries.get_id_to_pk_map(
-        models.Route, feed_update.feed.system.pk
-    )
-    trip_mappings = []
+    route_id_to_pk = idcache.get_id_to_pk_map(models.Route, feed_update.feed.system)
+    stop_id_to_pk = idcache.get_id_to_pk_map(models.Stop, feed_update.feed.system)
+
+    trip_id_to_trip_mapping = {}
+    trip_id_to_trip = {}
     for parsed_service in parsed_services:
         for trip in parsed_service.trips:
-            trip_mappings.append(
-                {
-                    "id": trip.id,
-                    "route_pk": route_id_to_pk[trip.route_id],
-                    "service_pk": service_id_to_pk[parsed_service.id],
-                    "direction_id": trip.direction_id,
-                    "headsign": trip.headsign,
-                    "short_name": trip.short_name,
-                    "wheelchair_accessible": trip.wheelchair_accessible,
-                    "bikes_allowed": trip.bikes_allowed,
-                }
+            if trip.id in trip_id_to_trip:
+                continue
+            trip_id_to_trip[trip.id] = trip
+            trip_id_to_trip_mapping[trip.id] = {
+                "id": trip.id,
+                "route_pk": route_id_to_pk[trip.route_id],
+                "service_pk": service_id_to_pk[parsed_service.id],
+                "direction_id": trip.direction_id,
+                "headsign": trip.headsign,
+                "short_name": trip.short_name,
+                "block_id": trip.block_id,
+                "wheelchair_accessible": trip.wheelchair_accessible,
+                "bikes_allowed": trip.bikes_allowed,
+            }
+    if stop_time_columns is None:
+        stop_time_columns = [
+            parse.gtfsstatic.StopTimeColumns.from_stop_times(
+                (trip.id, stop_time)
+                for trip in trip_id_to_trip.values()
+                for stop_time in trip.stop_times
             )
-    session.bulk_insert_mappings(models.ScheduledTrip, trip_mappings)
+        ]
 
-    trip_id_to_pk = schedulequeries.get_trip_id_to_pk_map_by_feed_pk(
+    # (1) Fingerprint the parsed trips.
+    trip_id_to_stop_times_hash = collections.defaultdict(int)
+    for trip_id, stop_time_mapping in _build_stop_time_mappings(
+        stop_time_columns, trip_id_to_trip_mapping, stop_id_to_pk
+    ):
+        trip_id_to_stop_times_hash[trip_id] = (
+            trip_id_to_stop_times_hash[trip_id] + _hash_to_int(stop_time_mapping)
+        ) % _STOP_TIMES_HASH_MODULUS
+    for trip_id, trip_mapping in trip_id_to_trip_mapping.items():
+        trip_mapping["fingerprint"] = _hash_to_hex(
+            (
+                trip_mapping,
+                [
+                    dataclasses.asdict(frequency)
+                    for frequency in trip_id_to_trip[trip_id].frequencies
+                ],
+                trip_id_to_stop_times_hash[trip_id],
+            )
+        )
+
+    # (2) Diff the parsed trips against the trips currently in the database.
+    trip_id_to_fingerprint = schedulequeries.get_trip_id_to_fingerprint_map_by_feed_pk(
         feed_update.feed.pk
     )
+    new_trip_mappings = []
+    updated_trip_mappings = []
+    for trip_id, trip_mapping in trip_id_to_trip_mapping.items():
+        fingerprint_data = trip_id_to_fingerprint.get(trip_id)
+        if fingerprint_data is None:
+            new_trip_mappings.append(trip_mapping)
+        elif fingerprint_data.fingerprint != trip_mapping["fingerprint"]:
+            updated_trip_mappings.append({"pk": fingerprint_data.pk, **trip_mapping})
+    deleted_trip_pks = [
+        fingerprint_data.pk
+        for trip_id, fingerprint_data in trip_id_to_fingerprint.items()
+        if trip_id not in trip_id_to_trip_mapping
+    ]
 
-    stop_id_to_pk = genericqueries.get_id_to_pk_map(
-        models.Stop, feed_update.feed.system.pk
+    # (3) Write the changes.
+    _delete_trips_by_pk(
+        [trip_mapping["pk"] for trip_mapping in updated_trip_mappings],
+        delete_trip_rows=False,
     )
-    # NOTE: SQL Alchemy's bulk_insert_mappings can take up a huge amount of memory if
-    # executed on a large collection of mappings. If executed on the NYC Subway's
-    # collection of stop times, it uses up to 750mb of memory. Chunking solves this
-    # and actually seems to make the process faster.
-    all_trips_iter = itertools.chain.from_iterable(
-        parsed_service.trips for parsed_service in parsed_services
+    _delete_trips_by_pk(deleted_trip_pks, delete_trip_rows=True)
+    bulk_insert(models.ScheduledTrip, new_trip_mappings)
+    dbconnection.get_session().bulk_update_mappings(
+        models.ScheduledTrip, updated_trip_mappings
     )
-    for chunk_of_trips in split(all_trips_iter, 100):
+
+    trip_ids_to_write = set(
+        trip_mapping["id"]
+        for trip_mapping in itertools.chain(new_trip_mappings, updated_trip_mappings)
+    )
+    if len(trip_ids_to_write) == 0:
+        return len(deleted_trip_pks) > 0
+    trip_id_to_pk = {
+        trip_id: pk
+        for trip_id, pk in schedulequeries.get_trip_id_to_pk_map_by_feed_pk(
+            feed_update.feed.pk
+        ).items()
+        if trip_id in trip_ids_to_write
+    }
+    bulk_insert(
+        models.ScheduledTripFrequency,
+        [
+            {"trip_pk": trip_pk, **dataclasses.asdict(trip_frequency)}
+            for trip_id, trip_pk in trip_id_to_pk.items()
+            for trip_frequency in trip_id_to_trip[trip_id].frequencies
+        ],
+    )
+    for chunk in split(
+        _build_stop_time_mappings(stop_time_columns, trip_id_to_pk, stop_id_to_pk),
+        STOP_TIME_CHUNK_SIZE,
+    ):
         stop_time_mappings = []
-        frequency_mappings = []
-        for trip in chunk_of_trips:
-            for trip_frequency in trip.frequencies:
-                frequency_mappings.append(
-                    {
-                        "trip_pk": trip_id_to_pk[trip.id],
-                        **dataclasses.asdict(trip_frequency),
-                    }
-                )
-            for stop_time in trip.stop_times:
-                if stop_time.stop_id not in stop_id_to_pk:
-                    continue
-                stop_time_mappings.append(
-                    {
-                        "trip_pk": trip_id_to_pk[trip.id],
-                        "stop_pk": stop_id_to_pk[stop_time.stop_id],
-                        "arrival_time": stop_time.arrival_time,
-                        "departure_time": stop_time.departure_time,
-                        "stop_sequence": stop_time.stop_sequence,
-                        "headsign": stop_time.headsign,
-                        "pickup_type": stop_time.pickup_type,
-                        "drop_off_type": stop_time.drop_off_type,
-                        "continuous_pickup": stop_time.continuous_pickup,
-                        "continuous_drop_off": stop_time.continuous_drop_off,
-                        "shape_distance_traveled": stop_time.shape_distance_traveled,
-                        "exact_times": stop_time.exact_times,
-                    }
-                )
-        session.bulk_insert_mappings(models.ScheduledTripStopTime, stop_time_mappings)
-        if len(frequency_mappings) > 0:
-            session.bulk_insert_mappings(
-                models.ScheduledTripFrequency, frequency_mappings
-            )
+        for trip_id, stop_time_mapping in chunk:
+            stop_time_mapping["trip_pk"] = trip_id_to_pk[trip_id]
+            stop_time_mappings.append(stop_time_mapping)
+        bulk_insert(models.ScheduledTripStopTime, stop_time_mappings)
+    return True
+
+
+_STOP_TIMES_HASH_MODULUS = 2 ** 64
+
+
+def _build_stop_time_mappings(
+    stop_time_columns, trip_ids: typing.Container[str], stop_id_to_pk
+) -> typing.Iterator[typing.Tuple[str, dict]]:
+    """
+    Build (trip ID, mapping) pairs for the stop times whose trip ID is in the
+    collection of trip IDs and whose stop ID is valid.
+
+    The trip PK is not populated in the mapping.
+    """
+    for columns in stop_time_columns:
+        for (
+            trip_id,
+            stop_pk,
+            arrival_time,
+            departure_time,
+            stop_sequence,
+            headsign,
+            pickup_type,
+            drop_off_type,
+            continuous_pickup,
+            continuous_drop_off,
+            shape_distance_traveled,
+            exact_times,
+        ) in zip(
+            columns.trip_id,
+            map(stop_id_to_pk.get, columns.stop_id),
+            columns.arrival_time,
+            columns.departure_time,
+            columns.stop_sequence,
+            columns.headsign,
+            columns.pickup_type,
+            columns.drop_off_type,
+            columns.continuous_pickup,
+            columns.continuous_drop_off,
+            columns.shape_distance_traveled,
+            columns.exact_times,
+        ):
+            if stop_pk is None or trip_id not in trip_ids:
+                continue
+            yield trip_id, {
+                "stop_pk": stop_pk,
+                "arrival_time": arrival_time,
+                "departure_time": departure_time,
+                "stop_sequence": stop_sequence,
+                "headsign": headsign,
+                "pickup_type": pickup_type,
+                "drop_off_type": drop_off_type,
+                "continuous_pickup": continuous_pickup,
+                "continuous_drop_off": continuous_drop_off,
+                "shape_distance_traveled": shape_distance_traveled,
+                "exact_times": exact_times,
+            }
 
-    return num_entities_deleted > 0 or len(trip_mappings) > 0
+
+def _hash_to_hex(value) -> str:
+    # NOTE: Python's built in hash function is not used because it is randomized for
+    # strings across processes, and these hashes are persisted in the database.
+    return hashlib.md5(repr(value).encode("utf-8")).hexdigest()
+
+
+def _hash_to_int(value) -> int:
+    return int(_hash_to_hex(value)[:16], 16)
+
+
+def bulk_insert(DbEntity: typing.Type[models.Base], mappings: typing.List[dict]):
+    """
+    Insert rows, given as mappings from column name to value, into an entity's table.
+
+    When the database driver is psycopg2 the rows are streamed into the table using
+    PostgreSQL's COPY ... FROM STDIN command, which avoids SQL Alchemy's executemany
+    machinery entirely and is substantially faster for large tables. For other
+    drivers this falls back to the session's bulk_insert_mappings. In both cases the
+    insert happens inside the current unit of work's transaction.
+
+    All of the mappings must have the same keys, and the keys must be column names.
+    """
+    if len(mappings) == 0:
+        return
+    session = dbconnection.get_session()
+    if not _supports_copy(session):
+        session.bulk_insert_mappings(DbEntity, mappings)
+        return
+    columns = list(mappings[0].keys())
+    buffer = io.StringIO()
+    for mapping in mappings:
+        buffer.write(
+            ",".join(_format_copy_value(mapping[column]) for column in columns)
+        )
+        buffer.write("\n")
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+                DbEntity.__table__.name, ", ".join(columns)
+            ),
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def _supports_copy(session) -> bool:
+    return session.get_bind().dialect.driver == "psycopg2"
+
+
+def _format_copy_value(value) -> str:
+    """
+    Format a value as a field in a COPY CSV row.
+
+    In the CSV format an unquoted empty field is NULL, so every non-null value is
+    quoted in order for empty strings to be preserved.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        # Enums are stored non-natively using their names.
+        value = value.name
+    elif isinstance(value, bool):
+        value = "t" if value else "f"
+    elif isinstance(value, (datetime.date, datetime.time)):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
 
 
 def split(container, size):
@@ -101,7 +297,14 @@ def split(container, size):
         yield chunk
 
 
-def delete_trips_associated_to_feed(feed_pk):
+def delete_trips_associated_to_feed(feed_pk, exclude_feed_update_pk=None):
+    """
+    Delete all scheduled trips, with their stop times and frequencies, whose service
+    was most recently imported from a given feed.
+
+    If exclude_feed_update_pk is provided, trips whose service was imported in that
+    feed update are retained. This can be used to delete the trips in stale services.
+    """
     session = dbconnection.get_session()
     base_queries = [
         session.query(models.ScheduledTripStopTime).filter(
@@ -114,9 +317,30 @@ def delete_trips_associated_to_feed(feed_pk):
     ]
     num_deleted = 0
     for base_query in base_queries:
-        num_deleted += base_query.filter(
+        query = base_query.filter(
             models.ScheduledService.pk == models.ScheduledTrip.service_pk,
             models.FeedUpdate.pk == models.ScheduledService.source_pk,
             models.FeedUpdate.feed_pk == feed_pk,
-        ).delete(synchronize_session=False)
+        )
+        if exclude_feed_update_pk is not None:
+            query = query.filter(models.FeedUpdate.pk != exclude_feed_update_pk)
+        num_deleted += query.delete(synchronize_session=False)
     return num_deleted
+
+
+def _delete_trips_by_pk(trip_pks, delete_trip_rows):
+    """
+    Delete the stop times and frequencies of the trips with the given PKs, and
+    optionally the trips themselves.
+    """
+    session = dbconnection.get_session()
+    DbEntities = [models.ScheduledTripStopTime, models.ScheduledTripFrequency]
+    for chunk_of_trip_pks in split(trip_pks, STOP_TIME_CHUNK_SIZE):
+        for DbEntity in DbEntities:
+            session.query(DbEntity).filter(
+                DbEntity.trip_pk.in_(chunk_of_trip_pks)
+            ).delete(synchronize_session=False)
+        if delete_trip_rows:
+            session.query(models.ScheduledTrip).filter(
+                models.ScheduledTrip.pk.in_(chunk_of_trip_pks)
+            ).delete(synchronize_session=False)
@@ -0,0 +1,51 @@
+"""
+The ID cache is an in-process cache of entity ID to entity PK maps.
+
+Every feed update needs to convert the IDs of stops and routes in the feed into
+database PKs. These maps only change when the stops or routes themselves are added or
+deleted, which typically happens when a static feed is imported, so they are cached
+per system in the process running the imports, using the system cache. Whenever an
+import adds or deletes entities of a cached type the system cache is invalidated.
+"""
+import typing
+
+from transiter.db import models, systemcache
+from transiter.db.queries import genericqueries
+
+CACHED_DB_ENTITIES = {models.Agency, models.Route, models.Stop}
+
+
+# DbEntity is a class
+# noinspection PyPep8Naming
+def get_id_to_pk_map(
+    DbEntity: typing.Type[models.Base],
+    system: models.System,
+    ids: typing.Iterable[str] = None,
+) -> typing.Dict[str, int]:
+    """
+    Get a map of entity ID to entity PK for entities of a given type in a system.
+
+    This has the same semantics as genericqueries.get_id_to_pk_map: if IDs are
+    provided, the map contains exactly those IDs, with None for IDs that do not
+    correspond to an entity in the system.
+    """
+    if DbEntity not in CACHED_DB_ENTITIES:
+        return genericqueries.get_id_to_pk_map(DbEntity, system.pk, ids)
+    id_to_pk = systemcache.get(
+        system, DbEntity, lambda: genericqueries.get_id_to_pk_map(DbEntity, system.pk),
+    )
+    if ids is None:
+        return dict(id_to_pk)
+    return {id_: id_to_pk.get(id_) for id_ in ids}
+
+
+# DbEntity is a class
+# noinspection PyPep8Naming
+def invalidate(DbEntity: typing.Type[models.Base], system: models.System):
+    """
+    Invalidate the cached maps for a system after entities of a given type have been
+    added or deleted.
+    """
+    if DbEntity not in CACHED_DB_ENTITIES:
+        return
+    systemcache.invalidate(system)
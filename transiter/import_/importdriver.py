@@ -11,7 +11,9 @@ This involves:
 - Deleting existing entities that no longer appear in the feed.
 """
 import collections
+import concurrent.futures
 import dataclasses
+import json
 import logging
 import typing
 import itertools
@@ -21,6 +23,7 @@ from transiter import parse
 from transiter.db import (
     dbconnection,
     models,
+    systemcache,
 )
 from transiter.db.models import updatableentity
 from transiter.db.queries import (
@@ -32,7 +35,8 @@ from transiter.db.queries import (
     schedulequeries,
     systemqueries,
 )
-from transiter.import_ import fastscheduleoperations
+from transiter.import_ import fastscheduleoperations, idcache
+from transiter.services import departureboardmanager
 from transiter.services.servicemap import servicemapmanager
 
 logger = logging.getLogger(__name__)
@@ -42,38 +46,166 @@ class ImportStats:
     def __init__(self):
         self._entity_type_to_data = {}
 
-    def add_data(self, entity_type, num_added, num_updated, num_deleted):
-        if num_added == 0 and num_updated == 0 and num_deleted == 0:
+    def add_data(
+        self, entity_type, num_added, num_updated, num_deleted, num_unchanged=0
+    ):
+        if (
+            num_added == 0
+            and num_updated == 0
+            and num_deleted == 0
+            and num_unchanged == 0
+        ):
             return
-        self._entity_type_to_data[entity_type] = (num_added, num_updated, num_deleted)
+        self._entity_type_to_data[entity_type] = (
+            num_added,
+            num_updated,
+            num_deleted,
+            num_unchanged,
+        )
 
     def num_added(self):
-        return sum(x for x, _, _ in self._entity_type_to_data.values())
+        return sum(x for x, _, _, _ in self._entity_type_to_data.values())
 
     def num_updated(self):
-        return sum(x for _, x, _ in self._entity_type_to_data.values())
+        return sum(x for _, x, _, _ in self._entity_type_to_data.values())
 
     def num_deleted(self):
-        return sum(x for _, _, x in self._entity_type_to_data.values())
+        return sum(x for _, _, x, _ in self._entity_type_to_data.values())
+
+    def num_unchanged(self):
+        return sum(x for _, _, _, x in self._entity_type_to_data.values())
 
     def entity_type_to_num_in_db(self):
         result = {}
         for entity_type, data in self._entity_type_to_data.items():
-            result[entity_type] = data[0] + data[1]
+            result[entity_type] = data[0] + data[1] + data[3]
         return result
 
 
-def run_import(feed_update_pk, parser_object: parse.TransiterParser):
+@dataclasses.dataclass
+class EntityBatch:
+    """
+    The entities of a feed, loaded from a parser ahead of the import.
+
+    A batch can be passed to run_import in place of the parser. Loading the entities is
+    the CPU bound part of parsing, so batches allow parsing to happen in a different
+    process from the import. Batches are picklable, provided that the parser produces
+    picklable entities.
+    """
+
+    type_to_entities: typing.Dict[typing.Type, list]
+
+    @property
+    def supported_types(self):
+        return set(self.type_to_entities.keys())
+
+
+def can_load_entity_batch(parser_object: parse.TransiterParser) -> bool:
+    """
+    Return whether the entities of a parser can be loaded into a batch.
+
+    This is not possible for the GTFS Static parser, as stop times are streamed from the
+    archive during the import and unchanged entity types are detected using the files
+    in the archive.
+    """
+    return not isinstance(parser_object, parse.GtfsStaticParser)
+
+
+def load_entity_batch(parser_object: parse.TransiterParser) -> EntityBatch:
+    """
+    Load all of the entities of a parser into a batch.
+    """
+    type_to_entities = {}
+    for syncer_class in _get_syncers_in_order():
+        if syncer_class.feed_entity() not in parser_object.supported_types:
+            continue
+        # Loading entities does not depend on the feed update.
+        type_to_entities[syncer_class.feed_entity()] = syncer_class(
+            feed_update=None
+        ).load_entities(parser_object)
+    return EntityBatch(type_to_entities)
+
+
+def run_import(
+    feed_update_pk, parser_object: typing.Union[parse.TransiterParser, EntityBatch]
+):
     """
     Sync entities to the database.
 
     :param feed_update_pk: the feed update event in which this sync operation is being
       performed
-    :param parser_object: the parser object
+    :param parser_object: the parser object, or a batch of entities loaded from it
     """
     feed_update = feedqueries.get_update_by_pk(feed_update_pk)
 
-    syncers_in_order = [
+    syncers_in_order = _get_syncers_in_order()
+    if feed_update.update_type == feed_update.Type.FLUSH:
+        syncers_in_order.reverse()
+
+    unchanged_types = _get_unchanged_types(feed_update, parser_object)
+
+    syncers = []
+    for syncer_class in syncers_in_order:
+        if syncer_class.feed_entity() not in parser_object.supported_types:
+            continue
+        if syncer_class.feed_entity() in unchanged_types:
+            logger.debug(
+                "Skipping {}; source files unchanged".format(syncer_class.feed_entity())
+            )
+            continue
+        syncers.append(syncer_class(feed_update))
+
+    stats = ImportStats()
+    for syncer_, entities in _load_entities_ahead(syncers, parser_object):
+        logger.debug("Syncing {}".format(syncer_.feed_entity()))
+        num_added, num_updated, num_deleted = syncer_.run(entities)
+        entity = syncer_.feed_entity().__name__.upper()
+        stats.add_data(
+            entity, num_added, num_updated, num_deleted, syncer_.num_unchanged
+        )
+
+    return stats
+
+
+def _load_entities_ahead(
+    syncers: typing.List["SyncerBase"],
+    parser_object: typing.Union[parse.TransiterParser, EntityBatch],
+) -> typing.Iterator[typing.Tuple["SyncerBase", list]]:
+    """
+    Yield each syncer along with its entities.
+
+    The entities for the next syncer are loaded in a background thread while the
+    current syncer runs. Loading entities only uses the parser and is mostly CPU bound,
+    whereas running a syncer mostly waits on the database, so this reduces the latency
+    of updates with multiple entity types; for example, realtime feeds with trips,
+    vehicles and alerts. The syncers themselves still run one after the other in the
+    same session, so the import remains a single transaction.
+    """
+    if isinstance(parser_object, EntityBatch):
+        for syncer_ in syncers:
+            yield syncer_, parser_object.type_to_entities[syncer_.feed_entity()]
+        return
+    if len(syncers) <= 1:
+        for syncer_ in syncers:
+            yield syncer_, syncer_.load_entities(parser_object)
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(syncers[0].load_entities, parser_object)
+        for syncer_, next_syncer in zip(syncers, syncers[1:] + [None]):
+            entities = future.result()
+            if next_syncer is None:
+                yield syncer_, entities
+                break
+            load_next_concurrently = not syncer_.reads_parser_during_sync()
+            if load_next_concurrently:
+                future = executor.submit(next_syncer.load_entities, parser_object)
+            yield syncer_, entities
+            if not load_next_concurrently:
+                future = executor.submit(next_syncer.load_entities, parser_object)
+
+
+def _get_syncers_in_order():
+    return [
         AgencySyncer,
         RouteSyncer,
         StopSyncer,
@@ -84,25 +216,27 @@ def run_import(feed_update_pk, parser_object: parse.TransiterParser):
         VehicleImporter,
         AlertSyncer,
     ]
-    if feed_update.update_type == feed_update.Type.FLUSH:
-        syncers_in_order.reverse()
 
-    stats = ImportStats()
-    for syncer_class in syncers_in_order:
-        if syncer_class.feed_entity() not in parser_object.supported_types:
-            continue
-        logger.debug("Syncing {}".format(syncer_class.feed_entity()))
-        entities = list(parser_object.get_entities(syncer_class.feed_entity()))
-        for entity in entities:
-            entity.source_pk = feed_update.pk
-        num_added, num_updated, num_deleted = syncer_class(feed_update).run(entities)
-        if num_added == 0 and num_updated == 0 and num_deleted == 0:
-            continue
 
-        entity = syncer_class.__feed_entity__.__name__.upper()
-        stats.add_data(entity, num_added, num_updated, num_deleted)
+def _get_unchanged_types(feed_update, parser_object: parse.TransiterParser):
+    """
+    Return the entity types whose source files have not changed since the last update
+    that changed the DB.
 
-    return stats
+    Syncing these types again would be a no-op, so they are skipped entirely. This is
+    only supported for the GTFS Static parser, for which the hash of each file in the
+    archive is calculated.
+    """
+    if feed_update.update_type == feed_update.Type.FLUSH:
+        return set()
+    if not isinstance(parser_object, parse.GtfsStaticParser):
+        return set()
+    previous_file_hashes = feedqueries.get_last_updated_content_file_hashes(
+        feed_update.feed_pk
+    )
+    if previous_file_hashes is None:
+        return set()
+    return parser_object.get_unchanged_types(json.loads(previous_file_hashes))
 
 
 class SyncerBase:
@@ -110,9 +244,33 @@ class SyncerBase:
     __feed_entity__ = None
     __db_entity__ = None
 
+    # Syncers that can detect entities that are identical to the version already in
+    # the database, and hence skip writing them, record the number of such entities
+    # here. These entities are not counted as updated.
+    num_unchanged = 0
+
+    # If true, the entities of the syncer appear in the departure boards of every stop
+    # in the system, so all of the boards are rebuilt when the entities change.
+    # Trips, which only appear in the boards of their stops, are handled separately by
+    # the trip syncer.
+    rebuild_all_departure_boards = False
+
     def __init__(self, feed_update: models.FeedUpdate):
         self.feed_update = feed_update
 
+    def load_entities(self, parser_object: parse.TransiterParser) -> list:
+        """
+        Retrieve the entities to sync from the parser.
+        """
+        return list(parser_object.get_entities(self.feed_entity()))
+
+    def reads_parser_during_sync(self) -> bool:
+        """
+        Return whether the syncer reads from the parser while syncing, in which case the
+        entities of the next syncer are not loaded concurrently.
+        """
+        return False
+
     def run(self, entities):
         self.pre_sync()
         if len(entities) > 0:
@@ -120,7 +278,20 @@ class SyncerBase:
         else:
             num_added, num_updated = 0, 0
         num_deleted = self.delete_stale_entities()
+        if num_added > 0 or num_deleted > 0:
+            idcache.invalidate(self.__db_entity__, self.feed_update.feed.system)
         self.post_sync()
+        if (
+            self.rebuild_all_departure_boards
+            and (num_added > 0 or num_updated > 0 or num_deleted > 0)
+            and departureboardmanager.is_enabled()
+        ):
+            departureboardmanager.rebuild_departure_boards(
+                self.feed_update.feed.system_pk,
+                idcache.get_id_to_pk_map(
+                    models.Stop, self.feed_update.feed.system
+                ).values(),
+            )
         return num_added, num_updated, num_deleted
 
     def pre_sync(self):
@@ -137,15 +308,14 @@ class SyncerBase:
         updated by the feed associated to the current feed update, but that was not
         contained in the current feed update. I.e., it is an entity which previously
         appeared in the current feed of interest but has since disappeared.
+
+        Stale entities and their dependents are deleted using bulk statements rather
+        than by loading them into the session.
         """
         assert self.__db_entity__ is not None
-        session = dbconnection.get_session()
-        entities_to_delete = genericqueries.list_stale_entities(
+        return genericqueries.delete_stale_entities(
             self.__db_entity__, self.feed_update
         )
-        for entity in entities_to_delete:
-            session.delete(entity)
-        return len(entities_to_delete)
 
     def post_sync(self):
         pass
@@ -193,8 +363,8 @@ class SyncerBase:
         )
 
     def _get_id_to_pk_map(self):
-        return genericqueries.get_id_to_pk_map(
-            self.__db_entity__, self.feed_update.feed.system.pk
+        return idcache.get_id_to_pk_map(
+            self.__db_entity__, self.feed_update.feed.system
         )
 
 
@@ -220,9 +390,12 @@ class AgencySyncer(syncer(models.Agency)):
 
 
 class RouteSyncer(syncer(models.Route)):
+
+    rebuild_all_departure_boards = True
+
     def sync(self, parsed_routes):
-        agency_id_to_pk = genericqueries.get_id_to_pk_map(
-            models.Agency, self.feed_update.feed.system.pk
+        agency_id_to_pk = idcache.get_id_to_pk_map(
+            models.Agency, self.feed_update.feed.system
         )
         routes = []
         for parsed_route in parsed_routes:
@@ -235,6 +408,15 @@ class RouteSyncer(syncer(models.Route)):
 
 
 class StopSyncer(syncer(models.Stop)):
+
+    rebuild_all_departure_boards = True
+
+    def run(self, entities):
+        num_added, num_updated, num_deleted = super().run(entities)
+        if num_added > 0 or num_updated > 0 or num_deleted > 0:
+            systemcache.invalidate(self.feed_update.feed.system)
+        return num_added, num_updated, num_deleted
+
     def sync(self, parsed_stops: typing.Iterable[parse.Stop]):
         # NOTE: the stop tree is manually linked together because otherwise SQL
         # Alchemy's cascades will result in duplicate entries in the DB because the
@@ -277,8 +459,8 @@ class TransferSyncer(syncer(models.Transfer)):
         for transfer in parsed_transfers:
             stop_ids.add(transfer.from_stop_id)
             stop_ids.add(transfer.to_stop_id)
-        stop_id_to_pk = stopqueries.get_id_to_pk_map_in_system(
-            self.feed_update.feed.system.pk, stop_ids
+        stop_id_to_pk = idcache.get_id_to_pk_map(
+            models.Stop, self.feed_update.feed.system, stop_ids
         )
 
         session = dbconnection.get_session()
@@ -302,13 +484,28 @@ class TransferSyncer(syncer(models.Transfer)):
 class ScheduleSyncer(syncer(models.ScheduledService)):
 
     recalculate_service_maps = False
+    stop_time_columns = None
+
+    def load_entities(self, parser_object: parse.TransiterParser) -> list:
+        # For the built in GTFS Static parser, stop times are streamed directly from
+        # the feed into the database, in blocks of typed columns, rather than being
+        # attached to the parsed trips.
+        # This bounds the memory used by the import to the chunk size used in the
+        # fast schedule operations, rather than the size of the schedule.
+        if not isinstance(parser_object, parse.GtfsStaticParser) or (
+            type(parser_object).get_scheduled_services
+            is not parse.GtfsStaticParser.get_scheduled_services
+        ):
+            return super().load_entities(parser_object)
+        (
+            parsed_services,
+            self.stop_time_columns,
+        ) = parser_object.stream_scheduled_services()
+        return parsed_services
 
-    def pre_sync(self):
-        num_entities_deleted = fastscheduleoperations.delete_trips_associated_to_feed(
-            self.feed_update.feed.pk
-        )
-        if num_entities_deleted > 0:
-            self.recalculate_service_maps = True
+    def reads_parser_during_sync(self) -> bool:
+        # The stop times are streamed from the feed during the sync.
+        return self.stop_time_columns is not None
 
     def sync(self, parsed_services):
         # TODO: need to timestamp the dates using the system timezone
@@ -318,12 +515,23 @@ class ScheduleSyncer(syncer(models.ScheduledService)):
         for service in persisted_services:
             service.system = self.feed_update.feed.system
         schedule_updated = fastscheduleoperations.sync_trips(
-            self.feed_update, parsed_services
+            self.feed_update, parsed_services, self.stop_time_columns
         )
         if schedule_updated:
             self.recalculate_service_maps = True
         return num_added, num_updated
 
+    def delete_stale_entities(self):
+        # The trips in stale services are deleted using a bulk query first, as
+        # otherwise the ORM cascades would load every trip and stop time.
+        dbconnection.get_session().flush()
+        num_entities_deleted = fastscheduleoperations.delete_trips_associated_to_feed(
+            self.feed_update.feed.pk, exclude_feed_update_pk=self.feed_update.pk
+        )
+        if num_entities_deleted > 0:
+            self.recalculate_service_maps = True
+        return super().delete_stale_entities()
+
     def post_sync(self):
         if not self.recalculate_service_maps:
             return
@@ -333,9 +541,12 @@ class ScheduleSyncer(syncer(models.ScheduledService)):
 
 
 class DirectionRuleSyncer(syncer(models.DirectionRule)):
+
+    rebuild_all_departure_boards = True
+
     def sync(self, parsed_direction_rules):
-        stop_id_to_pk = stopqueries.get_id_to_pk_map_in_system(
-            self.feed_update.feed.system.pk
+        stop_id_to_pk = idcache.get_id_to_pk_map(
+            models.Stop, self.feed_update.feed.system
         )
         entities_to_merge = []
         for parsed_direction_rule in parsed_direction_rules:
@@ -363,14 +574,27 @@ class _TripStopTime(parse.TripStopTime):
     stop_pk: int = None
     trip_pk: int = None
     is_from_parsing: bool = True
+    # The data currently stored in the database for this stop time, if it exists.
+    db_data: tripqueries.StopTimeData = None
 
     def is_new(self):
         return self.pk is None
 
+    def is_unchanged(self):
+        if self.db_data is None or self.db_data.pk != self.pk:
+            return False
+        return all(
+            getattr(self, field_name) == db_value
+            for field_name, db_value in zip(
+                tripqueries.StopTimeData._fields, self.db_data
+            )
+        )
+
     def to_db_mapping(self):
-        result = dataclasses.asdict(self)
-        del result["stop_id"]
-        del result["is_from_parsing"]
+        result = {
+            field_name: getattr(self, field_name)
+            for field_name in _TRIP_STOP_TIME_DB_FIELD_NAMES
+        }
         if not self.is_from_parsing:
             null_keys = {key for key, value in result.items() if value is None}
             for null_key in null_keys:
@@ -387,22 +611,47 @@ class _Trip(parse.Trip):
     source_pk: int = None
     current_stop_sequence: int = None
     stop_times: typing.List[_TripStopTime] = dataclasses.field(default_factory=list)
+    # The trip currently stored in the database, if it exists.
+    db_trip: models.Trip = None
 
     @classmethod
     def from_parsed_trip(cls, parsed_trip: parse.Trip) -> "_Trip":
-        parsed_trip_dict = dataclasses.asdict(parsed_trip)
-        parsed_stop_times_dict = parsed_trip_dict.pop("stop_times")
+        # NOTE: this is a shallow copy, rather than using dataclasses.asdict, as the
+        # fields of parsed trips and stop times are all immutable except for the
+        # list of stop times, which is rebuilt anyway.
         return cls(
-            **parsed_trip_dict,
+            **{
+                field_name: getattr(parsed_trip, field_name)
+                for field_name in _PARSED_TRIP_FIELD_NAMES
+            },
             stop_times=[
-                _TripStopTime(**parsed_stop_time_dict, is_from_parsing=True)
-                for parsed_stop_time_dict in parsed_stop_times_dict
+                _TripStopTime(
+                    **{
+                        field_name: getattr(parsed_stop_time, field_name)
+                        for field_name in _PARSED_TRIP_STOP_TIME_FIELD_NAMES
+                    },
+                    is_from_parsing=True
+                )
+                for parsed_stop_time in parsed_trip.stop_times
             ]
         )
 
     def is_new(self):
         return self.pk is None
 
+    def is_unchanged(self):
+        """
+        Return whether the trip's row is identical to the stored row, disregarding
+        the source PK which changes in every feed update.
+        """
+        if self.db_trip is None or self.db_trip.pk != self.pk:
+            return False
+        return all(
+            getattr(self.db_trip, key) == value
+            for key, value in self.to_db_mapping().items()
+            if key != "source_pk"
+        )
+
     def to_db_mapping(self):
         result = {
             "pk": self.pk,
@@ -420,14 +669,45 @@ class _Trip(parse.Trip):
         return result
 
 
+_PARSED_TRIP_FIELD_NAMES = [
+    field.name for field in dataclasses.fields(parse.Trip) if field.name != "stop_times"
+]
+_PARSED_TRIP_STOP_TIME_FIELD_NAMES = [
+    field.name for field in dataclasses.fields(parse.TripStopTime)
+]
+_TRIP_STOP_TIME_DB_FIELD_NAMES = [
+    field.name
+    for field in dataclasses.fields(_TripStopTime)
+    if field.name not in {"stop_id", "is_from_parsing", "db_data"}
+]
+
+
 class TripSyncer(syncer(models.Trip)):
 
     # TODO: replace this kinds of object variables with a notion of post import actions
     route_pk_to_previous_service_map_hash = {}
     route_pk_to_new_service_map_hash = {}
+    trip_pks_with_deleted_stop_times = set()
 
-    def sync(self, parsed_trips):
-        trips = map(_Trip.from_parsed_trip, parsed_trips)
+    def __init__(self, feed_update: models.FeedUpdate):
+        super().__init__(feed_update)
+        # The stops whose departure boards need to be rebuilt after the sync.
+        self.departure_board_stop_pks = set()
+        self.trip_pk_to_previous_stop_pks = {}
+
+    def load_entities(self, parser_object: parse.TransiterParser) -> list:
+        # For the built in GTFS Realtime parser, the syncer's trip records are built
+        # directly from the protobuf message. Otherwise every trip and stop time
+        # would be built twice: once as a parse type and then again as a record.
+        if not isinstance(parser_object, parse.GtfsRealtimeParser) or (
+            type(parser_object).get_trips is not parse.GtfsRealtimeParser.get_trips
+        ):
+            return list(
+                map(_Trip.from_parsed_trip, super().load_entities(parser_object))
+            )
+        return list(parser_object.build_trips(_Trip, _TripStopTime))
+
+    def sync(self, trips):
         # TODO: localize the trip start time
         for data_adder in (
             self._filter_duplicate_ids,
@@ -491,8 +771,9 @@ class TripSyncer(syncer(models.Trip)):
         route IDs and are missing route PKs are filtered out.
         """
         trips = list(trips)
-        route_id_to_pk = routequeries.get_id_to_pk_map_in_system(
-            self.feed_update.feed.system.pk,
+        route_id_to_pk = idcache.get_id_to_pk_map(
+            models.Route,
+            self.feed_update.feed.system,
             [trip.route_id for trip in trips if trip.route_id is not None],
         )
         for trip in trips:
@@ -512,8 +793,8 @@ class TripSyncer(syncer(models.Trip)):
         for trip in trips:
             for stop_time in trip.stop_times:
                 all_stop_ids.add(stop_time.stop_id)
-        stop_id_to_pk = stopqueries.get_id_to_pk_map_in_system(
-            self.feed_update.feed.system.pk, all_stop_ids
+        stop_id_to_pk = idcache.get_id_to_pk_map(
+            models.Stop, self.feed_update.feed.system, all_stop_ids
         )
 
         def process_stop_times(stop_times):
@@ -546,6 +827,7 @@ class TripSyncer(syncer(models.Trip)):
             db_trip = trip_id_to_db_trip.get(trip.id, None)
             if db_trip is not None:
                 trip.pk = db_trip.pk
+                trip.db_trip = db_trip
             db_stop_time_data = trip_pk_to_db_stop_time_data_list.get(trip.pk, [])
             self._add_pk_and_stop_sequence_to_stop_times(trip, db_stop_time_data)
             if len(trip.stop_times) > 0:
@@ -555,6 +837,10 @@ class TripSyncer(syncer(models.Trip)):
             else:
                 # This is a trip with no stop times at all...
                 trip.current_stop_sequence = 1
+        self.trip_pk_to_previous_stop_pks = {
+            trip_pk: {stop_time_data.stop_pk for stop_time_data in data_list}
+            for trip_pk, data_list in trip_pk_to_db_stop_time_data_list.items()
+        }
         self._delete_relevant_stop_times(trips, trip_pk_to_db_stop_time_data_list)
         self._calculate_route_pk_to_previous_service_map_hash(
             trip_id_to_db_trip.values(), trip_pk_to_db_stop_time_data_list
@@ -620,16 +906,17 @@ class TripSyncer(syncer(models.Trip)):
                     stop_time.stop_sequence = existing_stop_sequence
             index = stop_time.stop_sequence + 1
 
-        stop_sequence_to_pk_and_stop_pk = {
-            stop_sequence: (stop_time_pk, stop_pk)
-            for stop_time_pk, stop_sequence, stop_pk in db_stop_time_data
+        stop_sequence_to_stop_time_data = {
+            stop_time_data.stop_sequence: stop_time_data
+            for stop_time_data in db_stop_time_data
         }
         for feed_stop_time in trip.stop_times:
-            stop_time_pk, __ = stop_sequence_to_pk_and_stop_pk.get(
-                feed_stop_time.stop_sequence, (None, None)
+            stop_time_data = stop_sequence_to_stop_time_data.get(
+                feed_stop_time.stop_sequence
             )
-            if stop_time_pk is not None:
-                feed_stop_time.pk = stop_time_pk
+            if stop_time_data is not None:
+                feed_stop_time.pk = stop_time_data.pk
+                feed_stop_time.db_data = stop_time_data
 
     def _delete_relevant_stop_times(self, trips, trip_pk_to_db_stop_time_data):
         """
@@ -646,11 +933,13 @@ class TripSyncer(syncer(models.Trip)):
             ):
                 stop_time_pks_to_retain.add(historical_stop_time.pk)
         stop_time_pks_to_delete = set()
+        self.trip_pks_with_deleted_stop_times = set()
         for trip_pk, db_stop_time_data_list in trip_pk_to_db_stop_time_data.items():
             for stop_time_data in db_stop_time_data_list:
                 if stop_time_data.pk in stop_time_pks_to_retain:
                     continue
                 stop_time_pks_to_delete.add(stop_time_data.pk)
+                self.trip_pks_with_deleted_stop_times.add(trip_pk)
         delete_query_selector = (
             dbconnection.get_session()
             .query(models.TripStopTime)
@@ -714,14 +1003,54 @@ class TripSyncer(syncer(models.Trip)):
         }
 
     def _fast_merge(self, trips):
-        num_added, num_updated = self._fast_mappings_merge(models.Trip, trips)
-        trip_id_to_db_trip_pk = genericqueries.get_id_to_pk_map_by_feed_pk(
-            models.Trip, self.feed_update.feed.pk
-        )
+        """
+        Write the trips and their stop times to the database.
+
+        Trips and stop times whose values are identical to those already stored are
+        not written. A trip is counted as unchanged if neither its row nor any of its
+        stop times were written or deleted.
+        """
+        num_added = 0
+        num_updated = 0
+        unchanged_trip_pks = []
+        for trip in trips:
+            if trip.is_new():
+                num_added += 1
+                self._add_departure_board_stop_pks(trip)
+                continue
+            if not trip.is_unchanged():
+                num_updated += 1
+                self._add_departure_board_stop_pks(trip)
+                continue
+            unchanged_trip_pks.append(trip.pk)
+            if trip.pk not in self.trip_pks_with_deleted_stop_times and all(
+                stop_time.is_unchanged()
+                for stop_time in trip.stop_times
+                if stop_time.is_from_parsing
+            ):
+                self.num_unchanged += 1
+            else:
+                num_updated += 1
+                self._add_departure_board_stop_pks(trip)
+        self._fast_mappings_merge(models.Trip, trips)
+        # Unchanged trips still need their source to be updated, otherwise they would
+        # be considered stale and deleted at the end of the import.
+        for chunk_of_trip_pks in fastscheduleoperations.split(unchanged_trip_pks, 5000):
+            dbconnection.get_session().query(models.Trip).filter(
+                models.Trip.pk.in_(chunk_of_trip_pks)
+            ).update({"source_pk": self.feed_update.pk}, synchronize_session=False)
+        # The PKs of existing trips are already known from the diff, so the PKs only
+        # need to be read back from the database if new trips were inserted.
+        if num_added > 0:
+            trip_id_to_db_trip_pk = genericqueries.get_id_to_pk_map_by_feed_pk(
+                models.Trip, self.feed_update.feed.pk
+            )
+            for trip in trips:
+                if trip.is_new():
+                    trip.pk = trip_id_to_db_trip_pk[trip.id]
         for trip in trips:
-            trip_pk = trip_id_to_db_trip_pk[trip.id]
             for stop_time in trip.stop_times:
-                stop_time.trip_pk = trip_pk
+                stop_time.trip_pk = trip.pk
         self._fast_mappings_merge(
             models.TripStopTime,
             (
@@ -733,6 +1062,18 @@ class TripSyncer(syncer(models.Trip)):
         )
         return num_added, num_updated
 
+    def _add_departure_board_stop_pks(self, trip: _Trip):
+        """
+        Mark the departure boards of the stops the trip calls at, both before and after
+        the update, as needing to be rebuilt.
+        """
+        self.departure_board_stop_pks.update(
+            stop_time.stop_pk for stop_time in trip.stop_times
+        )
+        self.departure_board_stop_pks.update(
+            self.trip_pk_to_previous_stop_pks.get(trip.pk, set())
+        )
+
     @staticmethod
     def _fast_mappings_merge(db_model, entities):
         new_mappings = []
@@ -740,15 +1081,28 @@ class TripSyncer(syncer(models.Trip)):
         for entity in entities:
             if entity.is_new():
                 new_mappings.append(entity.to_db_mapping())
-            else:
+            elif not entity.is_unchanged():
                 updated_mappings.append(entity.to_db_mapping())
         session = dbconnection.get_session()
         session.bulk_insert_mappings(db_model, new_mappings)
         session.bulk_update_mappings(db_model, updated_mappings)
         session.flush()
-        return len(new_mappings), len(updated_mappings)
+
+    def delete_stale_entities(self):
+        if departureboardmanager.is_enabled():
+            self.departure_board_stop_pks.update(
+                tripqueries.list_stop_pks_in_stale_trips(self.feed_update)
+            )
+        return super().delete_stale_entities()
 
     def post_sync(self):
+        if (
+            departureboardmanager.is_enabled()
+            and len(self.departure_board_stop_pks) > 0
+        ):
+            departureboardmanager.rebuild_departure_boards(
+                self.feed_update.feed.system_pk, self.departure_board_stop_pks
+            )
         changed_route_pks = servicemapmanager.calculate_changed_route_pks_from_hashes(
             self.route_pk_to_previous_service_map_hash,
             self.route_pk_to_new_service_map_hash,
@@ -835,8 +1189,9 @@ class VehicleImporter(syncer(models.Vehicle)):
 
     @staticmethod
     def _get_stop_id_to_pk_map(system, parsed_vehicles):
-        return stopqueries.get_id_to_pk_map_in_system(
-            system.pk,
+        return idcache.get_id_to_pk_map(
+            models.Stop,
+            system,
             (
                 vehicle.current_stop_id
                 for vehicle in parsed_vehicles
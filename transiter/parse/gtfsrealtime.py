@@ -44,6 +44,18 @@ class GtfsRealtimeParser(TransiterParser):
     def get_trips(self) -> typing.Iterable[parse.Trip]:
         yield from parse_trips(self._gtfs_feed_message)
 
+    def build_trips(
+        self, trip_class: typing.Type[parse.Trip], stop_time_class
+    ) -> typing.Iterable[parse.Trip]:
+        """
+        Build the trips in the feed directly as instances of the given classes.
+
+        The classes must be subclasses of the parse Trip and TripStopTime types. This
+        is used by the importer to build its own trip records straight from the
+        protobuf message, without the intermediate parse types.
+        """
+        yield from parse_trips(self._gtfs_feed_message, trip_class, stop_time_class)
+
     def get_vehicles(self) -> typing.Iterable[parse.Vehicle]:
         yield from parse_vehicles(self._gtfs_feed_message)
 
@@ -146,7 +158,9 @@ def build_alert_messages(alert):
         yield message
 
 
-def parse_trips(feed_message):
+def parse_trips(
+    feed_message, trip_class=parse.Trip, stop_time_class=parse.TripStopTime
+):
     for entity in feed_message.entity:
         if not entity.HasField("trip_update"):
             continue
@@ -175,7 +189,7 @@ def parse_trips(feed_message):
         else:
             trip_start_time = None
 
-        yield parse.Trip(
+        yield trip_class(
             id=trip_desc.trip_id,
             route_id=_get_nullable_field(trip_desc, "route_id"),
             direction_id=_get_nullable_field(trip_desc, "direction_id"),
@@ -188,13 +202,13 @@ def parse_trips(feed_message):
             updated_at=_timestamp_to_datetime(trip_update.timestamp),
             delay=_get_nullable_field(trip_update, "delay"),
             stop_times=[
-                _build_stop_time(stop_time_update)
+                _build_stop_time(stop_time_update, stop_time_class)
                 for stop_time_update in trip_update.stop_time_update
             ],
         )
 
 
-def _build_stop_time(stop_time_update):
+def _build_stop_time(stop_time_update, stop_time_class=parse.TripStopTime):
     # This the only way to actually get the extension...of course, the API can't
     # be trusted to not change but probably it won't.
     # noinspection PyProtectedMember
@@ -203,7 +217,7 @@ def _build_stop_time(stop_time_update):
         track = None
     else:
         track = _get_nullable_field(stop_time_update.Extensions[extension_key], "track")
-    return parse.TripStopTime(
+    return stop_time_class(
         stop_sequence=_get_nullable_field(stop_time_update, "stop_sequence"),
         stop_id=stop_time_update.stop_id,
         schedule_relationship=parse.TripStopTime.ScheduleRelationship(
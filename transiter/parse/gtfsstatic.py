@@ -4,10 +4,14 @@ The GTFS Static module contains the logic for reading feeds of this format.
 The official reference is here: https://gtfs.org/reference/static
 """
 
+import array
 import csv
 import datetime
 import enum
+import hashlib
 import io
+import itertools
+import json
 import typing
 import uuid
 import zipfile
@@ -23,6 +27,7 @@ class GtfsStaticParser(TransiterParser):
     def __init__(self):
         super().__init__()
         self._transfers_config = _TransfersConfig()
+        self._file_hashes = None
 
     def load_options(self, options_blob: typing.Optional[dict]) -> None:
         self._transfers_config = _TransfersConfig.load_from_options_blob(
@@ -31,6 +36,50 @@ class GtfsStaticParser(TransiterParser):
 
     def load_content(self, content: bytes) -> None:
         self.gtfs_static_file = _GtfsStaticFile(content)
+        self._file_hashes = None
+
+    def get_file_hashes(self) -> typing.Dict[str, str]:
+        """
+        Return a map from internal file name to the hash of that file's content.
+
+        The map also contains an entry for the transfers options, as these affect the
+        stops and transfers that are parsed just like the files themselves do.
+        """
+        if self._file_hashes is None:
+            self._file_hashes = self.gtfs_static_file.calculate_file_hashes()
+            self._file_hashes[
+                _TRANSFERS_CONFIG_HASH_KEY
+            ] = self._transfers_config.hash()
+        return self._file_hashes
+
+    def get_unchanged_types(
+        self, previous_file_hashes: typing.Optional[typing.Dict[str, str]]
+    ) -> typing.Set[typing.Type]:
+        """
+        Return the entity types whose source files are identical to those described
+        by the previous file hashes.
+
+        These entity types would be parsed into exactly the same entities as in the
+        previous update, so the importer can skip syncing them. Entity types whose
+        getter has been overridden in a subclass are never reported as unchanged, as
+        the overriding getter may depend on more than the files.
+        """
+        if previous_file_hashes is None:
+            return set()
+        file_hashes = self.get_file_hashes()
+        unchanged_types = set()
+        for entity_type, hash_keys in _ENTITY_TYPE_TO_HASH_KEYS.items():
+            method_name = self.__type_to_method__[entity_type].__name__
+            if getattr(type(self), method_name) is not getattr(
+                GtfsStaticParser, method_name
+            ):
+                continue
+            if all(
+                file_hashes.get(key) == previous_file_hashes.get(key)
+                for key in hash_keys
+            ):
+                unchanged_types.add(entity_type)
+        return unchanged_types
 
     def get_agencies(self) -> typing.Iterable[parse.Agency]:
         for row in self.gtfs_static_file.agency():
@@ -59,6 +108,27 @@ class GtfsStaticParser(TransiterParser):
     def get_scheduled_services(self) -> typing.Iterable[parse.ScheduledService]:
         yield from _parse_schedule(self.gtfs_static_file)
 
+    def stream_scheduled_services(
+        self,
+    ) -> typing.Tuple[
+        typing.List[parse.ScheduledService], typing.Iterable["StopTimeColumns"]
+    ]:
+        """
+        Return the scheduled services along with a lazy stream of their stop times.
+
+        Unlike get_scheduled_services, the trips in the returned services do not have
+        their stop times populated. Instead, the stop times are returned separately as
+        an iterable of StopTimeColumns blocks that reads stop_times.txt a block at a
+        time each time it is iterated over. This is used by the importer so that the
+        full set of stop times, which for large feeds is by far the biggest table, is
+        never held in memory at once.
+        """
+        services = list(
+            _parse_schedule(self.gtfs_static_file, include_stop_times=False)
+        )
+        trip_ids = set(trip.id for service in services for trip in service.trips)
+        return services, _StopTimesStream(self.gtfs_static_file, trip_ids)
+
 
 class _TransfersStrategy(enum.Enum):
     DEFAULT = 0
@@ -109,6 +179,15 @@ class _TransfersConfig:
             )
         return self.default_strategy
 
+    def hash(self) -> str:
+        blob = {
+            "default_strategy": self.default_strategy.name,
+            "exceptions": sorted(sorted(exception) for exception in self.exceptions),
+        }
+        m = hashlib.md5()
+        m.update(json.dumps(blob).encode("utf-8"))
+        return m.hexdigest()
+
 
 class _GtfsStaticFile:
     class _InternalFileName(enum.Enum):
@@ -143,6 +222,9 @@ class _GtfsStaticFile:
     def stop_times(self):
         return self._read_internal_file(self._InternalFileName.STOP_TIMES)
 
+    def stop_times_columns(self):
+        return self._read_internal_file_columns(self._InternalFileName.STOP_TIMES)
+
     def transfers(self):
         return self._read_internal_file(self._InternalFileName.TRANSFERS)
 
@@ -152,6 +234,22 @@ class _GtfsStaticFile:
     def trip_frequencies(self):
         return self._read_internal_file(self._InternalFileName.FREQUENCIES)
 
+    def calculate_file_hashes(self) -> typing.Dict[str, str]:
+        """
+        Calculate the hash of each internal file that is present in the archive.
+        """
+        file_name_to_hash = {}
+        for file_name in self._InternalFileName:
+            m = hashlib.md5()
+            try:
+                with self._zip_file.open(file_name.value) as raw_file:
+                    for block in iter(lambda: raw_file.read(_HASH_BLOCK_SIZE), b""):
+                        m.update(block)
+            except KeyError:
+                continue
+            file_name_to_hash[file_name.value] = m.hexdigest()
+        return file_name_to_hash
+
     def _read_internal_file(self, file_name):
         """
         Read a GTFS static file
@@ -169,6 +267,78 @@ class _GtfsStaticFile:
         except KeyError:
             return []
 
+    def _read_internal_file_columns(self, file_name):
+        """
+        Read a GTFS static file column-wise, in blocks of rows.
+
+        Unlike _read_internal_file, no dictionary is built for each row. The rows in
+        each block are decoded by the C CSV reader and then transposed into columns
+        in a single pass.
+
+        :param file_name: which static file to read
+        :return: iterator of dictionaries, one for each block of rows, mapping each
+            column name to the column's values in that block. Values missing from
+            short rows are None.
+        """
+        file_name = file_name.value
+        try:
+            with self._zip_file.open(file_name) as raw_csv_file:
+                csv_file = io.TextIOWrapper(raw_csv_file, "utf-8-sig")
+                csv_reader = csv.reader(csv_file)
+                column_names = next(csv_reader, None)
+                if column_names is None:
+                    return
+                while True:
+                    block = list(itertools.islice(csv_reader, _COLUMNS_BLOCK_SIZE))
+                    if len(block) == 0:
+                        return
+                    rows = [row for row in block if len(row) > 0]
+                    if len(rows) == 0:
+                        continue
+                    columns = list(itertools.zip_longest(*rows))
+                    columns.extend(
+                        [(None,) * len(rows)] * (len(column_names) - len(columns))
+                    )
+                    yield dict(zip(column_names, columns))
+        except KeyError:
+            return
+
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+_COLUMNS_BLOCK_SIZE = 10000
+
+_TRANSFERS_CONFIG_HASH_KEY = "transfers_options"
+
+_FileName = _GtfsStaticFile._InternalFileName
+
+# For each entity type, the internal files and options that the parsed entities
+# depend on. Routes, stops and transfers also depend on the entities in other files
+# because the importer resolves references to those entities by ID.
+_ENTITY_TYPE_TO_HASH_KEYS = {
+    parse.Agency: [_FileName.AGENCY.value],
+    parse.Route: [_FileName.AGENCY.value, _FileName.ROUTES.value],
+    parse.Stop: [
+        _FileName.STOPS.value,
+        _FileName.TRANSFERS.value,
+        _TRANSFERS_CONFIG_HASH_KEY,
+    ],
+    parse.Transfer: [
+        _FileName.STOPS.value,
+        _FileName.TRANSFERS.value,
+        _TRANSFERS_CONFIG_HASH_KEY,
+    ],
+    parse.ScheduledService: [
+        _FileName.CALENDAR.value,
+        _FileName.CALENDAR_DATES.value,
+        _FileName.FREQUENCIES.value,
+        _FileName.ROUTES.value,
+        _FileName.STOP_TIMES.value,
+        _FileName.STOPS.value,
+        _FileName.TRIPS.value,
+    ],
+}
+
 
 def _parse_routes(gtfs_static_file: _GtfsStaticFile):
     for row in gtfs_static_file.routes():
@@ -364,7 +534,7 @@ def _create_station_from_child_stops(child_stops):
     )
 
 
-def _parse_schedule(gtfs_static_file: _GtfsStaticFile):
+def _parse_schedule(gtfs_static_file: _GtfsStaticFile, include_stop_times=True):
     str_to_bool = {"0": False, "1": True}
 
     service_id_to_service = {}
@@ -421,22 +591,7 @@ def _parse_schedule(gtfs_static_file: _GtfsStaticFile):
         service_id_to_service[service_id].trips.append(trip)
         trip_id_to_trip[trip.id] = trip
 
-    # NOTE: memoization of the next function cuts about 2 seconds off the time taken to
-    # parse the NYC Subway's GTFS static feed. However because the function itself is
-    # not very computationally intensive, to see any benefit it is necessary to have
-    # a very simple memoization process.
-    cache = {}
-
-    def time_string_to_datetime_time(time_string):
-        if time_string not in cache:
-            s = time_string.split(":")
-            if len(s) != 3:
-                return None
-            hour, minute, second = s
-            cache[time_string] = datetime.time(
-                hour=int(hour) % 24, minute=int(minute), second=int(second)
-            )
-        return cache[time_string]
+    time_string_to_datetime_time = _TimeStringParser()
 
     for row in gtfs_static_file.trip_frequencies():
         trip = trip_id_to_trip.get(row["trip_id"])
@@ -451,49 +606,208 @@ def _parse_schedule(gtfs_static_file: _GtfsStaticFile):
             )
         )
 
-    for row in gtfs_static_file.stop_times():
-        trip_id = row["trip_id"]
-        if trip_id not in trip_id_to_trip:
-            continue
-        dep_time = time_string_to_datetime_time(row["departure_time"])
-        arr_time = time_string_to_datetime_time(row["arrival_time"])
-        if dep_time is None:
-            print("Skipping stop_times.txt row", row)
-            continue
-        if arr_time is None:
-            arr_time = dep_time
-        stop_time = parse.ScheduledTripStopTime(
-            stop_id=row["stop_id"],
-            stop_sequence=int(row["stop_sequence"]),
-            departure_time=dep_time,
-            arrival_time=arr_time,
-            headsign=row.get("stop_headsign"),
-            pickup_type=_get_enum_by_key(
-                parse.BoardingPolicy,
-                row.get("pickup_type"),
-                parse.BoardingPolicy.ALLOWED,
+    if include_stop_times:
+        for columns in _StopTimesStream(gtfs_static_file, trip_id_to_trip):
+            for trip_id, stop_time in columns.to_stop_times():
+                trip_id_to_trip[trip_id].stop_times.append(stop_time)
+
+    yield from service_id_to_service.values()
+
+
+class _TimeStringParser:
+    """
+    Callable that converts GTFS time strings like 25:03:00 to datetime.time objects.
+
+    NOTE: memoization of this conversion cuts about 2 seconds off the time taken to
+    parse the NYC Subway's GTFS static feed. However because the conversion itself is
+    not very computationally intensive, to see any benefit it is necessary to have
+    a very simple memoization process.
+    """
+
+    def __init__(self):
+        self._cache = {}
+
+    def __call__(self, time_string):
+        if time_string not in self._cache:
+            s = time_string.split(":")
+            if len(s) != 3:
+                return None
+            hour, minute, second = s
+            self._cache[time_string] = datetime.time(
+                hour=int(hour) % 24, minute=int(minute), second=int(second)
+            )
+        return self._cache[time_string]
+
+
+class _EnumStringParser:
+    """
+    Callable that converts GTFS enum strings like "1" to enum members.
+
+    Like _TimeStringParser, the conversion is memoized as there are only a handful of
+    distinct strings in any enum column.
+    """
+
+    def __init__(self, enum_class, default):
+        self._enum_class = enum_class
+        self._default = default
+        self._cache = {}
+
+    def __call__(self, key):
+        if key not in self._cache:
+            self._cache[key] = _get_enum_by_key(self._enum_class, key, self._default)
+        return self._cache[key]
+
+
+@dataclasses.dataclass
+class StopTimeColumns:
+    """
+    A block of scheduled trip stop times stored column-wise.
+
+    Each field is a sequence with one entry per stop time; together, the i-th entries
+    of the fields describe the i-th stop time in the block. Storing stop times this
+    way avoids creating an object for every stop time in the feed.
+    """
+
+    trip_id: typing.Sequence[str]
+    stop_id: typing.Sequence[str]
+    arrival_time: typing.Sequence[datetime.time]
+    departure_time: typing.Sequence[datetime.time]
+    stop_sequence: typing.Sequence[int]
+    headsign: typing.Sequence[typing.Optional[str]]
+    pickup_type: typing.Sequence[parse.BoardingPolicy]
+    drop_off_type: typing.Sequence[parse.BoardingPolicy]
+    continuous_pickup: typing.Sequence[parse.BoardingPolicy]
+    continuous_drop_off: typing.Sequence[parse.BoardingPolicy]
+    shape_distance_traveled: typing.Sequence[typing.Optional[float]]
+    exact_times: typing.Sequence[bool]
+
+    @classmethod
+    def from_stop_times(
+        cls, stop_times: typing.Iterable[typing.Tuple[str, parse.ScheduledTripStopTime]]
+    ) -> "StopTimeColumns":
+        """
+        Build the columns from (trip ID, stop time) pairs.
+        """
+        stop_times = list(stop_times)
+        return cls(
+            trip_id=[trip_id for trip_id, _ in stop_times],
+            **{
+                field.name: [
+                    getattr(stop_time, field.name) for _, stop_time in stop_times
+                ]
+                for field in dataclasses.fields(parse.ScheduledTripStopTime)
+            },
+        )
+
+    def to_stop_times(
+        self,
+    ) -> typing.Iterator[typing.Tuple[str, parse.ScheduledTripStopTime]]:
+        """
+        Iterate over the stop times as (trip ID, stop time) pairs.
+        """
+        field_names = [
+            field.name for field in dataclasses.fields(parse.ScheduledTripStopTime)
+        ]
+        for trip_id, *values in zip(
+            self.trip_id, *(getattr(self, field_name) for field_name in field_names)
+        ):
+            yield trip_id, parse.ScheduledTripStopTime(**dict(zip(field_names, values)))
+
+    def __len__(self):
+        return len(self.trip_id)
+
+
+class _StopTimesStream:
+    """
+    Re-iterable stream of the stop times in stop_times.txt, as StopTimeColumns blocks.
+
+    Each column is decoded in a single pass over its values, using memoized
+    converters for the times and enums, rather than row by row.
+    """
+
+    def __init__(self, gtfs_static_file: _GtfsStaticFile, trip_ids):
+        self._gtfs_static_file = gtfs_static_file
+        self._trip_ids = trip_ids
+        self._time_string_to_datetime_time = _TimeStringParser()
+        self._boarding_policy_parsers = {
+            default: _EnumStringParser(parse.BoardingPolicy, default)
+            for default in parse.BoardingPolicy
+        }
+
+    def __iter__(self) -> typing.Iterator[StopTimeColumns]:
+        for raw_columns in self._gtfs_static_file.stop_times_columns():
+            columns = self._decode(raw_columns)
+            if len(columns) > 0:
+                yield columns
+
+    def _decode(self, raw_columns) -> StopTimeColumns:
+        # Rows whose trip ID is not in the feed are dropped first so that none of
+        # their other columns need to be decoded.
+        raw_columns = _filter_columns(
+            raw_columns, list(map(self._trip_ids.__contains__, raw_columns["trip_id"]))
+        )
+        departure_times = list(
+            map(self._time_string_to_datetime_time, raw_columns["departure_time"])
+        )
+        if None in departure_times:
+            for i, departure_time in enumerate(departure_times):
+                if departure_time is None:
+                    print(
+                        "Skipping stop_times.txt row",
+                        {name: column[i] for name, column in raw_columns.items()},
+                    )
+            mask = [departure_time is not None for departure_time in departure_times]
+            raw_columns = _filter_columns(raw_columns, mask)
+            departure_times = list(itertools.compress(departure_times, mask))
+        num_rows = len(departure_times)
+
+        def column(name, default=None):
+            return raw_columns.get(name, (default,) * num_rows)
+
+        def boarding_policy_column(name, default):
+            return list(map(self._boarding_policy_parsers[default], column(name)))
+
+        return StopTimeColumns(
+            trip_id=raw_columns["trip_id"],
+            stop_id=raw_columns["stop_id"],
+            arrival_time=[
+                departure_time if arrival_time is None else arrival_time
+                for arrival_time, departure_time in zip(
+                    map(
+                        self._time_string_to_datetime_time, raw_columns["arrival_time"]
+                    ),
+                    departure_times,
+                )
+            ],
+            departure_time=departure_times,
+            stop_sequence=array.array("l", map(int, raw_columns["stop_sequence"])),
+            headsign=column("stop_headsign"),
+            pickup_type=boarding_policy_column(
+                "pickup_type", parse.BoardingPolicy.ALLOWED
             ),
-            drop_off_type=_get_enum_by_key(
-                parse.BoardingPolicy,
-                row.get("drop_off_type"),
-                parse.BoardingPolicy.ALLOWED,
+            drop_off_type=boarding_policy_column(
+                "drop_off_type", parse.BoardingPolicy.ALLOWED
             ),
-            continuous_pickup=_get_enum_by_key(
-                parse.BoardingPolicy,
-                row.get("continuous_pickup"),
-                parse.BoardingPolicy.NOT_ALLOWED,
+            continuous_pickup=boarding_policy_column(
+                "continuous_pickup", parse.BoardingPolicy.NOT_ALLOWED
             ),
-            continuous_drop_off=_get_enum_by_key(
-                parse.BoardingPolicy,
-                row.get("continuous_drop_off"),
-                parse.BoardingPolicy.NOT_ALLOWED,
+            continuous_drop_off=boarding_policy_column(
+                "continuous_drop_off", parse.BoardingPolicy.NOT_ALLOWED
             ),
-            shape_distance_traveled=_cast_to_float(row.get("shape_dist_traveled")),
-            exact_times=row.get("timepoint", "0") == "1",
+            shape_distance_traveled=list(
+                map(_cast_to_float, column("shape_dist_traveled"))
+            ),
+            exact_times=[value == "1" for value in column("timepoint", "0")],
         )
-        trip_id_to_trip[trip_id].stop_times.append(stop_time)
 
-    yield from service_id_to_service.values()
+
+def _filter_columns(raw_columns, mask):
+    if all(mask):
+        return raw_columns
+    return {
+        name: list(itertools.compress(column, mask))
+        for name, column in raw_columns.items()
+    }
 
 
 def date_string_to_datetime_date(date_string):
@@ -46,6 +46,26 @@ def dfield(*args, **kwargs):
     return dataclasses.field(*args, **kwargs)
 
 
+def _slotted(cls):
+    """
+    Recreate a dataclass so that its fields are stored in __slots__.
+
+    Instances of the new class have no per-instance __dict__, which makes them
+    substantially smaller and faster to construct. This is used for the types that
+    are created in very large numbers during imports. It is equivalent to
+    dataclass(slots=True), which is only available in Python 3.10+.
+    """
+    field_names = tuple(field.name for field in dataclasses.fields(cls))
+    cls_dict = dict(cls.__dict__)
+    cls_dict["__slots__"] = field_names
+    for name in field_names + ("__dict__", "__weakref__"):
+        # Field defaults are stored as class attributes, which would conflict with
+        # the slot descriptors. The generated __init__ method has its own copy of
+        # the defaults so these attributes are not needed.
+        cls_dict.pop(name, None)
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
 @dataclass
 class Agency:
     """
@@ -276,6 +296,7 @@ class ScheduledTripFrequency:
     frequency_based: bool = True
 
 
+@_slotted
 @dataclass
 class ScheduledTripStopTime:
     """
@@ -296,6 +317,7 @@ class ScheduledTripStopTime:
     exact_times: bool = False
 
 
+@_slotted
 @dataclass
 class Trip:
     """
@@ -328,6 +350,7 @@ class Trip:
     stop_times: typing.List["TripStopTime"] = dfield(default_factory=list)
 
 
+@_slotted
 @dataclass
 class TripStopTime:
     """
@@ -353,6 +376,7 @@ class TripStopTime:
     track: str = None  # Transiter-only non-GTFS field
 
 
+@_slotted
 @dataclass
 class Vehicle:
     """
@@ -408,6 +432,7 @@ class Vehicle:
     occupancy_status: OccupancyStatus = OccupancyStatus.UNKNOWN
 
 
+@_slotted
 @dataclass
 class Alert:
     """
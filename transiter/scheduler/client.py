@@ -45,10 +45,22 @@ def refresh_tasks():
     return False
 
 
-def feed_update_callback(feed_pk, status, result, entity_type_to_num_in_db):
+def feed_update_callback(
+    feed_pk,
+    status,
+    result,
+    entity_type_to_num_in_db,
+    content_created_at=None,
+    trigger_id=None,
+):
     """
-    Send a message to the scheduler that a feed update has completed
+    Send a message to the scheduler that a feed update has completed.
+
+    :param trigger_id: the ID of the scheduler trigger of the update, if the update
+        was triggered by the scheduler
     """
+    if content_created_at is not None:
+        content_created_at = content_created_at.timestamp()
     try:
         requests.post(
             "http://{}:{}/feed_update_callback".format(
@@ -59,6 +71,29 @@ def feed_update_callback(feed_pk, status, result, entity_type_to_num_in_db):
                 "status": status.name,
                 "result": result.name,
                 "entity_type_to_count": entity_type_to_num_in_db,
+                "content_created_at": content_created_at,
+                "trigger_id": trigger_id,
+            },
+            timeout=0.25,
+        )
+    except requests.RequestException:
+        pass
+
+
+def feed_updates_skipped_callback(system_id, feed_ids, trigger_id):
+    """
+    Send a message to the scheduler that feeds of a scheduler trigger were not
+    updated, because they no longer exist.
+    """
+    try:
+        requests.post(
+            "http://{}:{}/feed_updates_skipped_callback".format(
+                config.SCHEDULER_HOST, config.SCHEDULER_PORT
+            ),
+            json={
+                "system_id": system_id,
+                "feed_ids": list(feed_ids),
+                "trigger_id": trigger_id,
             },
             timeout=0.25,
         )
@@ -15,6 +15,9 @@ PROMETHEUS_NUM_UPDATES = "transiter_num_updates"
 PROMETHEUS_LAST_UPDATE = "transiter_last_update"
 PROMETHEUS_SUCCESSFUL_UPDATE_LATENCY = "transiter_successful_update_latency"
 PROMETHEUS_NUM_ENTITIES = "transiter_num_entities"
+PROMETHEUS_NUM_IN_FLIGHT_UPDATES = "transiter_num_in_flight_updates"
+PROMETHEUS_NUM_PENDING_UPDATES = "transiter_num_pending_updates"
+PROMETHEUS_NUM_SKIPPED_TRIGGERS = "transiter_num_skipped_triggers"
 
 
 class MetricsPopulator:
@@ -50,6 +53,9 @@ class MetricsPopulator:
             feedservice.get_feed_pk_to_system_id_and_feed_id_map()
         )
 
+    def get_system_id_and_feed_id(self, feed_pk) -> typing.Tuple[str, str]:
+        return self._feed_pk_to_system_id_and_feed_id.get(feed_pk, (None, None))
+
     def report(self, blob):
         if blob is None:
             return "expected JSON payload"
@@ -9,8 +9,10 @@ import datetime
 import json
 import logging
 import random
+import threading
 import time
 import typing
+import uuid
 
 import apscheduler.schedulers.background
 import flask
@@ -19,9 +21,11 @@ import prometheus_client as prometheus
 from sqlalchemy.exc import SQLAlchemyError
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 
+from transiter import config
+from transiter.db import dbconnection, models
 from transiter.executor import celeryapp
 from transiter.scheduler import metrics
-from transiter.services import feedservice
+from transiter.services import feedservice, views
 
 logger = logging.getLogger("transiter")
 
@@ -72,6 +76,103 @@ class PeriodicSchedule(Schedule):
         )
 
 
+# The period of an adaptive schedule is reconsidered each time this many feed update
+# results have been reported.
+ADAPTIVE_WINDOW = 10
+# If at least this fraction of the updates in the window found new content the period
+# is shortened; if at most this fraction did, the period is lengthened.
+ADAPTIVE_SHORTEN_RATIO = 0.8
+ADAPTIVE_LENGTHEN_RATIO = 0.3
+ADAPTIVE_SHORTEN_FACTOR = 0.75
+ADAPTIVE_LENGTHEN_FACTOR = 1.5
+# When the feed reports when its content was created, the period is capped so that
+# there are at least this many updates for each new version of the content.
+ADAPTIVE_UPDATES_PER_CONTENT = 2
+
+
+class AdaptiveSchedule(PeriodicSchedule):
+    """
+    A periodic schedule whose period adapts, within bounds, to how often the content
+    of the feed changes.
+
+    The results of the feed's updates are reported to the schedule. Once a window of
+    results has been collected, the period is shortened if almost every update found
+    new content, as changes are then likely being missed, and lengthened if most
+    updates found the content unchanged. If the feed reports when its content was
+    created, the period is also capped using the observed interval between new
+    versions of the content.
+
+    Two adaptive schedules are equal if they have the same configuration, so the
+    learned period survives refreshes of the registry.
+    """
+
+    def __init__(self, period, min_period, max_period):
+        super().__init__(min(max(period, min_period), max_period))
+        self._initial_period = self._period
+        self._min_period = min_period
+        self._max_period = max_period
+        self._results: typing.List[bool] = []
+        self._content_created_ats = collections.deque(maxlen=ADAPTIVE_WINDOW + 1)
+
+    def report(self, result: models.FeedUpdate.Result, content_created_at=None) -> bool:
+        """
+        Report the result of an update of the feed.
+
+        :return: whether the period of the schedule changed
+        """
+        if content_created_at is not None and (
+            len(self._content_created_ats) == 0
+            or content_created_at > self._content_created_ats[-1]
+        ):
+            self._content_created_ats.append(content_created_at)
+        if result == models.FeedUpdate.Result.UPDATED:
+            self._results.append(True)
+        elif result == models.FeedUpdate.Result.NOT_NEEDED:
+            self._results.append(False)
+        else:
+            # Failed updates say nothing about how often the content changes.
+            return False
+        if len(self._results) < ADAPTIVE_WINDOW:
+            return False
+        new_period = self._calculate_period()
+        self._results = []
+        if new_period == self._period:
+            return False
+        self._period = new_period
+        return True
+
+    def _calculate_period(self):
+        updated_ratio = sum(self._results) / len(self._results)
+        period = self._period
+        if updated_ratio >= ADAPTIVE_SHORTEN_RATIO:
+            period *= ADAPTIVE_SHORTEN_FACTOR
+        elif updated_ratio <= ADAPTIVE_LENGTHEN_RATIO:
+            period *= ADAPTIVE_LENGTHEN_FACTOR
+        if len(self._content_created_ats) >= 2:
+            content_period = (
+                self._content_created_ats[-1] - self._content_created_ats[0]
+            ) / (len(self._content_created_ats) - 1)
+            period = min(period, content_period / ADAPTIVE_UPDATES_PER_CONTENT)
+        return round(min(max(period, self._min_period), self._max_period), 1)
+
+    def json(self):
+        json_ = super().json()
+        json_["parameters"] = {
+            "period": self._period,
+            "initial_period": self._initial_period,
+            "min_period": self._min_period,
+            "max_period": self._max_period,
+        }
+        return json_
+
+    def __eq__(self, other):
+        return isinstance(other, AdaptiveSchedule) and (
+            self._initial_period,
+            self._min_period,
+            self._max_period,
+        ) == (other._initial_period, other._min_period, other._max_period)
+
+
 class CronSchedule(Schedule):
     def __init__(self, minute):
         self._minute = minute
@@ -115,29 +216,278 @@ class Task:
         }
 
 
-class FeedAutoUpdateTask(Task):
-    def __init__(self, system_id, feed_id):
+class FeedUpdateTracker:
+    """
+    The feed update tracker keeps track of the feed updates that have been triggered by
+    the scheduler but that have not yet been reported as completed through the feed
+    update callback.
+
+    Each trigger is given an ID that is passed to the executor and sent back in the
+    feed update callback, so that only the updates triggered by the scheduler release
+    their feeds; callbacks for updates triggered in other ways, for example through
+    the HTTP API, are ignored. If a feed of a trigger no longer exists the executor
+    reports that the feed was skipped, which also releases the feed.
+
+    A feed task is only triggered if none of its feeds have an update in flight.
+    Otherwise, the trigger is skipped and the task is marked as pending; pending tasks
+    are triggered as soon as all of their feeds' updates complete. When the executor is
+    behind this coalesces triggers into at most one pending update per feed, rather
+    than piling up overlapping updates.
+
+    Because a completion report may never arrive, for example if the executor crashes,
+    an update is no longer considered in flight after a timeout. The executor task of
+    the update expires at the same time, so a task stuck behind a backlog is dropped
+    rather than running next to the task of a later trigger.
+    """
+
+    def __init__(self, registry=prometheus.REGISTRY):
+        self._lock = threading.Lock()
+        self._feed_key_to_trigger: typing.Dict[
+            typing.Tuple[str, str], typing.Tuple[str, float]
+        ] = {}
+        self._pending_tasks: typing.Set["_FeedTask"] = set()
+        self._num_in_flight = prometheus.Gauge(
+            metrics.PROMETHEUS_NUM_IN_FLIGHT_UPDATES,
+            "Number of feed updates in a system that have been triggered but not "
+            "yet completed",
+            ["system_id"],
+            registry=registry,
+        )
+        self._num_pending = prometheus.Gauge(
+            metrics.PROMETHEUS_NUM_PENDING_UPDATES,
+            "Number of feed updates in a system waiting for a previous update to "
+            "complete",
+            ["system_id"],
+            registry=registry,
+        )
+        self._num_skipped_triggers = prometheus.Counter(
+            metrics.PROMETHEUS_NUM_SKIPPED_TRIGGERS,
+            "Number of times an update of a given feed was not triggered because a "
+            "previous update was in flight",
+            ["system_id", "feed_id"],
+            registry=registry,
+        )
+        self._system_ids = set()
+
+    def start(self, task: "_FeedTask", timeout) -> typing.Optional[str]:
+        """
+        Record that the task is being triggered.
+
+        :return: the ID of the trigger, or None if the task should not be triggered.
+            In the latter case the task has been marked as pending.
+        """
+        with self._lock:
+            self._remove_expired()
+            feed_keys = task.feed_keys()
+            if any(feed_key in self._feed_key_to_trigger for feed_key in feed_keys):
+                for system_id, feed_id in feed_keys:
+                    self._num_skipped_triggers.labels(
+                        system_id=system_id, feed_id=feed_id
+                    ).inc()
+                self._pending_tasks.add(task)
+                self._update_gauges()
+                return None
+            trigger_id = uuid.uuid4().hex
+            deadline = time.time() + timeout
+            for feed_key in feed_keys:
+                self._feed_key_to_trigger[feed_key] = (trigger_id, deadline)
+            self._pending_tasks.discard(task)
+            self._update_gauges()
+            return trigger_id
+
+    def finish(self, system_id, feed_id, trigger_id):
+        """
+        Record that an update for the feed has completed, and trigger any pending
+        tasks that are now ready.
+
+        :param trigger_id: the ID of the trigger of the update, or None if the update
+            was not triggered by the scheduler. The feed is only released if this is
+            the trigger of the feed's update in flight.
+        """
+        self._release(feed_key=(system_id, feed_id), trigger_id=trigger_id)
+
+    def release_expired(self):
+        """
+        Release the feeds of updates that are no longer considered in flight, and
+        trigger any pending tasks that are now ready.
+
+        This is called when the executor reports that a task expired. The updates of
+        later triggers are still in flight and are not released.
+        """
+        self._release()
+
+    def _release(self, feed_key=None, trigger_id=None):
+        with self._lock:
+            entry = self._feed_key_to_trigger.get(feed_key)
+            if entry is not None and trigger_id is not None and entry[0] == trigger_id:
+                del self._feed_key_to_trigger[feed_key]
+            self._remove_expired()
+            ready_tasks = [
+                task
+                for task in self._pending_tasks
+                if not any(
+                    feed_key in self._feed_key_to_trigger
+                    for feed_key in task.feed_keys()
+                )
+            ]
+            self._pending_tasks.difference_update(ready_tasks)
+            self._update_gauges()
+        for task in ready_tasks:
+            if task.schedule is not None:
+                task.run()
+
+    def _remove_expired(self):
+        now = time.time()
+        for feed_key, (_, deadline) in list(self._feed_key_to_trigger.items()):
+            if deadline <= now:
+                del self._feed_key_to_trigger[feed_key]
+
+    def _update_gauges(self):
+        system_id_to_num_in_flight = collections.defaultdict(int)
+        for system_id, _ in self._feed_key_to_trigger.keys():
+            system_id_to_num_in_flight[system_id] += 1
+        system_id_to_num_pending = collections.defaultdict(int)
+        for task in self._pending_tasks:
+            for system_id, _ in task.feed_keys():
+                system_id_to_num_pending[system_id] += 1
+        self._system_ids.update(system_id_to_num_in_flight.keys())
+        self._system_ids.update(system_id_to_num_pending.keys())
+        for system_id in self._system_ids:
+            self._num_in_flight.labels(system_id=system_id).set(
+                system_id_to_num_in_flight[system_id]
+            )
+            self._num_pending.labels(system_id=system_id).set(
+                system_id_to_num_pending[system_id]
+            )
+
+
+# An update is considered to be lost if it has not completed after this many periods
+# of the feed, or after the minimum timeout if that is longer.
+IN_FLIGHT_TIMEOUT_PERIODS = 10
+MIN_IN_FLIGHT_TIMEOUT = 60
+
+
+class _FeedTask(Task):
+    """
+    Base class for tasks that update feeds. Triggers are coordinated using the feed
+    update tracker.
+    """
+
+    def __init__(self, system_id):
         self._system_id = system_id
-        self._feed_id = feed_id
         super().__init__()
 
+    def feed_keys(self) -> typing.List[typing.Tuple[str, str]]:
+        raise NotImplementedError
+
     def run(self):
-        expires = (
-            self.schedule.period * 0.8
-            if isinstance(self.schedule, PeriodicSchedule)
-            else None
+        timeout = MIN_IN_FLIGHT_TIMEOUT
+        if isinstance(self.schedule, PeriodicSchedule):
+            timeout = max(timeout, self.schedule.period * IN_FLIGHT_TIMEOUT_PERIODS)
+        trigger_id = feed_update_tracker.start(self, timeout)
+        if trigger_id is None:
+            logger.info("Skipping task update %s; update in flight", self._describe())
+            return
+        logger.info("Triggering task update %s", self._describe())
+        # The task expires when the tracker stops considering it in flight, so that a
+        # stale task can never run alongside the task of a later trigger.
+        self._trigger(trigger_id, expires=timeout)
+
+    def _trigger(self, trigger_id, expires):
+        raise NotImplementedError
+
+    def _on_expired(self):
+        logger.info("Task update %s expired before running", self._describe())
+        feed_update_tracker.release_expired()
+
+    def _describe(self):
+        return "{}/{}".format(
+            self._system_id, ",".join(feed_id for _, feed_id in self.feed_keys())
+        )
+
+
+class FeedAutoUpdateTask(_FeedTask):
+    def __init__(self, system_id, feed_id):
+        self._feed_id = feed_id
+        super().__init__(system_id)
+
+    def feed_keys(self):
+        return [(self._system_id, self._feed_id)]
+
+    def report(self, result: models.FeedUpdate.Result, content_created_at=None):
+        """
+        Report the result of an update of the feed, and reschedule the task if this
+        changes the period of its adaptive schedule.
+        """
+        schedule = self.schedule
+        if not isinstance(schedule, AdaptiveSchedule):
+            return
+        if not schedule.report(result, content_created_at):
+            return
+        logger.info(
+            "Changing period of task update %s to %s seconds",
+            self._describe(),
+            schedule.period,
         )
+        self._job.reschedule(trigger="interval", seconds=schedule.period)
+
+    def _trigger(self, trigger_id, expires):
         # NOTE: access the task like a static method to avoid the current instance
-        # being unnecessarily being sent through RabbitMQ.
-        logger.info("Triggering task update %s/%s", self._system_id, self._feed_id)
-        FeedAutoUpdateTask._create_feed_update.apply_async(
-            args=(None, self._system_id, self._feed_id), expires=expires
+        # being unnecessarily being sent to the executor.
+        celeryapp.submit(
+            FeedAutoUpdateTask._create_feed_update,
+            None,
+            self._system_id,
+            self._feed_id,
+            trigger_id,
+            expires=expires,
+            on_expired=self._on_expired,
         )
 
     @celeryapp.app.task
-    def _create_feed_update(self, system_id, feed_id):
+    def _create_feed_update(self, system_id, feed_id, trigger_id=None):
         return feedservice.create_and_execute_feed_update(
-            system_id, feed_id, execute_async=False
+            system_id, feed_id, execute_async=False, trigger_id=trigger_id
+        )
+
+
+class FeedsAutoUpdateTask(_FeedTask):
+    """
+    Task that updates multiple feeds in a system in a single batch.
+    """
+
+    def __init__(self, system_id, feed_ids):
+        self._feed_ids = feed_ids
+        super().__init__(system_id)
+
+    @property
+    def feed_ids(self):
+        return self._feed_ids
+
+    @feed_ids.setter
+    def feed_ids(self, feed_ids):
+        self._feed_ids = feed_ids
+
+    def feed_keys(self):
+        return [(self._system_id, feed_id) for feed_id in self._feed_ids]
+
+    def _trigger(self, trigger_id, expires):
+        # NOTE: access the task like a static method to avoid the current instance
+        # being unnecessarily being sent to the executor.
+        celeryapp.submit(
+            FeedsAutoUpdateTask._create_feed_updates,
+            None,
+            self._system_id,
+            self._feed_ids,
+            trigger_id,
+            expires=expires,
+            on_expired=self._on_expired,
+        )
+
+    @celeryapp.app.task
+    def _create_feed_updates(self, system_id, feed_ids, trigger_id=None):
+        return feedservice.create_and_execute_feed_updates(
+            system_id, feed_ids, trigger_id=trigger_id
         )
 
 
@@ -148,8 +498,8 @@ class TrimFeedUpdatesTask(Task):
 
     def run(self):
         # NOTE: access the task like a static method to avoid the current instance
-        # being unnecessarily being sent through RabbitMQ.
-        TrimFeedUpdatesTask._trim_feed_updates.delay(None)
+        # being unnecessarily being sent to the executor.
+        celeryapp.submit(TrimFeedUpdatesTask._trim_feed_updates, None)
 
     @celeryapp.app.task
     def _trim_feed_updates(self):
@@ -178,6 +528,15 @@ class Registry:
     def all_tasks(self):
         raise NotImplementedError
 
+    def report(
+        self,
+        system_id,
+        feed_id,
+        result: models.FeedUpdate.Result,
+        content_created_at=None,
+    ):
+        pass
+
 
 class FeedAutoUpdateRegistry(Registry):
     def __init__(self):
@@ -195,7 +554,7 @@ class FeedAutoUpdateRegistry(Registry):
                 self._system_id_to_feed_id_to_task[feed.system.id][feed.id] = task
             else:
                 logger.info("Updating {}/{}".format(feed.system.id, feed.id))
-            task.schedule = PeriodicSchedule(feed.auto_update_period)
+            task.schedule = self._build_schedule(feed)
             stale_feed_keys.discard((feed.system.id, feed.id))
 
         for system_id, feed_id in stale_feed_keys:
@@ -210,12 +569,74 @@ class FeedAutoUpdateRegistry(Registry):
         for feed_id_to_task in self._system_id_to_feed_id_to_task.values():
             yield from feed_id_to_task.values()
 
+    def report(
+        self,
+        system_id,
+        feed_id,
+        result: models.FeedUpdate.Result,
+        content_created_at=None,
+    ):
+        task = self._system_id_to_feed_id_to_task.get(system_id, {}).get(feed_id)
+        if task is not None:
+            task.report(result, content_created_at)
+
+    @staticmethod
+    def _build_schedule(feed: views.Feed) -> PeriodicSchedule:
+        min_period = feed.auto_update_min_period
+        max_period = feed.auto_update_max_period
+        if min_period is views.NULL and max_period is views.NULL:
+            return PeriodicSchedule(feed.auto_update_period)
+        return AdaptiveSchedule(
+            feed.auto_update_period,
+            min_period if min_period is not views.NULL else feed.auto_update_period,
+            max_period if max_period is not views.NULL else feed.auto_update_period,
+        )
+
     def _current_feed_keys(self):
         for system_id, feed_id_to_task in self._system_id_to_feed_id_to_task.items():
             for feed_id in feed_id_to_task.keys():
                 yield system_id, feed_id
 
 
+class BatchedFeedAutoUpdateRegistry(Registry):
+    """
+    Registry that schedules one task for all feeds in a system that have the same
+    auto update period.
+
+    Feeds are batched using their configured period, so periods are not adapted to
+    how often the feeds change.
+    """
+
+    def __init__(self):
+        self._system_id_and_period_to_task: typing.Dict[
+            typing.Tuple[str, int], FeedsAutoUpdateTask
+        ] = {}
+
+    def refresh(self):
+        key_to_feed_ids = collections.defaultdict(list)
+        for feed in feedservice.list_all_auto_updating():
+            key_to_feed_ids[(feed.system.id, feed.auto_update_period)].append(feed.id)
+
+        for key in set(self._system_id_and_period_to_task) - set(key_to_feed_ids):
+            logger.info("Removing {}/period={}".format(*key))
+            self._system_id_and_period_to_task.pop(key).schedule = None
+
+        for (system_id, period), feed_ids in key_to_feed_ids.items():
+            feed_ids = sorted(feed_ids)
+            task = self._system_id_and_period_to_task.get((system_id, period))
+            if task is None:
+                logger.info("Adding {}/period={}".format(system_id, period))
+                task = FeedsAutoUpdateTask(system_id, feed_ids)
+                self._system_id_and_period_to_task[(system_id, period)] = task
+            else:
+                logger.info("Updating {}/period={}".format(system_id, period))
+                task.feed_ids = feed_ids
+            task.schedule = PeriodicSchedule(period)
+
+    def all_tasks(self):
+        return self._system_id_and_period_to_task.values()
+
+
 class TransiterRegistry(Registry):
     def __init__(self):
         self._tasks = []
@@ -229,9 +650,13 @@ class TransiterRegistry(Registry):
         return self._tasks
 
 
-feed_auto_update_registry = FeedAutoUpdateRegistry()
+if config.SCHEDULER_BATCH_FEED_UPDATES:
+    feed_auto_update_registry = BatchedFeedAutoUpdateRegistry()
+else:
+    feed_auto_update_registry = FeedAutoUpdateRegistry()
 transiter_registry = TransiterRegistry()
 metrics_populator = metrics.MetricsPopulator()
+feed_update_tracker = FeedUpdateTracker()
 
 
 def app_ping():
@@ -257,12 +682,34 @@ def app_feed_update_callback():
     # TODO: add a time.sleep and verify that this is blocking
     error_message = metrics_populator.report(flask.request.json)
     if error_message is None:
+        system_id, feed_id = metrics_populator.get_system_id_and_feed_id(
+            int(flask.request.json["feed_pk"])
+        )
+        feed_update_tracker.finish(
+            system_id, feed_id, flask.request.json.get("trigger_id")
+        )
+        feed_auto_update_registry.report(
+            system_id,
+            feed_id,
+            models.FeedUpdate.Result[flask.request.json["result"]],
+            flask.request.json.get("content_created_at"),
+        )
         return "", 200
     logger.info(error_message)
     return error_message, 400  # bad request
 
 
+def app_feed_updates_skipped_callback():
+    request_json = flask.request.json
+    for feed_id in request_json["feed_ids"]:
+        feed_update_tracker.finish(
+            request_json["system_id"], feed_id, request_json["trigger_id"]
+        )
+    return "", 200
+
+
 def create_app():
+    dbconnection.set_role(dbconnection.SCHEDULER)
     app = flask.Flask(__name__)
     app.add_url_rule("/", "ping", app_ping, methods=["GET"])
     app.add_url_rule("/", "refresh_tasks", app_refresh_tasks, methods=["POST"])
@@ -272,6 +719,12 @@ def create_app():
         app_feed_update_callback,
         methods=["POST"],
     )
+    app.add_url_rule(
+        "/feed_updates_skipped_callback",
+        "feed_updates_skipped_callback",
+        app_feed_updates_skipped_callback,
+        methods=["POST"],
+    )
     # Add prometheus wsgi middleware to route /metrics requests
     app.wsgi_app = DispatcherMiddleware(
         app.wsgi_app, {"/metrics": prometheus.make_wsgi_app()}
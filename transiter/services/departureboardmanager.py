@@ -0,0 +1,274 @@
+"""
+The departure board manager maintains the materialized departure boards of stops.
+
+The departure board of a stop contains the upcoming trip stop times at the stop,
+along with the data about each trip that is returned by the stop endpoint. If the
+MATERIALIZE_DEPARTURE_BOARDS setting is true, boards are rebuilt during feed updates
+for the stops whose trips changed, and the stop endpoint reads the boards instead of
+querying the trip stop times.
+
+The boards are stored as JSON. Vehicles are updated in almost every realtime feed
+update independently of the trips, so the vehicle of each trip is not stored in the
+board and is instead retrieved when the board is read.
+"""
+import datetime
+import json
+import typing
+
+from transiter import config
+from transiter.db import models
+from transiter.db.queries import stopqueries, systemqueries, tripqueries
+from transiter.services import views
+
+
+def is_enabled() -> bool:
+    return bool(config.MATERIALIZE_DEPARTURE_BOARDS)
+
+
+def rebuild_departure_boards(system_pk, stop_pks):
+    """
+    Build and save the departure boards of the given stops.
+
+    Concurrent feed updates in the same system may change the trips at the same stop.
+    Each board is built from the trips visible to the current transaction, so board
+    rebuilds in the system are serialized: otherwise the board written last would be
+    missing the trips of the other update.
+    """
+    systemqueries.lock(system_pk)
+    stop_pk_to_board = build_departure_boards(stop_pks)
+    stopqueries.save_departure_boards(
+        {stop_pk: json.dumps(board) for stop_pk, board in stop_pk_to_board.items()},
+        datetime.datetime.now(datetime.timezone.utc),
+    )
+
+
+def build_departure_boards(stop_pks) -> typing.Dict[int, dict]:
+    """
+    Build the departure boards of the given stops.
+
+    :return: map of stop PK to the stop's board, which is a dictionary that can be
+      serialized to JSON.
+    """
+    stop_pks = list(stop_pks)
+    stop_pk_to_board = {
+        stop_pk: {"directions": set(), "stop_times": []} for stop_pk in stop_pks
+    }
+    if len(stop_pks) == 0:
+        return stop_pk_to_board
+    direction_rules = stopqueries.list_direction_rules_for_stops(stop_pks)
+    for direction_rule in direction_rules:
+        stop_pk_to_board[direction_rule.stop_pk]["directions"].add(direction_rule.name)
+    direction_name_matcher = DirectionNameMatcher(direction_rules)
+    trip_stop_times = stopqueries.list_stop_time_updates_at_stops(stop_pks)
+    trip_pk_to_last_stop = tripqueries.get_trip_pk_to_last_stop_map(
+        {trip_stop_time.trip_pk for trip_stop_time in trip_stop_times}
+    )
+    for trip_stop_time in trip_stop_times:
+        stop_pk_to_board[trip_stop_time.stop_pk]["stop_times"].append(
+            _build_stop_time_entry(
+                trip_stop_time,
+                direction_name_matcher.match(trip_stop_time),
+                trip_pk_to_last_stop[trip_stop_time.trip_pk],
+            )
+        )
+    for board in stop_pk_to_board.values():
+        board["directions"] = sorted(board["directions"], key=str)
+    return stop_pk_to_board
+
+
+def get_departure_board(
+    system_id, stop_pks
+) -> typing.Tuple[typing.List[str], typing.List[views.TripStopTime]]:
+    """
+    Get the combined departure board of a collection of stops.
+
+    Boards that have not been built, for example because the setting was only recently
+    enabled, are built on the fly but not saved.
+
+    :return: the direction names at the stops, and the trip stop times at the stops
+      ordered by departure time and then arrival time.
+    """
+    stop_pks = list(stop_pks)
+    stop_pk_to_board = {
+        stop_pk: json.loads(content)
+        for stop_pk, content in stopqueries.get_stop_pk_to_departure_board_content_map(
+            stop_pks
+        ).items()
+    }
+    missing_stop_pks = [
+        stop_pk for stop_pk in stop_pks if stop_pk not in stop_pk_to_board
+    ]
+    if len(missing_stop_pks) > 0:
+        stop_pk_to_board.update(build_departure_boards(missing_stop_pks))
+
+    directions = set()
+    entries = []
+    for board in stop_pk_to_board.values():
+        directions.update(board["directions"])
+        entries.extend(board["stop_times"])
+    entries.sort(key=_entry_sort_key)
+    trip_pk_to_vehicle_id = tripqueries.get_trip_pk_to_vehicle_id_map(
+        {entry["trip_pk"] for entry in entries}
+    )
+    return (
+        list(directions),
+        [
+            _build_trip_stop_time_response(system_id, entry, trip_pk_to_vehicle_id)
+            for entry in entries
+        ],
+    )
+
+
+class DirectionNameMatcher:
+    """
+    Object to find the direction name associated to a particular trip at
+    a particular stop.
+    """
+
+    def __init__(self, rules):
+        """
+        Initialize a new matcher.
+
+        :param rules: the rules to be used in the matcher.
+        :type rules: iterable of DirectionRule models.
+        """
+        self._rules = sorted(rules, key=lambda rule: rule.priority)
+        self._cache = {}
+
+    def all_names(self):
+        """
+        Get all of the direction names in the matcher.
+
+        :return: list of names
+        :rtype: list of strings
+        """
+        return {rule.name for rule in self._rules}
+
+    def match(self, trip_stop_time):
+        """
+        Find the direction name associate to the TripStopTime by matching
+        the appropriate rule.
+
+        :param trip_stop_time: the TripStopTime
+        :return: the direction name
+        """
+        cache_key = (
+            trip_stop_time.stop_pk,
+            trip_stop_time.trip.direction_id,
+            trip_stop_time.track,
+        )
+        if cache_key not in self._cache:
+            self._cache[cache_key] = None
+            for rule in self._rules:
+                if rule.stop_pk != cache_key[0]:
+                    continue
+                if rule.direction_id is not None and rule.direction_id != cache_key[1]:
+                    continue
+                if rule.track is not None and rule.track != cache_key[2]:
+                    continue
+                self._cache[cache_key] = rule.name
+                break
+
+        return self._cache[cache_key]
+
+
+def _build_stop_time_entry(
+    trip_stop_time: models.TripStopTime, direction, last_stop: models.Stop
+):
+    trip = trip_stop_time.trip
+    return {
+        "trip_pk": trip.pk,
+        "arrival": [
+            _to_timestamp(trip_stop_time.arrival_time),
+            trip_stop_time.arrival_delay,
+            trip_stop_time.arrival_uncertainty,
+        ],
+        "departure": [
+            _to_timestamp(trip_stop_time.departure_time),
+            trip_stop_time.departure_delay,
+            trip_stop_time.departure_uncertainty,
+        ],
+        "track": trip_stop_time.track,
+        "future": trip_stop_time.future,
+        "stop_sequence": trip_stop_time.stop_sequence,
+        "direction": direction,
+        "trip": {
+            "id": trip.id,
+            "direction_id": trip.direction_id,
+            "started_at": _to_timestamp(trip.started_at),
+            "updated_at": _to_timestamp(trip.updated_at),
+            "delay": trip.delay,
+            "route_id": trip.route.id,
+            "route_color": trip.route.color,
+        },
+        "last_stop": None
+        if last_stop is None
+        else {"id": last_stop.id, "name": last_stop.name},
+    }
+
+
+def _entry_sort_key(entry):
+    # This matches the order of the trip stop time query, in which null times are
+    # sorted last.
+    departure_time = entry["departure"][0]
+    arrival_time = entry["arrival"][0]
+    return (
+        departure_time is None,
+        departure_time or 0,
+        arrival_time is None,
+        arrival_time or 0,
+    )
+
+
+def _build_trip_stop_time_response(system_id, entry, trip_pk_to_vehicle_id):
+    trip_entry = entry["trip"]
+    result = views.TripStopTime(
+        arrival=_build_event(entry["arrival"]),
+        departure=_build_event(entry["departure"]),
+        track=entry["track"],
+        future=entry["future"],
+        stop_sequence=entry["stop_sequence"],
+        direction=entry["direction"],
+    )
+    result.trip = views.Trip(
+        id=trip_entry["id"],
+        direction_id=trip_entry["direction_id"],
+        started_at=_from_timestamp(trip_entry["started_at"]),
+        updated_at=_from_timestamp(trip_entry["updated_at"]),
+        delay=trip_entry["delay"],
+        vehicle=None,
+        _system_id=system_id,
+        _route_id=trip_entry["route_id"],
+    )
+    if entry["trip_pk"] in trip_pk_to_vehicle_id:
+        result.trip.vehicle = views.VehicleInTrip(
+            id=trip_pk_to_vehicle_id[entry["trip_pk"]]
+        )
+    result.trip.route = views.Route(
+        id=trip_entry["route_id"], color=trip_entry["route_color"], _system_id=system_id
+    )
+    last_stop = entry["last_stop"]
+    if last_stop is not None:
+        result.trip.last_stop = views.Stop(
+            id=last_stop["id"], name=last_stop["name"], _system_id=system_id
+        )
+    return result
+
+
+def _build_event(event_entry):
+    time, delay, uncertainty = event_entry
+    return views._TripStopTimeEvent(
+        time=_from_timestamp(time), delay=delay, uncertainty=uncertainty
+    )
+
+
+def _to_timestamp(value: typing.Optional[datetime.datetime]):
+    if value is None:
+        return None
+    return value.timestamp()
+
+
+def _from_timestamp(value) -> typing.Optional[datetime.datetime]:
+    if value is None:
+        return None
+    return datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
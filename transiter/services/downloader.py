@@ -0,0 +1,119 @@
+"""
+The downloader is responsible for retrieving feed content over HTTP.
+
+Connections are pooled per host in a process-wide requests session, so a feed that is
+polled every few seconds reuses keep-alive connections rather than performing a new
+TCP and TLS handshake for each download.
+
+Downloads can be conditional: if the validators (ETag and Last-Modified) returned with
+previously downloaded content are provided, the server may respond that the content
+has not been modified, in which case no content is transferred.
+"""
+import concurrent.futures
+import dataclasses
+import threading
+import time
+import typing
+
+import requests
+from requests import adapters, RequestException
+
+from transiter import config
+
+DEFAULT_TIMEOUT = 10
+
+_session = None
+_session_lock = threading.Lock()
+
+
+@dataclasses.dataclass
+class DownloadRequest:
+    url: str
+    timeout: typing.Optional[float] = None
+    headers: typing.Dict[str, str] = dataclasses.field(default_factory=dict)
+    etag: typing.Optional[str] = None
+    last_modified: typing.Optional[str] = None
+
+
+@dataclasses.dataclass
+class DownloadResult:
+    # None if and only if the content was not modified
+    content: typing.Optional[bytes]
+    etag: typing.Optional[str] = None
+    last_modified: typing.Optional[str] = None
+    duration: typing.Optional[float] = None
+
+    @property
+    def not_modified(self):
+        return self.content is None
+
+
+def download(request: DownloadRequest) -> DownloadResult:
+    """
+    Download content.
+
+    :raises RequestException: if the download fails
+    """
+    headers = dict(request.headers)
+    if request.etag is not None:
+        headers.setdefault("If-None-Match", request.etag)
+    if request.last_modified is not None:
+        headers.setdefault("If-Modified-Since", request.last_modified)
+    start_time = time.time()
+    response = _get_session().get(
+        request.url, timeout=request.timeout or DEFAULT_TIMEOUT, headers=headers,
+    )
+    response.raise_for_status()
+    duration = time.time() - start_time
+    if response.status_code == requests.codes.not_modified:
+        return DownloadResult(
+            content=None,
+            etag=response.headers.get("ETag", request.etag),
+            last_modified=response.headers.get("Last-Modified", request.last_modified),
+            duration=duration,
+        )
+    return DownloadResult(
+        content=response.content,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        duration=duration,
+    )
+
+
+def download_many(
+    requests_: typing.Iterable[DownloadRequest], max_workers=None
+) -> typing.List[typing.Union[DownloadResult, RequestException]]:
+    """
+    Download content for many requests concurrently using a bounded thread pool.
+
+    :return: a list with an entry for each request, in the same order. The entry is
+        either the download result or the exception raised by the download.
+    """
+    if max_workers is None:
+        max_workers = int(config.DOWNLOAD_MAX_WORKERS)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(download, request) for request in requests_]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except RequestException as e:
+            results.append(e)
+    return results
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is not None:
+        return _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            pool_size = int(config.DOWNLOAD_MAX_WORKERS)
+            adapter = adapters.HTTPAdapter(
+                pool_connections=pool_size, pool_maxsize=pool_size
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
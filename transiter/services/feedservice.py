@@ -10,7 +10,9 @@ import typing
 from transiter import exceptions
 from transiter.db import dbconnection, models
 from transiter.db.queries import feedqueries, systemqueries
-from transiter.services import views, updatemanager
+from transiter.executor import celeryapp
+from transiter.scheduler import client
+from transiter.services import views, updatemanager, pagination
 
 logger = logging.getLogger(__name__)
 
@@ -68,14 +70,33 @@ def get_in_system_by_id(system_id, feed_id) -> views.Feed:
 
 
 def create_and_execute_feed_update(
-    system_id, feed_id, content=None, execute_async=False
+    system_id, feed_id, content=None, execute_async=False, trigger_id=None
 ):
+    """
+    Create and execute an update for a feed in a system.
+
+    :param trigger_id: the ID of the scheduler trigger, if the update was triggered
+        by the scheduler
+    """
     return _create_and_execute_feed_update_helper(
         system_id,
         feed_id,
         update_manager_function=updatemanager.create_feed_update,
         content=content,
         execute_async=execute_async,
+        trigger_id=trigger_id,
+    )
+
+
+def create_and_execute_feed_updates(system_id, feed_ids, trigger_id=None):
+    """
+    Create and execute updates for multiple feeds in a system in a single batch.
+
+    :param trigger_id: the ID of the scheduler trigger, if the updates were triggered
+        by the scheduler
+    """
+    return updatemanager.create_and_execute_feed_updates(
+        system_id, feed_ids, trigger_id=trigger_id
     )
 
 
@@ -90,37 +111,87 @@ def create_and_execute_feed_flush(system_id, feed_id, execute_async=False):
 
 
 def _create_and_execute_feed_update_helper(
-    system_id, feed_id, update_manager_function, content=None, execute_async=False,
+    system_id,
+    feed_id,
+    update_manager_function,
+    content=None,
+    execute_async=False,
+    trigger_id=None,
 ):
     """
     Create a feed update for a feed in a system.
     """
     feed_update_pk = update_manager_function(system_id, feed_id)
     if feed_update_pk is None:
+        if trigger_id is not None:
+            client.feed_updates_skipped_callback(system_id, [feed_id], trigger_id)
         raise exceptions.IdNotFoundError(
             models.Feed, system_id=system_id, feed_id=feed_id
         )
     if execute_async:
-        updatemanager.execute_feed_update_async.delay(feed_update_pk, content)
+        celeryapp.submit(
+            updatemanager.execute_feed_update_async,
+            feed_update_pk,
+            content,
+            trigger_id,
+        )
     else:
-        updatemanager.execute_feed_update(feed_update_pk, content)
+        updatemanager.execute_feed_update(
+            feed_update_pk, content, trigger_id=trigger_id
+        )
     return feed_update_pk
 
 
+DEFAULT_NUM_UPDATES_IN_PAGE = 100
+
+
 @dbconnection.unit_of_work
-def list_updates_in_feed(system_id, feed_id):
+def list_updates_in_feed(system_id, feed_id, limit=None, after=None):
+    """
+    List the updates for a feed, most recent first.
+
+    :param limit: the maximum number of updates in the page; by default 100
+    :param after: the cursor of the previous page
+    """
+    pagination.check_limit(limit)
+    before_pk = pagination.decode_cursor(after, int)
+    if limit is None:
+        limit = DEFAULT_NUM_UPDATES_IN_PAGE
+    feed = _get_feed(system_id, feed_id)
+    feed_updates, next_cursor = pagination.split(
+        feedqueries.list_updates_in_feed(
+            feed.pk, before_pk=before_pk, limit=pagination.query_limit(limit)
+        ),
+        limit,
+        lambda feed_update: feed_update.pk,
+    )
+    return pagination.Page(
+        list(map(views.FeedUpdate.from_model, feed_updates)), next_cursor
+    )
+
+
+def stream_updates_in_feed(system_id, feed_id) -> typing.Iterator[views.FeedUpdate]:
     """
-    List all of the updates for a feed.
+    Stream all of the updates for a feed, most recent first.
+
+    The updates are read from the database in chunks using a server side cursor. The
+    unit of work is open until the iterator is exhausted or closed.
     """
+    with dbconnection.inline_unit_of_work():
+        feed = _get_feed(system_id, feed_id)
+        for feed_updates in feedqueries.list_updates_in_feed(
+            feed.pk, limit=None, chunk_size=pagination.STREAM_CHUNK_SIZE
+        ):
+            yield from map(views.FeedUpdate.from_model, feed_updates)
+
+
+def _get_feed(system_id, feed_id) -> models.Feed:
     feed = feedqueries.get_in_system_by_id(system_id, feed_id)
     if feed is None:
         raise exceptions.IdNotFoundError(
             models.Feed, system_id=system_id, feed_id=feed_id
         )
-    response = []
-    for feed_update in feedqueries.list_updates_in_feed(feed.pk):
-        response.append(views.FeedUpdate.from_model(feed_update))
-    return response
+    return feed
 
 
 @dbconnection.unit_of_work
@@ -184,6 +255,9 @@ def trim_feed_updates():
     Delete old feed updates.
 
     This method is designed to be called hourly by the task server.
+
+    If the feed update table is partitioned, whole partitions of old updates are
+    dropped, and partitions for the next few days are created ahead of time.
     """
 
     @dbconnection.unit_of_work
@@ -201,8 +275,54 @@ def trim_feed_updates():
 
     logger.info("Trimming old feed updates.")
     before_datetime = (
-        datetime.datetime.utcnow() - datetime.timedelta(hours=30)
+        datetime.datetime.utcnow() - FEED_UPDATE_RETENTION_PERIOD
     ).replace(microsecond=0, second=0)
 
+    if _is_feed_update_partitioned():
+        _trim_feed_update_partitions(before_datetime)
+        return
     for feed_pk in _list_all_feed_pks():
         _trim_feed_updates_helper(feed_pk, before_datetime)
+
+
+FEED_UPDATE_RETENTION_PERIOD = datetime.timedelta(hours=30)
+# The number of days after today for which feed update partitions are created ahead
+# of time. Updates scheduled on days without a partition go to the default partition.
+FEED_UPDATE_PARTITION_DAYS_AHEAD = 2
+
+
+@dbconnection.unit_of_work
+def _is_feed_update_partitioned():
+    return feedqueries.is_feed_update_partitioned()
+
+
+def _trim_feed_update_partitions(before_datetime):
+    @dbconnection.unit_of_work
+    def _list_partition_days():
+        return feedqueries.list_feed_update_partition_days()
+
+    @dbconnection.unit_of_work
+    def _create_partition(day_):
+        logger.info("Creating feed update partition for {}".format(day_))
+        feedqueries.create_feed_update_partition(day_)
+
+    @dbconnection.unit_of_work
+    def _drop_partition(day_):
+        logger.info("Dropping feed update partition for {}".format(day_))
+        feedqueries.drop_feed_update_partition(day_)
+
+    @dbconnection.unit_of_work
+    def _trim_default_partition():
+        feedqueries.trim_default_feed_update_partition(before_datetime)
+
+    existing_days = set(_list_partition_days())
+    today = datetime.datetime.utcnow().date()
+    for days in range(FEED_UPDATE_PARTITION_DAYS_AHEAD + 1):
+        day = today + datetime.timedelta(days=days)
+        if day not in existing_days:
+            _create_partition(day)
+    # A partition is only dropped when every update in it is older than the cut-off.
+    for day in sorted(existing_days):
+        if day + datetime.timedelta(days=1) <= before_datetime.date():
+            _drop_partition(day)
+    _trim_default_partition()
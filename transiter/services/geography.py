@@ -7,10 +7,12 @@ def distance(lat_1: float, lon_1: float, lat_2: float, lon_2: float) -> float:
     """
     Calculate the distance in meters between two points on the Earth.
     """
-    return RADIUS_OF_EARTH_IN_METERS * acos(
-        cos(radians(lon_1 - lon_2)) * cos(radians(lat_1)) * cos(radians(lat_2))
-        + sin(radians(lat_1)) * sin(radians(lat_2))
-    )
+    cos_angle = cos(radians(lon_1 - lon_2)) * cos(radians(lat_1)) * cos(
+        radians(lat_2)
+    ) + sin(radians(lat_1)) * sin(radians(lat_2))
+    # Rounding errors can put the cosine slightly outside [-1, 1] for points that are
+    # very close together or antipodal.
+    return RADIUS_OF_EARTH_IN_METERS * acos(max(-1.0, min(1.0, cos_angle)))
 
 
 def longitude_bounds(lat: float, lon: float, max_distance: float):
@@ -0,0 +1,95 @@
+"""
+Keyset pagination for list endpoints.
+
+The results of a paginated list are ordered by a column that uniquely identifies
+each result. A page is requested using a limit and, for all but the first page, the
+cursor of the previous page. The cursor is an opaque encoding of the value of the
+ordering column for the last result in the previous page, and the next page contains
+the results that come after this value. Unlike offset based pagination, the database
+can jump directly to the start of each page using an index, and results are not
+skipped or repeated if entities are added or removed between requests.
+"""
+import base64
+import binascii
+import dataclasses
+import json
+import typing
+
+from transiter import exceptions
+
+# The number of results fetched from the database at a time when results are streamed.
+STREAM_CHUNK_SIZE = 500
+
+
+@dataclasses.dataclass
+class Page:
+    """
+    A page of results.
+
+    If there are more results after this page, next_cursor is the cursor to pass to
+    get the next page; otherwise it is None.
+    """
+
+    items: list
+    next_cursor: typing.Optional[str] = None
+
+
+def encode_cursor(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: typing.Optional[str], value_type):
+    """
+    Decode a cursor that was built using encode_cursor.
+
+    :param cursor: the cursor, or None
+    :param value_type: the type of the value the cursor should contain
+    :return: the value in the cursor, or None if cursor is None
+    :raises InvalidInput: if the cursor is not valid
+    """
+    if cursor is None:
+        return None
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, binascii.Error):
+        value = None
+    if type(value) is not value_type:
+        raise exceptions.InvalidInput(f"Invalid pagination cursor '{cursor}'.")
+    return value
+
+
+def check_limit(limit: typing.Optional[int]):
+    """
+    Raise InvalidInput if the given page size is not valid.
+    """
+    if limit is not None and limit < 1:
+        raise exceptions.InvalidInput(
+            f"The page size limit must be positive; received {limit}."
+        )
+
+
+def split(results: list, limit, get_cursor_value) -> typing.Tuple[list, str]:
+    """
+    Build a page from the results of a query that requested limit + 1 results.
+
+    :param results: the results of the query
+    :param limit: the page size, or None if the results are not paginated
+    :param get_cursor_value: function that returns the value of the ordering column
+        for a result
+    :return: the results in the page, and the cursor of the next page, or None if
+        this is the last page.
+    """
+    if limit is None or len(results) <= limit:
+        return results, None
+    results = results[:limit]
+    return results, encode_cursor(get_cursor_value(results[-1]))
+
+
+def query_limit(limit) -> typing.Optional[int]:
+    """
+    The number of results to query for a page of the given size. One extra result is
+    queried to determine if there is a next page.
+    """
+    if limit is None:
+        return None
+    return limit + 1
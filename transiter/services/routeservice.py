@@ -7,7 +7,7 @@ from transiter.services import views, helpers
 from transiter.services.servicemap import servicemapmanager
 
 
-@dbconnection.unit_of_work
+@dbconnection.unit_of_work(read_only=True)
 def list_all_in_system(
     system_id, alerts_detail: views.AlertsDetail = None
 ) -> typing.List[views.Route]:
@@ -26,7 +26,7 @@ def list_all_in_system(
     return response
 
 
-@dbconnection.unit_of_work
+@dbconnection.unit_of_work(read_only=True)
 def get_in_system_by_id(
     system_id, route_id, alerts_detail: views.AlertsDetail = None
 ) -> views.RouteLarge:
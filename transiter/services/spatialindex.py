@@ -0,0 +1,113 @@
+"""
+The spatial index is an in-process index of the coordinates of the stops in each
+system. It is used to find the stops near a point, for geographical stop searches and
+for building inter-system transfers, without computing the distance to every stop.
+
+The index of a system is a grid of cells of a fixed size in degrees. Stops are placed
+in the cell containing their coordinates, and a search only computes the distance to
+stops in the cells that intersect the search's bounding box.
+
+Indices are stored in the system cache. Whenever an import adds, updates or deletes
+stops the system cache is invalidated.
+"""
+import collections
+import math
+import typing
+
+from transiter.db import models, systemcache
+from transiter.db.queries import stopqueries
+from transiter.services import geography
+
+# Roughly 1.1 kilometers of latitude.
+CELL_SIZE_IN_DEGREES = 0.01
+
+
+class StopIndex:
+    """
+    A grid index of the coordinates of a collection of stops.
+    """
+
+    def __init__(self, stops: typing.Iterable[stopqueries.StopCoordinates]):
+        self._cell_to_stops = collections.defaultdict(list)
+        for stop in stops:
+            self._cell_to_stops[_cell(stop.latitude, stop.longitude)].append(stop)
+        self._cell_to_stops = dict(self._cell_to_stops)
+
+    def search(
+        self, latitude, longitude, distance, limit=None, stations_only=False
+    ) -> typing.List[typing.Tuple[float, stopqueries.StopCoordinates]]:
+        """
+        Find the stops within a certain distance of a point.
+
+        :param latitude: the latitude of the point
+        :param longitude: the longitude of the point
+        :param distance: the maximum distance in meters
+        :param limit: if provided, only return this many of the nearest stops
+        :param stations_only: if true, only return stops without a parent stop
+        :return: list of (distance, stop) pairs, ordered by distance
+        """
+        result = []
+        for stop in self._candidates(latitude, longitude, distance):
+            if stations_only and stop.parent_stop_pk is not None:
+                continue
+            stop_distance = geography.distance(
+                latitude, longitude, stop.latitude, stop.longitude
+            )
+            if stop_distance <= distance:
+                result.append((stop_distance, stop))
+        result.sort(key=lambda distance_and_stop: distance_and_stop[0])
+        if limit is not None:
+            result = result[:limit]
+        return result
+
+    def _candidates(self, latitude, longitude, distance):
+        # The bounding box is enlarged slightly to account for rounding errors.
+        latitude_delta = math.degrees(
+            distance * 1.01 / geography.RADIUS_OF_EARTH_IN_METERS
+        )
+        max_abs_latitude = abs(latitude) + latitude_delta
+        if max_abs_latitude >= 89:
+            return self._all_stops()
+        longitude_delta = latitude_delta / math.cos(math.radians(max_abs_latitude))
+        if longitude - longitude_delta < -180 or longitude + longitude_delta > 180:
+            return self._all_stops()
+        lower_cell = _cell(latitude - latitude_delta, longitude - longitude_delta)
+        upper_cell = _cell(latitude + latitude_delta, longitude + longitude_delta)
+        num_cells = (upper_cell[0] - lower_cell[0] + 1) * (
+            upper_cell[1] - lower_cell[1] + 1
+        )
+        if num_cells > len(self._cell_to_stops):
+            cells = (
+                cell
+                for cell in self._cell_to_stops.keys()
+                if lower_cell[0] <= cell[0] <= upper_cell[0]
+                and lower_cell[1] <= cell[1] <= upper_cell[1]
+            )
+        else:
+            cells = (
+                (i, j)
+                for i in range(lower_cell[0], upper_cell[0] + 1)
+                for j in range(lower_cell[1], upper_cell[1] + 1)
+            )
+        return (stop for cell in cells for stop in self._cell_to_stops.get(cell, []))
+
+    def _all_stops(self):
+        return (stop for stops in self._cell_to_stops.values() for stop in stops)
+
+
+def get_index(system: models.System) -> StopIndex:
+    """
+    Get the spatial index of the stops in a system.
+    """
+    return systemcache.get(system, StopIndex, lambda: _build_index(system))
+
+
+def _build_index(system: models.System) -> StopIndex:
+    return StopIndex(stopqueries.list_stop_coordinates_in_system(system.pk))
+
+
+def _cell(latitude, longitude) -> typing.Tuple[int, int]:
+    return (
+        math.floor(latitude / CELL_SIZE_IN_DEGREES),
+        math.floor(longitude / CELL_SIZE_IN_DEGREES),
+    )
@@ -14,18 +14,61 @@ import typing
 from transiter import exceptions
 from transiter.db import dbconnection, models
 from transiter.db.queries import tripqueries, stopqueries, systemqueries
-from transiter.services import views, helpers, geography
+from transiter.services import (
+    views,
+    helpers,
+    departureboardmanager,
+    pagination,
+    spatialindex,
+)
 from transiter.services.servicemap import servicemapmanager
 from transiter.services.servicemap.graphutils import datastructures
 
 
-@dbconnection.unit_of_work
-def list_all_in_system(system_id, alerts_detail=None) -> typing.List[views.Stop]:
+@dbconnection.unit_of_work(read_only=True)
+def list_all_in_system(
+    system_id, alerts_detail=None, limit=None, after=None
+) -> pagination.Page:
+    """
+    List the stops in a system, ordered by ID.
+
+    :param limit: if provided, the maximum number of stops in the page
+    :param after: the cursor of the previous page
+    """
+    pagination.check_limit(limit)
+    after_id = pagination.decode_cursor(after, str)
     system = systemqueries.get_by_id(system_id, only_return_active=True)
     if system is None:
         raise exceptions.IdNotFoundError(models.System, system_id=system_id)
 
-    stops = stopqueries.list_all_in_system(system_id)
+    stops, next_cursor = pagination.split(
+        stopqueries.list_all_in_system(
+            system_id, after_id=after_id, limit=pagination.query_limit(limit)
+        ),
+        limit,
+        lambda stop: stop.id,
+    )
+    return pagination.Page(_build_stop_views(stops, alerts_detail), next_cursor)
+
+
+def stream_all_in_system(system_id, alerts_detail=None) -> typing.Iterator[views.Stop]:
+    """
+    Stream all of the stops in a system, ordered by ID.
+
+    The stops are read from the database in chunks using a server side cursor. The
+    unit of work is open until the iterator is exhausted or closed.
+    """
+    with dbconnection.inline_unit_of_work(read_only=True):
+        system = systemqueries.get_by_id(system_id, only_return_active=True)
+        if system is None:
+            raise exceptions.IdNotFoundError(models.System, system_id=system_id)
+        for stops in stopqueries.list_all_in_system(
+            system_id, chunk_size=pagination.STREAM_CHUNK_SIZE
+        ):
+            yield from _build_stop_views(stops, alerts_detail)
+
+
+def _build_stop_views(stops, alerts_detail) -> typing.List[views.Stop]:
     response = list(map(views.Stop.from_model, stops))
     helpers.add_alerts_to_views(
         response, stops, alerts_detail or views.AlertsDetail.NONE,
@@ -33,25 +76,32 @@ def list_all_in_system(system_id, alerts_detail=None) -> typing.List[views.Stop]
     return response
 
 
-@dbconnection.unit_of_work
+@dbconnection.unit_of_work(read_only=True)
 def geographical_search(
-    system_id, latitude, longitude, distance, return_service_maps=True,
+    system_id, latitude, longitude, distance, return_service_maps=True, limit=None,
 ) -> typing.List[views.Stop]:
-    lower_lat, upper_lat = geography.latitude_bounds(latitude, longitude, distance)
-    lower_lon, upper_lon = geography.longitude_bounds(latitude, longitude, distance)
-    all_stops = stopqueries.list_all_in_geographical_bounds(
-        lower_lat, upper_lat, lower_lon, upper_lon, system_id
-    )
-    stop_pk_to_distance = {
-        stop.pk: geography.distance(
-            float(stop.latitude), float(stop.longitude), latitude, longitude,
-        )
-        for stop in all_stops
-    }
-    all_stops = list(
-        filter(lambda stop_: stop_pk_to_distance[stop_.pk] <= distance, all_stops)
-    )
-    all_stops.sort(key=lambda stop_: stop_pk_to_distance[stop_.pk])
+    """
+    Search for the stations within a certain distance of a point, ordered by distance.
+
+    :param system_id: the system to search in, or None to search in all systems
+    :param limit: if provided, only return this many of the nearest stations
+    """
+    pagination.check_limit(limit)
+    if system_id is None:
+        systems = systemqueries.list_all()
+    else:
+        system = systemqueries.get_by_id(system_id)
+        systems = [system] if system is not None else []
+    stop_pk_to_distance = {}
+    for system in systems:
+        for stop_distance, stop in spatialindex.get_index(system).search(
+            latitude, longitude, distance, limit=limit, stations_only=True
+        ):
+            stop_pk_to_distance[stop.pk] = stop_distance
+    all_stops = stopqueries.list_by_pks(stop_pk_to_distance.keys())
+    all_stops.sort(key=lambda stop_: (stop_pk_to_distance[stop_.pk], stop_.pk))
+    if limit is not None:
+        all_stops = all_stops[:limit]
     if return_service_maps:
         stop_pk_to_service_maps = servicemapmanager.build_stop_pk_to_service_maps_response(
             list(stop.pk for stop in all_stops)
@@ -68,26 +118,63 @@ def geographical_search(
     return result
 
 
-@dbconnection.unit_of_work
+@dbconnection.unit_of_work(read_only=True)
 def list_all_transfers_in_system(
-    system_id, from_stop_ids=None, to_stop_ids=None
-) -> typing.List[views.Transfer]:
+    system_id, from_stop_ids=None, to_stop_ids=None, limit=None, after=None
+) -> pagination.Page:
+    """
+    List the transfers in a system.
+
+    :param limit: if provided, the maximum number of transfers in the page
+    :param after: the cursor of the previous page
+    """
+    pagination.check_limit(limit)
+    after_pk = pagination.decode_cursor(after, int)
     system = systemqueries.get_by_id(system_id, only_return_active=True)
     if system is None:
         raise exceptions.IdNotFoundError(models.System, system_id=system_id)
-    return [
-        views.Transfer.from_model(
-            transfer,
-            views.Stop.from_model(transfer.from_stop),
-            views.Stop.from_model(transfer.to_stop),
-        )
-        for transfer in stopqueries.list_all_transfers_in_system(
-            system_id, from_stop_ids=from_stop_ids, to_stop_ids=to_stop_ids
-        )
-    ]
+    transfers, next_cursor = pagination.split(
+        stopqueries.list_all_transfers_in_system(
+            system_id,
+            from_stop_ids=from_stop_ids,
+            to_stop_ids=to_stop_ids,
+            after_pk=after_pk,
+            limit=pagination.query_limit(limit),
+        ),
+        limit,
+        lambda transfer: transfer.pk,
+    )
+    return pagination.Page(list(map(_build_transfer_view, transfers)), next_cursor)
+
+
+def stream_all_transfers_in_system(
+    system_id, from_stop_ids=None, to_stop_ids=None
+) -> typing.Iterator[views.Transfer]:
+    """
+    Stream all of the transfers in a system; see stream_all_in_system.
+    """
+    with dbconnection.inline_unit_of_work(read_only=True):
+        system = systemqueries.get_by_id(system_id, only_return_active=True)
+        if system is None:
+            raise exceptions.IdNotFoundError(models.System, system_id=system_id)
+        for transfers in stopqueries.list_all_transfers_in_system(
+            system_id,
+            from_stop_ids=from_stop_ids,
+            to_stop_ids=to_stop_ids,
+            chunk_size=pagination.STREAM_CHUNK_SIZE,
+        ):
+            yield from map(_build_transfer_view, transfers)
+
+
+def _build_transfer_view(transfer: models.Transfer) -> views.Transfer:
+    return views.Transfer.from_model(
+        transfer,
+        views.Stop.from_model(transfer.from_stop),
+        views.Stop.from_model(transfer.to_stop),
+    )
 
 
-@dbconnection.unit_of_work
+@dbconnection.unit_of_work(read_only=True)
 def get_in_system_by_id(
     system_id,
     stop_id,
@@ -114,15 +201,6 @@ def get_in_system_by_id(
 
     # The descendant stops are used as the source of trip stop times
     descendant_stop_pks = list(stop.pk for stop in stop_tree.descendents())
-    direction_name_matcher = _DirectionNameMatcher(
-        stopqueries.list_direction_rules_for_stops(descendant_stop_pks)
-    )
-    trip_stop_times = stopqueries.list_stop_time_updates_at_stops(
-        descendant_stop_pks, earliest_time=earliest_time, latest_time=latest_time,
-    )
-    trip_pk_to_last_stop = tripqueries.get_trip_pk_to_last_stop_map(
-        trip_stop_time.trip.pk for trip_stop_time in trip_stop_times
-    )
 
     # On the other hand, the stop tree graph that is returned consists of all
     # stations in the stop's tree
@@ -138,7 +216,6 @@ def get_in_system_by_id(
     response.parent_stop = stop_tree_base.parent_stop
     response.child_stops = stop_tree_base.child_stops
     response.service_maps = stop_tree_base.service_maps
-    response.directions = list(direction_name_matcher.all_names())
     response.transfers = _build_transfers_response(
         transfers, stop_pk_to_service_maps_response
     )
@@ -148,15 +225,43 @@ def get_in_system_by_id(
         inclusion_interval_end=include_all_trips_within,
         min_trips_per_direction=minimum_number_of_trips,
     )
-    for trip_stop_time in trip_stop_times:
-        direction = direction_name_matcher.match(trip_stop_time)
-        if stop_time_filter.remove(trip_stop_time, direction):
-            continue
-        response.stop_times.append(
-            _build_trip_stop_time_response(
-                trip_stop_time, direction, trip_pk_to_last_stop
-            )
+    # The materialized departure boards only contain the upcoming stop times, so they
+    # are not used when a time window is requested.
+    if (
+        departureboardmanager.is_enabled()
+        and earliest_time is None
+        and latest_time is None
+    ):
+        response.directions, stop_times = departureboardmanager.get_departure_board(
+            system_id, descendant_stop_pks
+        )
+        for stop_time in stop_times:
+            if stop_time_filter.remove_at_time(
+                (stop_time.arrival.time or stop_time.departure.time).timestamp(),
+                stop_time.direction,
+            ):
+                continue
+            response.stop_times.append(stop_time)
+    else:
+        direction_name_matcher = departureboardmanager.DirectionNameMatcher(
+            stopqueries.list_direction_rules_for_stops(descendant_stop_pks)
         )
+        trip_stop_times = stopqueries.list_stop_time_updates_at_stops(
+            descendant_stop_pks, earliest_time=earliest_time, latest_time=latest_time,
+        )
+        trip_pk_to_last_stop = tripqueries.get_trip_pk_to_last_stop_map(
+            trip_stop_time.trip.pk for trip_stop_time in trip_stop_times
+        )
+        response.directions = list(direction_name_matcher.all_names())
+        for trip_stop_time in trip_stop_times:
+            direction = direction_name_matcher.match(trip_stop_time)
+            if stop_time_filter.remove(trip_stop_time, direction):
+                continue
+            response.stop_times.append(
+                _build_trip_stop_time_response(
+                    trip_stop_time, direction, trip_pk_to_last_stop
+                )
+            )
     helpers.add_alerts_to_views(
         [response], [stop], alerts_detail or views.AlertsDetail.CAUSE_AND_EFFECT,
     )
@@ -174,15 +279,17 @@ class _TripStopTimeFilter:
         self._current_time = time.time()
 
     def remove(self, trip_stop_time: models.TripStopTime, direction):
-        result = self._remove_helper(trip_stop_time, direction)
+        return self.remove_at_time(trip_stop_time.get_time().timestamp(), direction)
+
+    def remove_at_time(self, trip_time: float, direction):
+        result = self._remove_helper(trip_time, direction)
         if not result:
             self._direction_to_num_trips_so_far[direction] = (
                 self._direction_to_num_trips_so_far.get(direction, 0) + 1
             )
         return result
 
-    def _remove_helper(self, trip_stop_time: models.TripStopTime, direction):
-        trip_time = trip_stop_time.get_time().timestamp()
+    def _remove_helper(self, trip_time: float, direction):
         # If the trip is before the inclusion interval, remove.
         if self._inclusion_interval_start is not None and (
             trip_time <= self._current_time - float(self._inclusion_interval_start) * 60
@@ -398,57 +505,3 @@ def _build_stop_tree_response(
         return response
 
     return stop_tree.apply_function(node_function, only_stations=return_only_stations)
-
-
-class _DirectionNameMatcher:
-    """
-    Object to find the direction name associated to a particular trip at
-    a particular stop.
-    """
-
-    def __init__(self, rules):
-        """
-        Initialize a new matcher.
-
-        :param rules: the rules to be used in the matcher.
-        :type rules: iterable of DirectionRule models.
-        """
-        self._rules = sorted(rules, key=lambda rule: rule.priority)
-        self._cache = {}
-
-    def all_names(self):
-        """
-        Get all of the direction names in the matcher.
-
-        :return: list of names
-        :rtype: list of strings
-        """
-        print(self._rules)
-        return {rule.name for rule in self._rules}
-
-    def match(self, trip_stop_time):
-        """
-        Find the direction name associate to the TripStopTime by matching
-        the appropriate rule.
-
-        :param trip_stop_time: the TripStopTime
-        :return: the direction name
-        """
-        cache_key = (
-            trip_stop_time.stop_pk,
-            trip_stop_time.trip.direction_id,
-            trip_stop_time.track,
-        )
-        if cache_key not in self._cache:
-            self._cache[cache_key] = None
-            for rule in self._rules:
-                if rule.stop_pk != cache_key[0]:
-                    continue
-                if rule.direction_id is not None and rule.direction_id != cache_key[1]:
-                    continue
-                if rule.track is not None and rule.track != cache_key[2]:
-                    continue
-                self._cache[cache_key] = rule.name
-                break
-
-        return self._cache[cache_key]
@@ -125,6 +125,8 @@ ENABLED = "enabled"
 FEEDS = "feeds"
 HEADERS = "headers"
 HTTP = "http"
+MAX_PERIOD = "max_period"
+MIN_PERIOD = "min_period"
 NAME = "name"
 OPTIONS = "options"
 PREFERRED_ID = "preferred_id"
@@ -205,6 +207,8 @@ _schema = Map(
                         {
                             Optional(ENABLED, True): Bool(),
                             Optional(PERIOD, -1): HumanReadableTimePeriod(),
+                            Optional(MIN_PERIOD): HumanReadableTimePeriod(),
+                            Optional(MAX_PERIOD): HumanReadableTimePeriod(),
                         }
                     ),
                     Optional(REQUIRED_FOR_INSTALL, False): Bool(),
@@ -254,6 +258,20 @@ def read(yaml_string, setting_to_value=None, label="transit system config"):
             "Provided system config file cannot be parsed as YAML\n" + str(error)
         )
 
+    for feed_id, feed_config in config[FEEDS].items():
+        auto_update_config = feed_config[AUTO_UPDATE]
+        min_period = auto_update_config.get(MIN_PERIOD)
+        max_period = auto_update_config.get(MAX_PERIOD)
+        if (
+            min_period is not None
+            and max_period is not None
+            and min_period > max_period
+        ):
+            raise exceptions.InvalidSystemConfigFile(
+                "The auto update min_period of feed '{}' is greater than its "
+                "max_period".format(feed_id)
+            )
+
     required_settings = config[REQUIREMENTS][SETTINGS]
     missing_settings = set(required_settings) - set(setting_to_value.keys())
     if len(missing_settings) > 0:
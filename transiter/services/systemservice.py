@@ -3,6 +3,7 @@ The system service is used to install, delete and retrieve information about
 (transit) systems.
 """
 import datetime
+import functools
 import json
 import traceback
 import logging
@@ -22,12 +23,12 @@ from transiter.services import systemconfigreader, views, updatemanager
 logger = logging.getLogger(__name__)
 
 
-@dbconnection.unit_of_work
+@dbconnection.unit_of_work(read_only=True)
 def list_all() -> typing.List[views.System]:
     return list(map(views.System.from_model, systemqueries.list_all()))
 
 
-@dbconnection.unit_of_work
+@dbconnection.unit_of_work(read_only=True)
 def get_by_id(system_id) -> views.SystemLarge:
     system = systemqueries.get_by_id(system_id)
     if system is None:
@@ -53,6 +54,20 @@ def get_by_id(system_id) -> views.SystemLarge:
     return response
 
 
+@dbconnection.unit_of_work(read_only=True)
+def get_update_generation(system_id) -> typing.Optional[typing.Tuple[int, int]]:
+    """
+    Get the PK of a system along with its update generation, which is incremented
+    whenever a feed update or a transfers config changes the system's data.
+
+    Returns None if the system does not exist.
+    """
+    result = systemqueries.get_update_generation(system_id)
+    if result is None:
+        return None
+    return tuple(result)
+
+
 @dbconnection.unit_of_work
 def is_active(system_id):
     system = systemqueries.get_by_id(system_id)
@@ -89,7 +104,7 @@ def install(system_id, config_str, extra_settings, config_source_url, sync=True)
     )
     sync_to_function = {
         True: _execute_system_update,
-        False: _execute_system_update_async.delay,
+        False: functools.partial(celeryapp.submit, _execute_system_update_async),
     }
     sync_to_function[sync](system_update_pk)
     return system_update_pk
@@ -160,11 +175,15 @@ def _execute_system_update(system_update_pk):
         feed_ids_to_update, feed_ids_to_delete = _install_system_configuration(
             system_update_pk
         )
+        feed_id_to_download_result = updatemanager.download_feeds(
+            context.system_id, feed_ids_to_update
+        )
         for feed_id in feed_ids_to_update:
             feed_update, exception = updatemanager.execute_feed_update(
                 feed_update_pk=updatemanager.create_feed_update(
                     context.system_id, feed_id
-                )
+                ),
+                download_result=feed_id_to_download_result.get(feed_id),
             )
             if feed_update.status != models.FeedUpdate.Status.SUCCESS:
                 if exception is None:
@@ -278,7 +297,7 @@ def delete_by_id(system_id, error_if_not_exists=True, sync=True):
 
     sync_to_function = {
         True: _complete_delete_operation,
-        False: _complete_delete_operation_async.delay,
+        False: functools.partial(celeryapp.submit, _complete_delete_operation_async),
     }
     sync_to_function[sync](system_id)
 
@@ -372,6 +391,12 @@ def _build_feeds_from_config(feeds_config) -> Iterator[models.Feed]:
         feed.auto_update_period = config[systemconfigreader.AUTO_UPDATE][
             systemconfigreader.PERIOD
         ]
+        feed.auto_update_min_period = config[systemconfigreader.AUTO_UPDATE].get(
+            systemconfigreader.MIN_PERIOD
+        )
+        feed.auto_update_max_period = config[systemconfigreader.AUTO_UPDATE].get(
+            systemconfigreader.MAX_PERIOD
+        )
         feed.required_for_install = config[systemconfigreader.REQUIRED_FOR_INSTALL]
         yield feed
 
@@ -4,7 +4,7 @@ import collections
 from transiter import exceptions
 from transiter.db import dbconnection, models
 from transiter.db.queries import stopqueries, systemqueries, transfersconfigqueries
-from transiter.services import geography, views
+from transiter.services import spatialindex, views
 
 
 @dbconnection.unit_of_work
@@ -44,7 +44,10 @@ def get_by_id(config_id) -> views.TransfersConfig:
 def update(config_id, system_ids, distance) -> None:
     config = _get_transfer_config(config_id)
     if system_ids is not None:
-        config.systems = _list_systems(system_ids)
+        systems = _list_systems(system_ids)
+        # Transfers are removed from any systems that are no longer in the config.
+        _invalidate_cached_responses(config.systems)
+        config.systems = systems
     if distance is not None:
         config.distance = distance
     _build_and_add_transfers(config)
@@ -53,6 +56,7 @@ def update(config_id, system_ids, distance) -> None:
 @dbconnection.unit_of_work
 def delete(config_id) -> None:
     config = _get_transfer_config(config_id)
+    _invalidate_cached_responses(config.systems)
     dbconnection.get_session().delete(config)
 
 
@@ -86,30 +90,37 @@ def _build_and_add_transfers(transfers_config):
     transfers_config.transfers = list(
         _build_transfers(transfers_config.systems, transfers_config.distance)
     )
+    _invalidate_cached_responses(transfers_config.systems)
+
+
+def _invalidate_cached_responses(systems):
+    # The transfers of a system appear in the system's cached HTTP responses.
+    for system in systems:
+        systemqueries.increment_update_generation(system.pk)
 
 
 def _build_transfers(systems, distance) -> typing.Iterable[models.Transfer]:
     system_id_to_stops = {
         system.id: stopqueries.list_all_in_system(system.id) for system in systems
     }
+    system_id_to_index = {
+        system.id: spatialindex.get_index(system) for system in systems
+    }
+    stop_pk_to_stop = {
+        stop.pk: stop for stops in system_id_to_stops.values() for stop in stops
+    }
     pairs = _WorkingSet()
     for system_1_id, stops_1 in system_id_to_stops.items():
         for stop_1 in stops_1:
-            for system_2_id, stops_2 in system_id_to_stops.items():
+            if stop_1.latitude is None or stop_1.longitude is None:
+                continue
+            for system_2_id, index_2 in system_id_to_index.items():
                 if system_1_id == system_2_id:
                     continue
-                for stop_2 in stops_2:
-                    # This could be optimized by having a lower bound on distance
-                    # function that is fast to calculate.
-                    stops_distance = geography.distance(
-                        stop_1.latitude,
-                        stop_1.longitude,
-                        stop_2.latitude,
-                        stop_2.longitude,
-                    )
-                    if stops_distance > distance:
-                        continue
-                    pairs.add(stop_1, stop_2, stops_distance)
+                for stops_distance, stop_2 in index_2.search(
+                    float(stop_1.latitude), float(stop_1.longitude), distance
+                ):
+                    pairs.add(stop_1, stop_pk_to_stop[stop_2.pk], stops_distance)
 
     for stop_1, stop_2, distance in pairs.elements():
         yield models.Transfer(
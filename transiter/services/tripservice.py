@@ -3,21 +3,64 @@ import typing
 from transiter import exceptions
 from transiter.db import dbconnection, models
 from transiter.db.queries import tripqueries, routequeries
-from transiter.services import views, helpers
+from transiter.services import views, helpers, pagination
 
 
-@dbconnection.unit_of_work
+@dbconnection.unit_of_work(read_only=True)
 def list_all_in_route(
+    system_id,
+    route_id,
+    alerts_detail: views.AlertsDetail = None,
+    limit=None,
+    after=None,
+) -> pagination.Page:
+    """
+    List the trips in a route, ordered by ID.
+
+    :param limit: if provided, the maximum number of trips in the page
+    :param after: the cursor of the previous page
+    """
+    pagination.check_limit(limit)
+    after_id = pagination.decode_cursor(after, str)
+    route = _get_route(system_id, route_id)
+    trips, next_cursor = pagination.split(
+        tripqueries.list_all_in_route_by_pk(
+            route.pk, after_id=after_id, limit=pagination.query_limit(limit)
+        ),
+        limit,
+        lambda trip: trip.id,
+    )
+    return pagination.Page(_build_trip_views(trips, alerts_detail), next_cursor)
+
+
+def stream_all_in_route(
     system_id, route_id, alerts_detail: views.AlertsDetail = None
-) -> typing.List[views.Trip]:
+) -> typing.Iterator[views.Trip]:
+    """
+    Stream all of the trips in a route, ordered by ID.
+
+    The trips are read from the database in chunks using a server side cursor. The
+    unit of work is open until the iterator is exhausted or closed.
+    """
+    with dbconnection.inline_unit_of_work(read_only=True):
+        route = _get_route(system_id, route_id)
+        for trips in tripqueries.list_all_in_route_by_pk(
+            route.pk, chunk_size=pagination.STREAM_CHUNK_SIZE
+        ):
+            yield from _build_trip_views(trips, alerts_detail)
+
+
+def _get_route(system_id, route_id) -> models.Route:
     route = routequeries.get_in_system_by_id(system_id, route_id)
     if route is None:
         raise exceptions.IdNotFoundError(
             models.Route, system_id=system_id, route_id=route_id
         )
+    return route
+
 
+def _build_trip_views(trips, alerts_detail) -> typing.List[views.Trip]:
     response = []
-    trips = tripqueries.list_all_in_route_by_pk(route.pk)
     trip_pk_to_last_stop = tripqueries.get_trip_pk_to_last_stop_map(
         trip.pk for trip in trips
     )
@@ -33,7 +76,7 @@ def list_all_in_route(
     return response
 
 
-@dbconnection.unit_of_work
+@dbconnection.unit_of_work(read_only=True)
 def get_in_route_by_id(
     system_id, route_id, trip_id, alerts_detail: views.AlertsDetail = None
 ):
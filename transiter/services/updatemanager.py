@@ -8,25 +8,38 @@ This algorithm performs the following steps in order:
     INVALID_PARSER.
 
 (2) Downloads the data from the URL specified in the Feed. If this
-    fails the update fails with explanation DOWNLOAD_ERROR. If the content
-    of the download is empty, the update fails with explanation EMPTY_FEED.
+    fails the update fails with explanation DOWNLOAD_ERROR. The download is
+    conditional on the HTTP validators of the last successful FeedUpdate; if the
+    server responds that the content has not been modified, the update succeeds
+    with explanation NOT_NEEDED. If the content of the download is empty, the
+    update fails with explanation EMPTY_FEED.
 
 (3) Calculate the hash of the downloaded data and compare it to the data
     used for the last successful FeedUpdate for this Feed. If they match,
     the update succeeds with explanation NOT_NEEDED.
 
-(4) Perform the actual parsing using the Feed's parser. This "converts" the raw
+(4) For GTFS Static feeds, calculate the hash of each file in the archive. During
+    the import, entities whose source files are the same as in the last update
+    that changed the database are not synced again.
+
+(5) Perform the actual parsing using the Feed's parser. This "converts" the raw
     feed content into an iterator of UpdatableEntities. If any exception is
     raised by the parser then the update is failed with explanation
     PARSE_ERROR.
 
-(5) Sync the results of the parser to the database using the import module. If any
+(6) Sync the results of the parser to the database using the import module. If any
     exception is raised here, the update fails with explanation SYNC_ERROR.
 
-(6) Otherwise, the update is deemed to be successful with explanation UPDATED.
+(7) Otherwise, the update is deemed to be successful with explanation UPDATED.
+
+When many updates are executed together they can be pipelined: steps (1) through (5)
+run in a pool of worker processes, which send the parsed entities back to the
+executing process for step (6).
 """
+import concurrent.futures
 import datetime
 import dataclasses
+import functools
 import hashlib
 import importlib
 import json
@@ -35,19 +48,30 @@ import time
 import traceback
 import typing
 
-import requests
 from requests import RequestException
 
-from transiter import import_
+from transiter import config, import_
 from transiter.db import dbconnection, models
-from transiter.db.queries import feedqueries
-from transiter.executor import celeryapp
+from transiter.db.queries import feedqueries, systemqueries
+from transiter.executor import celeryapp, processpool
 from transiter.parse import parser, gtfsstatic, gtfsrealtime, TransiterParser
 from transiter.scheduler import client
+from transiter.services import downloader
 
 logger = logging.getLogger(__name__)
 
 
+def _parse_pool_num_workers() -> int:
+    return int(config.PARSE_POOL_NUM_WORKERS)
+
+
+_parse_pool = processpool.ProcessPool(
+    "Parse",
+    _parse_pool_num_workers,
+    initializer=functools.partial(dbconnection.set_role, dbconnection.EXECUTOR),
+)
+
+
 def create_feed_update(system_id, feed_id) -> typing.Optional[int]:
     return _create_feed_update_helper(
         system_id, feed_id, update_type=models.FeedUpdate.Type.REGULAR
@@ -75,26 +99,188 @@ def _create_feed_update_helper(system_id, feed_id, update_type) -> typing.Option
 
 
 @celeryapp.app.task
-def execute_feed_update_async(feed_update_pk, content=None):
-    return execute_feed_update(feed_update_pk, content)
+def execute_feed_update_async(feed_update_pk, content=None, trigger_id=None):
+    return execute_feed_update(feed_update_pk, content, trigger_id=trigger_id)
+
+
+def create_and_execute_feed_updates(
+    system_id, feed_ids, trigger_id=None
+) -> typing.List[int]:
+    """
+    Create and execute updates for multiple feeds in a system.
+
+    The feeds are downloaded concurrently and then the updates are executed
+    sequentially in this process, so that lookups cached in one import are reused in
+    the next. Each feed still gets its own FeedUpdate, executed in its own units of
+    work, so a failure in one update does not affect the others.
+
+    If the parse pool is enabled, the updates are instead executed using
+    execute_feed_updates_pipelined. The parse pool cannot be used in a daemonic
+    process, like a Celery prefork worker; in this case DaemonicProcessError is raised
+    before any update is created.
+
+    :param trigger_id: the ID of the scheduler trigger, if the updates were triggered
+        by the scheduler. Feeds that no longer exist are reported to the scheduler as
+        skipped, as no update callback is sent for them.
+    :return: the PKs of the feed updates
+    """
+    if _parse_pool_num_workers() > 0:
+        _parse_pool.check_can_start()
+    feed_id_to_feed_update_pk = {}
+    skipped_feed_ids = []
+    for feed_id in feed_ids:
+        feed_update_pk = create_feed_update(system_id, feed_id)
+        if feed_update_pk is not None:
+            feed_id_to_feed_update_pk[feed_id] = feed_update_pk
+        else:
+            skipped_feed_ids.append(feed_id)
+    if trigger_id is not None and len(skipped_feed_ids) > 0:
+        client.feed_updates_skipped_callback(system_id, skipped_feed_ids, trigger_id)
+    if _parse_pool_num_workers() > 0:
+        execute_feed_updates_pipelined(
+            feed_id_to_feed_update_pk.values(), trigger_id=trigger_id
+        )
+        return list(feed_id_to_feed_update_pk.values())
+    feed_id_to_download_result = download_feeds(
+        system_id, feed_id_to_feed_update_pk.keys()
+    )
+    for feed_id, feed_update_pk in feed_id_to_feed_update_pk.items():
+        execute_feed_update(
+            feed_update_pk,
+            download_result=feed_id_to_download_result.get(feed_id),
+            trigger_id=trigger_id,
+        )
+    return list(feed_id_to_feed_update_pk.values())
+
+
+def execute_feed_updates_pipelined(feed_update_pks, trigger_id=None) -> None:
+    """
+    Execute many feed updates, with parsing and importing in separate stages.
+
+    The parse stage of each update - downloading the feed and parsing its content into
+    a batch of entities - runs in a pool of worker processes. The import stage runs in
+    this process, and imports the batches in the order in which they become ready.
+    Parsing is CPU bound, so this uses multiple cores for the parsing while the import
+    of one update overlaps with the parsing of the others.
+
+    For parsers whose entities cannot be loaded into a batch, namely the GTFS Static
+    parser, only the download runs in the pool and the content is parsed in this
+    process during the import stage.
+    """
+    future_to_feed_update_pk = {}
+    for feed_update_pk in feed_update_pks:
+        try:
+            future = _parse_pool.submit(_execute_parse_stage, feed_update_pk)
+        except Exception:
+            logger.exception("Failed to submit the parse stage of a feed update")
+            execute_feed_update(feed_update_pk, trigger_id=trigger_id)
+            continue
+        future_to_feed_update_pk[future] = feed_update_pk
+    for future in concurrent.futures.as_completed(future_to_feed_update_pk):
+        try:
+            context = future.result()
+        except Exception:
+            # The failure has been logged by the pool. The worker process may have
+            # crashed before marking a status on the update, so the whole update is
+            # run again in this process.
+            execute_feed_update(future_to_feed_update_pk[future], trigger_id=trigger_id)
+            continue
+        context.trigger_id = trigger_id
+        if context.feed_update.status == models.FeedUpdate.Status.IN_PROGRESS:
+            actions = [_import]
+            if context.parser is None:
+                actions = [_get_parser_t, _load_options_into_parser] + (
+                    _PARSE_ACTIONS + actions
+                )
+            stats, _ = _run_actions(context, actions)
+        else:
+            stats = None
+        _finish_update(context, stats)
+
+
+def _execute_parse_stage(feed_update_pk) -> "_UpdateContext":
+    """
+    Run the parse stage of a pipelined feed update. This runs in a worker process.
+
+    The returned context is sent back to the importing process. It contains the batch
+    of entities in place of the parser, or neither if the content could not be parsed
+    into a batch.
+    """
+    context = _initialize_update_context(feed_update_pk, None)
+    # Exceptions are logged here, and are not sent back as they may not be picklable.
+    _run_actions(context, _PRE_PARSE_ACTIONS)
+    if context.feed_update.status == models.FeedUpdate.Status.IN_PROGRESS and (
+        import_.can_load_entity_batch(context.parser)
+    ):
+        _run_actions(context, _PARSE_ACTIONS + [_load_entity_batch])
+    if not isinstance(context.parser, import_.EntityBatch):
+        context.parser = None
+    if context.feed_update.status != models.FeedUpdate.Status.IN_PROGRESS:
+        context.content = None
+    return context
+
+
+def download_feeds(
+    system_id, feed_ids
+) -> typing.Dict[str, typing.Union[downloader.DownloadResult, RequestException]]:
+    """
+    Download the content of many feeds in a system concurrently.
+
+    The download for each feed is conditional in the same way as in a feed update. The
+    results can be passed to execute_feed_update, in which case the download step of
+    the update is skipped.
+    """
+    feed_id_to_request = {}
+    with dbconnection.inline_unit_of_work():
+        for feed_id in feed_ids:
+            feed = feedqueries.get_in_system_by_id(system_id, feed_id)
+            if feed is None or feed.url is None:
+                continue
+            feed_id_to_request[feed_id] = _build_download_request(
+                feed, feedqueries.get_last_successful_update(feed.pk)
+            )
+    results = downloader.download_many(feed_id_to_request.values())
+    return dict(zip(feed_id_to_request.keys(), results))
 
 
 def execute_feed_update(
-    feed_update_pk, content=None
+    feed_update_pk, content=None, download_result=None, trigger_id=None
 ) -> typing.Tuple[models.FeedUpdate, typing.Optional[Exception]]:
     """
     Execute a feed update with logging and timing.
 
     For a description of what feed updates involve consult the module docs.
+
+    :param feed_update_pk: the PK of the update
+    :param content: optional content for the update. If provided, the feed is not
+        downloaded
+    :param download_result: optional result of downloading the feed ahead of the
+        update using download_feeds
+    :param trigger_id: the ID of the scheduler trigger, if the update was triggered by
+        the scheduler. It is sent back to the scheduler when the update completes.
     """
 
     context = _initialize_update_context(feed_update_pk, content)
+    context.download_result = download_result
+    context.trigger_id = trigger_id
 
     if context.feed_update.update_type == models.FeedUpdate.Type.FLUSH:
         actions = _FLUSH_UPDATE_ACTIONS
     else:
         actions = _REGULAR_UPDATE_ACTIONS
 
+    stats, exception = _run_actions(context, actions)
+    _finish_update(context, stats)
+    return context.feed_update, exception
+
+
+def _run_actions(context: "_UpdateContext", actions):
+    """
+    Run update actions until one of them marks a status on the update.
+
+    :return: the import stats, if the import action ran, and the exception that
+        failed the update, if any
+    """
     stats = None
     exception = None
     for action in actions:
@@ -122,7 +308,10 @@ def execute_feed_update(
         # need to finish right now.
         if context.feed_update.status != models.FeedUpdate.Status.IN_PROGRESS:
             break
+    return stats, exception
 
+
+def _finish_update(context: "_UpdateContext", stats):
     context.feed_update.total_duration = time.time() - context.start_time
     context.feed_update.completed_at = datetime.datetime.utcnow()
     with dbconnection.inline_unit_of_work() as session:
@@ -140,8 +329,9 @@ def execute_feed_update(
         context.feed_update.status,
         context.feed_update.result,
         stats.entity_type_to_num_in_db() if stats is not None else {},
+        context.feed_update.content_created_at,
+        trigger_id=context.trigger_id,
     )
-    return context.feed_update, exception
 
 
 class _InvalidParser(ValueError):
@@ -154,8 +344,12 @@ class _InvalidParser(ValueError):
 class _UpdateContext:
     feed_update: models.FeedUpdate
     content: typing.Optional[bytes] = None
-    parser: typing.Optional[TransiterParser] = None
+    download_result: typing.Union[
+        None, downloader.DownloadResult, RequestException
+    ] = None
+    parser: typing.Union[None, TransiterParser, import_.EntityBatch] = None
     start_time: int = dataclasses.field(default_factory=time.time)
+    trigger_id: typing.Optional[str] = None
 
 
 def _initialize_update_context(feed_update_pk, content) -> _UpdateContext:
@@ -207,15 +401,41 @@ def _get_parser_for_flush(context: _UpdateContext):
 def _get_content(context: _UpdateContext):
     if context.content is not None:
         return
-    download_start_time = time.time()
-    request = requests.get(
-        context.feed_update.feed.url,
-        timeout=context.feed_update.feed.http_timeout or 10,
-        headers=json.loads(context.feed_update.feed.headers),
+    feed = context.feed_update.feed
+    with dbconnection.inline_unit_of_work():
+        previous_update = feedqueries.get_last_successful_update(feed.pk)
+        previous_hash = (
+            previous_update.content_hash if previous_update is not None else None
+        )
+        request = _build_download_request(feed, previous_update)
+    result = context.download_result
+    if result is None:
+        result = downloader.download(request)
+    elif isinstance(result, RequestException):
+        raise result
+    context.feed_update.download_duration = result.duration
+    context.feed_update.content_etag = result.etag
+    context.feed_update.content_last_modified = result.last_modified
+    if result.not_modified:
+        # The hash is carried forward so that the next update that does download
+        # content can still be compared with it.
+        context.feed_update.content_hash = previous_hash
+        context.feed_update.status = models.FeedUpdate.Status.SUCCESS
+        context.feed_update.result = models.FeedUpdate.Result.NOT_NEEDED
+        return
+    context.content = result.content
+
+
+def _build_download_request(
+    feed: models.Feed, previous_update: typing.Optional[models.FeedUpdate]
+) -> downloader.DownloadRequest:
+    request = downloader.DownloadRequest(
+        url=feed.url, timeout=feed.http_timeout, headers=json.loads(feed.headers)
     )
-    request.raise_for_status()
-    context.content = request.content
-    context.feed_update.download_duration = time.time() - download_start_time
+    if previous_update is not None:
+        request.etag = previous_update.content_etag
+        request.last_modified = previous_update.content_last_modified
+    return request
 
 
 def _check_for_non_empty_content(context: _UpdateContext):
@@ -262,6 +482,18 @@ def _load_options_into_parser(context: _UpdateContext):
 )
 def _load_content_into_parser(context: _UpdateContext):
     context.parser.load_content(context.content)
+    context.feed_update.content_created_at = context.parser.get_timestamp()
+
+
+@_possible_exception(
+    Exception, models.FeedUpdate.Status.FAILURE, models.FeedUpdate.Result.PARSE_ERROR,
+)
+def _calculate_content_file_hashes(context: _UpdateContext):
+    if not isinstance(context.parser, gtfsstatic.GtfsStaticParser):
+        return
+    context.feed_update.content_file_hashes = json.dumps(
+        context.parser.get_file_hashes(), sort_keys=True
+    )
 
 
 @_possible_exception(
@@ -275,24 +507,41 @@ def _import(context: _UpdateContext):
         feed_update.num_added_entities = stats.num_added()
         feed_update.num_updated_entities = stats.num_updated()
         feed_update.num_deleted_entities = stats.num_deleted()
+        feed_update.num_unchanged_entities = stats.num_unchanged()
         feed_update.num_parsed_entities = -1
         feed_update.status = models.FeedUpdate.Status.SUCCESS
         feed_update.result = models.FeedUpdate.Result.UPDATED
+        # Cached HTTP responses for the system are invalidated when this commits.
+        if stats.num_added() + stats.num_updated() + stats.num_deleted() > 0:
+            systemqueries.increment_update_generation(feed_update.feed.system_pk)
 
         session.merge(feed_update)
         return stats
 
 
-_REGULAR_UPDATE_ACTIONS = [
+@_possible_exception(
+    Exception, models.FeedUpdate.Status.FAILURE, models.FeedUpdate.Result.PARSE_ERROR,
+)
+def _load_entity_batch(context: _UpdateContext):
+    context.parser = import_.load_entity_batch(context.parser)
+    context.content = None
+
+
+_PRE_PARSE_ACTIONS = [
     _get_parser_t,
     _load_options_into_parser,
     _get_content,
     _check_for_non_empty_content,
     _calculate_content_hash,
+]
+
+_PARSE_ACTIONS = [
     _load_content_into_parser,
-    _import,
+    _calculate_content_file_hashes,
 ]
 
+_REGULAR_UPDATE_ACTIONS = _PRE_PARSE_ACTIONS + _PARSE_ACTIONS + [_import]
+
 _FLUSH_UPDATE_ACTIONS = [_get_parser_for_flush, _import]
 
 
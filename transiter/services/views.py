@@ -379,12 +379,24 @@ class Feed(View):
     updates: "UpdatesInFeedLink" = NULL
     statistics: typing.List[FeedStatistics] = NULL
     system: models.System = NULL
+    auto_update_min_period: int = NULL
+    auto_update_max_period: int = NULL
 
     @classmethod
     def from_model(cls, feed: models.Feed, add_system=False):
         return cls(
             id=feed.id,
             auto_update_period=feed.auto_update_period,
+            auto_update_min_period=(
+                feed.auto_update_min_period
+                if feed.auto_update_min_period is not None
+                else NULL
+            ),
+            auto_update_max_period=(
+                feed.auto_update_max_period
+                if feed.auto_update_max_period is not None
+                else NULL
+            ),
             _system_id=feed.system.id,
             system=System.from_model(feed.system) if add_system else NULL,
         )